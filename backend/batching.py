@@ -0,0 +1,88 @@
+"""微批处理模块
+
+本地推理的模型（或其他按批计算的后端）每次调用都有固定开销（加载提示词、调度计算等），
+一批求解多个输入时这部分开销只付一次，逐token生成的步骤也可以对整批并行进行。
+MicroBatcher把多个线程中并发的单次调用收集成批：
+- 第一个调用到达后最多再等待window秒收集后续调用，凑满max_size个时立即执行
+- window为0时不额外等待，只合并执行上一批期间已排队的调用（负载低时不增加延迟）
+- 由一个分派线程依次执行各批，对应单个模型实例；批处理期间到达的调用排队等待下一批
+
+窗口越大批越大、吞吐越高，但单次调用的延迟也越高，取值可用bench/bench_batching.py测量。
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional
+
+
+class MicroBatcher:
+    """把并发的单次调用收集成批，交给批处理函数执行
+
+    func接收输入列表，按相同顺序返回结果列表；func抛出异常时该批的每个调用都得到该异常。
+    """
+
+    def __init__(
+        self,
+        func: Callable[[List[Any]], List[Any]],
+        max_size: int = 8,
+        window: float = 0.0,
+        name: str = "batcher",
+    ):
+        self.func = func
+        self.max_size = max(1, max_size)
+        self.window = max(0.0, window)
+        self.name = name
+        self._queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, item: Any) -> Future:
+        """提交一个输入，返回其结果的Future"""
+        future: Future = Future()
+        self._ensure_started()
+        self._queue.put((item, future))
+        return future
+
+    def call(self, item: Any, timeout: Optional[float] = None) -> Any:
+        """提交一个输入并阻塞等待结果"""
+        return self.submit(item).result(timeout)
+
+    def _ensure_started(self) -> None:
+        # 分派线程在第一次调用时启动（守护线程，随进程退出）
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def _collect(self) -> list:
+        """阻塞等待第一个调用，然后在窗口内收集后续调用，最多max_size个"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            # 跳过已取消的调用
+            batch = [(item, future) for item, future in self._collect() if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                results = self.func([item for item, _ in batch])
+                if len(results) != len(batch):
+                    raise RuntimeError(f"批处理返回了{len(results)}个结果，输入为{len(batch)}个")
+            except BaseException as exc:
+                for _, future in batch:
+                    future.set_exception(exc)
+                continue
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
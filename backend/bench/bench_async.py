@@ -0,0 +1,164 @@
+"""同步与异步请求路径的吞吐量对比（大量并发连接）
+
+启动独立的uvicorn服务进程（临时数据库中预先生成题目），
+用大量并发连接在固定时长内持续请求题目接口，统计每秒请求数与延迟：
+- sync: 旧实现，同步路由 + 同步会话（crud），在Starlette线程池中执行，
+  并发数受线程池大小（默认40）限制
+- async: 当前实现，async路由 + 异步会话（crud_async），在事件循环中等待数据库IO
+
+请求按1:1混合 GET /problems/{id} 与 GET /problems?limit=20。
+
+用法（在backend目录下执行）：
+    python bench/bench_async.py --connections 1000 --duration 15
+"""
+
+import argparse
+import asyncio
+import datetime
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchutil import BACKEND_DIR, free_port, percentile, setup_app, wait_until_up
+
+# 预先生成的题目数量
+SEED_PROBLEMS = 5000
+
+
+def serve(mode: str, port: int, workdir: str):
+    """子进程入口：创建临时数据库、生成题目并启动服务"""
+    main, engine, SessionLocal = setup_app(workdir, "production")
+
+    import uvicorn
+    from fastapi import Depends, HTTPException
+    from jose import JWTError, jwt
+    from sqlalchemy import text
+
+    import cache
+    import crud
+    import models
+    import pagination
+    import schemas
+
+    db = SessionLocal()
+    user = crud.create_user(db, schemas.UserCreate(username="bench", password="bench-password"))
+    db.close()
+
+    start = datetime.datetime(2024, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO problems (owner_id, source_type, raw, subject, is_bookmarked, created_at, updated_at) "
+            "VALUES (:owner, 'text', :raw, '数学', 0, :t, :t)"
+        ), [
+            {"owner": user.id, "raw": f"题目 {i}", "t": start + datetime.timedelta(seconds=i)}
+            for i in range(SEED_PROBLEMS)
+        ])
+
+    if mode == "sync":
+        # 复现旧实现：用户验证、路由都是同步函数，使用同步会话
+        def sync_current_user(token: str = Depends(main.oauth2_scheme), db=Depends(main.get_db)):
+            try:
+                username = jwt.decode(token, main.SECRET_KEY, algorithms=[main.ALGORITHM]).get("sub")
+            except JWTError:
+                raise HTTPException(status_code=401)
+            user = cache.user_cache.get(username)
+            if user is None:
+                user = cache.UserSnapshot.from_user(crud.get_user_by_username(db, username))
+                cache.user_cache.set(username, user)
+            return user
+
+        @main.app.get("/bench/sync/problems/{problem_id}", response_model=schemas.ProblemOut)
+        def sync_get_problem(problem_id: int, db=Depends(main.get_db), current_user=Depends(sync_current_user)):
+            p = crud.get_problem(db, problem_id)
+            if not p or p.owner_id != current_user.id:
+                raise HTTPException(status_code=404)
+            return schemas.ProblemOut.from_orm(p)
+
+        @main.app.get("/bench/sync/problems", response_model=list)
+        def sync_list_problems(limit: int = 20, db=Depends(main.get_db), current_user=Depends(sync_current_user)):
+            query = db.query(models.Problem).filter(models.Problem.owner_id == current_user.id)
+            problems, _ = pagination.paginate(query, models.Problem.created_at, models.Problem.id, limit=limit, descending=True)
+            return [
+                schemas.ProblemSummary(**{f: getattr(p, f) for f in schemas.PROBLEM_SUMMARY_FIELDS}).dict(exclude_unset=True)
+                for p in problems
+            ]
+
+    uvicorn.run(main.app, host="127.0.0.1", port=port, log_level="warning", backlog=4096)
+
+
+async def _worker(client, headers, prefix: str, deadline: float, stats: dict):
+    rng = random.Random()
+    while time.perf_counter() < deadline:
+        if rng.random() < 0.5:
+            request = client.get(f"{prefix}/problems/{rng.randint(1, SEED_PROBLEMS)}", headers=headers)
+        else:
+            request = client.get(f"{prefix}/problems", headers=headers, params={"limit": 20})
+        started = time.perf_counter()
+        try:
+            r = await request
+        except Exception:
+            stats["errors"] += 1
+            continue
+        stats["latencies"].append(time.perf_counter() - started)
+        if r.status_code != 200:
+            stats["errors"] += 1
+
+
+async def _run_load(base_url: str, prefix: str, connections: int, duration: float):
+    import httpx
+
+    limits = httpx.Limits(max_connections=connections, max_keepalive_connections=connections)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        await wait_until_up(client)
+        form = {"username": "bench", "password": "bench-password"}
+        token = (await client.post("/login", data=form)).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+
+        stats = {"latencies": [], "errors": 0}
+        started = time.perf_counter()
+        deadline = started + duration
+        await asyncio.gather(*(_worker(client, headers, prefix, deadline, stats) for _ in range(connections)))
+        # 最后一批请求可能在deadline之后才完成，按实际耗时计算吞吐量
+        return stats, time.perf_counter() - started
+
+
+def run_mode(mode: str, connections: int, duration: float):
+    port = free_port()
+    with tempfile.TemporaryDirectory() as workdir:
+        proc = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "--serve", mode, "--port", str(port), "--workdir", workdir],
+            cwd=BACKEND_DIR,
+        )
+        try:
+            prefix = "/bench/sync" if mode == "sync" else ""
+            stats, elapsed = asyncio.run(_run_load(f"http://127.0.0.1:{port}", prefix, connections, duration))
+        finally:
+            proc.terminate()
+            proc.wait()
+
+    lat = stats["latencies"] or [float("nan")]
+    print(
+        f"{mode:<5} connections={connections} {len(stats['latencies']) / elapsed:7.1f} req/s "
+        f"p50={percentile(lat, 50) * 1000:7.1f}ms p99={percentile(lat, 99) * 1000:7.1f}ms errors={stats['errors']}"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--connections", type=int, default=1000)
+    parser.add_argument("--duration", type=float, default=15.0, help="每种模式的压测时长（秒）")
+    parser.add_argument("--mode", choices=["sync", "async", "both"], default="both")
+    parser.add_argument("--serve", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.port, args.workdir)
+    else:
+        modes = ["sync", "async"] if args.mode == "both" else [args.mode]
+        for mode in modes:
+            run_mode(mode, args.connections, args.duration)
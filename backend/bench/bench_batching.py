@@ -0,0 +1,78 @@
+"""求解微批处理基准测试：吞吐量与批处理窗口
+
+使用fake求解后端模拟本地模型（每次调用固定开销--call-overhead秒，每个token --token-delay秒，
+一批中各题目的token并行生成），--concurrency个线程各求解--requests道题目，
+分别测量不批处理（每批1个）和各批处理窗口（每批最多--batch-size个）下的吞吐量、延迟和平均批大小。
+
+用法（在backend目录下执行）：
+    python bench/bench_batching.py --concurrency 16 --windows 0,5,20,50
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+from benchutil import BACKEND_DIR, percentile
+
+sys.path.insert(0, BACKEND_DIR)
+
+import batching  # noqa: E402
+import solver  # noqa: E402
+
+
+def run(backend, max_size: int, window: float, concurrency: int, requests: int):
+    """返回 (每次求解的延迟列表, 总耗时, 批数)"""
+    batches = []
+
+    def solve_batch(items):
+        batches.append(len(items))
+        return backend.solve_batch(items)
+
+    batcher = batching.MicroBatcher(solve_batch, max_size=max_size, window=window)
+    latencies = []
+
+    def client(c: int):
+        for i in range(requests):
+            started = time.perf_counter()
+            result = batcher.call((f"第{c}-{i}题：求 f(x)=x^2+{c}x+{i} 的最小值", "structured"))
+            latencies.append(time.perf_counter() - started)
+            assert result["answer"]
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(c,)) for c in range(concurrency)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latencies, time.perf_counter() - started, batches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=10, help="每个线程的求解次数")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--windows", default="0,5,20,50", help="批处理窗口（毫秒），逗号分隔")
+    parser.add_argument("--call-overhead", type=float, default=0.05)
+    parser.add_argument("--token-delay", type=float, default=0.002)
+    args = parser.parse_args()
+
+    backend = solver.FakeBackend(token_delay=args.token_delay, call_overhead=args.call_overhead)
+    configs = [(1, 0.0)] + [(args.batch_size, float(w) / 1000) for w in args.windows.split(",")]
+    print(
+        f"fake后端 固定开销 {args.call_overhead * 1000:g}ms token {args.token_delay * 1000:g}ms，"
+        f"并发 {args.concurrency}，共 {args.concurrency * args.requests} 次求解"
+    )
+    for max_size, window in configs:
+        latencies, elapsed, batches = run(backend, max_size, window, args.concurrency, args.requests)
+        print(
+            f"每批≤{max_size:<3} 窗口 {window * 1000:4g}ms  吞吐 {len(latencies) / elapsed:6.1f} 次/秒  "
+            f"平均批大小 {sum(batches) / len(batches):4.1f}  "
+            f"延迟 p50={percentile(latencies, 50) * 1000:7.1f}ms p99={percentile(latencies, 99) * 1000:7.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""数据库配置基准测试：dev 与 production（WAL + PRAGMA + 连接池）的读写混合吞吐量
+
+对每种配置启动独立的uvicorn服务进程（临时数据库中预先生成题目），
+多个客户端在固定时长内持续请求题目接口：
+- 读：GET /problems?limit=20 与 GET /problems/{id}
+- 写：PATCH /problems/{id} 与 POST /problems/upload（纯文本题目）
+
+按 --write-ratio 的比例混合读写，统计每秒请求数、延迟p50/p99与失败数。
+
+用法（在backend目录下执行）：
+    python bench/bench_db_profile.py --clients 32 --duration 15 --write-ratio 0.2
+"""
+
+import argparse
+import asyncio
+import datetime
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchutil import BACKEND_DIR, free_port, percentile, setup_app, wait_until_up
+
+# 预先生成的题目数量
+SEED_PROBLEMS = 5000
+
+
+def serve(profile: str, port: int, workdir: str):
+    """子进程入口：按指定配置创建临时数据库、生成题目并启动服务"""
+    main, engine, SessionLocal = setup_app(workdir, profile)
+
+    import uvicorn
+    from sqlalchemy import text
+
+    import crud
+    import schemas
+
+    db = SessionLocal()
+    user = crud.create_user(db, schemas.UserCreate(username="bench", password="bench-password"))
+    db.close()
+
+    start = datetime.datetime(2024, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO problems (owner_id, source_type, raw, subject, is_bookmarked, created_at, updated_at) "
+            "VALUES (:owner, 'text', :raw, '数学', 0, :t, :t)"
+        ), [
+            {"owner": user.id, "raw": f"题目 {i}", "t": start + datetime.timedelta(seconds=i)}
+            for i in range(SEED_PROBLEMS)
+        ])
+
+    uvicorn.run(main.app, host="127.0.0.1", port=port, log_level="warning")
+
+
+async def _client(client, headers, write_ratio: float, deadline: float, stats: dict):
+    rng = random.Random()
+    while time.perf_counter() < deadline:
+        problem_id = rng.randint(1, SEED_PROBLEMS)
+        if rng.random() < write_ratio:
+            kind = "write"
+            if rng.random() < 0.5:
+                request = client.patch(
+                    f"/problems/{problem_id}", headers=headers,
+                    json={"notes": f"note {rng.random()}", "is_bookmarked": rng.random() < 0.5},
+                )
+            else:
+                request = client.post("/problems/upload", headers=headers, data={"raw": "新题目", "subject": "数学"})
+        else:
+            kind = "read"
+            if rng.random() < 0.5:
+                request = client.get("/problems", headers=headers, params={"limit": 20})
+            else:
+                request = client.get(f"/problems/{problem_id}", headers=headers)
+
+        started = time.perf_counter()
+        r = await request
+        stats[kind]["latencies"].append(time.perf_counter() - started)
+        if r.status_code != 200:
+            stats[kind]["failed"] += 1
+
+
+async def _run_load(base_url: str, clients: int, duration: float, write_ratio: float):
+    import httpx
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=httpx.Limits(max_connections=clients)) as client:
+        await wait_until_up(client)
+        form = {"username": "bench", "password": "bench-password"}
+        token = (await client.post("/login", data=form)).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+
+        stats = {kind: {"latencies": [], "failed": 0} for kind in ("read", "write")}
+        deadline = time.perf_counter() + duration
+        await asyncio.gather(*(_client(client, headers, write_ratio, deadline, stats) for _ in range(clients)))
+        return stats
+
+
+def run_profile(profile: str, clients: int, duration: float, write_ratio: float):
+    port = free_port()
+    with tempfile.TemporaryDirectory() as workdir:
+        proc = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "--serve", profile, "--port", str(port), "--workdir", workdir],
+            cwd=BACKEND_DIR,
+        )
+        try:
+            stats = asyncio.run(_run_load(f"http://127.0.0.1:{port}", clients, duration, write_ratio))
+        finally:
+            proc.terminate()
+            proc.wait()
+
+    total = sum(len(s["latencies"]) for s in stats.values())
+    line = f"{profile:<10} clients={clients} total={total / duration:7.1f} req/s"
+    for kind, s in stats.items():
+        lat = s["latencies"] or [float("nan")]
+        line += (
+            f" | {kind} {len(s['latencies']) / duration:7.1f} req/s "
+            f"p50={percentile(lat, 50) * 1000:6.1f}ms p99={percentile(lat, 99) * 1000:7.1f}ms failed={s['failed']}"
+        )
+    print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=15.0, help="每种配置的压测时长（秒）")
+    parser.add_argument("--write-ratio", type=float, default=0.2, help="写请求所占比例")
+    parser.add_argument("--profile", choices=["dev", "production", "both"], default="both")
+    parser.add_argument("--serve", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.port, args.workdir)
+    else:
+        profiles = ["dev", "production"] if args.profile == "both" else [args.profile]
+        for profile in profiles:
+            run_profile(profile, args.clients, args.duration, args.write_ratio)
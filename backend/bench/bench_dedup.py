@@ -0,0 +1,137 @@
+"""题目去重基准测试：指纹计算耗时与大规模签名表上的查找延迟
+
+1. 指纹计算：对一批中文数学题目文本计算规范化SHA-256和MinHash/LSH签名的平均耗时
+2. 查找：在临时SQLite数据库中生成相当于--problems道题目的簇和签名行
+   （每个簇1个精确指纹键和LSH_BANDS个段键，--distinct-ratio表示不重复题目的比例），
+   再写入一批真实题目的指纹，然后测量dedup.find_cluster的延迟：
+   - exact: 与已有题目规范化后相同的文本
+   - near: 在已有题目上做小改动的文本（需要读取候选簇的MinHash确认）
+   - miss: 全新的题目
+
+用法（在backend目录下执行）：
+    python bench/bench_dedup.py --problems 10000000
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text  # noqa: E402
+
+import database  # noqa: E402
+import dedup  # noqa: E402
+import models  # noqa: E402
+from benchutil import percentile  # noqa: E402
+
+FUNCTIONS = ["e^x", "sin x", "ln(1+x)", "x^2+1", "cos 2x", "arctan x", "x·e^x", "1/(1+x^2)", "√x", "tan x"]
+TASKS = ["求导数", "求不定积分", "计算定积分", "求极限", "判断单调性并求极值", "求在x=0处的泰勒展开", "求最大值与最小值"]
+CONTEXTS = ["设函数 f(x)={f}，", "已知 f(x)={f}，", "对于函数 y={f}，", "若 g(x)={f}+{c}，"]
+
+# 每批写入的簇数
+BATCH_SIZE = 1000000
+
+
+def make_text(rng) -> str:
+    context = rng.choice(CONTEXTS).format(f=rng.choice(FUNCTIONS), c=rng.randint(1, 99))
+    return f"{context}{rng.choice(TASKS)}，其中 x∈[{rng.randint(-9, 0)}, {rng.randint(1, 9)}]。（第{rng.randint(1, 10 ** 6)}题）"
+
+
+def perturb(rng, value: str) -> str:
+    """小改动：去掉或替换一个字符"""
+    i = rng.randrange(len(value))
+    return value[:i] + rng.choice(["", "的", "1"]) + value[i + 1:]
+
+
+def populate(engine, clusters: int):
+    """用递归CTE批量生成簇和签名行（签名键在64位空间中均匀分布、按顺序写入）"""
+    step = 2 ** 64 // (clusters * (dedup.LSH_BANDS + 1))
+    started = time.perf_counter()
+    for first in range(1, clusters + 1, BATCH_SIZE):
+        last = min(first + BATCH_SIZE - 1, clusters)
+        with engine.begin() as conn:
+            conn.execute(text(
+                "WITH RECURSIVE c(x) AS (SELECT :first UNION ALL SELECT x + 1 FROM c WHERE x < :last) "
+                "INSERT INTO problem_clusters (id, canonical_problem_id, content_hash, minhash, member_count) "
+                "SELECT x, x, hex(randomblob(32)), randomblob(:size), 1 FROM c"
+            ), {"first": first, "last": last, "size": dedup.NUM_PERM * 4})
+            conn.execute(text(
+                "WITH RECURSIVE c(x) AS (SELECT :first UNION ALL SELECT x + 1 FROM c WHERE x < :last) "
+                "INSERT INTO problem_signatures (signature, cluster_id) "
+                "SELECT (x - 1) * :step - 9223372036854775807 + b.k, x FROM c, "
+                "(SELECT value AS k FROM json_each(:offsets)) AS b"
+            ), {
+                "first": first, "last": last, "step": step * (dedup.LSH_BANDS + 1),
+                "offsets": "[" + ",".join(str(i * step) for i in range(dedup.LSH_BANDS + 1)) + "]",
+            })
+        print(f"  已生成 {last} 个簇 ({time.perf_counter() - started:.0f}s)", flush=True)
+
+
+def bench_fingerprint(texts):
+    started = time.perf_counter()
+    for value in texts:
+        dedup.fingerprint(value)
+    return (time.perf_counter() - started) / len(texts)
+
+
+def measure(conn, fingerprints, repeat: int = 3):
+    latencies = []
+    matches = {}
+    for fp in fingerprints:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            match = dedup.find_cluster(conn, fp)
+            latencies.append(time.perf_counter() - started)
+        kind = match.match if match else dedup.MATCH_NEW
+        matches[kind] = matches.get(kind, 0) + 1
+    return latencies, matches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--problems", type=int, default=10000000)
+    parser.add_argument("--distinct-ratio", type=float, default=1.0, help="不重复题目（簇）占题目总数的比例")
+    parser.add_argument("--samples", type=int, default=1000)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    texts = [make_text(rng) for _ in range(args.samples)]
+    per_text = bench_fingerprint(texts)
+    print(f"指纹计算: {per_text * 1e6:.0f}us/题（{dedup.NUM_PERM}个MinHash值，{dedup.LSH_BANDS}段LSH）")
+
+    clusters = int(args.problems * args.distinct_ratio)
+    with tempfile.TemporaryDirectory() as workdir:
+        engine = database.create_db_engine(f"sqlite:///{os.path.join(workdir, 'bench.db')}", "production")
+        models.Base.metadata.create_all(bind=engine)
+        print(f"生成 {clusters} 个簇（{args.problems} 道题目）...")
+        populate(engine, clusters)
+
+        # 写入真实题目的指纹，作为精确和近似重复的查找目标
+        with engine.begin() as conn:
+            for i, value in enumerate(texts):
+                dedup.assign_cluster(conn, "sqlite", clusters + i + 1, dedup.fingerprint(value))
+        size = os.path.getsize(os.path.join(workdir, "bench.db")) / 1024 / 1024
+        print(f"数据库大小: {size:.0f}MB")
+
+        queries = {
+            "exact": [dedup.fingerprint(" " + value.replace("，", ",") + " ") for value in texts],
+            "near": [dedup.fingerprint(perturb(rng, value)) for value in texts],
+            "miss": [dedup.fingerprint(make_text(rng) + "新题") for _ in texts],
+        }
+        with engine.connect() as conn:
+            for name, fingerprints in queries.items():
+                latencies, matches = measure(conn, fingerprints)
+                print(
+                    f"{name:<5} p50={percentile(latencies, 50) * 1000:.3f}ms p99={percentile(latencies, 99) * 1000:.3f}ms "
+                    f"mean={statistics.mean(latencies) * 1000:.3f}ms 匹配结果={matches}"
+                )
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""集中登录负载测试：登录风暴期间其他接口的延迟
+
+启动独立的uvicorn服务进程，先测量空闲时 GET /users/me 的延迟，
+再在同时发起大量登录请求期间（最多--concurrency个连接同时在途）测量同一接口的延迟，统计p50/p99。
+
+两种模式：
+- sync: 旧实现，同步路由中直接调用crud.authenticate_user（PBKDF2在请求线程中计算）
+- pool: 当前 /login，PBKDF2在独立进程池中计算
+
+用法（在backend目录下执行）：
+    python bench/bench_login_burst.py --logins 500
+"""
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchutil import BACKEND_DIR, free_port, percentile, setup_app, wait_until_up
+
+# 探测接口的并发数与两次探测之间的间隔（秒）
+PROBES = 4
+PROBE_INTERVAL = 0.01
+
+
+def serve(mode: str, port: int, workdir: str):
+    """子进程入口：使用临时数据库启动服务，并创建测试用户"""
+    main, _, SessionLocal = setup_app(workdir)
+
+    import uvicorn
+    from fastapi import Depends, HTTPException
+    from fastapi.security import OAuth2PasswordRequestForm
+
+    import crud
+    import schemas
+
+    db = SessionLocal()
+    crud.create_user(db, schemas.UserCreate(username="bench", password="bench-password"))
+    db.close()
+
+    if mode == "sync":
+        @main.app.post("/bench/sync-login")
+        def sync_login(form_data: OAuth2PasswordRequestForm = Depends(), db=Depends(main.get_db)):
+            # 复现旧实现：在请求线程中同步验证密码
+            user = crud.authenticate_user(db, form_data.username, form_data.password)
+            if not user:
+                raise HTTPException(status_code=400, detail="Incorrect username or password")
+            return {"access_token": main.create_access_token(data={"sub": user.username})}
+
+    uvicorn.run(main.app, host="127.0.0.1", port=port, log_level="warning")
+
+
+async def _probe(client, headers, stop: asyncio.Event, latencies: list):
+    while not stop.is_set():
+        started = time.perf_counter()
+        r = await client.get("/users/me", headers=headers)
+        r.raise_for_status()
+        latencies.append(time.perf_counter() - started)
+        await asyncio.sleep(PROBE_INTERVAL)
+
+
+async def _measure(client, headers, duration: float = None, burst=None):
+    """在duration秒内或burst协程运行期间持续探测，返回探测延迟列表"""
+    stop = asyncio.Event()
+    latencies = []
+    probes = [asyncio.create_task(_probe(client, headers, stop, latencies)) for _ in range(PROBES)]
+    result = None
+    if burst is not None:
+        result = await burst
+    else:
+        await asyncio.sleep(duration)
+    stop.set()
+    await asyncio.gather(*probes)
+    return latencies, result
+
+
+async def _run_load(base_url: str, login_path: str, logins: int, concurrency: int):
+    import httpx
+
+    form = {"username": "bench", "password": "bench-password"}
+    # 探测与登录使用各自的客户端，避免探测请求排在登录请求之后等待连接
+    async with httpx.AsyncClient(base_url=base_url, timeout=600) as client, httpx.AsyncClient(
+        base_url=base_url, timeout=600, limits=httpx.Limits(max_connections=concurrency)
+    ) as login_client:
+        await wait_until_up(client)
+        token = (await client.post(login_path, data=form)).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+
+        idle, _ = await _measure(client, headers, duration=2.0)
+
+        async def burst():
+            started = time.perf_counter()
+            responses = await asyncio.gather(*(login_client.post(login_path, data=form) for _ in range(logins)))
+            failed = sum(1 for r in responses if r.status_code != 200)
+            return time.perf_counter() - started, failed
+
+        busy, (elapsed, failed) = await _measure(client, headers, burst=burst())
+        return idle, busy, elapsed, failed
+
+
+def run_mode(mode: str, logins: int, concurrency: int):
+    port = free_port()
+    with tempfile.TemporaryDirectory() as workdir:
+        proc = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "--serve", mode, "--port", str(port), "--workdir", workdir],
+            cwd=BACKEND_DIR,
+        )
+        try:
+            login_path = "/bench/sync-login" if mode == "sync" else "/login"
+            idle, busy, elapsed, failed = asyncio.run(_run_load(f"http://127.0.0.1:{port}", login_path, logins, concurrency))
+        finally:
+            proc.terminate()
+            proc.wait()
+
+    print(
+        f"{mode:<5} logins={logins} concurrency={concurrency} burst={elapsed:6.2f}s failed={failed} | /users/me "
+        f"idle p50={percentile(idle, 50) * 1000:6.1f}ms p99={percentile(idle, 99) * 1000:6.1f}ms | "
+        f"burst p50={percentile(busy, 50) * 1000:7.1f}ms p99={percentile(busy, 99) * 1000:7.1f}ms"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=100, help="同时在途的登录请求数（连接数）")
+    parser.add_argument("--mode", choices=["sync", "pool", "both"], default="both")
+    parser.add_argument("--serve", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.port, args.workdir)
+    else:
+        modes = ["sync", "pool"] if args.mode == "both" else [args.mode]
+        for mode in modes:
+            run_mode(mode, args.logins, args.concurrency)
@@ -0,0 +1,126 @@
+"""掌握度更新基准测试：增量更新 与 从答题历史重算
+
+在临时SQLite数据库中为一个用户逐步写入最近90天内的答题历史（每道题3个知识点，共--topics个主题），
+在每个历史规模下测量：
+- 增量：crud_async.record_attempt（写入答题 + 更新该题3个主题的掌握度和趋势桶，一个事务）的延迟
+- 重算：mastery.replay重放该用户全部历史的耗时（不采用增量更新时每次答题的代价）
+- 趋势：crud_async.get_learning_profile读取最近90天按周汇总的趋势桶，
+  与每次请求时扫描答题记录按天分组统计（不预先汇总时的代价）的延迟
+最后输出全量回填的吞吐量。
+
+用法（在backend目录下执行）：
+    python bench/bench_mastery.py --history 0,10000,100000,1000000
+"""
+
+import argparse
+import asyncio
+import datetime
+import random
+import tempfile
+import time
+
+from sqlalchemy import func, select
+
+from benchutil import create_async_sessionmaker, percentile, setup_app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--history", default="0,10000,100000", help="答题历史规模，逗号分隔（递增）")
+    parser.add_argument("--topics", type=int, default=50)
+    parser.add_argument("--problems", type=int, default=500)
+    parser.add_argument("--samples", type=int, default=300, help="每个规模下增量记录答题的次数")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        _, engine, SessionLocal = setup_app(workdir, "production")
+
+        import crud_async
+        import mastery
+        import models
+        import schemas
+
+        rng = random.Random(0)
+        topics = [f"主题{i}" for i in range(args.topics)]
+        with SessionLocal() as db:
+            user = models.User(uuid="bench", username="bench", hashed_password="x")
+            db.add(user)
+            problems = [
+                models.Problem(owner_id=None, source_type="text", raw=f"第{i}题", knowledge_tags=rng.sample(topics, 3))
+                for i in range(args.problems)
+            ]
+            db.add_all(problems)
+            db.commit()
+            user_id, problem_ids = user.id, [p.id for p in problems]
+
+        written = 0
+        now = models.utcnow()
+        window = datetime.timedelta(days=90).total_seconds()
+        for size in (int(s) for s in args.history.split(",")):
+            # 直接批量写入历史答题（不更新掌握度，只用于构造规模）
+            with engine.begin() as conn:
+                while written < size:
+                    n = min(10000, size - written)
+                    conn.execute(models.Attempt.__table__.insert(), [
+                        {"user_id": user_id, "problem_id": rng.choice(problem_ids), "correct": rng.random() < 0.7,
+                         "submitted_at": now - datetime.timedelta(seconds=rng.random() * window)}
+                        for i in range(n)
+                    ])
+                    written += n
+
+            async def record(latencies):
+                AsyncSessionLocal = create_async_sessionmaker(engine, "production")
+                async with AsyncSessionLocal() as db:
+                    for _ in range(args.samples):
+                        problem = await db.get(models.Problem, rng.choice(problem_ids))
+                        attempt_in = schemas.AttemptCreate(problem_id=problem.id, correct=rng.random() < 0.7)
+                        t = time.perf_counter()
+                        await crud_async.record_attempt(db, user_id, problem, attempt_in)
+                        latencies.append(time.perf_counter() - t)
+                await AsyncSessionLocal.kw["bind"].dispose()
+
+            latencies = []
+            asyncio.run(record(latencies))
+            written += args.samples
+
+            with engine.begin() as conn:
+                t = time.perf_counter()
+                mastery.replay(conn, [user_id])
+                recompute = time.perf_counter() - t
+
+            async def read_trend():
+                AsyncSessionLocal = create_async_sessionmaker(engine, "production")
+                async with AsyncSessionLocal() as db:
+                    t = time.perf_counter()
+                    profile = await crud_async.get_learning_profile(db, user_id, 90)
+                    elapsed = time.perf_counter() - t
+                await AsyncSessionLocal.kw["bind"].dispose()
+                return profile["trend"], elapsed
+
+            trend, rollup_read = asyncio.run(read_trend())
+
+            with SessionLocal() as db:
+                attempts = models.Attempt.__table__
+                day = func.date(attempts.c.submitted_at)
+                t = time.perf_counter()
+                db.execute(
+                    select(day, func.count(), func.sum(attempts.c.correct))
+                    .where(attempts.c.user_id == user_id, attempts.c.submitted_at >= now - datetime.timedelta(days=90))
+                    .group_by(day)
+                ).all()
+                scan = time.perf_counter() - t
+            print(
+                f"历史 {written:>8} 次答题  增量 p50={percentile(latencies, 50) * 1000:6.2f}ms "
+                f"p99={percentile(latencies, 99) * 1000:6.2f}ms  重算 {recompute * 1000:9.1f}ms  "
+                f"趋势 汇总桶 {rollup_read * 1000:6.2f}ms（{len(trend)}个点） 扫描答题 {scan * 1000:8.1f}ms"
+            )
+
+        with engine.begin() as conn:
+            t = time.perf_counter()
+            rows = mastery.replay(conn)
+            elapsed = time.perf_counter() - t
+        print(f"全量回填 {written} 次答题 → {rows} 行掌握度，{elapsed:.2f}s（{written / elapsed:,.0f} 次答题/秒）")
+
+
+if __name__ == "__main__":
+    main()
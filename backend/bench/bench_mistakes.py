@@ -0,0 +1,154 @@
+"""错题本基准测试：冗余错题表 与 从答题记录现场计算
+
+在临时SQLite数据库中为一个用户写入--history次答题（--problems道题目，每道题2个知识点、随机学科和难度，约30%答错），
+并为--users个其他用户写入同样多的答题作为干扰数据，用mistakes.backfill建立错题本，然后对几组筛选条件测量：
+- 错题表：crud_async.list_mistakes（一页错题 + 分面统计）
+- 答题记录：扫描该用户的答题按题目分组得到错题，连接题目表筛选，再分别统计分面
+  （没有错题表时实现同样功能所需的查询）
+最后测量crud_async.record_attempt（答错时维护错题表）的延迟。
+
+用法（在backend目录下执行）：
+    python bench/bench_mistakes.py --history 100000
+"""
+
+import argparse
+import asyncio
+import datetime
+import random
+import tempfile
+import time
+
+from sqlalchemy import and_, case, func, select
+
+from benchutil import create_async_sessionmaker, percentile, setup_app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--history", type=int, default=100000, help="被测用户的答题次数")
+    parser.add_argument("--users", type=int, default=20, help="其他用户数（每人答题次数相同）")
+    parser.add_argument("--problems", type=int, default=20000)
+    parser.add_argument("--topics", type=int, default=100)
+    parser.add_argument("--samples", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        _, engine, _ = setup_app(workdir, "production")
+
+        import crud_async
+        import mistakes
+        import models
+        import schemas
+
+        rng = random.Random(0)
+        topics = [f"主题{i}" for i in range(args.topics)]
+        subjects = ["数学", "物理", "化学", "英语"]
+        now = models.utcnow()
+        with engine.begin() as conn:
+            conn.execute(models.User.__table__.insert(), [
+                {"uuid": f"u{i}", "username": f"user{i}", "hashed_password": "x", "is_active": True}
+                for i in range(args.users + 1)
+            ])
+            conn.execute(models.Tag.__table__.insert(), [{"kind": models.TAG_KIND_KNOWLEDGE, "name": t} for t in topics])
+            tag_ids = dict(conn.execute(select(models.Tag.name, models.Tag.id)).all())
+            problems, problem_tags = [], []
+            for i in range(args.problems):
+                names = rng.sample(topics, 2)
+                problems.append({"id": i + 1, "source_type": "text", "raw": f"第{i}题", "subject": rng.choice(subjects),
+                                 "knowledge_tags": names, "difficulty": rng.randint(1, 5)})
+                problem_tags.extend({"problem_id": i + 1, "tag_id": tag_ids[n]} for n in names)
+            conn.execute(models.Problem.__table__.insert(), problems)
+            conn.execute(models.ProblemTag.__table__.insert(), problem_tags)
+            for user_id in range(1, args.users + 2):
+                for i in range(0, args.history, 20000):
+                    conn.execute(models.Attempt.__table__.insert(), [
+                        {"user_id": user_id, "problem_id": rng.randint(1, args.problems), "correct": rng.random() >= 0.3,
+                         "submitted_at": now - datetime.timedelta(seconds=rng.random() * 365 * 86400)}
+                        for _ in range(min(20000, args.history - i))
+                    ])
+            t = time.perf_counter()
+            rows = mistakes.backfill(conn)
+            print(f"{args.users + 1} 个用户各 {args.history} 次答题；回填错题本 {rows} 行，{time.perf_counter() - t:.1f}s")
+
+        user_id = 1
+        attempts, problems_table = models.Attempt.__table__, models.Problem.__table__
+        problem_tags_table = models.ProblemTag.__table__
+        filters = [
+            ("全部", {}),
+            ("未掌握", {"mastered": False}),
+            ("学科+难度", {"subject": "数学", "difficulty_min": 3, "difficulty_max": 4}),
+            ("知识点", {"knowledge_tags": ["主题1"]}),
+            ("最近30天", {"since": now - datetime.timedelta(days=30)}),
+        ]
+
+        async def from_attempts(db, subject=None, knowledge_tags=None, difficulty_min=None, difficulty_max=None,
+                          since=None, mastered=None):
+            # 按题目分组得到错题（第一次答错后的统计），再连接题目表筛选
+            wrong = func.sum(case((attempts.c.correct.is_(False), 1), else_=0))
+            grouped = (
+                select(attempts.c.problem_id, wrong.label("wrong"),
+                       func.max(attempts.c.submitted_at).label("last_attempt_at"))
+                .where(attempts.c.user_id == user_id)
+                .group_by(attempts.c.problem_id)
+                .having(wrong > 0)
+                .subquery()
+            )
+            conditions = []
+            if subject:
+                conditions.append(problems_table.c.subject == subject)
+            if difficulty_min is not None:
+                conditions.append(problems_table.c.difficulty.between(difficulty_min, difficulty_max))
+            if since is not None:
+                conditions.append(grouped.c.last_attempt_at >= since)
+            if knowledge_tags:
+                conditions.append(problems_table.c.id.in_(
+                    select(problem_tags_table.c.problem_id).where(problem_tags_table.c.tag_id == tag_ids[knowledge_tags[0]])
+                ))
+            base = select(grouped.c.problem_id, problems_table.c.subject, problems_table.c.difficulty).join(
+                problems_table, problems_table.c.id == grouped.c.problem_id
+            ).where(and_(True, *conditions)).subquery()
+            (await db.execute(select(base).order_by(base.c.problem_id.desc()).limit(50))).all()
+            (await db.execute(select(base.c.subject, func.count()).group_by(base.c.subject))).all()
+            (await db.execute(select(base.c.difficulty, func.count()).group_by(base.c.difficulty))).all()
+            (await db.execute(
+                select(problem_tags_table.c.tag_id, func.count())
+                .join(base, base.c.problem_id == problem_tags_table.c.problem_id)
+                .group_by(problem_tags_table.c.tag_id)
+            )).all()
+
+        async def measure():
+            AsyncSessionLocal = create_async_sessionmaker(engine, "production")
+            async with AsyncSessionLocal() as db:
+                for name, kwargs in filters:
+                    indexed, scanned = [], []
+                    total = 0
+                    for _ in range(args.samples):
+                        t = time.perf_counter()
+                        _, _, facets = await crud_async.list_mistakes(db, user_id, **kwargs)
+                        indexed.append(time.perf_counter() - t)
+                        total = facets["total"]
+                    for _ in range(max(1, args.samples // 10)):
+                        t = time.perf_counter()
+                        await from_attempts(db, **kwargs)
+                        scanned.append(time.perf_counter() - t)
+                    print(
+                        f"{name:<8}（{total:>5}道） 错题表 p50={percentile(indexed, 50) * 1000:7.2f}ms "
+                        f"p99={percentile(indexed, 99) * 1000:7.2f}ms  答题记录 p50={percentile(scanned, 50) * 1000:8.1f}ms"
+                    )
+
+                latencies = []
+                for _ in range(args.samples):
+                    problem = await db.get(models.Problem, rng.randint(1, args.problems))
+                    t = time.perf_counter()
+                    await crud_async.record_attempt(
+                        db, user_id, problem, schemas.AttemptCreate(problem_id=problem.id, correct=False)
+                    )
+                    latencies.append(time.perf_counter() - t)
+                print(f"记录答错   p50={percentile(latencies, 50) * 1000:.2f}ms  p99={percentile(latencies, 99) * 1000:.2f}ms")
+            await AsyncSessionLocal.kw["bind"].dispose()
+
+        asyncio.run(measure())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""题目列表分页基准测试：键集（游标）分页 与 OFFSET 分页 的对比
+
+在临时SQLite数据库中为同一用户生成大量题目，然后：
+- keyset: 通过crud_async.list_problems沿游标从第1页一直翻到最后一页，
+  记录指定页码的单页延迟
+- offset: 对同样的页码执行 ORDER BY ... LIMIT ... OFFSET ... 查询
+
+用法（在backend目录下执行）：
+    python bench/bench_pagination.py --rows 1000000 --page-size 100
+"""
+
+import argparse
+import asyncio
+import datetime
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text  # noqa: E402
+from sqlalchemy.ext.asyncio import async_sessionmaker  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+import crud_async  # noqa: E402
+import database  # noqa: E402
+import models  # noqa: E402
+
+# 需要记录延迟的页码
+SAMPLE_PAGES = (1, 10, 100, 1000, 5000, 10000)
+
+
+def populate(engine, rows: int):
+    """批量生成同一用户的题目数据"""
+    start = datetime.datetime(2024, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO users (id, uuid, username, hashed_password, is_active, is_admin, created_at) "
+            "VALUES (1, 'bench', 'bench', 'x', 1, 0, :t)"
+        ), {"t": start})
+        batch = []
+        for i in range(1, rows + 1):
+            # 每10行共用一个时间戳，覆盖created_at相同、按id区分先后的情况
+            created = start + datetime.timedelta(seconds=i // 10)
+            batch.append({"id": i, "raw": f"题目 {i}", "t": created})
+            if len(batch) == 50000:
+                _insert(conn, batch)
+                batch = []
+        if batch:
+            _insert(conn, batch)
+
+
+def _insert(conn, batch):
+    conn.execute(text(
+        "INSERT INTO problems (id, owner_id, source_type, raw, subject, is_bookmarked, created_at, updated_at) "
+        "VALUES (:id, 1, 'text', :raw, '数学', 0, :t, :t)"
+    ), batch)
+
+
+async def bench_keyset(url: str, pages: int, page_size: int):
+    latencies = {}
+    async_engine = database.create_async_db_engine(url)
+    async with async_sessionmaker(async_engine, expire_on_commit=False)() as db:
+        # 预热：首次查询包含SQL编译开销，不计入第1页延迟
+        await crud_async.list_problems(db, owner_id=1, limit=page_size)
+        cursor = None
+        for page in range(1, pages + 1):
+            started = time.perf_counter()
+            items, cursor = await crud_async.list_problems(db, owner_id=1, limit=page_size, cursor=cursor)
+            elapsed = time.perf_counter() - started
+            if page in SAMPLE_PAGES:
+                latencies[page] = elapsed
+            if not cursor:
+                break
+    await async_engine.dispose()
+    return latencies
+
+
+def bench_offset(db, page_size: int, pages):
+    latencies = {}
+    for page in pages:
+        started = time.perf_counter()
+        db.execute(text(
+            "SELECT id, owner_id, source_type, subject, created_at FROM problems WHERE owner_id = 1 "
+            "ORDER BY created_at DESC, id DESC LIMIT :limit OFFSET :offset"
+        ), {"limit": page_size, "offset": (page - 1) * page_size}).fetchall()
+        latencies[page] = time.perf_counter() - started
+    return latencies
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--page-size", type=int, default=100)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        url = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+        engine = create_engine(url)
+        models.Base.metadata.create_all(bind=engine)
+        started = time.perf_counter()
+        populate(engine, args.rows)
+        print(f"生成 {args.rows} 行用时 {time.perf_counter() - started:.1f}s")
+
+        db = sessionmaker(bind=engine)()
+        pages = args.rows // args.page_size
+        sampled = [p for p in SAMPLE_PAGES if p <= pages]
+        keyset = asyncio.run(bench_keyset(url, pages, args.page_size))
+        offset = bench_offset(db, args.page_size, sampled)
+        db.close()
+        engine.dispose()
+
+    print(f"{'page':>8} {'keyset(ms)':>12} {'offset(ms)':>12}")
+    for page in sampled:
+        print(f"{page:>8} {keyset.get(page, float('nan')) * 1000:>12.2f} {offset[page] * 1000:>12.2f}")
@@ -0,0 +1,142 @@
+"""题目推荐基准测试：推荐索引 与 按标签连接题目表排序
+
+在临时SQLite数据库中生成--problems道系统题目（每道题3个知识点、随机难度）、--users个用户和--attempts次答题，
+建立推荐索引（与数据迁移0007相同的语句），然后对--samples个用户测量：
+- 索引：crud_async.get_recommendations（最弱主题 → 推荐索引的有界范围读取 → 排除已做对的题目 → 加载题目摘要）
+- 缓存命中：recommend.lookup读取进程内缓存的结果
+- 不使用索引：从problem_tags连接题目表按难度筛选，热度按答题记录现场统计后排序
+  （没有预计算索引时选出"热门的目标难度题目"所需的查询）
+最后记录答题（热度加一、缓存失效）的额外开销。
+
+用法（在backend目录下执行）：
+    python bench/bench_recommend.py --problems 100000 --attempts 500000
+"""
+
+import argparse
+import asyncio
+import datetime
+import random
+import tempfile
+import time
+
+from sqlalchemy import func, select
+
+from benchutil import create_async_sessionmaker, percentile, setup_app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--problems", type=int, default=100000)
+    parser.add_argument("--topics", type=int, default=200)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--attempts", type=int, default=500000)
+    parser.add_argument("--samples", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        _, engine, _ = setup_app(workdir, "production")
+
+        import crud_async
+        import mastery
+        import models
+        import recommend
+        import schemas
+
+        rng = random.Random(0)
+        topics = [f"主题{i}" for i in range(args.topics)]
+        with engine.begin() as conn:
+            conn.execute(models.User.__table__.insert(), [
+                {"uuid": f"u{i}", "username": f"user{i}", "hashed_password": "x", "is_active": True}
+                for i in range(args.users)
+            ])
+            conn.execute(models.Tag.__table__.insert(), [{"kind": models.TAG_KIND_KNOWLEDGE, "name": t} for t in topics])
+            tag_ids = dict(conn.execute(select(models.Tag.name, models.Tag.id)).all())
+            problems, problem_tags = [], []
+            for i in range(args.problems):
+                names = rng.sample(topics, 3)
+                problems.append({"id": i + 1, "source_type": "text", "raw": f"第{i}题", "subject": "数学",
+                                 "knowledge_tags": names, "difficulty": rng.randint(1, 5)})
+                problem_tags.extend({"problem_id": i + 1, "tag_id": tag_ids[n]} for n in names)
+            for i in range(0, len(problems), 20000):
+                conn.execute(models.Problem.__table__.insert(), problems[i:i + 20000])
+            conn.execute(models.ProblemTag.__table__.insert(), problem_tags)
+            now = models.utcnow()
+            # 热度呈长尾分布：少数题目被大量作答
+            for i in range(0, args.attempts, 20000):
+                conn.execute(models.Attempt.__table__.insert(), [
+                    {"user_id": rng.randint(1, args.users), "problem_id": min(int(rng.paretovariate(1.2)), args.problems),
+                     "correct": rng.random() < 0.6, "submitted_at": now}
+                    for _ in range(min(20000, args.attempts - i))
+                ])
+            t = time.perf_counter()
+            mastery.replay(conn)
+            print(f"{args.problems} 道题目，{args.attempts} 次答题；重放掌握度 {time.perf_counter() - t:.1f}s")
+            t = time.perf_counter()
+            for stmt in recommend.rebuild_stmts():
+                conn.execute(stmt)
+            entries = conn.execute(select(func.count()).select_from(models.RecommendationEntry)).scalar()
+            print(f"建立推荐索引：{entries} 行，{time.perf_counter() - t:.2f}s")
+
+        user_ids = rng.sample(range(1, args.users + 1), args.samples)
+        problem_table, problem_tags_table = models.Problem.__table__, models.ProblemTag.__table__
+        attempts_table = models.Attempt.__table__
+
+        def report(name, latencies):
+            print(f"{name:<14} p50={percentile(latencies, 50) * 1000:8.3f}ms  p99={percentile(latencies, 99) * 1000:8.3f}ms")
+
+        async def measure():
+            AsyncSessionLocal = create_async_sessionmaker(engine, "production")
+            indexed, cached, scanned = [], [], []
+            async with AsyncSessionLocal() as db:
+                for user_id in user_ids:
+                    t = time.perf_counter()
+                    result = await crud_async.get_recommendations(db, user_id, recommend.DEFAULT_LIMIT)
+                    indexed.append(time.perf_counter() - t)
+                    key = recommend.cache_key(user_id, recommend.DEFAULT_LIMIT, None)
+                    recommend.remember(key, result)
+                    t = time.perf_counter()
+                    assert recommend.lookup(key) is result
+                    cached.append(time.perf_counter() - t)
+
+                    weak = [recommend.WeakTopic(*row) for row in await db.execute(recommend.weak_topics_stmt(user_id))]
+                    t = time.perf_counter()
+                    counts = (
+                        select(attempts_table.c.problem_id, func.count().label("n"))
+                        .group_by(attempts_table.c.problem_id).subquery()
+                    )
+                    for topic in weak:
+                        low, high = recommend.target_band(topic.mastery)
+                        (await db.execute(
+                            select(problem_table.c.id, func.coalesce(counts.c.n, 0).label("popularity"))
+                            .join(problem_tags_table, problem_tags_table.c.problem_id == problem_table.c.id)
+                            .outerjoin(counts, counts.c.problem_id == problem_table.c.id)
+                            .where(problem_tags_table.c.tag_id == topic.tag_id,
+                                   problem_table.c.difficulty.between(low, high),
+                                   problem_table.c.owner_id.is_(None) | (problem_table.c.owner_id == user_id))
+                            .order_by(func.coalesce(counts.c.n, 0).desc())
+                            .limit(recommend.DEFAULT_LIMIT * recommend.CANDIDATE_FACTOR)
+                        )).all()
+                    scanned.append(time.perf_counter() - t)
+
+                report("推荐索引", indexed)
+                report("缓存命中", cached)
+                report("不使用索引", scanned)
+
+                # 记录答题：热度加一与缓存失效是答题事务中新增的开销
+                latencies = []
+                problem_ids = rng.sample(range(1, args.problems + 1), args.samples)
+                for user_id, problem_id in zip(user_ids, problem_ids):
+                    problem = await db.get(models.Problem, problem_id)
+                    t = time.perf_counter()
+                    await crud_async.record_attempt(
+                        db, user_id, problem, schemas.AttemptCreate(problem_id=problem_id, correct=True)
+                    )
+                    latencies.append(time.perf_counter() - t)
+                report("记录答题", latencies)
+            await AsyncSessionLocal.kw["bind"].dispose()
+
+        asyncio.run(measure())
+
+
+if __name__ == "__main__":
+    main()
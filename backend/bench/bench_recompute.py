@@ -0,0 +1,155 @@
+"""掌握度批量重算基准测试：NumPy向量化 与 逐行Python
+
+在临时SQLite数据库中生成--users个用户、平均每人--attempts次答题（每道题3个知识点，共--topics个主题），然后：
+1. 逐行Python：recompute.run使用逐个序列、逐次调用mastery.update的计算函数
+2. NumPy：recompute.run的默认实现（同一批内的所有序列一起向量化计算）
+3. 断点续传：第2批计算时模拟中断，再次运行从检查点继续
+断言三次得到的掌握度与mastery.replay（答题时增量更新所用的同一套BKT）一致，并输出各自的吞吐量。
+
+用法（在backend目录下执行）：
+    python bench/bench_recompute.py --users 20000 --attempts 50
+"""
+
+import argparse
+import datetime
+import os
+import random
+import tempfile
+import time
+
+from benchutil import setup_app
+
+
+def python_chunk(chunk):
+    """逐行计算（对照组）：与recompute.compute_chunk返回相同的结果"""
+    import numpy as np
+
+    import mastery
+
+    starts, values, attempts, correct = [], [], [], []
+    for i in range(len(chunk.correct)):
+        if i == 0 or chunk.user_ids[i] != chunk.user_ids[i - 1] or chunk.topic_ids[i] != chunk.topic_ids[i - 1]:
+            starts.append(i)
+            values.append(mastery.P_INIT)
+            attempts.append(0)
+            correct.append(0)
+        values[-1] = mastery.update(values[-1], bool(chunk.correct[i]))
+        attempts[-1] += 1
+        correct[-1] += int(chunk.correct[i])
+    return np.array(starts), np.array(values), np.array(attempts), np.array(correct)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--attempts", type=int, default=50, help="每个用户的平均答题次数")
+    parser.add_argument("--topics", type=int, default=200)
+    parser.add_argument("--problems", type=int, default=5000)
+    parser.add_argument("--users-per-chunk", type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        _, engine, _ = setup_app(workdir, "production")
+
+        import mastery
+        import models
+        import recompute
+
+        rng = random.Random(0)
+        start = datetime.datetime(2024, 1, 1)
+        with engine.begin() as conn:
+            conn.execute(models.User.__table__.insert(), [
+                {"uuid": f"u{i}", "username": f"user{i}", "hashed_password": "x", "is_active": True}
+                for i in range(args.users)
+            ])
+            conn.execute(models.Tag.__table__.insert(), [
+                {"kind": models.TAG_KIND_KNOWLEDGE, "name": f"主题{i}"} for i in range(args.topics)
+            ])
+            tag_ids = dict(conn.execute(models.Tag.__table__.select().with_only_columns(
+                models.Tag.__table__.c.name, models.Tag.__table__.c.id)).all())
+            problems, problem_tags = [], []
+            for i in range(args.problems):
+                names = rng.sample(sorted(tag_ids), 3)
+                problems.append({"id": i + 1, "source_type": "text", "raw": f"第{i}题", "knowledge_tags": names})
+                problem_tags.extend({"problem_id": i + 1, "tag_id": tag_ids[n]} for n in names)
+            conn.execute(models.Problem.__table__.insert(), problems)
+            conn.execute(models.ProblemTag.__table__.insert(), problem_tags)
+            user_ids = [row[0] for row in conn.execute(models.User.__table__.select().with_only_columns(
+                models.User.__table__.c.id))]
+            total = 0
+            batch = []
+            for user_id in user_ids:
+                for _ in range(rng.randint(1, 2 * args.attempts - 1)):
+                    batch.append({
+                        "user_id": user_id, "problem_id": rng.randint(1, args.problems),
+                        "correct": rng.random() < 0.7 if rng.random() < 0.9 else None,
+                        "score": rng.uniform(0, 100),
+                        "submitted_at": start + datetime.timedelta(seconds=rng.randint(0, 10 ** 7)),
+                    })
+                if len(batch) >= 20000:
+                    conn.execute(models.Attempt.__table__.insert(), batch)
+                    total += len(batch)
+                    batch = []
+            conn.execute(models.Attempt.__table__.insert(), batch)
+            total += len(batch)
+        print(f"{args.users} 个用户，{total} 次答题（每道题3个知识点，展开为约 {total * 3} 行答题·主题）")
+
+        mastery_table = models.TopicMastery.__table__
+
+        def snapshot():
+            with engine.connect() as conn:
+                return {(r.user_id, r.topic): (r.mastery, r.attempts, r.correct) for r in conn.execute(mastery_table.select())}
+
+        def clear():
+            with engine.begin() as conn:
+                conn.execute(mastery_table.delete())
+
+        with engine.begin() as conn:
+            t = time.perf_counter()
+            mastery.replay(conn)
+            print(f"mastery.replay（逐行，含趋势桶）：{time.perf_counter() - t:.1f}s")
+        expected = snapshot()
+
+        for name, compute in (("逐行Python", python_chunk), ("NumPy", recompute.compute_chunk)):
+            clear()
+            stats = recompute.run(engine, args.users_per_chunk, compute=compute)
+            print(
+                f"{name:<8} 总计 {stats['elapsed']:6.1f}s（计算 {stats['compute']:5.2f}s）  "
+                f"{stats['processed'] / stats['elapsed']:>10,.0f} 答题·主题行/秒  {stats['written'] / stats['elapsed']:>8,.0f} 掌握度行/秒"
+            )
+            got = snapshot()
+            assert got.keys() == expected.keys(), f"{name}: 掌握度行不一致"
+            assert all(abs(got[k][0] - expected[k][0]) < 1e-12 and got[k][1:] == expected[k][1:] for k in got), \
+                f"{name}: 掌握度与mastery.replay不一致"
+
+        # 断点续传：第2批计算时中断
+        clear()
+        checkpoint = os.path.join(workdir, "recompute.checkpoint.json")
+        calls = 0
+
+        def interrupted(chunk):
+            nonlocal calls
+            calls += 1
+            if calls == 2:
+                raise KeyboardInterrupt
+            return recompute.compute_chunk(chunk)
+
+        try:
+            recompute.run(engine, args.users_per_chunk, checkpoint, compute=interrupted)
+        except KeyboardInterrupt:
+            pass
+        resumed = recompute._read_checkpoint(checkpoint)
+        stats = recompute.run(engine, args.users_per_chunk, checkpoint)
+        got = snapshot()
+        assert got.keys() == expected.keys() and all(
+            abs(got[k][0] - expected[k][0]) < 1e-12 and got[k][1:] == expected[k][1:] for k in got
+        ), "续传后的结果不一致"
+        assert not os.path.exists(checkpoint)
+        print(
+            f"断点续传：中断于 user_id ≤ {resumed['last_user_id']}，"
+            f"继续处理 {stats['processed']} 行（共 {stats['attempts']} 行），结果一致"
+        )
+
+
+if __name__ == "__main__":
+    main()
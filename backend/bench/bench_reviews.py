@@ -0,0 +1,156 @@
+"""复习计划基准测试：到期队列索引 与 从答题记录重放；批量重建 NumPy 与 逐个答题
+
+在临时SQLite数据库中生成--users个用户，每人在自己常做的--pool道题中作答--attempts次
+（约70%答对，10%只有分数），然后：
+1. 重建：reviews.rebuild逐个答题计算与NumPy向量化计算，断言两者写入的复习状态一致；
+   另外对内存中的同一批答题单独测量两种计算的耗时
+2. 到期队列：crud_async.get_due_reviews（(user_id, due_at) 索引上的范围读取）与
+   读取该用户全部答题、在Python中重放SM-2后选出到期题目（没有复习状态表时所需的计算）
+3. 记录答题：crud_async.record_attempt（含复习状态的增量更新）的延迟
+
+用法（在backend目录下执行）：
+    python bench/bench_reviews.py --users 2000 --attempts 500
+"""
+
+import argparse
+import asyncio
+import datetime
+import random
+import tempfile
+import time
+
+from sqlalchemy import func, select
+
+from benchutil import create_async_sessionmaker, percentile, setup_app
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--attempts", type=int, default=500, help="每个用户的答题次数")
+    parser.add_argument("--problems", type=int, default=20000)
+    parser.add_argument("--pool", type=int, default=100, help="每个用户常做的题目数")
+    parser.add_argument("--samples", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        _, engine, _ = setup_app(workdir, "production")
+
+        import crud_async
+        import models
+        import reviews
+        import schemas
+
+        rng = random.Random(0)
+        now = models.utcnow()
+        with engine.begin() as conn:
+            conn.execute(models.User.__table__.insert(), [
+                {"uuid": f"u{i}", "username": f"user{i}", "hashed_password": "x", "is_active": True}
+                for i in range(args.users)
+            ])
+            conn.execute(models.Problem.__table__.insert(), [
+                {"id": i + 1, "source_type": "text", "raw": f"第{i}题", "subject": "数学", "difficulty": rng.randint(1, 5)}
+                for i in range(args.problems)
+            ])
+            batch = []
+            for user_id in range(1, args.users + 1):
+                pool = rng.sample(range(1, args.problems + 1), args.pool)
+                for _ in range(args.attempts):
+                    correct = rng.random() < 0.7
+                    batch.append({
+                        "user_id": user_id, "problem_id": rng.choice(pool),
+                        "correct": None if rng.random() < 0.1 else correct,
+                        "score": rng.uniform(60, 100) if correct else rng.uniform(0, 60),
+                        "submitted_at": now - datetime.timedelta(seconds=rng.random() * 365 * 86400),
+                    })
+                if len(batch) >= 20000:
+                    conn.execute(models.Attempt.__table__.insert(), batch)
+                    batch = []
+            if batch:
+                conn.execute(models.Attempt.__table__.insert(), batch)
+        total = args.users * args.attempts
+        print(f"{args.users} 个用户，{total} 次答题")
+
+        # 1. 重建
+        table = models.ReviewState.__table__
+        snapshots = {}
+        for name, vectorized in (("逐个答题", False), ("NumPy", True)):
+            with engine.begin() as conn:
+                t = time.perf_counter()
+                written = reviews.rebuild(conn, vectorized=vectorized)
+                elapsed = time.perf_counter() - t
+                snapshots[name] = conn.execute(select(table).order_by(table.c.user_id, table.c.problem_id)).all()
+            print(f"重建（{name}）：{written} 行复习状态，{elapsed:.1f}s，{total / elapsed:.0f} 答题/秒")
+        assert snapshots["逐个答题"] == snapshots["NumPy"], "两种计算得到的复习状态不一致"
+
+        attempts = models.Attempt.__table__
+        with engine.connect() as conn:
+            rows = conn.execute(
+                select(attempts.c.user_id, attempts.c.problem_id, attempts.c.correct, attempts.c.score,
+                       attempts.c.submitted_at)
+                .order_by(attempts.c.user_id, attempts.c.problem_id, attempts.c.submitted_at, attempts.c.id)
+            ).all()
+        chunk = reviews.Chunk(*(list(column) for column in zip(*rows)))
+        for name, compute in (("逐个答题", reviews.compute_chunk_python), ("NumPy", reviews.compute_chunk)):
+            t = time.perf_counter()
+            compute(chunk)
+            print(f"计算（{name}）：{time.perf_counter() - t:.2f}s")
+
+        # 2. 到期队列
+        user_ids = rng.sample(range(1, args.users + 1), min(args.samples, args.users))
+        with engine.connect() as conn:
+            due_total = conn.execute(select(func.count()).select_from(table).where(table.c.due_at <= now)).scalar()
+        print(f"到期题目：{due_total} / {len(snapshots['NumPy'])}")
+
+        def report(name, latencies):
+            print(f"{name:<10} p50={percentile(latencies, 50) * 1000:8.3f}ms  p99={percentile(latencies, 99) * 1000:8.3f}ms")
+
+        async def measure():
+            AsyncSessionLocal = create_async_sessionmaker(engine, "production")
+            indexed, replayed = [], []
+            async with AsyncSessionLocal() as db:
+                for user_id in user_ids:
+                    t = time.perf_counter()
+                    result = await crud_async.get_due_reviews(db, user_id, reviews.DEFAULT_LIMIT)
+                    indexed.append(time.perf_counter() - t)
+
+                    t = time.perf_counter()
+                    history = (await db.execute(
+                        select(attempts.c.problem_id, attempts.c.correct, attempts.c.score, attempts.c.submitted_at)
+                        .where(attempts.c.user_id == user_id)
+                        .order_by(attempts.c.problem_id, attempts.c.submitted_at, attempts.c.id)
+                    )).all()
+                    states = {}
+                    for problem_id, correct, score, submitted_at in history:
+                        q = reviews.quality(correct, score)
+                        if q is None:
+                            continue
+                        repetitions, interval_days, ease, _ = states.get(problem_id, (0, 0, reviews.INITIAL_EASE, None))
+                        repetitions, interval_days, ease = reviews.schedule(repetitions, interval_days, ease, q)
+                        states[problem_id] = (repetitions, interval_days, ease,
+                                              submitted_at + datetime.timedelta(days=interval_days))
+                    due = sorted((state[3], problem_id) for problem_id, state in states.items() if state[3] <= now)
+                    due = due[:reviews.DEFAULT_LIMIT]
+                    replayed.append(time.perf_counter() - t)
+                    assert [row.problem_id for row in result] == [problem_id for _, problem_id in due]
+
+                report("到期索引", indexed)
+                report("重放答题", replayed)
+
+                # 3. 记录答题
+                latencies = []
+                for user_id in user_ids:
+                    problem = await db.get(models.Problem, rng.randint(1, args.problems))
+                    t = time.perf_counter()
+                    await crud_async.record_attempt(
+                        db, user_id, problem, schemas.AttemptCreate(problem_id=problem.id, correct=True)
+                    )
+                    latencies.append(time.perf_counter() - t)
+                report("记录答题", latencies)
+            await AsyncSessionLocal.kw["bind"].dispose()
+
+        asyncio.run(measure())
+
+
+if __name__ == "__main__":
+    main()
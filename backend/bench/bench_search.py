@@ -0,0 +1,152 @@
+"""题目全文检索基准测试：FTS5全文索引 与 LIKE '%...%' 扫描 的对比
+
+在临时SQLite数据库中生成大量题目（中文数学题目文本），其中一个"重度用户"拥有
+--heavy-rows道题目，其余题目平均分给其他用户，然后：
+- 统计写入耗时（problems表上的触发器同步维护全文索引）和索引大小
+- fts: 用search.search_stmt检索题目（与GET /problems/search相同的查询）
+- like: 对同样的查询词执行 raw/parsed/notes LIKE '%词%' 的查询（按owner_id索引缩小范围）
+分别记录重度用户和普通用户每个查询的延迟。
+
+用法（在backend目录下执行）：
+    python bench/bench_search.py --rows 1000000
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text  # noqa: E402
+
+import database  # noqa: E402
+import models  # noqa: E402
+import search  # noqa: E402
+
+FUNCTIONS = ["f(x)=e^x", "f(x)=sin x", "f(x)=ln x", "f(x)=x^2+1", "f(x)=cos 2x", "y=arctan x", "f(x)=x e^x"]
+TASKS = ["求导数", "求不定积分", "计算定积分", "求极限", "判断单调性", "求极值", "求泰勒展开", "证明不等式"]
+CONTEXTS = ["在区间[0,1]上", "当x趋于0时", "在定义域内", "利用分部积分法", "利用换元法", "结合洛必达法则", ""]
+NOTES = ["容易算错符号", "考试真题", "老师讲过的例题", "需要复习", "", "", ""]
+SUBJECTS = ["数学", "物理"]
+
+# 约千分之一的题目中出现的少见内容
+RARE_PHRASE = "（傅里叶级数）"
+
+# 检索的查询词：常见词、较少见的词、组合查询，以及少见词和不存在的词
+QUERIES = ["积分", "分部积分", "泰勒展开 e^x", "洛必达", "arctan", "极值 cos", "傅里叶", "拉格朗日"]
+
+BATCH_SIZE = 20000
+
+
+def make_row(rng, i: int, owner_id: int):
+    raw = f"{rng.choice(CONTEXTS)}{rng.choice(TASKS)}：{rng.choice(FUNCTIONS)}（第{i}题）"
+    if rng.random() < 0.001:
+        raw += RARE_PHRASE
+    return {
+        "owner_id": owner_id,
+        "raw": raw,
+        "parsed": raw if rng.random() < 0.3 else None,
+        "notes": rng.choice(NOTES) or None,
+        "subject": rng.choice(SUBJECTS),
+    }
+
+
+def populate(engine, rows: int, users: int, heavy_rows: int):
+    """批量生成题目（用户1拥有heavy_rows道，其余随机分给其他用户），返回写入耗时（秒）"""
+    rng = random.Random(0)
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO users (id, uuid, username, hashed_password, is_active, is_admin, created_at) "
+            "VALUES (:id, :name, :name, 'x', 1, 0, CURRENT_TIMESTAMP)"
+        ), [{"id": u, "name": f"u{u}"} for u in range(1, users + 1)])
+        batch = []
+        for i in range(rows):
+            owner_id = 1 if rng.random() < heavy_rows / rows else rng.randint(2, users)
+            batch.append(make_row(rng, i, owner_id))
+            if len(batch) == BATCH_SIZE:
+                _insert(conn, batch)
+                batch = []
+        if batch:
+            _insert(conn, batch)
+    return time.perf_counter() - started
+
+
+def _insert(conn, batch):
+    conn.execute(text(
+        "INSERT INTO problems (owner_id, source_type, raw, parsed, notes, subject, is_bookmarked, created_at, updated_at) "
+        "VALUES (:owner_id, 'text', :raw, :parsed, :notes, :subject, 0, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)"
+    ), batch)
+
+
+def table_size_mb(conn, prefix: str) -> float:
+    """用dbstat统计以prefix开头的表和索引占用的空间（需要SQLite编译时启用dbstat）"""
+    try:
+        size = conn.execute(text("SELECT SUM(pgsize) FROM dbstat WHERE name LIKE :p"), {"p": prefix + "%"}).scalar()
+    except Exception:
+        return float("nan")
+    return (size or 0) / 1024 / 1024
+
+
+def like_stmt(owner_id: int, terms, limit: int):
+    conditions = []
+    params = {"owner_id": owner_id, "limit": limit}
+    for i, term in enumerate(terms):
+        params[f"t{i}"] = f"%{term}%"
+        conditions.append(f"(raw LIKE :t{i} OR parsed LIKE :t{i} OR notes LIKE :t{i})")
+    return text(
+        f"SELECT id FROM problems WHERE owner_id = :owner_id AND {' AND '.join(conditions)} "
+        "ORDER BY id DESC LIMIT :limit"
+    ).bindparams(**params)
+
+
+def measure(conn, stmt, repeat: int):
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        rows = conn.execute(stmt).fetchall()
+        latencies.append(time.perf_counter() - started)
+    return statistics.median(latencies), len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--heavy-rows", type=int, default=50000, help="重度用户（用户1）的题目数（约数）")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        engine = database.create_db_engine(f"sqlite:///{os.path.join(workdir, 'bench.db')}", "production")
+        models.Base.metadata.create_all(bind=engine)
+        with engine.begin() as conn:
+            search.install(conn)
+
+        elapsed = populate(engine, args.rows, args.users, args.heavy_rows)
+        print(f"写入 {args.rows} 道题目（含触发器维护索引）: {elapsed:.1f}s ({args.rows / elapsed:.0f} 行/秒)")
+
+        with engine.connect() as conn:
+            print(f"problems表: {table_size_mb(conn, 'problems'):.1f}MB（含problems_fts）, "
+                  f"全文索引problems_fts: {table_size_mb(conn, 'problems_fts'):.1f}MB")
+            for owner_id, label in ((1, "重度用户"), (2, "普通用户")):
+                count = conn.execute(text("SELECT COUNT(*) FROM problems WHERE owner_id = :o"), {"o": owner_id}).scalar()
+                print(f"{label}（{count}道题目）:")
+                for query in QUERIES:
+                    terms = search.query_terms(query)
+                    fts_time, fts_rows = measure(conn, search.search_stmt("sqlite", owner_id, terms, args.limit), args.repeat)
+                    like_time, like_rows = measure(conn, like_stmt(owner_id, terms, args.limit), args.repeat)
+                    print(
+                        f"  {query:<14} fts={fts_time * 1000:8.1f}ms ({fts_rows}行)  "
+                        f"like={like_time * 1000:8.1f}ms ({like_rows}行)"
+                    )
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
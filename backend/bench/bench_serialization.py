@@ -0,0 +1,152 @@
+"""题目列表序列化基准测试：Pydantic逐行验证 与 直接从结果行构造 的对比
+
+在临时SQLite数据库中为同一用户生成题目（带知识点和自定义标签），
+按每页200条沿游标读取全部题目并序列化为JSON，分别统计查询与序列化耗时：
+- pydantic: 旧实现，select(Problem) + load_only得到ORM对象，
+  逐个构造ProblemSummary，再经jsonable_encoder和标准库json编码
+- rows: 当前实现，crud_async.list_problems直接选择列，
+  serialization.problem_rows_to_dicts构造字典后用orjson编码
+
+两种方式的输出解码后逐项比较，确保响应内容一致。
+
+用法（在backend目录下执行）：
+    python bench/bench_serialization.py --rows 10000
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+from sqlalchemy import create_engine, select, text  # noqa: E402
+from sqlalchemy.ext.asyncio import async_sessionmaker  # noqa: E402
+from sqlalchemy.orm import load_only  # noqa: E402
+from sqlalchemy.pool import NullPool  # noqa: E402
+
+import crud_async  # noqa: E402
+import database  # noqa: E402
+import models  # noqa: E402
+import pagination  # noqa: E402
+import schemas  # noqa: E402
+import serialization  # noqa: E402
+
+KNOWLEDGE_TAGS = ["函数", "导数", "积分", "极限", "数列", "概率", "向量", "矩阵", "几何", "三角"]
+USER_TAGS = ["易错", "难题", "复习", "考试", "收藏"]
+PAGE_SIZE = pagination.MAX_PAGE_SIZE
+
+
+def populate(url: str, rows: int):
+    """批量生成同一用户的题目数据"""
+    engine = create_engine(url)
+    models.Base.metadata.create_all(bind=engine)
+    rng = random.Random(0)
+    start = datetime.datetime(2024, 1, 1)
+    with engine.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO users (id, uuid, username, hashed_password, is_active, is_admin, created_at) "
+            "VALUES (1, 'bench', 'bench', 'x', 1, 0, :t)"
+        ), {"t": start})
+        conn.execute(models.Problem.__table__.insert(), [
+            {
+                "owner_id": 1,
+                "source_type": "text",
+                "raw": f"题目 {i}",
+                "subject": "数学",
+                "course": "高等数学",
+                "problem_type": "解答",
+                "difficulty": rng.randint(1, 5),
+                "is_bookmarked": rng.random() < 0.2,
+                "knowledge_tags": rng.sample(KNOWLEDGE_TAGS, rng.randint(1, 3)),
+                "tags": rng.sample(USER_TAGS, rng.randint(0, 2)),
+                "created_at": start + datetime.timedelta(seconds=i),
+                "updated_at": start + datetime.timedelta(seconds=i),
+            }
+            for i in range(rows)
+        ])
+    engine.dispose()
+
+
+async def _pydantic_page(db, fields, cursor):
+    """旧实现：加载ORM对象后逐个经过ProblemSummary"""
+    columns = [getattr(models.Problem, f) for f in set(fields) | {"created_at"} if f != "id"]
+    stmt = select(models.Problem).options(load_only(*columns)).where(models.Problem.owner_id == 1)
+    started = time.perf_counter()
+    problems, cursor = await pagination.paginate_async(
+        db, stmt, models.Problem.created_at, models.Problem.id, cursor=cursor, limit=PAGE_SIZE, descending=True
+    )
+    queried = time.perf_counter()
+    items = [schemas.ProblemSummary(**{f: getattr(p, f) for f in fields}) for p in problems]
+    body = JSONResponse(jsonable_encoder(items, exclude_unset=True)).body
+    return body, cursor, queried - started, time.perf_counter() - queried
+
+
+async def _rows_page(db, fields, cursor):
+    """当前实现：直接选择列，从结果行构造字典并用orjson编码"""
+    started = time.perf_counter()
+    rows, cursor = await crud_async.list_problems(db, owner_id=1, fields=fields, limit=PAGE_SIZE, cursor=cursor)
+    queried = time.perf_counter()
+    body = serialization.JSONBytesResponse(serialization.problem_rows_to_dicts(rows, fields)).body
+    return body, cursor, queried - started, time.perf_counter() - queried
+
+
+async def run(url: str, read_page, fields):
+    """沿游标读取全部题目，返回 (解码后的题目列表, 查询耗时, 序列化耗时)"""
+    engine = database.create_async_db_engine(database.to_async_url(url), poolclass=NullPool)
+    Session = async_sessionmaker(engine, expire_on_commit=False)
+    items, query_time, encode_time = [], 0.0, 0.0
+    async with Session() as db:
+        cursor = None
+        while True:
+            # 每页使用新的会话状态，避免ORM标识映射跨页复用对象
+            db.expunge_all()
+            body, cursor, q, e = await read_page(db, fields, cursor)
+            items.extend(json.loads(body))
+            query_time += q
+            encode_time += e
+            if not cursor:
+                break
+    await engine.dispose()
+    return items, query_time, encode_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=3, help="每种方式重复次数（取最快一次）")
+    args = parser.parse_args()
+
+    fields = list(schemas.PROBLEM_SUMMARY_FIELDS)
+    encoder = "orjson" if serialization.orjson is not None else "json"
+    with tempfile.TemporaryDirectory() as workdir:
+        url = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+        populate(url, args.rows)
+
+        results = {}
+        for name, read_page in (("pydantic", _pydantic_page), ("rows", _rows_page)):
+            best = None
+            for _ in range(args.repeat):
+                items, q, e = asyncio.run(run(url, read_page, fields))
+                if best is None or q + e < best[1] + best[2]:
+                    best = (items, q, e)
+            results[name] = best
+            items, q, e = best
+            print(
+                f"{name:<8} rows={len(items)} query={q * 1000:7.1f}ms serialize={e * 1000:7.1f}ms "
+                f"total={(q + e) * 1000:7.1f}ms" + (f" ({encoder})" if name == "rows" else "")
+            )
+
+        assert results["pydantic"][0] == results["rows"][0], "两种方式的输出不一致"
+        print("输出一致")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""求解请求合并（单飞）验证：并发的相同求解请求只调用一次求解器
+
+模拟老师把题目发到班级群后大量学生同时求解同一道题：
+启动--servers个独立的uvicorn服务进程（各自运行任务工作者，共享同一个临时SQLite数据库），
+求解器替换为记录调用次数、耗时--latency秒的模拟实现，然后：
+1. 老师上传一道题目
+2. --requests个并发请求（分属--students个学生，轮流发往各个服务进程）对该题目调用 POST /solve
+3. 轮询所有任务直到完成
+
+断言求解器总共只被调用一次、所有任务都成功且答案相同，并输出提交时的任务状态分布和完成耗时。
+
+用法（在backend目录下执行）：
+    python bench/bench_singleflight.py --requests 100 --servers 2
+"""
+
+import argparse
+import asyncio
+import collections
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchutil import BACKEND_DIR, free_port, percentile, wait_until_up
+
+
+def serve(port: int, workdir: str, latency: float):
+    """子进程入口：使用共享的临时数据库启动服务，求解器替换为记录调用的模拟实现"""
+    os.environ["STUDY_HELPER_DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ["STUDY_HELPER_DB_PROFILE"] = "production"
+    os.environ["STUDY_HELPER_BLOB_DIR"] = os.path.join(workdir, "blobs")
+    os.environ["STUDY_HELPER_UPLOAD_DIR"] = os.path.join(workdir, "uploads")
+    sys.path.insert(0, BACKEND_DIR)
+
+    import uvicorn
+
+    import main
+    import solver
+
+    placeholder = solver.solve
+
+    def counting_solve(raw, mode="structured"):
+        # 追加写入一行记录一次调用（O_APPEND在多进程间是原子的）
+        with open(os.path.join(workdir, "calls.log"), "a") as f:
+            f.write(f"{os.getpid()}\n")
+        time.sleep(latency)
+        return placeholder(raw, mode)
+
+    solver.solve = counting_solve
+    uvicorn.run(main.app, host="127.0.0.1", port=port, log_level="warning", backlog=4096)
+
+
+async def _token(client, username: str) -> dict:
+    await client.post("/register", json={"username": username, "password": "bench-password"})
+    r = await client.post("/login", data={"username": username, "password": "bench-password"})
+    return {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+
+async def _wait_job(client, headers, job_id: int, started: float):
+    while True:
+        job = (await client.get(f"/jobs/{job_id}", headers=headers)).json()
+        if job["status"] in ("succeeded", "failed"):
+            return job, time.perf_counter() - started
+        await asyncio.sleep(0.05)
+
+
+async def _run(ports, requests: int, students: int):
+    import httpx
+
+    clients = [httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=120) for port in ports]
+    try:
+        for client in clients:
+            await wait_until_up(client)
+        teacher = await _token(clients[0], "teacher")
+        problem = (await clients[0].post(
+            "/problems/upload", headers=teacher, data={"raw": "已知 f(x)=x^3-3x，求 f(x) 在 [-2, 2] 上的最大值与最小值。"}
+        )).json()
+        headers = [await _token(clients[0], f"student{i}") for i in range(students)]
+
+        async def solve(i: int):
+            client, h = clients[i % len(clients)], headers[i % students]
+            started = time.perf_counter()
+            job = (await client.post("/solve", headers=h, json={"problem_id": problem["id"]})).json()
+            submitted = job["status"]
+            job, elapsed = await _wait_job(client, h, job["id"], started)
+            return submitted, job, elapsed
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(solve(i) for i in range(requests)))
+        return results, time.perf_counter() - started
+    finally:
+        for client in clients:
+            await client.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--students", type=int, default=10, help="发起请求的用户数（注册登录较慢，请求轮流使用）")
+    parser.add_argument("--servers", type=int, default=2)
+    parser.add_argument("--latency", type=float, default=1.0, help="模拟求解器每次调用的耗时（秒）")
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.port, args.workdir, args.latency)
+        return
+
+    with tempfile.TemporaryDirectory() as workdir:
+        ports = [free_port() for _ in range(args.servers)]
+        procs = []
+        for i, port in enumerate(ports):
+            procs.append(subprocess.Popen(
+                [sys.executable, os.path.abspath(__file__), "--serve", "--port", str(port),
+                 "--workdir", workdir, "--latency", str(args.latency)],
+                cwd=BACKEND_DIR,
+            ))
+            if i == 0:
+                # 第一个进程完成建表和迁移后再启动其余进程
+                asyncio.run(_wait_up(port))
+        try:
+            results, elapsed = asyncio.run(_run(ports, args.requests, args.students))
+        finally:
+            for proc in procs:
+                proc.terminate()
+            for proc in procs:
+                proc.wait()
+        with open(os.path.join(workdir, "calls.log")) as f:
+            calls = f.read().split()
+
+    submitted = collections.Counter(s for s, _, _ in results)
+    final = collections.Counter(job["status"] for _, job, _ in results)
+    answers = {job["result"]["answer"] for _, job, _ in results if job["result"]}
+    latencies = [e for _, _, e in results]
+    print(f"{args.requests}个并发请求，{args.servers}个服务进程：提交时状态 {dict(submitted)}，最终状态 {dict(final)}")
+    print(
+        f"求解器调用 {len(calls)} 次；完成耗时 p50={percentile(latencies, 50):.2f}s "
+        f"max={max(latencies):.2f}s（模拟求解耗时 {args.latency:g}s），总耗时 {elapsed:.2f}s"
+    )
+    assert len(calls) == 1, f"求解器被调用了{len(calls)}次"
+    assert final == {"succeeded": args.requests}, f"存在未成功的任务: {dict(final)}"
+    assert len(answers) == 1, "任务的答案不一致"
+    print("通过：并发的相同求解请求只调用了一次求解器")
+
+
+async def _wait_up(port: int):
+    import httpx
+
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}") as client:
+        await wait_until_up(client, attempts=300)
+
+
+if __name__ == "__main__":
+    main()
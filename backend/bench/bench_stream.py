@@ -0,0 +1,132 @@
+"""流式求解基准测试：首token延迟 与 总延迟
+
+启动独立的uvicorn服务进程，求解后端使用fake（每个token等待--token-delay秒，模拟模型逐token生成），
+用--concurrency个并发客户端各求解--requests道不同的题目（避免命中求解结果缓存），对比：
+- stream: POST /solve/stream，记录收到第一个delta事件的时间（首token延迟）和收到result事件的时间（总延迟）
+- job: POST /solve 提交任务后轮询 GET /jobs/{id}，结果在任务完成时才一次性可见（首字节即总延迟）
+
+用法（在backend目录下执行）：
+    python bench/bench_stream.py --concurrency 8 --requests 5 --token-delay 0.02
+"""
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchutil import BACKEND_DIR, free_port, percentile, wait_until_up
+
+
+def serve(port: int, workdir: str):
+    """子进程入口：使用临时数据库启动服务（求解后端由环境变量选择）"""
+    os.environ["STUDY_HELPER_DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    os.environ["STUDY_HELPER_DB_PROFILE"] = "production"
+    os.environ["STUDY_HELPER_BLOB_DIR"] = os.path.join(workdir, "blobs")
+    os.environ["STUDY_HELPER_UPLOAD_DIR"] = os.path.join(workdir, "uploads")
+    sys.path.insert(0, BACKEND_DIR)
+
+    import uvicorn
+
+    import main
+
+    uvicorn.run(main.app, host="127.0.0.1", port=port, log_level="warning", backlog=4096)
+
+
+async def _stream_once(client, headers, raw: str):
+    started = time.perf_counter()
+    first = None
+    async with client.stream("POST", "/solve/stream", headers=headers, json={"raw": raw}) as r:
+        event = None
+        async for line in r.aiter_lines():
+            if line.startswith("event:"):
+                event = line[len("event:"):].strip()
+            elif line.startswith("data:"):
+                if event == "delta" and first is None:
+                    first = time.perf_counter() - started
+                if event == "result":
+                    return first, time.perf_counter() - started
+    raise RuntimeError("流式响应没有result事件")
+
+
+async def _job_once(client, headers, raw: str):
+    started = time.perf_counter()
+    job = (await client.post("/solve", headers=headers, json={"raw": raw})).json()
+    while job["status"] not in ("succeeded", "failed"):
+        await asyncio.sleep(0.02)
+        job = (await client.get(f"/jobs/{job['id']}", headers=headers)).json()
+    elapsed = time.perf_counter() - started
+    return elapsed, elapsed
+
+
+async def _run(port: int, concurrency: int, requests: int):
+    import httpx
+
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=300) as client:
+        await wait_until_up(client, attempts=300)
+        await client.post("/register", json={"username": "bench", "password": "bench-password"})
+        r = await client.post("/login", data={"username": "bench", "password": "bench-password"})
+        headers = {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+        results = {}
+        for name, once in (("stream", _stream_once), ("job", _job_once)):
+            samples = []
+
+            async def worker(w: int):
+                for i in range(requests):
+                    samples.append(await once(client, headers, f"{name} 第{w}-{i}题：求 f(x)=x^{w + 2}+{i} 的最小值"))
+
+            started = time.perf_counter()
+            await asyncio.gather(*(worker(w) for w in range(concurrency)))
+            results[name] = (samples, time.perf_counter() - started)
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=5, help="每个客户端的求解次数")
+    parser.add_argument("--token-delay", type=float, default=0.02)
+    parser.add_argument("--serve", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.port, args.workdir)
+        return
+
+    port = free_port()
+    env = dict(
+        os.environ,
+        STUDY_HELPER_SOLVER_BACKEND="fake",
+        STUDY_HELPER_FAKE_TOKEN_DELAY=str(args.token_delay),
+        # 任务模式下与并发客户端数相同的工作者，两种方式的并行度一致
+        STUDY_HELPER_JOB_WORKERS=str(args.concurrency),
+    )
+    with tempfile.TemporaryDirectory() as workdir:
+        proc = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "--serve", "--port", str(port), "--workdir", workdir],
+            cwd=BACKEND_DIR, env=env,
+        )
+        try:
+            results = asyncio.run(_run(port, args.concurrency, args.requests))
+        finally:
+            proc.terminate()
+            proc.wait()
+
+    print(f"fake后端 token延迟 {args.token_delay * 1000:g}ms，并发 {args.concurrency}")
+    for name, (samples, elapsed) in results.items():
+        first = [f for f, _ in samples]
+        total = [t for _, t in samples]
+        print(
+            f"{name:<6} 首token p50={percentile(first, 50) * 1000:7.1f}ms p99={percentile(first, 99) * 1000:7.1f}ms  "
+            f"总延迟 p50={percentile(total, 50) * 1000:7.1f}ms p99={percentile(total, 99) * 1000:7.1f}ms  "
+            f"{len(samples) / elapsed:.1f} 次/秒"
+        )
+
+
+if __name__ == "__main__":
+    main()
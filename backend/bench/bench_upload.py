@@ -0,0 +1,118 @@
+"""题目上传基准测试：整体读入+Base64 与 流式写入Blob存储 的对比
+
+启动独立的uvicorn服务进程，并发上传大文件，统计：
+- 服务进程峰值常驻内存（/proc/<pid>/status 中的VmHWM，仅Linux）
+- 请求延迟的p50/p99
+
+两种模式：
+- legacy: 旧实现，file.file.read()整体读入后Base64编码写入Text列
+- stream: 当前 /problems/upload，按块计算摘要并写入Blob存储
+
+用法（在backend目录下执行）：
+    python bench/bench_upload.py --clients 100 --size-mb 8
+"""
+
+import argparse
+import asyncio
+import base64
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchutil import BACKEND_DIR, free_port, peak_rss_mb, percentile, setup_app, wait_until_up
+
+
+def serve(mode: str, port: int, workdir: str):
+    """子进程入口：使用临时数据库和临时Blob目录启动服务"""
+    os.environ.setdefault("STUDY_HELPER_MAX_UPLOAD_BYTES", str(64 * 1024 * 1024))
+    main, engine, _ = setup_app(workdir)
+
+    import uvicorn
+    from fastapi import Depends, File, UploadFile
+    from sqlalchemy import text
+
+    if mode == "legacy":
+        with engine.begin() as conn:
+            conn.execute(text("CREATE TABLE legacy_problems (id INTEGER PRIMARY KEY, file_content TEXT)"))
+
+        @main.app.post("/bench/legacy-upload")
+        def legacy_upload(file: UploadFile = File(...), db=Depends(main.get_db), user=Depends(main.get_current_user)):
+            # 复现旧实现：整体读入内存后Base64编码，存入Text列
+            file_content = base64.b64encode(file.file.read()).decode("utf-8")
+            db.execute(text("INSERT INTO legacy_problems (file_content) VALUES (:c)"), {"c": file_content})
+            db.commit()
+            return {"ok": True}
+
+    uvicorn.run(main.app, host="127.0.0.1", port=port, log_level="warning")
+
+
+async def _run_load(base_url: str, path: str, clients: int, payload_size: int):
+    import httpx
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=600) as client:
+        await wait_until_up(client)
+
+        await client.post("/register", json={"username": "bench", "password": "bench"})
+        token = (await client.post("/login", data={"username": "bench", "password": "bench"})).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+
+        async def upload(i: int):
+            # 每个文件内容不同，避免Blob去重掩盖写入成本
+            payload = i.to_bytes(4, "big") + b"\0" * (payload_size - 4)
+            start = time.perf_counter()
+            r = await client.post(
+                path,
+                data={"source_type": "image"},
+                files={"file": (f"photo_{i}.jpg", payload, "image/jpeg")},
+                headers=headers,
+            )
+            r.raise_for_status()
+            return time.perf_counter() - start
+
+        started = time.perf_counter()
+        latencies = await asyncio.gather(*(upload(i) for i in range(clients)))
+        return latencies, time.perf_counter() - started
+
+
+def run_mode(mode: str, clients: int, size_mb: int):
+    port = free_port()
+    with tempfile.TemporaryDirectory() as workdir:
+        proc = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "--serve", mode, "--port", str(port), "--workdir", workdir],
+            cwd=BACKEND_DIR,
+        )
+        try:
+            path = "/bench/legacy-upload" if mode == "legacy" else "/problems/upload"
+            latencies, elapsed = asyncio.run(
+                _run_load(f"http://127.0.0.1:{port}", path, clients, size_mb * 1024 * 1024)
+            )
+            peak = peak_rss_mb(proc.pid)
+        finally:
+            proc.terminate()
+            proc.wait()
+
+    print(
+        f"{mode:<8} clients={clients} size={size_mb}MB "
+        f"peak_rss={peak:8.1f}MB p50={percentile(latencies, 50) * 1000:8.1f}ms "
+        f"p99={percentile(latencies, 99) * 1000:8.1f}ms total={elapsed:6.2f}s"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument("--size-mb", type=int, default=8)
+    parser.add_argument("--mode", choices=["legacy", "stream", "both"], default="both")
+    parser.add_argument("--serve", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.port, args.workdir)
+    else:
+        modes = ["legacy", "stream"] if args.mode == "both" else [args.mode]
+        for mode in modes:
+            run_mode(mode, args.clients, args.size_mb)
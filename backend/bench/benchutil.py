@@ -0,0 +1,115 @@
+"""基准脚本共用的辅助函数
+
+- 在子进程中使用临时数据库和临时Blob目录启动服务
+- 端口分配、百分位数、进程峰值内存等统计工具
+"""
+
+import asyncio
+import os
+import socket
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def setup_app(workdir: str, profile: str = None):
+    """导入应用并把数据库和Blob存储替换为workdir下的临时实例
+
+    profile为None时临时数据库使用NullPool；
+    否则按database.create_db_engine的对应配置（dev / production）创建引擎。
+
+    返回：
+        (main模块, 临时数据库引擎, 临时会话工厂)
+    """
+    os.environ["STUDY_HELPER_BLOB_DIR"] = os.path.join(workdir, "blobs")
+    os.environ["STUDY_HELPER_UPLOAD_DIR"] = os.path.join(workdir, "uploads")
+    sys.path.insert(0, BACKEND_DIR)
+
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.pool import NullPool
+
+    import database
+    import main
+    import models
+
+    url = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    if profile is None:
+        # 使用NullPool：基准只关心被测路径，避免并发数超过连接池上限时排队等待连接
+        engine = create_engine(url, connect_args={"check_same_thread": False}, poolclass=NullPool)
+    else:
+        engine = database.create_db_engine(url, profile)
+    models.Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def override_get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    # 异步路由使用的会话（与同步会话连接同一个临时数据库）
+    AsyncSessionLocal = create_async_sessionmaker(engine, profile)
+
+    async def override_get_async_db():
+        async with AsyncSessionLocal() as db:
+            yield db
+
+    main.app.dependency_overrides[main.get_db] = override_get_db
+    main.app.dependency_overrides[main.get_async_db] = override_get_async_db
+    return main, engine, SessionLocal
+
+
+def create_async_sessionmaker(engine, profile: str = None):
+    """为setup_app创建的临时数据库创建异步会话工厂（配置与异步路由使用的相同）
+
+    异步引擎的连接属于创建时的事件循环，需要在asyncio.run运行的协程中调用，用完后dispose。
+    """
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+    from sqlalchemy.pool import NullPool
+
+    import database
+
+    url = engine.url.render_as_string(hide_password=False)
+    if profile is None:
+        async_engine = database.create_async_db_engine(url, poolclass=NullPool)
+    else:
+        async_engine = database.create_async_db_engine(url, profile)
+    return async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+
+def free_port() -> int:
+    """分配一个空闲的本地端口"""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def peak_rss_mb(pid: int) -> float:
+    """读取进程峰值常驻内存（MB，仅Linux）"""
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    return float("nan")
+
+
+def percentile(values, pct):
+    """计算百分位数（最近秩法）"""
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return values[index]
+
+
+async def wait_until_up(client, attempts: int = 100):
+    """等待服务开始接受请求"""
+    import httpx
+
+    for _ in range(attempts):
+        try:
+            await client.get("/docs")
+            return
+        except httpx.TransportError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError("服务启动超时")
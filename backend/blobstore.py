@@ -0,0 +1,387 @@
+"""题目附件Blob存储模块
+
+按内容寻址（SHA-256）保存用户上传的图片、PDF等文件，
+数据库中只保存摘要、大小和MIME类型，不再把Base64塞进problems表。
+
+该模块负责：
+- BlobStore 存储接口定义
+- LocalBlobStore：本地文件系统实现（按摘要前缀分片目录）
+- S3BlobStore：S3兼容对象存储实现
+- LocalS3Client：满足S3BlobStore所需接口的本地替身（开发/测试用）
+- get_blob_store：根据环境变量选择并缓存全局存储实例
+
+相同内容的文件摘要相同，只会被存储一次。
+"""
+
+import hashlib
+import os
+import shutil
+import tempfile
+from dataclasses import dataclass
+from typing import BinaryIO, Iterable, Iterator, Optional, Union
+
+# 获取当前文件所在的目录路径
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 读取/写入文件时的分块大小：1MB
+CHUNK_SIZE = 1024 * 1024
+
+# 单个上传文件的最大字节数：默认20MB，可通过环境变量调整
+MAX_UPLOAD_SIZE = int(os.environ.get("STUDY_HELPER_MAX_UPLOAD_BYTES", 20 * 1024 * 1024))
+
+# 流式写入的数据源：可读的文件对象，或按块产出bytes的可迭代对象
+BlobSource = Union[BinaryIO, Iterable[bytes]]
+
+# 未知类型文件的默认MIME类型
+DEFAULT_MIME_TYPE = "application/octet-stream"
+
+
+@dataclass(frozen=True)
+class BlobInfo:
+    """已存储Blob的描述信息
+
+    字段：
+    - sha256: 文件内容的SHA-256十六进制摘要（即存储键）
+    - size: 文件字节数
+    - mime_type: 文件MIME类型
+    """
+    sha256: str
+    size: int
+    mime_type: str
+
+
+class BlobNotFound(Exception):
+    """请求的Blob不存在"""
+
+
+class BlobTooLarge(Exception):
+    """写入的内容超过了允许的最大字节数"""
+
+    def __init__(self, max_size: int):
+        super().__init__(f"文件超过最大限制 {max_size} 字节")
+        self.max_size = max_size
+
+
+def shard_path(sha256: str) -> str:
+    """根据摘要计算分片后的相对路径
+
+    使用摘要的前两级各2个字符作为目录，避免单目录下文件过多：
+    ab/cd/abcdef...
+    """
+    return f"{sha256[:2]}/{sha256[2:4]}/{sha256}"
+
+
+class BlobStore:
+    """Blob存储接口
+
+    所有实现都以内容摘要为键，put对相同内容是幂等的。
+    """
+
+    def put(self, data: bytes, mime_type: Optional[str] = None) -> BlobInfo:
+        """保存文件内容，返回BlobInfo（内容已存在时直接返回，不重复写入）"""
+        return self.put_stream([data], mime_type=mime_type)
+
+    def put_stream(
+        self,
+        source: BlobSource,
+        mime_type: Optional[str] = None,
+        max_size: Optional[int] = None,
+    ) -> BlobInfo:
+        """按块流式保存内容，内存占用与文件大小无关
+
+        边读取边计算摘要并写入临时文件，读完后再按摘要提交到存储；
+        内容已存在时丢弃临时文件。
+
+        参数：
+            source: 可读的文件对象，或按块产出bytes的可迭代对象
+            mime_type: 文件MIME类型
+            max_size: 最大允许字节数，超过时立即停止读取
+
+        异常：
+            BlobTooLarge: 内容超过max_size
+        """
+        tmp_path, sha256, size = spool_to_tempfile(source, self.spool_dir(), max_size)
+        try:
+            info = BlobInfo(sha256=sha256, size=size, mime_type=mime_type or DEFAULT_MIME_TYPE)
+            if not self.exists(sha256):
+                self._commit_file(tmp_path, info)
+        finally:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+        return info
+
+    def spool_dir(self) -> Optional[str]:
+        """流式写入时临时文件所在目录（None表示系统临时目录）"""
+        return None
+
+    def _commit_file(self, tmp_path: str, info: BlobInfo) -> None:
+        """把已写完并算好摘要的临时文件提交到存储"""
+        raise NotImplementedError
+
+    def exists(self, sha256: str) -> bool:
+        """判断指定摘要的Blob是否存在"""
+        raise NotImplementedError
+
+    def iter_chunks(self, sha256: str, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        """按块读取Blob内容，适合直接用于流式响应
+
+        异常：
+            BlobNotFound: Blob不存在
+        """
+        raise NotImplementedError
+
+    def delete(self, sha256: str) -> None:
+        """删除Blob（不存在时忽略）"""
+        raise NotImplementedError
+
+    def read(self, sha256: str) -> bytes:
+        """读取Blob的全部内容（仅用于小文件）"""
+        return b"".join(self.iter_chunks(sha256))
+
+
+class LocalBlobStore(BlobStore):
+    """本地文件系统Blob存储
+
+    文件保存在 root/ab/cd/<sha256>，写入时先写 root/tmp 下的临时文件，
+    算完摘要后再原子重命名到最终位置。
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self.tmp_dir = os.path.join(root, "tmp")
+        os.makedirs(self.tmp_dir, exist_ok=True)
+
+    def path_for(self, sha256: str) -> str:
+        """返回Blob在本地磁盘上的绝对路径"""
+        return os.path.join(self.root, *shard_path(sha256).split("/"))
+
+    def spool_dir(self) -> Optional[str]:
+        # 临时文件与最终位置在同一文件系统，提交时只需重命名
+        return self.tmp_dir
+
+    def _commit_file(self, tmp_path: str, info: BlobInfo) -> None:
+        # 原子重命名：并发上传同一文件时不会产生半写入的Blob
+        dest = self.path_for(info.sha256)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        os.replace(tmp_path, dest)
+
+    def exists(self, sha256: str) -> bool:
+        return os.path.exists(self.path_for(sha256))
+
+    def iter_chunks(self, sha256: str, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        try:
+            f = open(self.path_for(sha256), "rb")
+        except FileNotFoundError:
+            raise BlobNotFound(sha256)
+        return _iter_file(f, chunk_size)
+
+    def delete(self, sha256: str) -> None:
+        try:
+            os.unlink(self.path_for(sha256))
+        except FileNotFoundError:
+            pass
+
+
+def _iter_source(source: BlobSource, chunk_size: int) -> Iterator[bytes]:
+    """把文件对象或可迭代对象统一为按块产出bytes的迭代器"""
+    if hasattr(source, "read"):
+        while True:
+            chunk = source.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    else:
+        for chunk in source:
+            if chunk:
+                yield chunk
+
+
+def spool_to_tempfile(source: BlobSource, directory: Optional[str] = None, max_size: Optional[int] = None):
+    """把数据源按块写入临时文件，同时计算SHA-256
+
+    参数：
+        source: 可读的文件对象，或按块产出bytes的可迭代对象
+        directory: 临时文件所在目录（None表示系统临时目录）
+        max_size: 最大允许字节数，超过时删除临时文件并抛出BlobTooLarge
+
+    返回：
+        (临时文件路径, sha256十六进制摘要, 字节数)
+    """
+    hasher = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            for chunk in _iter_source(source, CHUNK_SIZE):
+                size += len(chunk)
+                if max_size is not None and size > max_size:
+                    raise BlobTooLarge(max_size)
+                hasher.update(chunk)
+                f.write(chunk)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return tmp_path, hasher.hexdigest(), size
+
+
+def _iter_file(f, chunk_size: int) -> Iterator[bytes]:
+    """按块读取文件对象，读完后自动关闭"""
+    with f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+
+class S3BlobStore(BlobStore):
+    """S3兼容对象存储Blob存储
+
+    client只需提供boto3 S3客户端的以下方法：
+    put_object / head_object / get_object / delete_object。
+    生产环境传入boto3客户端，开发和测试可传入LocalS3Client。
+    """
+
+    def __init__(self, client, bucket: str, prefix: str = "blobs/"):
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix
+
+    def key_for(self, sha256: str) -> str:
+        """返回Blob在桶中的对象键"""
+        return self.prefix + shard_path(sha256)
+
+    def _commit_file(self, tmp_path: str, info: BlobInfo) -> None:
+        with open(tmp_path, "rb") as f:
+            self.client.put_object(
+                Bucket=self.bucket,
+                Key=self.key_for(info.sha256),
+                Body=f,
+                ContentType=info.mime_type,
+            )
+
+    def exists(self, sha256: str) -> bool:
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self.key_for(sha256))
+        except Exception as e:
+            if _is_not_found(e):
+                return False
+            raise
+        return True
+
+    def iter_chunks(self, sha256: str, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        try:
+            obj = self.client.get_object(Bucket=self.bucket, Key=self.key_for(sha256))
+        except Exception as e:
+            if _is_not_found(e):
+                raise BlobNotFound(sha256)
+            raise
+        return _iter_file(obj["Body"], chunk_size)
+
+    def delete(self, sha256: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=self.key_for(sha256))
+
+
+def _is_not_found(error: Exception) -> bool:
+    """判断S3客户端异常是否表示对象不存在（兼容botocore的ClientError结构）"""
+    response = getattr(error, "response", None) or {}
+    code = str(response.get("Error", {}).get("Code", ""))
+    return code in ("404", "NoSuchKey", "NotFound")
+
+
+class LocalS3NotFound(Exception):
+    """LocalS3Client在对象不存在时抛出，结构与botocore的ClientError一致"""
+
+    def __init__(self, key: str):
+        super().__init__(f"Not Found: {key}")
+        self.response = {"Error": {"Code": "404", "Message": "Not Found"}}
+
+
+class LocalS3Client:
+    """S3客户端的本地替身
+
+    把对象保存在 root/<bucket>/<key>，实现S3BlobStore用到的接口，
+    用于没有对象存储服务的开发和测试环境。
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, bucket: str, key: str) -> str:
+        return os.path.join(self.root, bucket, *key.split("/"))
+
+    def put_object(self, Bucket: str, Key: str, Body, ContentType: str = None, **kwargs):
+        path = self._path(Bucket, Key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, "wb") as f:
+            if isinstance(Body, (bytes, bytearray)):
+                f.write(Body)
+            else:
+                shutil.copyfileobj(Body, f, CHUNK_SIZE)
+        os.replace(tmp_path, path)
+        return {}
+
+    def head_object(self, Bucket: str, Key: str, **kwargs):
+        path = self._path(Bucket, Key)
+        if not os.path.exists(path):
+            raise LocalS3NotFound(Key)
+        return {"ContentLength": os.path.getsize(path)}
+
+    def get_object(self, Bucket: str, Key: str, **kwargs):
+        path = self._path(Bucket, Key)
+        if not os.path.exists(path):
+            raise LocalS3NotFound(Key)
+        return {"Body": open(path, "rb"), "ContentLength": os.path.getsize(path)}
+
+    def delete_object(self, Bucket: str, Key: str, **kwargs):
+        try:
+            os.unlink(self._path(Bucket, Key))
+        except FileNotFoundError:
+            pass
+        return {}
+
+
+# ==================== 全局存储实例 ====================
+
+_store: Optional[BlobStore] = None
+
+
+def create_blob_store_from_env() -> BlobStore:
+    """根据环境变量创建Blob存储
+
+    环境变量：
+    - STUDY_HELPER_BLOB_BACKEND: local（默认）/ s3 / s3-local
+    - STUDY_HELPER_BLOB_DIR: 本地存储根目录（默认backend/blobs）
+    - STUDY_HELPER_S3_BUCKET: S3桶名（默认study-helper）
+    - STUDY_HELPER_S3_ENDPOINT: S3兼容服务地址（可选，如MinIO）
+    """
+    backend = os.environ.get("STUDY_HELPER_BLOB_BACKEND", "local")
+    root = os.environ.get("STUDY_HELPER_BLOB_DIR", os.path.join(BASE_DIR, "blobs"))
+    bucket = os.environ.get("STUDY_HELPER_S3_BUCKET", "study-helper")
+
+    if backend == "local":
+        return LocalBlobStore(root)
+    if backend == "s3-local":
+        return S3BlobStore(LocalS3Client(root), bucket)
+    if backend == "s3":
+        # boto3为可选依赖，仅在使用S3时才需要安装
+        import boto3
+
+        client = boto3.client("s3", endpoint_url=os.environ.get("STUDY_HELPER_S3_ENDPOINT"))
+        return S3BlobStore(client, bucket)
+    raise ValueError(f"未知的Blob存储后端: {backend}")
+
+
+def get_blob_store() -> BlobStore:
+    """获取全局Blob存储实例（首次调用时按环境变量创建）"""
+    global _store
+    if _store is None:
+        _store = create_blob_store_from_env()
+    return _store
+
+
+def set_blob_store(store: Optional[BlobStore]) -> None:
+    """替换全局Blob存储实例（测试和基准脚本使用，传None则恢复按环境变量创建）"""
+    global _store
+    _store = store
@@ -0,0 +1,147 @@
+"""进程内缓存模块
+
+该模块负责：
+- TTLCache：线程安全、容量有限的LRU缓存，条目在TTL到期后失效
+- 已认证用户缓存：按JWT的subject（用户名）缓存不可变的用户快照，
+  get_current_user命中缓存时无需查询数据库
+- SingleFlight：合并进程内同时进行的相同调用（如求解同一道题）
+
+注意：缓存只在当前进程内有效。封禁用户时crud_async.set_user_active会显式失效本进程的缓存，
+多进程部署下其他进程最迟在TTL到期后生效，因此用户缓存的TTL应保持较短。
+"""
+
+import asyncio
+import datetime
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Hashable, Optional
+
+
+class TTLCache:
+    """线程安全的LRU + TTL缓存
+
+    - 超过maxsize时淘汰最久未使用的条目
+    - 条目写入ttl秒后失效（读取时惰性删除）
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """读取条目，不存在或已过期时返回default"""
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[0] <= now:
+                if item is not None:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """写入条目（ttl为None时使用缓存默认TTL）"""
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable) -> None:
+        """删除条目（不存在时忽略）"""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+
+# ==================== 已认证用户缓存 ====================
+
+@dataclass(frozen=True)
+class UserSnapshot:
+    """用户的轻量不可变快照
+
+    包含请求处理需要的用户字段，不包含密码哈希，
+    也不绑定数据库会话，可以安全地在请求之间共享。
+    """
+    id: int
+    uuid: str
+    username: str
+    nickname: Optional[str]
+    is_active: bool
+    is_admin: bool
+    created_at: Optional[datetime.datetime]
+
+    @classmethod
+    def from_user(cls, user) -> "UserSnapshot":
+        """从User模型对象创建快照"""
+        return cls(
+            id=user.id,
+            uuid=user.uuid,
+            username=user.username,
+            nickname=user.nickname,
+            is_active=bool(user.is_active),
+            is_admin=bool(user.is_admin),
+            created_at=user.created_at,
+        )
+
+
+# 用户缓存容量与TTL（秒），可通过环境变量调整
+USER_CACHE_SIZE = int(os.environ.get("STUDY_HELPER_USER_CACHE_SIZE", 10000))
+USER_CACHE_TTL = float(os.environ.get("STUDY_HELPER_USER_CACHE_TTL", 60))
+
+# 按用户名缓存的用户快照
+user_cache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+
+
+def invalidate_user(username: str) -> None:
+    """使指定用户的缓存快照失效（用户状态或资料变化时调用）"""
+    user_cache.pop(username)
+
+
+# ==================== 进程内请求合并 ====================
+
+class SingleFlight:
+    """进程内的请求合并（single-flight）
+
+    同一个key的调用正在进行时，后到的调用不再重复执行，而是等待同一个结果
+    （结果或异常由所有等待者共享）。某个等待者被取消时不影响正在进行的调用。
+    """
+
+    def __init__(self):
+        self._calls = {}
+
+    async def do(self, key: Hashable, func):
+        """执行func()（无参数的协程函数）或等待进行中的相同调用
+
+        返回：
+            (结果, shared)，shared为True表示结果来自其他调用者发起的调用
+        """
+        task = self._calls.get(key)
+        shared = task is not None
+        if not shared:
+            task = asyncio.ensure_future(func())
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._calls.pop(key, None) if self._calls.get(key) is t else None)
+        return await asyncio.shield(task), shared
+
+    def __len__(self) -> int:
+        return len(self._calls)
@@ -5,16 +5,27 @@ fixtures是pytest的依赖注入机制，为测试提供必要的资源。
 """
 
 import pytest
-from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 from fastapi.testclient import TestClient
+import asyncio
 import tempfile
 import os
+import shutil
+import socket
+import subprocess
 from unittest.mock import patch
 
+import blobstore
 import database
 import models
-from main import app, get_db
+import cache
+import search
+import solve_cache
+import recommend
+import uploads
+from main import app, get_db, get_async_db
 
 
 def mock_password_hash(password: str) -> str:
@@ -47,11 +58,54 @@ def mock_verify_password(plain: str, hashed: str) -> bool:
     return f"hashed_{plain}_hashed" == hashed
 
 
-@pytest.fixture(scope="function")
-def db():
+@pytest.fixture(scope="session")
+def postgres_url():
+    """PostgreSQL测试实例fixture
+    
+    优先使用环境变量STUDY_HELPER_TEST_POSTGRES_URL指定的已有实例；
+    否则用initdb/pg_ctl在临时目录中启动一个只监听Unix socket的临时集群，
+    测试会话结束后停止并删除。
+    找不到PostgreSQL可执行文件或psycopg2驱动时跳过PostgreSQL测试。
+    
+    返回：
+        PostgreSQL连接URL
+    """
+    url = os.environ.get("STUDY_HELPER_TEST_POSTGRES_URL")
+    if url:
+        yield url
+        return
+    
+    pytest.importorskip("psycopg2")
+    initdb, pg_ctl = shutil.which("initdb"), shutil.which("pg_ctl")
+    if not initdb or not pg_ctl:
+        pytest.skip("未找到initdb/pg_ctl，跳过PostgreSQL测试")
+    
+    # 临时集群：数据目录和socket目录都放在临时目录中
+    workdir = tempfile.mkdtemp(prefix="study_helper_pg_")
+    data_dir = os.path.join(workdir, "data")
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    subprocess.run([initdb, "-D", data_dir, "-U", "postgres", "-A", "trust", "-E", "UTF8", "--locale=C"], check=True, capture_output=True)
+    subprocess.run(
+        [pg_ctl, "-D", data_dir, "-w", "-l", os.path.join(workdir, "postgres.log"),
+         "-o", f"-p {port} -k {workdir} -c listen_addresses=''", "start"],
+        check=True, capture_output=True,
+    )
+    try:
+        yield f"postgresql+psycopg2://postgres@/postgres?host={workdir}&port={port}"
+    finally:
+        subprocess.run([pg_ctl, "-D", data_dir, "-m", "fast", "stop"], capture_output=True)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+@pytest.fixture(scope="function", params=["sqlite", "postgresql"])
+def db(request):
     """数据库会话fixture
     
-    为每个测试创建独立的临时SQLite数据库，
+    分别在SQLite和PostgreSQL上运行每个使用该fixture的测试：
+    - sqlite: 为每个测试创建独立的临时SQLite数据库文件
+    - postgresql: 使用postgres_url提供的实例，每个测试重新建表
     测试完成后自动清理。
     
     Fixture作用域：
@@ -66,21 +120,25 @@ def db():
     Yield：
         SQLAlchemy Session对象
     """
-    # 创建唯一的临时数据库文件
-    db_fd, db_path = tempfile.mkstemp(suffix=".db")
-    os.close(db_fd)
-    
-    # 配置临时数据库连接URL
-    SQLALCHEMY_DATABASE_URL = f"sqlite:///{db_path}"
-    engine = create_engine(
-        SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-    )
+    db_path = None
+    if request.param == "postgresql":
+        SQLALCHEMY_DATABASE_URL = request.getfixturevalue("postgres_url")
+    else:
+        # 创建唯一的临时数据库文件
+        db_fd, db_path = tempfile.mkstemp(suffix=".db")
+        os.close(db_fd)
+        SQLALCHEMY_DATABASE_URL = f"sqlite:///{db_path}"
+    
+    # 与应用使用相同的引擎配置（见database.create_db_engine）
+    engine = database.create_db_engine(SQLALCHEMY_DATABASE_URL)
     
     # 创建测试用的会话工厂
     TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
     
-    # 创建所有表结构
+    # 创建所有表结构，以及全文检索的索引表和触发器（正常启动时由迁移创建）
     models.Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        search.install(conn)
     
     # 覆盖FastAPI应用的get_db依赖，使用测试数据库
     def override_get_db():
@@ -91,11 +149,24 @@ def db():
         finally:
             db.close()
     
+    # 异步路由使用的会话：连接同一个测试数据库
+    # NullPool: TestClient可能在不同的事件循环中处理请求，不复用跨循环的连接
+    async_engine = database.create_async_db_engine(SQLALCHEMY_DATABASE_URL, poolclass=NullPool)
+    AsyncTestingSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+    
+    async def override_get_async_db():
+        """返回测试数据库的异步会话"""
+        async with AsyncTestingSessionLocal() as db:
+            yield db
+    
     # 应用依赖覆盖
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
     
     # 创建数据库会话
+    # 异步会话工厂放在info中，供测试中自行打开异步会话的代码使用（如驱动任务工作者）
     db_session = TestingSessionLocal()
+    db_session.info["async_session_factory"] = AsyncTestingSessionLocal
     
     # 使用mock函数替换bcrypt（测试性能优化）
     with patch('backend.crud.get_password_hash', side_effect=mock_password_hash), \
@@ -105,20 +176,57 @@ def db():
     # 清理：关闭会话
     db_session.close()
     
-    # 清理：删除所有表
+    # 清理：删除所有表（全文检索的表不在模型元数据中，先单独删除）
+    with engine.begin() as conn:
+        search.uninstall(conn)
     models.Base.metadata.drop_all(bind=engine)
     
     # 清理：关闭数据库连接
     engine.dispose()
+    asyncio.run(async_engine.dispose())
     
-    # 清理：删除临时数据库文件
-    try:
-        os.unlink(db_path)
-    except OSError:
-        pass
+    # 清理：删除临时数据库文件（SQLite）
+    if db_path:
+        try:
+            os.unlink(db_path)
+        except OSError:
+            pass
     
     # 清理：恢复依赖覆盖
     app.dependency_overrides.clear()
+    
+    # 清理：清空进程内用户缓存，避免不同测试的数据库之间串用用户快照
+    cache.user_cache.clear()
+    solve_cache.memory_cache.clear()
+    recommend.recommendation_cache.clear()
+
+
+@pytest.fixture(scope="function")
+def blob_store(tmp_path):
+    """临时Blob存储fixture
+    
+    测试中上传的文件写入临时目录，不污染开发环境的Blob目录；
+    测试结束后恢复按环境变量创建的全局实例。
+    
+    返回：
+        blobstore.LocalBlobStore实例
+    """
+    store = blobstore.LocalBlobStore(str(tmp_path / "blobs"))
+    blobstore.set_blob_store(store)
+    yield store
+    blobstore.set_blob_store(None)
+
+
+@pytest.fixture(scope="function")
+def upload_dir(tmp_path, monkeypatch):
+    """临时分片暂存目录fixture：分片上传会话的暂存文件写入临时目录
+    
+    返回：
+        暂存根目录路径
+    """
+    directory = str(tmp_path / "uploads")
+    monkeypatch.setattr(uploads, "UPLOAD_DIR", directory)
+    return directory
 
 
 @pytest.fixture(scope="function")
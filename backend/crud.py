@@ -1,9 +1,10 @@
-"""数据库CRUD操作模块
+"""数据库CRUD操作模块（同步会话）
 
-包含所有与数据库交互的操作函数，包括：
-- 用户管理：创建、查询、认证、激活/禁用
-- 题目管理：创建、查询
-- 学习档案：查询掌握度
+包含密码哈希，以及同步会话上的用户创建、查询、认证和按ID查询题目，
+供密码哈希进程池、命令行工具和基准脚本使用。
+
+API路由全部是async路由，请求路径上的数据库操作（题目、用户管理、学习档案、分片上传会话、
+答题、推荐、错题本和复习计划）见crud_async。
 """
 
 from sqlalchemy.orm import Session
@@ -11,7 +12,6 @@ import models
 import schemas
 from passlib.context import CryptContext
 from uuid import uuid4
-import json
 
 # 密码加密/验证上下文
 # schemes=["pbkdf2_sha256"]: 使用PBKDF2-SHA256算法进行密码加密
@@ -52,7 +52,7 @@ def verify_password(plain: str, hashed: str) -> bool:
     return pwd_context.verify(plain, hashed)
 
 
-def create_user(db: Session, user_in: schemas.UserCreate):
+def create_user(db: Session, user_in: schemas.UserCreate, hashed_password: str = None):
     """创建新用户
     
     创建用户账户，自动生成UUID并对密码进行加密。
@@ -60,6 +60,8 @@ def create_user(db: Session, user_in: schemas.UserCreate):
     参数：
         db: 数据库会话
         user_in: 用户创建数据（包含username、password、nickname）
+        hashed_password: 已计算好的密码哈希（可选）
+            接口层在哈希进程池中算好后传入，不提供时在当前线程计算
         
     返回：
         创建后的User模型对象（已保存到数据库）
@@ -70,7 +72,7 @@ def create_user(db: Session, user_in: schemas.UserCreate):
     user = models.User(
         uuid=str(uuid4()),  # 生成UUID作为用户全局唯一标识
         username=user_in.username,
-        hashed_password=get_password_hash(user_in.password),  # 密码加密后存储
+        hashed_password=hashed_password or get_password_hash(user_in.password),  # 密码加密后存储
         nickname=user_in.nickname,
     )
     db.add(user)  # 将对象添加到会话
@@ -120,82 +122,6 @@ def authenticate_user(db: Session, username: str, password: str):
     return user
 
 
-def list_users(db: Session, skip: int = 0, limit: int = 100):
-    """列出所有用户（支持分页）
-    
-    用于管理员查看所有用户列表。
-    
-    参数：
-        db: 数据库会话
-        skip: 跳过前N条记录（默认0）
-        limit: 返回最多N条记录（默认100）
-        
-    返回：
-        User对象列表
-    """
-    return db.query(models.User).offset(skip).limit(limit).all()
-
-
-def set_user_active(db: Session, user_id: int, active: bool):
-    """设置用户激活状态
-    
-    管理员用此函数激活或禁用用户账户。
-    禁用的用户无法登录。
-    
-    参数：
-        db: 数据库会话
-        user_id: 用户ID
-        active: True激活，False禁用
-        
-    返回：
-        更新后的User对象，或None如果用户不存在
-    """
-    user = db.query(models.User).filter(models.User.id == user_id).first()
-    if not user:
-        return None
-    user.is_active = active  # 更新激活状态
-    db.add(user)
-    db.commit()
-    db.refresh(user)
-    return user
-
-
-def create_problem(db: Session, owner_id: int, problem_in: schemas.ProblemCreate):
-    """创建新题目
-    
-    用户上传新的学习题目。
-    
-    参数：
-        db: 数据库会话
-        owner_id: 题目所有者的用户ID
-        problem_in: 题目信息（包含source_type、raw及元数据）
-        
-    返回：
-        创建后的Problem模型对象（已保存到数据库）
-    """
-    # 将列表转换为JSON字符串
-    knowledge_tags_json = json.dumps(problem_in.knowledge_tags) if problem_in.knowledge_tags else None
-    tags_json = json.dumps(problem_in.tags) if problem_in.tags else None
-    
-    p = models.Problem(
-        owner_id=owner_id,
-        source_type=problem_in.source_type,  # 题目来源类型
-        raw=problem_in.raw,  # 原始题目内容
-        file_content=problem_in.file_content,  # Base64编码的文件内容
-        subject=problem_in.subject,  # 学科
-        course=problem_in.course,  # 课程名称
-        problem_type=problem_in.problem_type,  # 题型
-        knowledge_tags=knowledge_tags_json,  # 知识点标签（JSON格式）
-        difficulty=problem_in.difficulty,  # 难度估计
-        tags=tags_json,  # 用户标签（JSON格式）
-        notes=problem_in.notes,  # 用户备注
-    )
-    db.add(p)
-    db.commit()
-    db.refresh(p)
-    return p
-
-
 def get_problem(db: Session, problem_id: int):
     """根据ID查询题目
     
@@ -209,76 +135,3 @@ def get_problem(db: Session, problem_id: int):
         Problem对象如果找到，None 如果题目不存在
     """
     return db.query(models.Problem).filter(models.Problem.id == problem_id).first()
-
-
-def update_problem(db: Session, problem_id: int, problem_in: schemas.ProblemUpdate):
-    """更新题目元数据
-    
-    更新已上传题目的元数据、标签和备注。
-    
-    参数：
-        db: 数据库会话
-        problem_id: 题目ID
-        problem_in: 要更新的题目元数据
-        
-    返回：
-        更新后的Problem对象，如果题目不存在则返回None
-    """
-    p = db.query(models.Problem).filter(models.Problem.id == problem_id).first()
-    if not p:
-        return None
-    
-    # 更新各字段（如果提供）
-    if problem_in.subject is not None:
-        p.subject = problem_in.subject
-    if problem_in.course is not None:
-        p.course = problem_in.course
-    if problem_in.problem_type is not None:
-        p.problem_type = problem_in.problem_type
-    if problem_in.knowledge_tags is not None:
-        p.knowledge_tags = json.dumps(problem_in.knowledge_tags)
-    if problem_in.difficulty is not None:
-        p.difficulty = problem_in.difficulty
-    if problem_in.is_bookmarked is not None:
-        p.is_bookmarked = problem_in.is_bookmarked
-    if problem_in.tags is not None:
-        p.tags = json.dumps(problem_in.tags)
-    if problem_in.notes is not None:
-        p.notes = problem_in.notes
-    
-    db.add(p)
-    db.commit()
-    db.refresh(p)
-    return p
-
-
-def get_learning_profile(db: Session, user_id: int):
-    """获取用户的学习档案
-    
-    返回用户对各个主题的掌握度统计。
-    用于展示学习进度和推荐学习材料。
-    
-    参数：
-        db: 数据库会话
-        user_id: 用户ID
-        
-    返回：
-        字典包含：
-        - user_id: 用户ID
-        - mastery: 各主题掌握度的字典
-          键：主题名称
-          值：掌握度（0.0-1.0）
-        - trend: 学习趋势（历史记录列表，当前为空占位）
-        
-    使用场景：
-        查询所有该用户学习过的主题及掌握度
-        用于生成学习报告和个性化建议
-    """
-    # 查询该用户的所有主题掌握度记录
-    rows = db.query(models.TopicMastery).filter(models.TopicMastery.user_id == user_id).all()
-    
-    # 构建掌握度字典：{主题名: 掌握度分数}
-    mastery = {r.topic: r.mastery for r in rows}
-    
-    # 返回学习档案（趋势数据为占位符，可在后续扩展）
-    return {"user_id": user_id, "mastery": mastery, "trend": []}
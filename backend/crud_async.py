@@ -0,0 +1,685 @@
+"""异步数据库CRUD操作模块
+
+请求路径上的数据库操作，供async路由使用：
+- 第一个参数是AsyncSession（database.AsyncSessionLocal），函数需要await
+- 使用select()语句而不是Session.query()
+
+数据库IO在事件循环中等待而不占用线程，路由的并发数不再受Starlette线程池大小限制。
+题目的创建和更新（含标签关联、推荐索引、归簇的维护）、列表查询、学习档案、用户管理、分片上传会话，
+以及记录答题（掌握度、学习趋势、推荐热度、错题本和复习计划的增量维护）、推荐、错题本和到期复习的查询
+只有异步版本；各模块（mastery、rollups、recommend、mistakes、reviews、dedup）构造SQL语句，这里负责执行。
+Blob存储的文件读写是阻塞IO，由路由放到线程池中执行，这里只接收写入后的BlobInfo。
+"""
+
+from sqlalchemy import Text, select, type_coerce
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only, selectinload
+from uuid import uuid4
+import datetime
+import models
+import schemas
+import blobstore
+import pagination
+import cache
+import tags
+import dedup
+import serialization
+import search
+import mastery
+import rollups
+import recommend
+import mistakes
+import reviews
+from crud import get_password_hash
+
+
+async def create_user(db: AsyncSession, user_in: schemas.UserCreate, hashed_password: str = None):
+    """创建新用户（见crud.create_user）"""
+    user = models.User(
+        uuid=str(uuid4()),
+        username=user_in.username,
+        hashed_password=hashed_password or get_password_hash(user_in.password),
+        nickname=user_in.nickname,
+    )
+    db.add(user)
+    await db.commit()
+    await db.refresh(user)
+    return user
+
+
+async def get_user_by_username(db: AsyncSession, username: str):
+    """按用户名查询用户（见crud.get_user_by_username）"""
+    result = await db.scalars(select(models.User).where(models.User.username == username).limit(1))
+    return result.first()
+
+
+async def list_users(db: AsyncSession, limit: int = 100, cursor: str = None):
+    """列出所有用户（键集分页）
+
+    用于管理员查看所有用户列表。
+    按(created_at, id)从旧到新排序，使用游标而不是OFFSET分页，
+    翻页开销不随页码增长。
+
+    参数：
+        db: 异步数据库会话
+        limit: 每页最多返回N条记录（默认100）
+        cursor: 上一页返回的游标（可选，不提供表示第一页）
+
+    返回：
+        (User对象列表, 下一页游标)，没有下一页时游标为None
+
+    异常：
+        pagination.InvalidCursor: 游标格式无效
+    """
+    return await pagination.paginate_async(
+        db, select(models.User), models.User.created_at, models.User.id, cursor=cursor, limit=limit
+    )
+
+
+async def set_user_active(db: AsyncSession, user_id: int, active: bool):
+    """设置用户激活状态
+
+    管理员用此函数激活或禁用用户账户。
+    禁用的用户无法登录，已签发的令牌也会立即失效（同时清除用户缓存）。
+
+    参数：
+        db: 异步数据库会话
+        user_id: 用户ID
+        active: True激活，False禁用
+
+    返回：
+        更新后的User对象，或None如果用户不存在
+    """
+    user = await db.get(models.User, user_id)
+    if not user:
+        return None
+    user.is_active = active
+    await db.commit()
+    await db.refresh(user)
+    cache.invalidate_user(user.username)
+    return user
+
+
+async def get_problem(db: AsyncSession, problem_id: int):
+    """根据ID查询题目（见crud.get_problem）"""
+    return await db.get(models.Problem, problem_id)
+
+
+async def create_problem(
+    db: AsyncSession,
+    owner_id: int,
+    problem_in: schemas.ProblemCreate,
+    blob: blobstore.BlobInfo = None,
+):
+    """创建新题目
+
+    附带文件时，文件内容已由调用方写入Blob存储（blobstore.BlobStore.put_stream，阻塞IO，
+    在线程池中执行），题目行中只保存摘要、大小和MIME类型。
+    在同一事务中写入标签关联、推荐索引并归入题目簇。
+
+    参数：
+        db: 异步数据库会话
+        owner_id: 题目所有者的用户ID
+        problem_in: 题目信息（包含source_type、raw及元数据）
+        blob: 已写入Blob存储的文件信息（可选）
+
+    返回：
+        创建后的Problem模型对象（已保存到数据库）
+    """
+    p = models.Problem(
+        owner_id=owner_id,
+        source_type=problem_in.source_type,
+        raw=problem_in.raw,
+        file_sha256=blob.sha256 if blob else None,
+        file_size=blob.size if blob else None,
+        mime_type=blob.mime_type if blob else None,
+        subject=problem_in.subject,
+        course=problem_in.course,
+        problem_type=problem_in.problem_type,
+        knowledge_tags=problem_in.knowledge_tags or None,
+        difficulty=problem_in.difficulty,
+        tags=problem_in.tags or None,
+        notes=problem_in.notes,
+    )
+    db.add(p)
+    await db.flush()  # 获取题目ID，用于写入标签关联和归簇
+    await sync_problem_tags(db, p)
+    await sync_recommendation_index(db, p)
+    await link_problem_cluster(db, p)
+    await db.commit()
+    await db.refresh(p)
+    return p
+
+
+async def link_problem_cluster(db: AsyncSession, problem: models.Problem):
+    """计算题目的去重指纹并归入题目簇（不提交事务）
+
+    精确重复的题目归入已有簇，并在自身没有解析结果时复用簇代表题目的parsed；
+    近似重复只归簇，不复用解析结果（题目文本不完全相同）。近似重复写入的精确指纹键之后会被精确命中，
+    此时代表题目的文本仍不相同（指纹与簇的content_hash不同），同样不复用。
+    没有可用于去重的内容（空文本且无文件）时不归簇。
+    dedup.assign_cluster在同步会话上执行语句，这里通过run_sync在异步会话的连接上运行。
+
+    参数：
+        db: 异步数据库会话
+        problem: 已有ID的Problem对象
+
+    返回：
+        dedup.ClusterMatch，不归簇时返回None
+    """
+    fp = dedup.fingerprint(problem.raw, problem.file_sha256)
+    if fp is None:
+        return None
+    dialect = db.get_bind().dialect.name
+    match = await db.run_sync(lambda session: dedup.assign_cluster(session, dialect, problem.id, fp))
+    problem.content_hash = fp.content_hash
+    problem.cluster_id = match.cluster_id
+    if match.match == dedup.MATCH_EXACT and problem.parsed is None:
+        problem.parsed = await db.scalar(
+            select(models.Problem.parsed)
+            .join(models.ProblemCluster, models.ProblemCluster.canonical_problem_id == models.Problem.id)
+            .where(
+                models.ProblemCluster.id == match.cluster_id,
+                models.ProblemCluster.content_hash == fp.content_hash,
+            )
+        )
+    dedup.matches_total[match.match].inc()
+    return match
+
+
+async def sync_problem_tags(db: AsyncSession, problem: models.Problem):
+    """按题目的knowledge_tags和tags重建标签关联（不提交事务）
+
+    缺失的标签先创建（并发创建同名标签时忽略冲突），
+    再删除题目的旧关联、插入新关联。
+    """
+    dialect = db.get_bind().dialect.name
+    keys = tags.tag_keys(problem.knowledge_tags, problem.tags)
+    tag_ids = []
+    if keys:
+        await db.execute(tags.insert_tags_stmt(dialect, keys))
+        tag_ids = [row.id for row in await db.execute(tags.select_tag_ids_stmt(keys))]
+    for stmt in tags.replace_problem_tags_stmts(dialect, problem.id, tag_ids):
+        await db.execute(stmt)
+
+
+async def sync_recommendation_index(db: AsyncSession, problem: models.Problem):
+    """按题目的难度、学科和知识点标签关联重建该题的推荐索引行，保留热度（不提交事务）
+
+    需要在sync_problem_tags之后调用（索引行来自标签关联表）。
+    """
+    popularity = await db.scalar(recommend.popularity_stmt(problem.id))
+    for stmt in recommend.replace_entries_stmts(problem, popularity):
+        await db.execute(stmt)
+
+
+async def get_tag_ids(db: AsyncSession, knowledge_tags=None, user_tags=None):
+    """查询标签ID，返回 (已存在标签的ID列表, 请求的标签数)，不存在的标签不会出现在ID列表中"""
+    keys = tags.tag_keys(knowledge_tags, user_tags)
+    if not keys:
+        return [], 0
+    return [row.id for row in await db.execute(tags.select_tag_ids_stmt(keys))], len(keys)
+
+
+def _list_column(field: str):
+    """列表查询中字段对应的列，标签列不经过JSON类型的结果处理（保留原始文本）"""
+    column = getattr(models.Problem, field)
+    if field in serialization.TAG_FIELDS:
+        return type_coerce(column, Text).label(field)
+    return column
+
+
+async def list_problems(
+    db: AsyncSession,
+    owner_id: int,
+    subject: str = None,
+    course: str = None,
+    bookmarked_only: bool = False,
+    fields=schemas.PROBLEM_SUMMARY_FIELDS,
+    limit: int = pagination.DEFAULT_PAGE_SIZE,
+    cursor: str = None,
+    knowledge_tags=None,
+    user_tags=None,
+    tag_match: str = tags.TAG_MATCH_ALL,
+):
+    """按条件查询用户的题目列表，只选择指定列，键集分页
+
+    直接选择列而不构造ORM对象，未请求的raw、parsed、notes等大文本字段不会从数据库读取：
+    返回的是结果行，前几列依次对应fields，用于serialization.problem_rows_to_dicts。
+    标签列按原始JSON文本读取（PostgreSQL的JSONB列仍由驱动解析为列表），
+    由serialization模块缓存解析，避免逐行json.loads。
+    结果按(created_at, id)从新到旧排序，使用(owner_id, created_at, id)
+    复合索引做游标分页，每页都是一次有界的索引范围扫描。
+
+    参数：
+        db: 异步数据库会话
+        owner_id: 题目所有者的用户ID
+        subject: 按学科筛选（可选）
+        course: 按课程筛选（可选）
+        bookmarked_only: 仅返回已收藏的题目
+        fields: 需要选择的字段名列表（默认为列表摘要字段）
+        limit: 每页条数
+        cursor: 上一页返回的游标（可选，不提供表示第一页）
+        knowledge_tags: 按知识点标签筛选（可选，标签名列表）
+        user_tags: 按用户标签筛选（可选，标签名列表）
+        tag_match: \"all\"要求包含全部标签（AND），\"any\"包含任一标签即可（OR）
+
+    返回：
+        (结果行列表, 下一页游标)
+
+    异常：
+        pagination.InvalidCursor: 游标格式无效
+    """
+    columns = [_list_column(f) for f in fields]
+    # created_at是分页排序键，总是需要选择
+    if "created_at" not in fields:
+        columns.append(models.Problem.created_at)
+    stmt = select(*columns).where(models.Problem.owner_id == owner_id)
+
+    if subject:
+        stmt = stmt.where(models.Problem.subject == subject)
+    if course:
+        stmt = stmt.where(models.Problem.course == course)
+    if bookmarked_only:
+        stmt = stmt.where(models.Problem.is_bookmarked == True)
+
+    tag_ids, requested = await get_tag_ids(db, knowledge_tags, user_tags)
+    if requested:
+        if not tag_ids or (tag_match == tags.TAG_MATCH_ALL and len(tag_ids) < requested):
+            return [], None
+        stmt = stmt.where(tags.filter_clause(tag_ids, tag_match))
+
+    return await pagination.paginate_async(
+        db,
+        stmt,
+        models.Problem.created_at,
+        models.Problem.id,
+        cursor=cursor,
+        limit=limit,
+        descending=True,
+        scalars=False,
+    )
+
+
+async def search_problems(db: AsyncSession, owner_id: int, query: str, limit: int = 20, offset: int = 0):
+    """全文检索用户的题目（raw、parsed、notes），按相关度排序（仅异步版本）
+
+    参数：
+        db: 异步数据库会话
+        owner_id: 题目所有者的用户ID
+        query: 查询文本，按空白分隔的多个查询词须全部命中
+        limit: 返回条数
+        offset: 跳过的条数
+
+    返回：
+        (结果行列表, 查询词列表)，查询中没有有效的查询词时结果为空列表
+        结果行包含题目的基本信息、raw/parsed/notes原文和相关度score
+    """
+    terms = search.query_terms(query)
+    if not terms:
+        return [], terms
+    stmt = search.search_stmt(db.get_bind().dialect.name, owner_id, terms, limit, offset)
+    return (await db.execute(stmt)).all(), terms
+
+
+async def update_problem(db: AsyncSession, problem_id: int, problem_in: schemas.ProblemUpdate):
+    """更新题目元数据、标签和备注
+
+    标签变化时同步标签关联表；难度、学科或知识点变化时同步推荐索引和错题本中的题目分面。
+
+    参数：
+        db: 异步数据库会话
+        problem_id: 题目ID
+        problem_in: 要更新的题目元数据（只更新提供了值的字段）
+
+    返回：
+        更新后的Problem对象，如果题目不存在则返回None
+    """
+    p = await db.get(models.Problem, problem_id)
+    if not p:
+        return None
+
+    # 只更新请求中提供了值的字段
+    for field in ("subject", "course", "problem_type", "knowledge_tags", "difficulty", "is_bookmarked", "tags", "notes"):
+        value = getattr(problem_in, field)
+        if value is not None:
+            setattr(p, field, value)
+
+    if problem_in.knowledge_tags is not None or problem_in.tags is not None:
+        await sync_problem_tags(db, p)
+    if any(v is not None for v in (problem_in.knowledge_tags, problem_in.difficulty, problem_in.subject)):
+        await sync_recommendation_index(db, p)
+        for stmt in mistakes.sync_problem_stmts(p):
+            await db.execute(stmt)
+
+    await db.commit()
+    await db.refresh(p)
+    return p
+
+
+async def record_attempt(db: AsyncSession, user_id: int, problem: models.Problem, attempt_in: schemas.AttemptCreate):
+    """记录一次答题，并在同一事务中更新所涉及主题的掌握度
+
+    只读写该题知识点标签对应的掌握度行（见mastery模块），不读取答题历史：
+    先为没有记录的主题创建初始行，再按主题顺序锁定（SELECT ... FOR UPDATE）并更新，
+    同一用户的并发答题依次生效，不会丢失更新。
+    计入掌握度的答题同时累加到学习趋势的日/周/月桶（见rollups模块）。
+    该题在推荐索引中的热度加一；掌握度变化后该用户缓存的推荐结果失效。
+    答错的题目进入错题本，错题重做的结果更新到错题本（见mistakes模块）。
+    按答题评分更新该题的复习间隔和下次复习时间（见reviews模块）。
+
+    参数：
+        db: 异步数据库会话
+        user_id: 答题用户ID
+        problem: 题目
+        attempt_in: 答题结果
+
+    返回：
+        (Attempt对象, 更新后的掌握度字典{主题: 掌握度})
+    """
+    now = models.utcnow()
+    attempt = models.Attempt(
+        user_id=user_id,
+        problem_id=problem.id,
+        correct=attempt_in.correct,
+        score=attempt_in.score,
+        submitted_at=now,
+    )
+    db.add(attempt)
+
+    updated = {}
+    result = mastery.outcome(attempt_in.correct, attempt_in.score)
+    topics = mastery.topics_of(problem.knowledge_tags)
+    dialect = db.get_bind().dialect.name
+    if result is not None and topics:
+        await db.execute(mastery.ensure_rows_stmt(dialect, user_id, topics))
+        for row in await db.scalars(mastery.lock_rows_stmt(user_id, topics)):
+            mastery.apply(row, result, now)
+            updated[row.topic] = row.mastery
+    if result is not None:
+        # 累加到学习趋势的日/周/月桶，并清理该用户超过保留期的桶
+        await db.execute(rollups.upsert_stmt(dialect, rollups.rows_for_attempt(user_id, now, result, updated)))
+        await db.execute(rollups.prune_stmt(user_id, now.date()))
+    await db.execute(recommend.bump_popularity_stmt(problem.id))
+    for stmt in mistakes.record_stmts(dialect, user_id, problem, result, now):
+        await db.execute(stmt)
+    quality = reviews.quality(attempt_in.correct, attempt_in.score)
+    if quality is not None:
+        await db.execute(reviews.ensure_row_stmt(dialect, user_id, problem.id, now))
+        reviews.apply((await db.scalars(reviews.lock_row_stmt(user_id, problem.id))).one(), quality, now)
+
+    await db.commit()
+    if result is not None:
+        recommend.invalidate(user_id)
+    await db.refresh(attempt)
+    return attempt, updated
+
+
+async def get_learning_profile(db: AsyncSession, user_id: int, days: int = 90, granularity: str = None):
+    """获取用户的学习档案
+
+    返回用户对各个主题的掌握度，以及最近一段时间的学习趋势。
+    学习趋势只读取时间范围内的预汇总桶（见rollups模块），不扫描答题历史。
+
+    参数：
+        db: 异步数据库会话
+        user_id: 用户ID
+        days: 学习趋势的时间范围（最近多少天，含今天）
+        granularity: 趋势的粒度（day / week / month），None时按时间范围选择
+
+    返回：
+        字典：user_id、mastery（{主题: 掌握度}）、granularity、trend（见rollups.build_trend）
+    """
+    rows = await db.scalars(select(models.TopicMastery).where(models.TopicMastery.user_id == user_id))
+    mastery = {r.topic: r.mastery for r in rows}
+    granularity = granularity or rollups.default_granularity(days)
+    start = rollups.range_start(models.utcnow().date(), days, granularity)
+    trend = rollups.build_trend(await db.execute(rollups.select_stmt(user_id, granularity, start)))
+    return {"user_id": user_id, "mastery": mastery, "granularity": granularity, "trend": trend}
+
+
+async def get_recommendations(db: AsyncSession, user_id: int, limit: int = recommend.DEFAULT_LIMIT, subject: str = None):
+    """为用户推荐略高于当前水平的题目
+
+    取掌握度最低的几个主题，按各主题的目标难度段从推荐索引中选取热度最高的候选，
+    排除用户已经做对的题目（见recommend模块）。只推荐系统题目和用户自己的题目。
+
+    参数：
+        db: 异步数据库会话
+        user_id: 用户ID
+        limit: 推荐条数
+        subject: 只推荐该学科的题目（可选）
+
+    返回：
+        推荐列表，每项包含题目摘要字段（id、subject、course、problem_type、knowledge_tags、difficulty）
+        以及topic（推荐针对的主题）、mastery（该主题的掌握度）和popularity（热度）；
+        没有掌握度记录时返回空列表
+    """
+    topics = [recommend.WeakTopic(*row) for row in await db.execute(recommend.weak_topics_stmt(user_id))]
+    if not topics:
+        return []
+    candidates = (await db.execute(
+        recommend.candidates_stmt(user_id, topics, limit * recommend.CANDIDATE_FACTOR, subject)
+    )).all()
+    if not candidates:
+        return []
+    solved = (await db.scalars(recommend.solved_stmt(user_id, {row.problem_id for row in candidates}))).all()
+    picked = recommend.pick(topics, candidates, solved, limit)
+    problems = {
+        p.id: p for p in await db.scalars(
+            select(models.Problem)
+            .options(load_only(*recommend.problem_columns()))
+            .where(models.Problem.id.in_([item["problem_id"] for item in picked]))
+        )
+    }
+    return [recommend.to_dict(problems[item["problem_id"]], item) for item in picked]
+
+
+async def list_mistakes(
+    db: AsyncSession,
+    user_id: int,
+    subject: str = None,
+    knowledge_tags=None,
+    tag_match: str = tags.TAG_MATCH_ALL,
+    difficulty_min: int = None,
+    difficulty_max: int = None,
+    since: datetime.datetime = None,
+    until: datetime.datetime = None,
+    mastered: bool = None,
+    limit: int = pagination.DEFAULT_PAGE_SIZE,
+    cursor: str = None,
+):
+    """按条件查询用户的错题本（键集分页），同时返回筛选结果的分面统计
+
+    筛选只读取错题本中该用户的行（见mistakes模块），不扫描答题记录；
+    结果按最近一次答错的时间从新到旧排序。
+
+    参数：
+        db: 异步数据库会话
+        user_id: 用户ID
+        subject: 按学科筛选（可选）
+        knowledge_tags: 按知识点筛选（可选，知识点名称列表）
+        tag_match: \"all\"要求包含全部知识点，\"any\"包含任一知识点即可
+        difficulty_min / difficulty_max: 难度范围（可选，含两端）
+        since / until: 最近一次答错的时间范围（可选，[since, until)）
+        mastered: 按掌握标记筛选（可选）
+        limit: 每页条数
+        cursor: 上一页返回的游标（可选，不提供表示第一页）
+
+    返回：
+        (结果行列表, 下一页游标, {"total": 总题数, "facets": 分面统计})
+
+    异常：
+        pagination.InvalidCursor: 游标格式无效
+    """
+    tag_ids, requested = await get_tag_ids(db, knowledge_tags=knowledge_tags)
+    if requested and (not tag_ids or (tag_match == tags.TAG_MATCH_ALL and len(tag_ids) < requested)):
+        return [], None, mistakes.build_facets([])
+    conditions = mistakes.filter_conditions(
+        user_id, subject, tag_ids, tag_match, difficulty_min, difficulty_max, since, until, mastered
+    )
+    rows, next_cursor = await pagination.paginate_async(
+        db, mistakes.list_stmt(conditions), models.Mistake.last_wrong_at, models.Mistake.problem_id,
+        cursor=cursor, limit=limit, descending=True, scalars=False,
+    )
+    return rows, next_cursor, mistakes.build_facets(await db.execute(mistakes.facets_stmt(conditions)))
+
+
+async def set_mistake_mastered(db: AsyncSession, user_id: int, problem_id: int, mastered: bool):
+    """设置错题的掌握标记
+
+    参数：
+        db: 异步数据库会话
+        user_id: 用户ID
+        problem_id: 题目ID
+        mastered: 是否已掌握
+
+    返回：
+        更新后的错题行（字段同list_mistakes的结果行，含题目摘要），错题本中没有该题时返回None
+    """
+    row = await db.get(models.Mistake, (user_id, problem_id))
+    if row is None:
+        return None
+    mistakes.set_mastered(row, mastered, models.utcnow())
+    await db.commit()
+    return (await db.execute(mistakes.get_stmt(user_id, problem_id))).first()
+
+
+async def get_due_reviews(db: AsyncSession, user_id: int, limit: int = reviews.DEFAULT_LIMIT):
+    """查询用户到期需要复习的题目
+
+    读取复习状态表中该用户 due_at 不晚于当前时间的前limit行（见reviews模块），不扫描答题记录。
+
+    参数：
+        db: 异步数据库会话
+        user_id: 用户ID
+        limit: 返回条数
+
+    返回：
+        结果行列表（复习状态和题目摘要字段），按到期时间从早到晚排序
+    """
+    return (await db.execute(reviews.due_stmt(user_id, models.utcnow(), limit))).all()
+
+
+async def create_upload_session(db: AsyncSession, owner_id: int, session_in: schemas.UploadSessionCreate, ttl: datetime.timedelta):
+    """创建分片上传会话
+
+    参数：
+        db: 异步数据库会话
+        owner_id: 上传用户ID
+        session_in: 会话信息（文件名、MIME类型及题目元数据）
+        ttl: 会话有效期
+
+    返回：
+        创建后的UploadSession对象（parts为空列表）
+    """
+    meta = session_in.dict(exclude={"filename", "mime_type"})
+    now = models.utcnow()
+    s = models.UploadSession(
+        id=uuid4().hex,  # 随机会话ID，不可猜测
+        owner_id=owner_id,
+        filename=session_in.filename,
+        mime_type=session_in.mime_type,
+        problem_meta=meta,  # 题目元数据（JSON对象）
+        status="open",
+        created_at=now,
+        expires_at=now + ttl,
+        parts=[],
+    )
+    db.add(s)
+    await db.commit()
+    return s
+
+
+async def get_upload_session(db: AsyncSession, session_id: str):
+    """根据ID查询分片上传会话，同时加载已接收的分片
+
+    异步会话不支持访问时才懒加载关系，因此parts在查询时一并加载。
+
+    返回：
+        UploadSession对象，或None如果会话不存在
+    """
+    stmt = (
+        select(models.UploadSession)
+        .options(selectinload(models.UploadSession.parts))
+        .where(models.UploadSession.id == session_id)
+    )
+    return (await db.scalars(stmt)).first()
+
+
+async def save_upload_part(db: AsyncSession, session: models.UploadSession, part_number: int, size: int, sha256: str):
+    """记录已接收的分片（同编号分片重复上传时覆盖）
+
+    参数：
+        db: 异步数据库会话
+        session: 所属上传会话
+        part_number: 分片编号
+        size: 分片字节数
+        sha256: 分片SHA-256摘要
+
+    返回：
+        UploadPart对象
+    """
+    part = await db.get(models.UploadPart, (session.id, part_number))
+    if part is None:
+        part = models.UploadPart(session_id=session.id, part_number=part_number)
+    part.size = size
+    part.sha256 = sha256
+    part.uploaded_at = models.utcnow()
+    db.add(part)
+    await db.commit()
+    await db.refresh(part)
+    return part
+
+
+async def complete_upload_session(db: AsyncSession, session: models.UploadSession, problem_id: int):
+    """标记上传会话已完成，并删除分片记录
+
+    会话记录保留到过期，重复提交时直接返回已创建的题目。
+
+    参数：
+        db: 异步数据库会话
+        session: 上传会话（已加载parts，见get_upload_session）
+        problem_id: 创建的题目ID
+
+    返回：
+        更新后的UploadSession对象
+    """
+    session.status = "completed"
+    session.problem_id = problem_id
+    session.parts.clear()
+    await db.commit()
+    return session
+
+
+async def delete_upload_session(db: AsyncSession, session: models.UploadSession):
+    """删除上传会话及其分片记录
+
+    参数：
+        db: 异步数据库会话
+        session: 上传会话（已加载parts，见get_upload_session）
+    """
+    await db.delete(session)
+    await db.commit()
+
+
+async def delete_expired_upload_sessions(db: AsyncSession, now: datetime.datetime):
+    """删除所有已过期的上传会话（及其分片记录）
+
+    参数：
+        db: 异步数据库会话
+        now: 当前时间
+
+    返回：
+        被删除的会话ID列表（用于清理暂存文件）
+    """
+    expired = (await db.scalars(
+        select(models.UploadSession)
+        .options(selectinload(models.UploadSession.parts))
+        .where(models.UploadSession.expires_at < now)
+    )).all()
+    session_ids = [s.id for s in expired]
+    for s in expired:
+        await db.delete(s)
+    await db.commit()
+    return session_ids
@@ -0,0 +1,241 @@
+"""题目去重：精确重复与近似重复检测
+
+同一道教材习题会被大量用户重复上传。上传时为每道题目计算指纹，
+把内容相同或高度相似的题目归入同一个题目簇（models.ProblemCluster），
+下游的解析、求解结果可以按簇复用。
+
+指纹：
+- 精确指纹：规范化文本（NFKC、转小写、去掉空白和标点）的SHA-256；
+  上传文件的题目直接使用文件内容的SHA-256，不做近似检测
+- 近似指纹：规范化文本的字符3-gram集合的MinHash签名（NUM_PERM个32位最小哈希值），
+  按LSH分成LSH_BANDS段，每段哈希为一个64位的段键
+
+签名表（models.ProblemSignature）以64位整数为主键保存精确指纹键和各簇代表题目的段键，
+查找时一次 IN 查询取出所有命中的簇，再用簇的MinHash估计Jaccard相似度确认近似重复。
+签名表的大小与簇数成正比，每次查找是固定个数的主键点查，不随题目总数增长。
+
+该模块只构造SQL语句和计算指纹，assign_cluster可以在ORM会话或Core连接上执行（二者都支持execute）。
+"""
+
+import hashlib
+import struct
+import unicodedata
+from typing import NamedTuple, Optional, Tuple
+
+from sqlalchemy import insert, select, update
+
+import metrics
+import models
+import tags
+
+# 字符n-gram的长度
+SHINGLE_SIZE = 3
+
+# MinHash签名长度（每个值32位）；LSH分段数与每段行数，NUM_PERM = LSH_BANDS * LSH_ROWS
+NUM_PERM = 32
+LSH_BANDS = 8
+LSH_ROWS = 4
+
+# 估计的Jaccard相似度达到该值时视为近似重复
+# 相似度0.8的两道题至少有一段完全相同的概率约为98.5%（1 - (1 - 0.8^4)^8）
+NEAR_DUPLICATE_THRESHOLD = 0.8
+
+# 匹配类型
+MATCH_NEW = "new"
+MATCH_EXACT = "exact"
+MATCH_NEAR = "near"
+
+# 上传时的归簇结果计数
+matches_total = {
+    match: metrics.counter(f"problem_dedup_{match}_total", description)
+    for match, description in (
+        (MATCH_NEW, "创建新题目簇的上传数"),
+        (MATCH_EXACT, "精确重复（归入已有簇）的上传数"),
+        (MATCH_NEAR, "近似重复（归入已有簇）的上传数"),
+    )
+}
+
+# 每个blake2b摘要提供16个32位哈希值，NUM_PERM个哈希函数需要的摘要个数（用不同的person区分）
+_DIGESTS = NUM_PERM // 16
+_PERSONS = [f"sh-minhash-{i}".encode() for i in range(_DIGESTS)]
+_UNPACK = struct.Struct(f"<{NUM_PERM}I")
+
+
+class Fingerprint(NamedTuple):
+    """题目指纹
+
+    - content_hash: 规范化文本（或文件内容）的SHA-256十六进制字符串
+    - exact_key: 精确指纹在签名表中的键（content_hash前8字节的有符号64位整数）
+    - minhash: MinHash签名（NUM_PERM个整数），上传文件的题目为None
+    - band_keys: LSH段键列表
+    """
+    content_hash: str
+    exact_key: int
+    minhash: Optional[Tuple[int, ...]]
+    band_keys: Tuple[int, ...]
+
+    @property
+    def keys(self):
+        """查找时使用的全部签名键"""
+        return (self.exact_key,) + self.band_keys
+
+
+class ClusterMatch(NamedTuple):
+    """assign_cluster的结果：所属簇ID、匹配类型（new / exact / near）和估计的相似度"""
+    cluster_id: int
+    match: str
+    similarity: float
+
+
+def normalize_text(text: str) -> str:
+    """规范化题目文本：NFKC（全角转半角等）、转小写、去掉空白和标点符号"""
+    text = unicodedata.normalize("NFKC", text).lower()
+    return "".join(ch for ch in text if unicodedata.category(ch)[0] not in "PZC")
+
+
+def _to_int64(digest: bytes) -> int:
+    return int.from_bytes(digest[:8], "big", signed=True)
+
+
+def minhash(normalized: str) -> Tuple[int, ...]:
+    """计算规范化文本的MinHash签名（字符SHINGLE_SIZE-gram，文本更短时整体作为一个gram）"""
+    n = len(normalized)
+    shingles = {normalized[i:i + SHINGLE_SIZE] for i in range(max(1, n - SHINGLE_SIZE + 1))}
+    rows = []
+    for shingle in shingles:
+        data = shingle.encode("utf-8")
+        rows.append(_UNPACK.unpack(b"".join(
+            hashlib.blake2b(data, digest_size=64, person=person).digest() for person in _PERSONS
+        )))
+    # 每个哈希函数取所有gram中的最小值
+    return tuple(min(column) for column in zip(*rows))
+
+
+def band_keys(signature) -> Tuple[int, ...]:
+    """把MinHash签名按LSH分段，每段哈希为64位键（段号参与哈希，不同段的键互不冲突）"""
+    keys = []
+    for band in range(LSH_BANDS):
+        values = signature[band * LSH_ROWS:(band + 1) * LSH_ROWS]
+        data = struct.pack(f"<B{LSH_ROWS}I", band, *values)
+        keys.append(_to_int64(hashlib.blake2b(data, digest_size=8).digest()))
+    return tuple(keys)
+
+
+def similarity(a, b) -> float:
+    """两个MinHash签名估计的Jaccard相似度"""
+    return sum(x == y for x, y in zip(a, b)) / NUM_PERM
+
+
+def pack_minhash(signature) -> bytes:
+    return _UNPACK.pack(*signature)
+
+
+def unpack_minhash(data: bytes) -> Tuple[int, ...]:
+    return _UNPACK.unpack(data)
+
+
+def content_hash(raw: str) -> Optional[str]:
+    """规范化文本的SHA-256十六进制字符串，规范化后为空时返回None（求解结果缓存等也按它判断题目相同）"""
+    normalized = normalize_text(raw or "")
+    if not normalized:
+        return None
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def fingerprint(raw: str = None, file_sha256: str = None) -> Optional[Fingerprint]:
+    """计算题目指纹
+
+    参数：
+        raw: 题目原始文本
+        file_sha256: 上传文件的SHA-256（有文件时只按文件内容做精确去重）
+
+    返回：
+        Fingerprint，没有可用于去重的内容（空文本且无文件）时返回None
+    """
+    if file_sha256:
+        return Fingerprint(file_sha256, _to_int64(bytes.fromhex(file_sha256)), None, ())
+    text_hash = content_hash(raw)
+    if text_hash is None:
+        return None
+    signature = minhash(normalize_text(raw))
+    return Fingerprint(text_hash, _to_int64(bytes.fromhex(text_hash)), signature, band_keys(signature))
+
+
+def _insert_signatures_stmt(dialect_name: str, cluster_id: int, keys):
+    """写入签名键，已存在的 (signature, cluster_id) 被忽略"""
+    return tags.insert_ignore(dialect_name, models.ProblemSignature.__table__).values(
+        [{"signature": key, "cluster_id": cluster_id} for key in sorted(set(keys))]
+    )
+
+
+def find_cluster(executor, fp: Fingerprint) -> Optional[ClusterMatch]:
+    """按指纹查找已有的簇，没有匹配时返回None
+
+    精确指纹命中时直接返回；否则在段键命中的候选簇中取MinHash相似度最高、
+    且不低于NEAR_DUPLICATE_THRESHOLD的簇。
+    """
+    rows = executor.execute(
+        select(models.ProblemSignature.signature, models.ProblemSignature.cluster_id)
+        .where(models.ProblemSignature.signature.in_(fp.keys))
+    ).all()
+    if not rows:
+        return None
+    exact = [cluster_id for signature, cluster_id in rows if signature == fp.exact_key]
+    if exact:
+        return ClusterMatch(min(exact), MATCH_EXACT, 1.0)
+    if fp.minhash is None:
+        return None
+
+    candidates = {cluster_id for _, cluster_id in rows}
+    best = None
+    for cluster_id, packed in executor.execute(
+        select(models.ProblemCluster.id, models.ProblemCluster.minhash)
+        .where(models.ProblemCluster.id.in_(candidates), models.ProblemCluster.minhash.is_not(None))
+        .order_by(models.ProblemCluster.id)
+    ):
+        score = similarity(fp.minhash, unpack_minhash(packed))
+        # 相似度相同时取ID较小（较早创建）的簇
+        if score >= NEAR_DUPLICATE_THRESHOLD and (best is None or score > best.similarity):
+            best = ClusterMatch(cluster_id, MATCH_NEAR, score)
+    return best
+
+
+def assign_cluster(executor, dialect_name: str, problem_id: int, fp: Fingerprint) -> ClusterMatch:
+    """把题目归入已有的簇，或以该题为代表题目创建新簇（不提交事务，也不更新problems行）
+
+    - 精确重复：簇的成员数加一
+    - 近似重复：簇的成员数加一，并写入该题的精确指纹键，之后相同文本的上传直接精确命中
+    - 新簇：写入精确指纹键和LSH段键（只有代表题目的段键进入签名表）
+
+    参数：
+        executor: ORM会话或Core连接
+        dialect_name: 数据库方言名（sqlite / postgresql）
+        problem_id: 已有ID的题目
+        fp: 题目指纹
+
+    返回：
+        ClusterMatch
+    """
+    match = find_cluster(executor, fp)
+    if match is not None:
+        executor.execute(
+            update(models.ProblemCluster)
+            .where(models.ProblemCluster.id == match.cluster_id)
+            .values(member_count=models.ProblemCluster.member_count + 1)
+        )
+        if match.match == MATCH_NEAR:
+            executor.execute(_insert_signatures_stmt(dialect_name, match.cluster_id, [fp.exact_key]))
+        return match
+
+    cluster_id = executor.execute(
+        insert(models.ProblemCluster)
+        .values(
+            canonical_problem_id=problem_id,
+            content_hash=fp.content_hash,
+            minhash=pack_minhash(fp.minhash) if fp.minhash is not None else None,
+            member_count=1,
+        )
+        .returning(models.ProblemCluster.id)
+    ).scalar_one()
+    executor.execute(_insert_signatures_stmt(dialect_name, cluster_id, fp.keys))
+    return ClusterMatch(cluster_id, MATCH_NEW, 1.0)
@@ -0,0 +1,235 @@
+"""multipart/form-data请求体的流式解析
+
+题目上传接口不再由框架预先接收并缓存整个请求体，而是直接读取request.stream()：
+- 用python-multipart的推送式解析器边接收边解析
+- 文件部分的数据经有界队列交给在线程池中运行的BlobStore.put_stream，
+  计算摘要和写入临时文件与接收请求体同时进行（内存占用与文件大小无关）
+- 普通字段收集为字符串，单个字段有长度上限
+
+不带文件的application/x-www-form-urlencoded请求体同样支持（接收完后一次性解析）。
+"""
+
+import asyncio
+import mimetypes
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+from urllib.parse import parse_qsl
+
+import anyio.from_thread
+from python_multipart.multipart import MultipartParser, parse_options_header
+from python_multipart.exceptions import MultipartParseError
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+
+import blobstore
+
+# 普通（非文件）字段的最大字节数，与Starlette解析表单时的默认上限相同
+MAX_FIELD_SIZE = 1024 * 1024
+
+# 事件循环与写入线程之间最多缓冲的数据块数：磁盘写入跟不上时暂停读取请求体
+QUEUE_CHUNKS = 8
+
+
+class FormError(Exception):
+    """请求体不是有效的multipart/form-data，或字段不符合要求"""
+
+
+@dataclass
+class StreamedForm:
+    """流式解析得到的表单
+
+    字段：
+    - fields: 普通字段（字段名 -> 字符串值）
+    - filename: 上传文件的文件名（没有文件时为None）
+    - blob: 已写入Blob存储的文件信息（没有文件时为None）
+    """
+    fields: Dict[str, str] = field(default_factory=dict)
+    filename: Optional[str] = None
+    blob: Optional[blobstore.BlobInfo] = None
+
+
+class _Aborted(Exception):
+    """请求体接收中止时放入队列，使写入线程中的put_stream删除临时文件后退出"""
+
+
+class _BlobWriter:
+    """在线程池中运行put_stream，数据块经有界队列从事件循环交给写入线程"""
+
+    def __init__(self, store: blobstore.BlobStore, mime_type: Optional[str], max_size: int):
+        self._queue = asyncio.Queue(maxsize=QUEUE_CHUNKS)
+        self._task = asyncio.ensure_future(
+            run_in_threadpool(store.put_stream, self._chunks(), mime_type=mime_type, max_size=max_size)
+        )
+
+    def _chunks(self):
+        # 在写入线程中迭代：None表示文件结束，异常对象表示中止
+        while True:
+            item = anyio.from_thread.run(self._queue.get)
+            if item is None:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+
+    async def _put(self, item) -> None:
+        put = asyncio.ensure_future(self._queue.put(item))
+        await asyncio.wait({put, self._task}, return_when=asyncio.FIRST_COMPLETED)
+        if not put.done():
+            # 写入线程已提前结束（如超过大小上限），不会再从队列取数据
+            put.cancel()
+            self._task.result()
+
+    async def write(self, data: bytes) -> None:
+        await self._put(data)
+
+    async def close(self) -> blobstore.BlobInfo:
+        await self._put(None)
+        return await self._task
+
+    async def abort(self) -> None:
+        if not self._task.done():
+            try:
+                await self._put(_Aborted())
+            except Exception:
+                pass
+        try:
+            await self._task
+        except Exception:
+            pass
+
+
+def _decode(value: bytes) -> str:
+    try:
+        return value.decode("utf-8")
+    except UnicodeDecodeError:
+        raise FormError("表单字段必须是UTF-8编码")
+
+
+async def _receive_urlencoded(request: Request, max_field_size: int) -> StreamedForm:
+    body = bytearray()
+    async for chunk in request.stream():
+        body.extend(chunk)
+        if len(body) > max_field_size:
+            raise FormError(f"表单超过最大长度 {max_field_size} 字节")
+    try:
+        pairs = parse_qsl(body.decode("latin-1"), keep_blank_values=True, encoding="utf-8", errors="strict")
+    except UnicodeDecodeError:
+        raise FormError("表单字段必须是UTF-8编码")
+    return StreamedForm(fields=dict(pairs))
+
+
+async def receive_form(
+    request: Request,
+    file_field: str,
+    store: blobstore.BlobStore,
+    max_file_size: int,
+    max_field_size: int = MAX_FIELD_SIZE,
+) -> StreamedForm:
+    """边接收边解析multipart请求体，文件部分直接流式写入Blob存储
+
+    参数：
+        request: 当前请求（请求体尚未被读取），也可以是不带文件的urlencoded表单
+        file_field: 文件字段名（只接受一个文件；文件名为空的文件字段视为未上传）
+        store: 文件写入的Blob存储
+        max_file_size: 文件最大字节数
+        max_field_size: 普通字段最大字节数
+
+    返回：
+        StreamedForm
+
+    异常：
+        FormError: 请求体格式错误、字段过长或上传了多个文件
+        blobstore.BlobTooLarge: 文件超过max_file_size（超限后立即停止接收）
+        OSError: 写入Blob存储失败
+
+    说明：
+        文件的MIME类型优先使用该部分声明的Content-Type，否则按文件名推断。
+        接收过程中出错（包括客户端断开）时写入线程中的临时文件会被删除；
+        文件写完后其他字段校验失败时，已写入的Blob保留（内容寻址，重试时直接复用）。
+    """
+    content_type, params = parse_options_header(request.headers.get("content-type", ""))
+    if content_type == b"application/x-www-form-urlencoded":
+        return await _receive_urlencoded(request, max_field_size)
+    boundary = params.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise FormError("请求体必须是multipart/form-data或application/x-www-form-urlencoded")
+
+    # 解析器的回调是同步的：先记录事件，每次写入数据后再在协程中处理
+    events = []
+    parser = MultipartParser(boundary, callbacks={
+        "on_part_begin": lambda: events.append(("part_begin", b"")),
+        "on_header_field": lambda data, start, end: events.append(("header_field", data[start:end])),
+        "on_header_value": lambda data, start, end: events.append(("header_value", data[start:end])),
+        "on_header_end": lambda: events.append(("header_end", b"")),
+        "on_headers_finished": lambda: events.append(("headers_finished", b"")),
+        "on_part_data": lambda data, start, end: events.append(("part_data", data[start:end])),
+        "on_part_end": lambda: events.append(("part_end", b"")),
+    })
+
+    form = StreamedForm()
+    header_field = header_value = b""
+    headers = {}
+    name = None
+    value = bytearray()
+    writer = None
+    in_file = skip = False
+
+    async def handle(kind: str, data: bytes):
+        nonlocal header_field, header_value, headers, name, value, writer, in_file, skip
+        if kind == "part_begin":
+            header_field = header_value = b""
+            headers = {}
+            value = bytearray()
+        elif kind == "header_field":
+            header_field += data
+        elif kind == "header_value":
+            header_value += data
+        elif kind == "header_end":
+            headers[header_field.lower()] = header_value
+            header_field = header_value = b""
+        elif kind == "headers_finished":
+            disposition, options = parse_options_header(headers.get(b"content-disposition", b""))
+            if disposition != b"form-data" or b"name" not in options:
+                raise FormError("表单部分缺少Content-Disposition的name参数")
+            name = _decode(options[b"name"])
+            filename = options.get(b"filename")
+            in_file = filename is not None
+            skip = in_file and (name != file_field or not filename)
+            if in_file and not skip:
+                if form.filename is not None:
+                    raise FormError("只能上传一个文件")
+                form.filename = _decode(filename)
+                part_type = headers.get(b"content-type")
+                mime_type = _decode(part_type) if part_type else mimetypes.guess_type(form.filename)[0]
+                writer = _BlobWriter(store, mime_type, max_file_size)
+        elif kind == "part_data":
+            if not in_file:
+                value.extend(data)
+                if len(value) > max_field_size:
+                    raise FormError(f"表单字段{name}超过最大长度 {max_field_size} 字节")
+            elif not skip:
+                await writer.write(data)
+        elif kind == "part_end":
+            if not in_file:
+                form.fields[name] = _decode(bytes(value))
+            elif not skip:
+                form.blob = await writer.close()
+                writer = None
+
+    try:
+        async for chunk in request.stream():
+            try:
+                parser.write(chunk)
+            except MultipartParseError as e:
+                raise FormError(f"请求体格式错误: {e}")
+            for kind, data in events:
+                await handle(kind, data)
+            events.clear()
+        parser.finalize()
+        if writer is not None:
+            raise FormError("请求体不完整")
+    except BaseException:
+        if writer is not None:
+            await writer.abort()
+        raise
+    return form
@@ -0,0 +1,83 @@
+"""密码哈希进程池模块
+
+PBKDF2每次计算需要数十毫秒CPU。在请求线程中同步计算时，
+上课开始时的集中登录会占满线程池并争抢GIL，拖慢所有其他接口。
+
+该模块把crud.get_password_hash / crud.verify_password放到独立的进程池中执行：
+- 进程数即并发上限（STUDY_HELPER_HASH_WORKERS，默认min(4, CPU核数)）
+- 排队任务数超过上限（STUDY_HELPER_HASH_MAX_QUEUE，默认1000）时直接拒绝，
+  由接口返回503，避免积压无限增长
+- 队列深度通过metrics导出（password_hash_queue_depth）
+"""
+
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import crud
+import metrics
+
+# 哈希进程数：即同时进行的哈希计算上限
+HASH_WORKERS = int(os.environ.get("STUDY_HELPER_HASH_WORKERS", min(4, os.cpu_count() or 1)))
+
+# 允许排队（含正在计算）的最大任务数
+HASH_MAX_QUEUE = int(os.environ.get("STUDY_HELPER_HASH_MAX_QUEUE", 1000))
+
+# 队列深度：已提交但尚未完成的哈希任务数
+queue_depth = metrics.gauge("password_hash_queue_depth", "排队和计算中的密码哈希任务数")
+
+# 因队列已满被拒绝的任务数
+rejected = metrics.counter("password_hash_rejected_total", "因队列已满被拒绝的密码哈希任务数")
+
+_executor = None
+
+
+class HashQueueFull(Exception):
+    """密码哈希队列已满，调用方应稍后重试"""
+
+
+def get_executor() -> ProcessPoolExecutor:
+    """获取（首次调用时创建）哈希进程池"""
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=HASH_WORKERS)
+    return _executor
+
+
+def shutdown() -> None:
+    """关闭哈希进程池：取消排队中的任务并等待子进程退出"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True, cancel_futures=True)
+        _executor = None
+
+
+async def _run(fn, *args):
+    """在进程池中执行fn，并维护队列深度"""
+    if queue_depth.value >= HASH_MAX_QUEUE:
+        rejected.inc()
+        raise HashQueueFull()
+    queue_depth.inc()
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(get_executor(), fn, *args)
+    finally:
+        queue_depth.dec()
+
+
+async def hash_password(password: str) -> str:
+    """在进程池中计算密码哈希（见crud.get_password_hash）
+
+    异常：
+        HashQueueFull: 排队任务过多
+    """
+    return await _run(crud.get_password_hash, password)
+
+
+async def verify_password(plain: str, hashed: str) -> bool:
+    """在进程池中验证密码（见crud.verify_password）
+
+    异常：
+        HashQueueFull: 排队任务过多
+    """
+    return await _run(crud.verify_password, plain, hashed)
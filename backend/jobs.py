@@ -0,0 +1,502 @@
+"""异步任务队列模块
+
+求解（以及之后的OCR、生成题目等）耗时较长，请求中只把任务写入jobs表（models.Job）并立即返回任务ID，
+由工作者按优先级领取执行，客户端通过 GET /jobs/{id} 轮询或订阅 GET /jobs/{id}/events（SSE）获取结果。
+
+- 队列：jobs表本身。任务按 priority DESC, id 的顺序领取；领取是一条 UPDATE ... RETURNING，
+  PostgreSQL上用 FOR UPDATE SKIP LOCKED 避免多个工作者抢同一行，SQLite上由写锁保证互斥。
+  多个API进程、独立的工作进程共享同一个队列，不依赖Redis等外部服务
+- 工作者：WorkerPool在事件循环中运行WORKERS个协程，同步的求解调用放到线程中执行；
+  应用启动时在API进程内启动，也可以单独运行 python jobs.py（此时API进程可设置 STUDY_HELPER_JOB_WORKERS=0）
+- 超时：任务执行超过JOB_TIMEOUT秒视为失败（线程中的同步调用无法强行中止，只是不再等待其结果）
+- 重试：失败后未达到max_attempts时重新排队，按RETRY_BACKOFF * 2^(attempts-1)秒推迟执行
+- 租约：领取时设置租约到期时间，工作进程异常退出后任务在租约到期时重新排队
+- 优先级：PRIORITIES中的通道，数值大的先执行（严格优先，低优先级任务在高优先级任务排空后执行）
+- 单飞：提交时带flight_key的任务（如求解同一道题）通过job_flights锁表合并，同一时间只有一个任务执行，
+  其他相同任务处于waiting状态，执行的任务完成时随之完成（成功或失败）；进程内还用cache.SingleFlight
+  合并同时进行的相同求解调用
+
+同一进程内的工作者在任务完成时通知等待结果的SSE连接，跨进程时SSE按POLL_INTERVAL轮询数据库。
+"""
+
+import asyncio
+import contextlib
+import datetime
+import logging
+import os
+import socket
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Awaitable, Callable, Dict, Optional
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import cache
+import metrics
+import models
+import solve_cache
+import solver
+
+logger = logging.getLogger(__name__)
+
+# 任务类型
+KIND_SOLVE = "solve"
+
+# 任务状态
+STATUS_QUEUED = "queued"
+STATUS_WAITING = "waiting"
+STATUS_RUNNING = "running"
+STATUS_SUCCEEDED = "succeeded"
+STATUS_FAILED = "failed"
+FINISHED_STATUSES = (STATUS_SUCCEEDED, STATUS_FAILED)
+
+# 优先级通道：通道名 -> priority
+PRIORITIES = {"high": 20, "normal": 10, "low": 0}
+DEFAULT_PRIORITY = "normal"
+
+# 每个进程的工作者数，0表示不在该进程中执行任务
+WORKERS = int(os.environ.get("STUDY_HELPER_JOB_WORKERS", 2))
+
+# 单次执行的超时时间（秒）
+JOB_TIMEOUT = float(os.environ.get("STUDY_HELPER_JOB_TIMEOUT", 120))
+
+# 最多执行次数与重试退避基数（秒）
+MAX_ATTEMPTS = int(os.environ.get("STUDY_HELPER_JOB_MAX_ATTEMPTS", 3))
+RETRY_BACKOFF = float(os.environ.get("STUDY_HELPER_JOB_RETRY_BACKOFF", 2))
+
+# 空闲工作者和SSE轮询数据库的间隔（秒）
+POLL_INTERVAL = float(os.environ.get("STUDY_HELPER_JOB_POLL_INTERVAL", 1))
+
+# 租约比超时多出的宽限时间，超过租约仍未完成的任务被认为工作者已退出
+LEASE_GRACE = datetime.timedelta(seconds=30)
+
+# 单飞锁的有效期：覆盖任务所有重试的最长执行时间，执行任务丢失时过期的锁可以被新任务接管
+FLIGHT_TTL = (datetime.timedelta(seconds=JOB_TIMEOUT) + LEASE_GRACE) * MAX_ATTEMPTS + datetime.timedelta(
+    seconds=RETRY_BACKOFF * 2 ** MAX_ATTEMPTS
+)
+
+# 已完成任务的保留时间，过期的任务在提交新任务时清理
+RETENTION = datetime.timedelta(days=int(os.environ.get("STUDY_HELPER_JOB_RETENTION_DAYS", 7)))
+
+enqueued_total = metrics.counter("jobs_enqueued_total", "提交的任务数")
+succeeded_total = metrics.counter("jobs_succeeded_total", "成功完成的任务数")
+failed_total = metrics.counter("jobs_failed_total", "达到最多执行次数后最终失败的任务数")
+retried_total = metrics.counter("jobs_retried_total", "失败后重新排队的次数")
+timeouts_total = metrics.counter("jobs_timeouts_total", "执行超时的次数")
+running = metrics.gauge("jobs_running", "本进程中正在执行的任务数")
+coalesced_total = metrics.counter("jobs_coalesced_total", "合并到进行中的相同任务、不单独执行的任务数")
+solve_shared_total = metrics.counter("solve_inflight_shared_total", "进程内合并到同时进行的相同求解调用的次数")
+
+# 进程内同时进行的求解调用（按求解结果缓存键合并）
+solve_inflight = cache.SingleFlight()
+
+# 任务类型 -> 处理函数 async (db, payload) -> 可保存为JSON的结果
+handlers: Dict[str, Callable[[AsyncSession, dict], Awaitable[dict]]] = {}
+
+# 等待任务状态变化的事件：任务ID -> [asyncio.Event, 等待中的连接数]（只在本进程内有效）
+# 最后一个等待者离开时移除条目，超时返回的等待不会留下条目
+_watchers: Dict[int, list] = {}
+
+# 本进程中运行的工作者池
+_pool: Optional["WorkerPool"] = None
+
+# SQLite上提交任务的写锁：事件循环 -> asyncio.Lock
+# SQLite同一时间只允许一个写事务，本进程内同时提交的任务先在事件循环中排队，
+# 不在各自的连接上按busy_timeout轮询写锁（大量并发提交时轮询的连接可能一直抢不到锁，报database is locked）
+_sqlite_write_locks: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock]" = weakref.WeakKeyDictionary()
+
+# 执行同步调用（求解器等）的线程池，线程数与工作者数相同
+# （asyncio默认线程池只有 min(32, CPU核数+4) 个线程，工作者较多时会限制并发）
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def handler(kind: str):
+    """注册任务类型的处理函数（装饰器）"""
+    def register(func):
+        handlers[kind] = func
+        return func
+    return register
+
+
+def _notify(job_id: int) -> None:
+    """通知本进程中等待该任务的连接"""
+    watcher = _watchers.pop(job_id, None)
+    if watcher is not None:
+        watcher[0].set()
+
+
+async def wait_for_change(job_id: int, timeout: float) -> None:
+    """等待任务状态变化（本进程的工作者通知）或超时，之后由调用方重新查询数据库"""
+    watcher = _watchers.get(job_id)
+    if watcher is None:
+        watcher = _watchers[job_id] = [asyncio.Event(), 0]
+    watcher[1] += 1
+    try:
+        await asyncio.wait_for(watcher[0].wait(), timeout)
+    except asyncio.TimeoutError:
+        pass
+    finally:
+        watcher[1] -= 1
+        # 已被_notify取出的条目不再在字典中（之后的等待者会创建新条目）
+        if watcher[1] == 0 and _watchers.get(job_id) is watcher:
+            del _watchers[job_id]
+
+
+def _write_lock(db: AsyncSession):
+    """提交任务的写事务使用的锁：SQLite上为当前事件循环的进程内锁，其他数据库不加锁"""
+    if db.get_bind().dialect.name != "sqlite":
+        return contextlib.nullcontext()
+    loop = asyncio.get_running_loop()
+    lock = _sqlite_write_locks.get(loop)
+    if lock is None:
+        lock = _sqlite_write_locks[loop] = asyncio.Lock()
+    return lock
+
+
+async def enqueue(
+    db: AsyncSession,
+    kind: str,
+    payload: dict,
+    owner_id: int = None,
+    priority: str = DEFAULT_PRIORITY,
+    result: dict = None,
+    flight_key: str = None,
+) -> models.Job:
+    """提交任务（提交事务），并清理保留期之前完成的任务
+
+    带flight_key时，如果已有相同key的任务在排队或执行，新任务不进入队列，
+    而是以waiting状态等待该任务完成（见_join_flight）。
+    SQLite上本进程内的提交依次执行写事务（见_write_lock）。
+
+    参数：
+        db: 异步数据库会话
+        kind: 任务类型（须已注册处理函数）
+        payload: 任务参数（可保存为JSON）
+        owner_id: 提交任务的用户ID
+        priority: 优先级通道（PRIORITIES的键）
+        result: 已有结果（如命中求解结果缓存）时直接记为成功的任务，不进入队列
+        flight_key: 任务输入的标识，相同标识的任务合并执行
+
+    返回：
+        Job对象
+    """
+    now = models.utcnow()
+    job = models.Job(
+        kind=kind,
+        owner_id=owner_id,
+        priority=PRIORITIES[priority],
+        payload=payload,
+        max_attempts=MAX_ATTEMPTS,
+        run_after=now,
+        created_at=now,
+    )
+    if result is not None:
+        job.status, job.result, job.finished_at = STATUS_SUCCEEDED, result, now
+    else:
+        job.status = STATUS_QUEUED
+    async with _write_lock(db):
+        db.add(job)
+        if result is None and flight_key is not None:
+            await db.flush()
+            leader_id = await _join_flight(db, flight_key, job.id, now)
+            if leader_id != job.id:
+                job.status, job.leader_job_id = STATUS_WAITING, leader_id
+                coalesced_total.inc()
+        await db.execute(
+            delete(models.Job).where(models.Job.status.in_(FINISHED_STATUSES), models.Job.finished_at < now - RETENTION)
+        )
+        await db.commit()
+    enqueued_total.inc()
+    if job.status == STATUS_QUEUED and _pool is not None:
+        _pool.wakeup()
+    return job
+
+
+def _acquire_flight_stmt(dialect_name: str, key: str, job_id: int, now: datetime.datetime):
+    """写入单飞锁：key不存在或已过期时由job_id持有，否则不变"""
+    values = {"key": key, "job_id": job_id, "expires_at": now + FLIGHT_TTL}
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        return insert(models.JobFlight).values(**values)
+    stmt = dialect_insert(models.JobFlight).values(**values)
+    return stmt.on_conflict_do_update(
+        index_elements=["key"],
+        set_={"job_id": stmt.excluded.job_id, "expires_at": stmt.excluded.expires_at},
+        where=models.JobFlight.expires_at < now,
+    )
+
+
+async def _join_flight(db: AsyncSession, key: str, job_id: int, now: datetime.datetime) -> int:
+    """获取或加入单飞锁，返回执行该输入的任务ID（等于job_id表示由本任务执行）
+
+    PostgreSQL上以共享锁读取锁行并持有到事务提交：执行的任务完成时删除锁行会等待本事务提交，
+    之后更新等待中的任务时能看到本任务，不会漏掉。SQLite的写事务本身互斥。
+    """
+    await db.execute(_acquire_flight_stmt(db.get_bind().dialect.name, key, job_id, now))
+    return (await db.execute(
+        select(models.JobFlight.job_id).where(models.JobFlight.key == key).with_for_update(read=True)
+    )).scalar_one()
+
+
+async def get_job(db: AsyncSession, job_id: int) -> Optional[models.Job]:
+    """查询任务的最新状态（不使用会话中缓存的对象）"""
+    return (await db.execute(
+        select(models.Job).where(models.Job.id == job_id).execution_options(populate_existing=True)
+    )).scalar_one_or_none()
+
+
+def _claim_stmt(now: datetime.datetime, worker_id: str):
+    """领取一个可执行的任务：状态改为running、执行次数加一并设置租约，返回任务行"""
+    candidate = (
+        select(models.Job.id)
+        .where(models.Job.status == STATUS_QUEUED, models.Job.run_after <= now)
+        .order_by(models.Job.priority.desc(), models.Job.id)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    return (
+        update(models.Job)
+        .where(models.Job.id == candidate, models.Job.status == STATUS_QUEUED)
+        .values(
+            status=STATUS_RUNNING,
+            attempts=models.Job.attempts + 1,
+            started_at=now,
+            lease_expires_at=now + datetime.timedelta(seconds=JOB_TIMEOUT) + LEASE_GRACE,
+            worker_id=worker_id,
+        )
+        .returning(models.Job.id, models.Job.kind, models.Job.payload, models.Job.attempts, models.Job.max_attempts)
+    )
+
+
+def _requeue_expired_stmt(now: datetime.datetime):
+    """把租约已到期（工作者已退出）的任务重新排队"""
+    return (
+        update(models.Job)
+        .where(models.Job.status == STATUS_RUNNING, models.Job.lease_expires_at < now)
+        .values(status=STATUS_QUEUED, run_after=now, lease_expires_at=None, worker_id=None, error="租约到期，重新排队")
+    )
+
+
+def _release_orphans_stmt(now: datetime.datetime):
+    """等待的任务已不存在或已结束（如被清理）时，把等待中的任务改为自己排队执行"""
+    leader = models.Job.__table__.alias("leader")
+    active = select(leader.c.id).where(
+        leader.c.id == models.Job.leader_job_id,
+        leader.c.status.in_((STATUS_QUEUED, STATUS_RUNNING)),
+    )
+    return (
+        update(models.Job)
+        .where(models.Job.status == STATUS_WAITING, ~active.exists())
+        .values(status=STATUS_QUEUED, run_after=now, leader_job_id=None)
+    )
+
+
+class WorkerPool:
+    """在当前事件循环中运行的任务工作者
+
+    参数：
+        session_factory: 异步会话工厂（如database.AsyncSessionLocal）
+        workers: 工作者协程数
+    """
+
+    def __init__(self, session_factory, workers: int = WORKERS):
+        self.session_factory = session_factory
+        self.workers = workers
+        self._tasks = []
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._last_reap = None
+        self._prefix = f"{socket.gethostname()}-{os.getpid()}"
+
+    def start(self) -> None:
+        self._tasks = [asyncio.create_task(self._run(i)) for i in range(self.workers)]
+
+    async def stop(self) -> None:
+        """停止工作者；执行中的任务被取消，租约到期后由其他工作者重新执行"""
+        self._stopping = True
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def wakeup(self) -> None:
+        """有新任务时唤醒空闲的工作者"""
+        self._wakeup.set()
+
+    async def _run(self, index: int) -> None:
+        worker_id = f"{self._prefix}-{index}"
+        while not self._stopping:
+            # 先清除唤醒标志再领取，领取之后提交的任务不会错过唤醒
+            self._wakeup.clear()
+            try:
+                claimed = await self._claim(worker_id)
+            except Exception:
+                logger.exception("领取任务失败")
+                claimed = None
+            if claimed is None:
+                # 没有可执行的任务：等待唤醒或轮询间隔（其他进程提交的任务、到期的重试）
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._execute(claimed)
+
+    async def _claim(self, worker_id: str):
+        now = models.utcnow()
+        async with self.session_factory() as db:
+            if self._last_reap is None or now - self._last_reap > LEASE_GRACE:
+                self._last_reap = now
+                await db.execute(_requeue_expired_stmt(now))
+                await db.execute(_release_orphans_stmt(now))
+            row = (await db.execute(_claim_stmt(now, worker_id))).first()
+            await db.commit()
+        if row is not None:
+            _notify(row.id)
+        return row
+
+    async def _execute(self, job) -> None:
+        running.inc()
+        try:
+            func = handlers.get(job.kind)
+            if func is None:
+                raise LookupError(f"未注册的任务类型: {job.kind}")
+            async with self.session_factory() as db:
+                result = await asyncio.wait_for(func(db, job.payload or {}), JOB_TIMEOUT)
+        except asyncio.TimeoutError:
+            timeouts_total.inc()
+            await self._fail(job, f"执行超过{JOB_TIMEOUT:g}秒")
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logger.exception("任务%s执行失败", job.id)
+            await self._fail(job, f"{type(exc).__name__}: {exc}")
+        else:
+            await self._finish(job.id, status=STATUS_SUCCEEDED, result=result, error=None)
+            succeeded_total.inc()
+        finally:
+            running.dec()
+
+    async def _fail(self, job, error: str) -> None:
+        if job.attempts < job.max_attempts:
+            delay = datetime.timedelta(seconds=RETRY_BACKOFF * 2 ** (job.attempts - 1))
+            await self._update(job.id, status=STATUS_QUEUED, error=error,
+                               run_after=models.utcnow() + delay)
+            retried_total.inc()
+        else:
+            await self._finish(job.id, status=STATUS_FAILED, error=error)
+            failed_total.inc()
+
+    async def _finish(self, job_id: int, **values) -> None:
+        """任务完成：释放单飞锁，等待该任务的相同任务以同样的状态和结果完成"""
+        values["finished_at"] = models.utcnow()
+        async with self.session_factory() as db:
+            # 先删除锁行（PostgreSQL上等待正在加入的事务提交），之后加入的相同任务会重新执行
+            await db.execute(delete(models.JobFlight).where(models.JobFlight.job_id == job_id))
+            await db.execute(
+                update(models.Job)
+                .where(models.Job.id == job_id, models.Job.status == STATUS_RUNNING)
+                .values(lease_expires_at=None, worker_id=None, **values)
+            )
+            followers = (await db.execute(
+                update(models.Job)
+                .where(models.Job.leader_job_id == job_id, models.Job.status == STATUS_WAITING)
+                .values(**values)
+                .returning(models.Job.id)
+            )).scalars().all()
+            await db.commit()
+        for follower_id in [job_id, *followers]:
+            _notify(follower_id)
+
+    async def _update(self, job_id: int, **values) -> None:
+        async with self.session_factory() as db:
+            await db.execute(
+                update(models.Job)
+                .where(models.Job.id == job_id, models.Job.status == STATUS_RUNNING)
+                .values(lease_expires_at=None, worker_id=None, **values)
+            )
+            await db.commit()
+        _notify(job_id)
+
+
+def start(session_factory, workers: int = WORKERS) -> Optional[WorkerPool]:
+    """在当前事件循环中启动本进程的工作者池（workers为0时不启动）"""
+    global _pool, _executor
+    if workers <= 0:
+        return None
+    _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+    _pool = WorkerPool(session_factory, workers)
+    _pool.start()
+    return _pool
+
+
+async def stop() -> None:
+    """停止本进程的工作者池"""
+    global _pool, _executor
+    if _pool is not None:
+        await _pool.stop()
+        _pool = None
+    if _executor is not None:
+        _executor.shutdown(wait=False)
+        _executor = None
+
+
+def run_blocking(func, *args):
+    """在工作者的线程池中执行同步调用（未启动工作者池时使用事件循环的默认线程池）"""
+    return asyncio.get_running_loop().run_in_executor(_executor, func, *args)
+
+
+# ==================== 任务处理函数 ====================
+
+@handler(KIND_SOLVE)
+async def run_solve(db: AsyncSession, payload: dict) -> dict:
+    """求解任务：调用求解器（在工作者线程池中执行）并写入求解结果缓存
+
+    参数payload：raw（题目文本）、mode（求解模式）
+    返回：SolveResult字段的字典
+    """
+    raw, mode = payload.get("raw"), payload["mode"]
+    key = solve_cache.solve_key(raw, mode)
+    if key is None:
+        result = await run_blocking(solver.solve, raw, mode)
+        entry = solve_cache.CachedSolve(result, models.utcnow(), None)
+        return solve_cache.to_response(entry, solver.solver_version(mode))
+
+    # 排队期间其他任务可能已经求解了同一道题（提交时已计入未命中，这里不重复统计）
+    entry = await solve_cache.lookup(db, key, record=False)
+    if entry is not None:
+        return solve_cache.to_response(entry._replace(source=None), key.solver_version)
+
+    # 本进程中同时求解同一道题的任务共享一次求解器调用（包括超时后重试时仍在线程中运行的上一次调用）；
+    # 发起调用的任务可能已超时取消，因此每个任务都写入缓存（写入是幂等的覆盖）
+    result, shared = await solve_inflight.do(key, lambda: run_blocking(solver.solve, raw, mode))
+    if shared:
+        solve_shared_total.inc()
+    entry = await solve_cache.store(db, key, result)
+    return solve_cache.to_response(entry, key.solver_version)
+
+
+async def _main() -> None:
+    """独立的工作进程：在本进程中执行任务，直到被中断"""
+    import database
+
+    pool = start(database.AsyncSessionLocal, max(WORKERS, 1))
+    logger.info("已启动%d个任务工作者", pool.workers)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await stop()
+        await database.async_engine.dispose()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(_main())
+    except KeyboardInterrupt:
+        pass
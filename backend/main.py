@@ -9,20 +9,41 @@
 - 管理员功能（用户管理、禁用用户）
 """
 
-from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File, Form
-from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
+from fastapi import FastAPI, Depends, HTTPException, status, Request, Response, Query
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.encoders import jsonable_encoder
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+from pydantic import ValidationError
 import database
 import models
-import crud
+import crud_async
 import schemas
+import blobstore
+import formstream
+import uploads
+import pagination
+import cache
+import hashing
+import metrics
+import tags
+import serialization
+import search
+import solver
+import rollups
+import recommend
+import reviews
+import solve_cache
+import jobs
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
+from contextlib import asynccontextmanager
 from typing import List
 import os
 import json
-import base64
+import mimetypes
 
 # ==================== 安全配置 ====================
 
@@ -36,17 +57,108 @@ ALGORITHM = "HS256"
 # 访问令牌过期时间：7天（单位：分钟）
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7
 
+# SSE连接无事件时发送保活注释的间隔（秒）
+SSE_KEEPALIVE = 15
+
 # ==================== 应用初始化 ====================
 
 # 初始化数据库（创建所有表）
 database.init_db()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """应用生命周期：启动时启动任务工作者；退出时停止工作者，关闭密码哈希进程池（避免遗留子进程）和异步数据库引擎"""
+    jobs.start(database.AsyncSessionLocal)
+    yield
+    await jobs.stop()
+    hashing.shutdown()
+    await database.async_engine.dispose()
+
+
 # 创建FastAPI应用实例
-app = FastAPI(title="Study Helper Backend")
+app = FastAPI(title="Study Helper Backend", lifespan=lifespan)
 
 # OAuth2认证方案：从请求头Authorization中提取Bearer token
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/login")
 
+# 上传请求中表单字段（题目文本、标签、备注等）允许占用的额外字节数
+UPLOAD_FORM_OVERHEAD = 64 * 1024
+
+# 题目上传接口的请求体说明：接口自行流式解析请求体，表单字段不再声明为参数，在OpenAPI文档中单独描述
+UPLOAD_FORM_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "properties": {
+                        "raw": {"type": "string"},
+                        "file": {"type": "string", "format": "binary"},
+                        "source_type": {"type": "string", "default": "text"},
+                        "subject": {"type": "string"},
+                        "course": {"type": "string"},
+                        "problem_type": {"type": "string"},
+                        "knowledge_tags": {"type": "string", "description": "JSON数组，如[\"函数\", \"微积分\"]"},
+                        "difficulty": {"type": "integer", "minimum": 1, "maximum": 5},
+                        "tags": {"type": "string", "description": "JSON数组，如[\"难题\", \"易错\"]"},
+                        "notes": {"type": "string"},
+                    },
+                }
+            }
+        },
+    }
+}
+
+
+class UploadSizeLimitMiddleware:
+    """在接收请求体的过程中限制上传请求的大小（ASGI中间件）
+    
+    上传接口边接收边解析请求体，文件部分的大小由Blob存储的max_size限制；
+    该中间件限制整个请求体（文件加上表单字段）的大小：
+    - 声明了Content-Length且超限时，不读取请求体直接返回413
+    - 未声明Content-Length的请求（分块传输）累计已接收的字节数，超限时立即中止接收并返回413
+    """
+    
+    def __init__(self, app, path: str, max_bytes: int):
+        self.app = app
+        self.path = path
+        self.max_bytes = max_bytes
+    
+    def _too_large(self):
+        return HTTPException(status_code=413, detail=f"文件超过最大限制 {blobstore.MAX_UPLOAD_SIZE} 字节")
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] != self.path:
+            await self.app(scope, receive, send)
+            return
+        
+        length = dict(scope["headers"]).get(b"content-length")
+        if length and length.isdigit() and int(length) > self.max_bytes:
+            error = self._too_large()
+            await JSONResponse(status_code=error.status_code, content={"detail": error.detail})(scope, receive, send)
+            return
+        
+        received = 0
+        
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # 解析请求体时抛出的HTTPException由FastAPI原样返回
+                    raise self._too_large()
+            return message
+        
+        await self.app(scope, limited_receive, send)
+
+
+app.add_middleware(
+    UploadSizeLimitMiddleware, path="/problems/upload", max_bytes=blobstore.MAX_UPLOAD_SIZE + UPLOAD_FORM_OVERHEAD
+)
+
 
 # ==================== 依赖函数 ====================
 
@@ -68,6 +180,16 @@ def get_db():
         db.close()
 
 
+async def get_async_db():
+    """获取异步数据库会话（依赖注入）
+    
+    与get_db相同，但返回AsyncSession，供async路由配合crud_async使用。
+    数据库IO在事件循环中等待，不占用线程池中的线程。
+    """
+    async with database.AsyncSessionLocal() as db:
+        yield db
+
+
 def create_access_token(data: dict, expires_delta: timedelta = None):
     """创建JWT访问令牌
     
@@ -90,9 +212,9 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     
     # 计算令牌过期时间
     if expires_delta:
-        expire = datetime.utcnow() + expires_delta
+        expire = models.utcnow() + expires_delta
     else:
-        expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+        expire = models.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     
     # 添加exp（expiration）字段
     to_encode.update({"exp": expire})
@@ -102,7 +224,7 @@ def create_access_token(data: dict, expires_delta: timedelta = None):
     return encoded_jwt
 
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
     """获取当前请求用户（验证JWT）
     
     从请求头的Authorization: Bearer <token>中提取令牌，
@@ -113,15 +235,15 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
         db: 数据库会话（用于查询用户）
         
     返回：
-        User对象（当前请求的用户）
+        cache.UserSnapshot（当前请求用户的不可变快照）
         
     异常：
-        HTTPException (401): 令牌无效或过期
+        HTTPException (401): 令牌无效或过期，或用户已被禁用
         
     验证过程：
         1. 检查token格式和签名
         2. 解码token获取username
-        3. 从数据库查询用户
+        3. 先查进程内用户缓存，未命中时再从数据库查询并写入缓存
         4. 确保用户存在且激活
     """
     # 认证失败时返回的异常
@@ -142,9 +264,17 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
         # JWT解码或验证失败（签名错误、过期等）
         raise credentials_exception
     
-    # 从数据库查询用户
-    user = crud.get_user_by_username(db, username=username)
+    # 优先使用缓存的用户快照，避免每个请求都查询数据库
+    user = cache.user_cache.get(username)
     if user is None:
+        db_user = await crud_async.get_user_by_username(db, username=username)
+        if db_user is None:
+            raise credentials_exception
+        user = cache.UserSnapshot.from_user(db_user)
+        cache.user_cache.set(username, user)
+    
+    # 已被禁用的用户不能继续使用已签发的令牌
+    if not user.is_active:
         raise credentials_exception
     
     return user
@@ -152,8 +282,17 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
 
 # ==================== API路由 ====================
 
+def _hash_queue_full():
+    """密码哈希队列已满时返回的异常"""
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="服务繁忙，请稍后重试",
+        headers={"Retry-After": "1"},
+    )
+
+
 @app.post("/register", response_model=schemas.UserOut)
-def register(user_in: schemas.UserCreate, db: Session = Depends(get_db)):
+async def register(user_in: schemas.UserCreate, db: AsyncSession = Depends(get_async_db)):
     """注册新用户
     
     创建新的用户账户。
@@ -173,22 +312,32 @@ def register(user_in: schemas.UserCreate, db: Session = Depends(get_db)):
             \"nickname\": \"John Doe\"
         }
         
+    说明：
+        密码哈希在独立的进程池中计算（见hashing模块），不占用请求线程
+        
     状态码：
         200: 注册成功
         400: 用户名已存在
+        503: 密码哈希队列已满，稍后重试
     """
     # 检查用户名是否已被注册
-    existing = crud.get_user_by_username(db, user_in.username)
+    existing = await crud_async.get_user_by_username(db, user_in.username)
     if existing:
         raise HTTPException(status_code=400, detail="Username already registered")
     
+    # 在哈希进程池中计算密码哈希
+    try:
+        hashed_password = await hashing.hash_password(user_in.password)
+    except hashing.HashQueueFull:
+        raise _hash_queue_full()
+    
     # 创建新用户
-    user = crud.create_user(db, user_in)
+    user = await crud_async.create_user(db, user_in, hashed_password)
     return user
 
 
 @app.post("/login", response_model=schemas.Token)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
     """用户登录
     
     验证用户名密码并返回JWT访问令牌。
@@ -207,14 +356,25 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depend
         将access_token放在后续请求的Authorization header中：
         Authorization: Bearer <access_token>
         
+    说明：
+        密码验证在独立的进程池中执行（见hashing模块），
+        集中登录时不会拖慢其他接口
+        
     状态码：
         200: 登录成功
         400: 用户名或密码错误
+        503: 密码哈希队列已满，稍后重试
     """
-    # 验证用户名和密码
-    user = crud.authenticate_user(db, form_data.username, form_data.password)
+    # 验证用户名和密码（与crud.authenticate_user相同，但密码验证放到进程池中）
+    user = await crud_async.get_user_by_username(db, form_data.username)
     if not user:
         raise HTTPException(status_code=400, detail="Incorrect username or password")
+    try:
+        password_ok = await hashing.verify_password(form_data.password, user.hashed_password)
+    except hashing.HashQueueFull:
+        raise _hash_queue_full()
+    if not password_ok:
+        raise HTTPException(status_code=400, detail="Incorrect username or password")
     
     # 生成JWT令牌
     access_token = create_access_token(data={"sub": user.username})
@@ -222,7 +382,7 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depend
 
 
 @app.get("/users/me", response_model=schemas.UserOut)
-def read_users_me(current_user=Depends(get_current_user)):
+async def read_users_me(current_user=Depends(get_current_user)):
     """获取当前登录用户信息
     
     返回当前JWT令牌对应的用户信息。
@@ -245,19 +405,10 @@ def read_users_me(current_user=Depends(get_current_user)):
     return current_user
 
 
-@app.post("/problems/upload", response_model=schemas.ProblemOut)
-def upload_problem(
-    raw: str = Form(None),
-    file: UploadFile = File(None),
-    source_type: str = Form("text"),
-    subject: str = Form(None),
-    course: str = Form(None),
-    problem_type: str = Form(None),
-    knowledge_tags: str = Form(None),  # JSON格式的字符串，如'["函数", "微积分"]'
-    difficulty: int = Form(None),
-    tags: str = Form(None),  # JSON格式的字符串，如'["难题", "易错"]'
-    notes: str = Form(None),
-    db: Session = Depends(get_db),
+@app.post("/problems/upload", response_model=schemas.ProblemOut, openapi_extra=UPLOAD_FORM_OPENAPI)
+async def upload_problem(
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
     current_user=Depends(get_current_user),
 ):
     """上传学习题目
@@ -283,7 +434,9 @@ def upload_problem(
         - id: 题目ID
         - owner_id: 所有者ID
         - source_type: 题目来源类型
-        - file_content: Base64编码的文件内容（如果上传了文件）
+        - file_sha256: 文件SHA-256摘要（如果上传了文件）
+        - file_size: 文件字节数
+        - mime_type: 文件MIME类型
         - subject: 学科
         - course: 课程
         - problem_type: 题型
@@ -298,41 +451,62 @@ def upload_problem(
     说明：
         - 题目自动关联到当前登录用户
         - 所有元数据字段均为可选，以支持渐进式填充
-        - 上传的文件会被编码为Base64格式存储在数据库中
+        - 请求体由本接口边接收边解析（见formstream模块），文件部分直接流式写入Blob存储：
+          计算摘要和写入与接收同时进行，内存占用与文件大小无关，阻塞的文件IO在线程池中执行；
+          数据库只记录摘要、大小和类型
+        - 较大的文件（多页PDF、多张照片）建议使用分片上传接口（POST /uploads），可断点续传
+        - 文件大小上限由环境变量STUDY_HELPER_MAX_UPLOAD_BYTES配置（默认20MB），
+          超限的请求在接收请求体的过程中即被拒绝（413），不会先接收完整个文件
+        - 文件内容通过 GET /problems/{problem_id}/file 下载
         
     状态码：
         200: 上传成功
         400: 缺少必填参数或参数格式错误
         401: 无效或过期的令牌
+        413: 文件超过大小限制
+        422: 字段值不符合要求（如难度不是1-5的整数）
     """
+    try:
+        form = await formstream.receive_form(
+            request, "file", blobstore.get_blob_store(), max_file_size=blobstore.MAX_UPLOAD_SIZE
+        )
+    except formstream.FormError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except blobstore.BlobTooLarge as e:
+        raise HTTPException(
+            status_code=413,
+            detail=str(e)
+        )
+    except OSError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"无法读取文件: {str(e)}"
+        )
+    # 与Form参数相同：空字符串视为未提供
+    fields = {k: v for k, v in form.fields.items() if v != ""}
+    raw = fields.get("raw")
+    
     # 验证至少提供了题目内容（文本或文件之一）
-    if not raw and not file:
+    if not raw and not form.blob:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="必须提供题目内容（raw文本或file文件）"
         )
     
-    # 构建要存储的题目内容和Base64编码的文件
-    file_content_base64 = None
-    if file:
-        raw_store = f"FILE:{file.filename}"  # 标记为文件来源
-        # 读取文件内容并编码为Base64
-        try:
-            file_bytes = file.file.read()
-            file_content_base64 = base64.b64encode(file_bytes).decode('utf-8')
-        except Exception as e:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"无法读取文件: {str(e)}"
-            )
+    # 构建要存储的题目内容
+    if form.blob:
+        raw_store = f"FILE:{form.filename}"  # 标记为文件来源
     else:
         raw_store = raw  # 文本来源
     
     # 解析JSON格式的标签字段
     knowledge_tags_list = None
-    if knowledge_tags:
+    if fields.get("knowledge_tags"):
         try:
-            knowledge_tags_list = json.loads(knowledge_tags)
+            knowledge_tags_list = json.loads(fields["knowledge_tags"])
         except json.JSONDecodeError:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -340,9 +514,9 @@ def upload_problem(
             )
     
     tags_list = None
-    if tags:
+    if fields.get("tags"):
         try:
-            tags_list = json.loads(tags)
+            tags_list = json.loads(fields["tags"])
         except json.JSONDecodeError:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -350,28 +524,334 @@ def upload_problem(
             )
     
     # 创建问题记录
-    problem_in = schemas.ProblemCreate(
-        source_type=source_type,
-        raw=raw_store,
-        file_content=file_content_base64,
-        subject=subject,
-        course=course,
-        problem_type=problem_type,
-        knowledge_tags=knowledge_tags_list,
-        difficulty=difficulty,
-        tags=tags_list,
-        notes=notes,
-    )
-    p = crud.create_problem(db, owner_id=current_user.id, problem_in=problem_in)
+    try:
+        problem_in = schemas.ProblemCreate(
+            source_type=fields.get("source_type", "text"),
+            raw=raw_store,
+            subject=fields.get("subject"),
+            course=fields.get("course"),
+            problem_type=fields.get("problem_type"),
+            knowledge_tags=knowledge_tags_list,
+            difficulty=fields.get("difficulty"),
+            tags=tags_list,
+            notes=fields.get("notes"),
+        )
+    except ValidationError as e:
+        raise RequestValidationError(e.errors())
+    p = await crud_async.create_problem(db, owner_id=current_user.id, problem_in=problem_in, blob=form.blob)
     
     # 返回创建的题目完整信息，包括解析后的tags和knowledge_tags列表
     return schemas.ProblemOut.from_orm(p)
 
 
+# ==================== 分片上传（断点续传） ====================
+
+async def _get_owned_upload_session(db: AsyncSession, session_id: str, current_user):
+    """查询当前用户的上传会话（同时加载分片），不存在或已过期时返回404"""
+    return _ensure_owned_upload_session(await crud_async.get_upload_session(db, session_id), current_user)
+
+
+def _ensure_owned_upload_session(session, current_user):
+    """检查上传会话存在、属于当前用户且未过期，否则返回404"""
+    if (
+        not session
+        or session.owner_id != current_user.id
+        or session.expires_at < models.utcnow()
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="上传会话不存在或已过期"
+        )
+    return session
+
+
+def _upload_session_out(session: models.UploadSession) -> schemas.UploadSessionOut:
+    """把UploadSession转换为响应模型（附带已接收字节数）"""
+    return schemas.UploadSessionOut(
+        id=session.id,
+        filename=session.filename,
+        mime_type=session.mime_type,
+        status=session.status,
+        parts=[schemas.UploadPartOut.from_orm(part) for part in session.parts],
+        received_bytes=sum(part.size for part in session.parts),
+        max_part_size=uploads.MAX_PART_SIZE,
+        expires_at=session.expires_at,
+        problem_id=session.problem_id,
+    )
+
+
+@app.post("/uploads", response_model=schemas.UploadSessionOut)
+async def create_upload_session(
+    session_in: schemas.UploadSessionCreate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user=Depends(get_current_user),
+):
+    """创建分片上传会话
+    
+    大文件（多页PDF、多张照片等）在不稳定的网络下上传时，
+    先创建会话，再逐个上传编号分片，最后提交会话创建题目。
+    中途断线只需重传失败的分片。
+    
+    请求体：
+        {
+            \"filename\": \"期中试卷.pdf\",
+            \"mime_type\": \"application/pdf\",
+            \"subject\": \"数学\",
+            \"knowledge_tags\": [\"导数\"]
+        }
+        
+    响应：
+        会话信息，包含会话ID、单个分片最大字节数和过期时间
+        
+    说明：
+        - 创建会话时会顺带回收已过期的会话及其暂存分片
+        
+    状态码：
+        200: 创建成功
+        401: 无效或过期的令牌
+    """
+    # 回收过期会话（按expires_at索引查询，开销很小）
+    await uploads.collect_expired_sessions(db)
+    
+    if not session_in.mime_type:
+        session_in.mime_type = mimetypes.guess_type(session_in.filename)[0]
+    session = await crud_async.create_upload_session(db, current_user.id, session_in, ttl=uploads.SESSION_TTL)
+    return _upload_session_out(session)
+
+
+@app.get("/uploads/{session_id}", response_model=schemas.UploadSessionOut)
+async def get_upload_session(
+    session_id: str,
+    db: AsyncSession = Depends(get_async_db),
+    current_user=Depends(get_current_user),
+):
+    """查询分片上传会话
+    
+    客户端断线重连后调用，根据返回的已上传分片列表只补传缺失的分片。
+    
+    状态码：
+        200: 查询成功
+        401: 无效或过期的令牌
+        404: 会话不存在或已过期
+    """
+    session = await _get_owned_upload_session(db, session_id, current_user)
+    return _upload_session_out(session)
+
+
+@app.put("/uploads/{session_id}/parts/{part_number}", response_model=schemas.UploadPartOut)
+async def upload_part(
+    session_id: str,
+    part_number: int,
+    request: Request,
+    db: AsyncSession = Depends(get_async_db),
+    current_user=Depends(get_current_user),
+):
+    """上传一个编号分片
+    
+    请求体为分片的原始二进制内容（不使用form-data）。
+    同一编号可以重复上传，新分片校验通过后覆盖旧分片。
+    
+    请求头：
+        X-Part-SHA256: 分片内容的SHA-256十六进制摘要（必填）
+        
+    响应：
+        {
+            \"part_number\": 1,
+            \"size\": 8388608,
+            \"sha256\": \"...\"
+        }
+        
+    状态码：
+        200: 上传成功
+        400: 分片编号无效、缺少校验和或校验和不匹配
+        401: 无效或过期的令牌
+        404: 会话不存在或已过期
+        409: 会话已提交
+        413: 分片或文件总大小超过限制
+    """
+    session = _ensure_owned_upload_session(
+        await crud_async.get_upload_session(db, session_id), current_user
+    )
+    if session.status != "open":
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="上传会话已提交")
+    if part_number < 1 or part_number > uploads.MAX_PARTS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"分片编号必须在1到{uploads.MAX_PARTS}之间"
+        )
+    expected_sha256 = request.headers.get("x-part-sha256")
+    if not expected_sha256:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="缺少X-Part-SHA256请求头")
+    
+    # 文件总大小限制：其他分片已占用的字节数 + 本分片不能超过上限
+    other_bytes = sum(p.size for p in session.parts if p.part_number != part_number)
+    max_size = min(uploads.MAX_PART_SIZE, uploads.MAX_TOTAL_SIZE - other_bytes)
+    length = request.headers.get("content-length")
+    if length and length.isdigit() and int(length) > max_size:
+        raise HTTPException(status_code=413, detail=f"分片超过最大限制 {max_size} 字节")
+    
+    try:
+        size, sha256 = await uploads.write_part(
+            session.id, part_number, request.stream(), expected_sha256, max_size=max_size
+        )
+    except blobstore.BlobTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except uploads.PartChecksumMismatch as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    return await crud_async.save_upload_part(db, session, part_number, size, sha256)
+
+
+@app.post("/uploads/{session_id}/complete", response_model=schemas.ProblemOut)
+async def complete_upload_session(
+    session_id: str,
+    complete_in: schemas.UploadComplete = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user=Depends(get_current_user),
+):
+    """提交分片上传会话并创建题目
+    
+    按编号顺序流式拼接所有分片写入Blob存储，然后创建题目。
+    分片编号必须从1开始连续。重复提交已完成的会话会直接返回已创建的题目。
+    
+    请求体（可选）：
+        {
+            \"parts\": [{\"part_number\": 1, \"sha256\": \"...\"}, ...]
+        }
+        提供时逐一核对分片编号和SHA-256，防止提交不完整的文件。
+        
+    响应：
+        创建的题目对象（与 /problems/upload 相同）
+        
+    状态码：
+        200: 提交成功
+        400: 分片不连续或与客户端声明不一致
+        401: 无效或过期的令牌
+        404: 会话不存在或已过期
+        413: 文件总大小超过限制
+    """
+    session = await _get_owned_upload_session(db, session_id, current_user)
+    
+    # 已提交过：幂等返回已创建的题目
+    if session.status == "completed":
+        return schemas.ProblemOut.from_orm(await crud_async.get_problem(db, session.problem_id))
+    
+    parts = list(session.parts)
+    part_numbers = [p.part_number for p in parts]
+    if not parts or part_numbers != list(range(1, len(parts) + 1)):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="分片编号必须从1开始连续"
+        )
+    if complete_in and complete_in.parts is not None:
+        declared = {p.part_number: p.sha256.lower() for p in complete_in.parts}
+        received = {p.part_number: p.sha256 for p in parts}
+        if declared != received:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="分片列表与服务端已接收的分片不一致"
+            )
+    
+    meta = session.problem_meta or {}
+    problem_in = schemas.ProblemCreate(raw=f"FILE:{session.filename}", **meta)
+    # 按编号拼接分片写入Blob存储（阻塞的文件IO在线程池中执行）
+    try:
+        blob = await run_in_threadpool(
+            blobstore.get_blob_store().put_stream,
+            uploads.iter_assembled(session.id, part_numbers),
+            mime_type=session.mime_type,
+            max_size=uploads.MAX_TOTAL_SIZE,
+        )
+    except blobstore.BlobTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    p = await crud_async.create_problem(db, owner_id=current_user.id, problem_in=problem_in, blob=blob)
+    
+    await crud_async.complete_upload_session(db, session, p.id)
+    await run_in_threadpool(uploads.remove_session_files, session.id)
+    return schemas.ProblemOut.from_orm(p)
+
+
+@app.delete("/uploads/{session_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def abort_upload_session(
+    session_id: str,
+    db: AsyncSession = Depends(get_async_db),
+    current_user=Depends(get_current_user),
+):
+    """放弃分片上传会话
+    
+    删除会话记录和所有暂存分片。
+    
+    状态码：
+        204: 删除成功
+        401: 无效或过期的令牌
+        404: 会话不存在或已过期
+    """
+    session = await _get_owned_upload_session(db, session_id, current_user)
+    await crud_async.delete_upload_session(db, session)
+    await run_in_threadpool(uploads.remove_session_files, session_id)
+
+
+@app.get("/problems/search", response_model=List[schemas.ProblemSearchHit])
+async def search_problems(
+    q: str,
+    limit: int = 20,
+    offset: int = 0,
+    db: AsyncSession = Depends(get_async_db),
+    current_user=Depends(get_current_user),
+):
+    """全文检索题目
+    
+    在当前用户题目的原始内容（raw）、解析结果（parsed）和笔记（notes）中检索，
+    结果按相关度从高到低排序，每项带有包含查询词的原文片段。
+    
+    查询参数：
+        q: 查询文本，多个查询词用空格分隔，须全部命中，如 \"积分 e^x\"
+            中文按连续子串匹配（\"定积分\"可以命中\"求定积分\"）
+        limit: 返回条数（默认20，最大100）
+        offset: 跳过的条数（用于翻页，最大1000）
+        
+    响应：
+        检索结果列表，每项包含题目基本信息、score、field、snippet和highlights
+        
+    说明：
+        - 检索使用全文索引（SQLite FTS5 / PostgreSQL tsvector + GIN），不扫描题目表
+        - 单个汉字按前缀匹配，只能命中其后还有汉字的位置
+        - 结果按相关度排序，不支持游标分页；翻页时相关度的计算与第一页相同
+        
+    状态码：
+        200: 检索成功（没有有效查询词时返回空列表）
+        400: limit或offset超出范围
+        401: 无效或过期的令牌
+    """
+    if not 1 <= limit <= search.MAX_LIMIT or not 0 <= offset <= search.MAX_OFFSET:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"limit须在1到{search.MAX_LIMIT}之间，offset须在0到{search.MAX_OFFSET}之间"
+        )
+    rows, terms = await crud_async.search_problems(db, current_user.id, q, limit=limit, offset=offset)
+    hits = []
+    for row in rows:
+        field, snippet, highlights = search.make_snippet(row, terms)
+        hits.append(schemas.ProblemSearchHit(
+            id=row.id,
+            subject=row.subject,
+            course=row.course,
+            problem_type=row.problem_type,
+            knowledge_tags=row.knowledge_tags,
+            difficulty=row.difficulty,
+            created_at=row.created_at,
+            score=row.score,
+            field=field,
+            snippet=snippet,
+            highlights=highlights,
+        ))
+    return hits
+
+
 @app.get("/problems/{problem_id}", response_model=schemas.ProblemOut)
-def get_problem(
+async def get_problem(
     problem_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user=Depends(get_current_user),
 ):
     """获取题目详情
@@ -389,7 +869,7 @@ def get_problem(
         401: 无效或过期的令牌
         404: 题目不存在
     """
-    p = crud.get_problem(db, problem_id)
+    p = await crud_async.get_problem(db, problem_id)
     if not p:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -404,11 +884,75 @@ def get_problem(
     return schemas.ProblemOut.from_orm(p)
 
 
+@app.get("/problems/{problem_id}/file")
+async def download_problem_file(
+    problem_id: int,
+    db: AsyncSession = Depends(get_async_db),
+    current_user=Depends(get_current_user),
+):
+    """下载题目附带的文件
+    
+    从Blob存储中流式读取题目上传时附带的图片/PDF等文件。
+    
+    路径参数：
+        problem_id: 题目ID
+        
+    响应：
+        文件二进制内容，Content-Type为上传时记录的MIME类型，
+        ETag为文件的SHA-256摘要（内容不可变，可被客户端长期缓存）
+        
+    状态码：
+        200: 获取成功
+        401: 无效或过期的令牌
+        403: 无权访问此题目
+        404: 题目不存在或题目没有附带文件
+        
+    说明：
+        文件块由同步迭代器读取，StreamingResponse会在线程池中迭代，不阻塞事件循环
+    """
+    p = await crud_async.get_problem(db, problem_id)
+    if not p:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="题目不存在"
+        )
+    # 验证当前用户是否有权查看此题目
+    if p.owner_id and p.owner_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="无权访问此题目"
+        )
+    if not p.file_sha256:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="题目没有附带文件"
+        )
+    
+    try:
+        chunks = blobstore.get_blob_store().iter_chunks(p.file_sha256)
+    except blobstore.BlobNotFound:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="文件不存在"
+        )
+    headers = {
+        "ETag": f'"{p.file_sha256}"',
+        "Cache-Control": "private, max-age=31536000, immutable",
+    }
+    if p.file_size is not None:
+        headers["Content-Length"] = str(p.file_size)
+    return StreamingResponse(
+        chunks,
+        media_type=p.mime_type or blobstore.DEFAULT_MIME_TYPE,
+        headers=headers,
+    )
+
+
 @app.patch("/problems/{problem_id}", response_model=schemas.ProblemOut)
-def update_problem(
+async def update_problem(
     problem_id: int,
     problem_in: schemas.ProblemUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user=Depends(get_current_user),
 ):
     """更新题目元数据
@@ -442,7 +986,7 @@ def update_problem(
         403: 无权更新此题目
         404: 题目不存在
     """
-    p = crud.get_problem(db, problem_id)
+    p = await crud_async.get_problem(db, problem_id)
     if not p:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -457,100 +1001,411 @@ def update_problem(
         )
     
     # 更新题目
-    p = crud.update_problem(db, problem_id, problem_in)
+    p = await crud_async.update_problem(db, problem_id, problem_in)
     return schemas.ProblemOut.from_orm(p)
 
 
-@app.get("/problems", response_model=List[schemas.ProblemOut])
-def list_problems(
+@app.get(
+    "/problems",
+    response_model=List[schemas.ProblemSummary],
+    response_model_exclude_unset=True,
+)
+async def list_problems(
     subject: str = None,
     course: str = None,
     bookmarked_only: bool = False,
-    db: Session = Depends(get_db),
+    tag: List[str] = Query(None),
+    knowledge_tag: List[str] = Query(None),
+    tag_match: str = tags.TAG_MATCH_ALL,
+    fields: str = None,
+    limit: int = pagination.DEFAULT_PAGE_SIZE,
+    cursor: str = None,
+    db: AsyncSession = Depends(get_async_db),
     current_user=Depends(get_current_user),
 ):
     """查询用户的题目列表
     
-    按条件查询当前用户上传的题目。
+    按条件查询当前用户上传的题目，返回轻量的题目摘要。
+    结果按创建时间从新到旧排序，使用游标分页。
     
     查询参数：
         subject: 按学科筛选（可选）
         course: 按课程筛选（可选）
         bookmarked_only: 仅返回已收藏的题目（可选，默认false）
+        tag: 按用户标签筛选（可选，可重复），如 ?tag=易错&tag=难题
+        knowledge_tag: 按知识点标签筛选（可选，可重复），如 ?knowledge_tag=导数
+        tag_match: 多个标签的组合方式（默认\"all\"）
+            all: 包含全部标签（AND），any: 包含任一标签（OR）
+            tag和knowledge_tag中的标签一起参与组合
+        fields: 逗号分隔的返回字段（可选），如\"id,subject,notes\"
+            不提供时返回摘要字段，不包含raw、parsed、notes
+            可选字段见schemas.PROBLEM_LIST_FIELDS，id总是返回
+        limit: 每页条数（默认50，最大200）
+        cursor: 上一页响应头X-Next-Cursor中的游标（可选，不提供表示第一页）
         
     响应：
-        返回符合条件的题目列表
+        返回符合条件的题目摘要列表，每项只包含请求的字段
+        还有下一页时，响应头X-Next-Cursor包含下一页游标
         
     说明：
         - 用户只能查看自己上传的题目
         - 支持多条件组合查询
+        - 只从数据库读取请求的列，列表查询不会读取附件和大文本字段
+        - 标签筛选通过规范化的标签关联表（problem_tags）按索引查找
+        - 响应由serialization模块直接从结果行构造并编码，大页面不逐行做模型验证
+        - 题目完整信息通过 GET /problems/{problem_id} 获取
         
     状态码：
         200: 查询成功
+        400: fields中包含未知字段、tag_match无效或游标无效
         401: 无效或过期的令牌
     """
-    query = db.query(models.Problem).filter(models.Problem.owner_id == current_user.id)
+    if tag_match not in tags.TAG_MATCH_MODES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"tag_match必须是: {', '.join(tags.TAG_MATCH_MODES)}"
+        )
     
-    if subject:
-        query = query.filter(models.Problem.subject == subject)
-    if course:
-        query = query.filter(models.Problem.course == course)
-    if bookmarked_only:
-        query = query.filter(models.Problem.is_bookmarked == True)
+    if fields:
+        selected = ["id"] + [f.strip() for f in fields.split(",") if f.strip() and f.strip() != "id"]
+        unknown = [f for f in selected if f not in schemas.PROBLEM_LIST_FIELDS]
+        if unknown:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"未知字段: {', '.join(unknown)}"
+            )
+    else:
+        selected = list(schemas.PROBLEM_SUMMARY_FIELDS)
+    
+    try:
+        rows, next_cursor = await crud_async.list_problems(
+            db,
+            owner_id=current_user.id,
+            subject=subject,
+            course=course,
+            bookmarked_only=bookmarked_only,
+            fields=selected,
+            limit=limit,
+            cursor=cursor,
+            knowledge_tags=knowledge_tag,
+            user_tags=tag,
+            tag_match=tag_match,
+        )
+    except pagination.InvalidCursor:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="无效的分页游标")
     
-    problems = query.all()
-    return [schemas.ProblemOut.from_orm(p) for p in problems]
+    # 直接从结果行构造响应并用orjson编码，不逐行经过ProblemSummary验证
+    # （response_model仅用于生成API文档）
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return serialization.JSONBytesResponse(serialization.problem_rows_to_dicts(rows, selected), headers=headers)
+
+
+def _sse(event: str, data) -> str:
+    """编码一条Server-Sent Events消息（data为JSON）"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
 
+async def _solve_input(db: AsyncSession, req: schemas.SolveRequest, current_user):
+    """解析求解请求，返回 (题目文本, 求解模式)
 
-@app.post("/solve", response_model=schemas.SolveResult)
-def solve(req: schemas.SolveRequest, db: Session = Depends(get_db), current_user=Depends(get_current_user)):
-    """求解题目
+    模式不支持或没有题目内容时返回400，problem_id是其他用户的题目时返回403。
+    """
+    mode = req.mode or "structured"
+    if mode not in solver.MODES:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="不支持的求解模式")
     
-    调用AI模型求解题目，返回思路、步骤和答案。
+    # 获取题目内容：可以是problem_id对应的题目，或直接提交的raw文本
+    raw = req.raw
+    if req.problem_id:
+        problem = await crud_async.get_problem(db, req.problem_id)
+        if problem:
+            # 验证当前用户是否有权查看此题目（求解结果会写入任务和共享的求解缓存）
+            if problem.owner_id and problem.owner_id != current_user.id:
+                raise HTTPException(
+                    status_code=status.HTTP_403_FORBIDDEN,
+                    detail="无权访问此题目"
+                )
+            raw = problem.raw
+    if not raw:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="需要提供problem_id或raw")
+    return raw, mode
+
+
+@app.post("/solve", response_model=schemas.JobOut, status_code=status.HTTP_202_ACCEPTED)
+async def solve(
+    req: schemas.SolveRequest,
+    response: Response,
+    db: AsyncSession = Depends(get_async_db),
+    current_user=Depends(get_current_user),
+):
+    """提交求解任务
+    
+    把求解作为异步任务提交到任务队列（见jobs模块），立即返回任务ID，
+    不在请求中等待求解完成。通过 GET /jobs/{id} 轮询或 GET /jobs/{id}/events（SSE）获取结果。
     
     请求体：
         {
             \"problem_id\": 1,  // 已上传题目ID（可选）
             \"raw\": \"2+2=?\",   /// 直接输入的题目（可选）
-            \"mode\": \"structured\"
+            \"mode\": \"structured\",
+            \"priority\": \"normal\"
         }
         
     响应：
         {
-            \"thoughts\": \"先把题目读清楚，然后分步求解。\",
-            \"steps\": [\"分析已知条件\", \"列出解题思路\", \"计算并得到结果\"],
-            \"answer\": \"4\"
+            \"id\": 12,
+            \"kind\": \"solve\",
+            \"status\": \"queued\",
+            \"priority\": 10,
+            \"attempts\": 0,
+            \"max_attempts\": 3,
+            \"result\": null,
+            \"created_at\": \"2024-01-15T10:30:45.123456\"
         }
         
     说明：
-        - 当前实现为占位符，返回模拟数据
-        - 未来将集成AI求解引擎
+        - 当前求解器为占位符，返回模拟数据（见solver模块）
+        - 命中求解结果缓存（见solve_cache模块）时直接返回已成功的任务（200），
+          result中cached/cache_source表示命中来源；否则任务进入队列（202）
+        - 同一道题已有排队或执行中的求解任务时，新任务的状态为\"waiting\"，
+          不重复调用求解器，随该任务一起完成
+        - 任务结果result为SolveResult的字段
         
     状态码：
-        200: 求解成功
+        200: 命中缓存，任务已完成
+        202: 任务已进入队列
+        400: 不支持的求解模式或优先级，或没有提供题目内容
         401: 无效或过期的令牌
+        403: 无权访问此题目（其他用户的题目）
     """
-    # 获取题目内容：可以是problem_id对应的题目，或直接提交的raw文本
-    if req.problem_id:
-        problem = crud.get_problem(db, req.problem_id)
-        raw = problem.raw if problem else req.raw
-    else:
-        raw = req.raw
+    raw, mode = await _solve_input(db, req, current_user)
+    priority = req.priority or jobs.DEFAULT_PRIORITY
+    if priority not in jobs.PRIORITIES:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="不支持的任务优先级")
+    
+    result = None
+    key = solve_cache.solve_key(raw, mode)
+    if key is not None:
+        entry = await solve_cache.lookup(db, key)
+        if entry is not None:
+            result = solve_cache.to_response(entry, key.solver_version)
+            response.status_code = status.HTTP_200_OK
+    
+    # 同一道题同时只执行一个求解任务，其他请求的任务等待它完成（单飞）
+    job = await jobs.enqueue(
+        db, jobs.KIND_SOLVE, {"raw": raw, "mode": mode}, owner_id=current_user.id, priority=priority, result=result,
+        flight_key=solve_cache.flight_key(key) if key is not None else None,
+    )
+    return schemas.JobOut.from_orm(job)
+
+
+@app.post("/solve/stream")
+async def solve_stream(req: schemas.SolveRequest, db: AsyncSession = Depends(get_async_db), current_user=Depends(get_current_user)):
+    """流式求解题目（Server-Sent Events）
     
-    # 调用AI求解（当前为占位符）
-    # TODO: 集成真实的AI求解模型
-    thoughts = "先把题目读清楚，然后分步求解。"
-    steps = ["分析已知条件", "列出解题思路", "计算并得到结果"]
-    answer = "42（占位答案）"
+    在请求中直接调用求解后端，按 思路 → 步骤 → 答案 的顺序边生成边推送，
+    客户端不必等到全部生成完才看到第一个字。请求体与 POST /solve 相同（忽略priority）。
     
-    return {"thoughts": thoughts, "steps": steps, "answer": answer}
+    事件：
+        event: delta
+        data: {\"section\": \"thoughts\", \"index\": null, \"text\": \"先\"}
+        
+        event: delta
+        data: {\"section\": \"steps\", \"index\": 0, \"text\": \"整理\"}
+        
+        event: result
+        data: {SolveResult，含cached/cache_source等字段}
+        
+    说明：
+        - delta的text追加到对应部分（steps为第index个步骤）已有的文本之后
+        - 最后推送完整的result事件后关闭连接；求解出错时推送error事件
+        - 命中求解结果缓存时每个部分（步骤）作为一个delta立即推送；
+          未命中时生成完成后写入缓存，之后的 POST /solve 也能命中
+        
+    状态码：
+        200: 开始推送
+        400: 不支持的求解模式，或没有提供题目内容
+        401: 无效或过期的令牌
+        403: 无权访问此题目（其他用户的题目）
+    """
+    raw, mode = await _solve_input(db, req, current_user)
+    key = solve_cache.solve_key(raw, mode)
+    entry = await solve_cache.lookup(db, key) if key is not None else None
+    
+    async def events():
+        if entry is not None:
+            for delta in solver.split_result(entry.result):
+                yield _sse("delta", delta._asdict())
+            yield _sse("result", solve_cache.to_response(entry, key.solver_version))
+            return
+        
+        # 同步的后端生成器在线程池中逐个取增量，不阻塞事件循环
+        deltas = []
+        try:
+            async for delta in iterate_in_threadpool(solver.stream(raw, mode)):
+                deltas.append(delta)
+                yield _sse("delta", delta._asdict())
+        except Exception as exc:
+            yield _sse("error", {"detail": f"{type(exc).__name__}: {exc}"})
+            return
+        result = solver.collect(deltas)
+        if key is None:
+            done = solve_cache.CachedSolve(result, models.utcnow(), None)
+            yield _sse("result", solve_cache.to_response(done, solver.solver_version(mode)))
+        else:
+            done = await solve_cache.store(db, key, result)
+            yield _sse("result", solve_cache.to_response(done, key.solver_version))
+    
+    return StreamingResponse(
+        events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+async def _get_own_job(db: AsyncSession, job_id: int, current_user) -> models.Job:
+    """查询当前用户的任务，不存在或不属于当前用户时返回404"""
+    job = await jobs.get_job(db, job_id)
+    if not job or job.owner_id != current_user.id:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="任务不存在")
+    return job
+
+
+@app.get("/jobs/{job_id}", response_model=schemas.JobOut)
+async def get_job(job_id: int, db: AsyncSession = Depends(get_async_db), current_user=Depends(get_current_user)):
+    """查询任务状态和结果（轮询）
+    
+    参数：
+        job_id: 任务ID
+        
+    响应：
+        JobOut，status为\"succeeded\"时result中为求解结果，为\"failed\"时error中为失败原因
+        
+    状态码：
+        200: 成功
+        401: 无效或过期的令牌
+        404: 任务不存在或不属于当前用户
+    """
+    return schemas.JobOut.from_orm(await _get_own_job(db, job_id, current_user))
+
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: int, db: AsyncSession = Depends(get_async_db), current_user=Depends(get_current_user)):
+    """订阅任务状态（Server-Sent Events）
+    
+    任务状态每次变化时推送一个 \"job\" 事件，data为JobOut的JSON；
+    任务完成（succeeded或failed）后推送最后一个事件并关闭连接。
+    长时间没有变化时发送注释行保持连接。
+    
+    事件示例：
+        event: job
+        data: {\"id\": 12, \"status\": \"succeeded\", \"result\": {...}, ...}
+        
+    状态码：
+        200: 开始推送
+        401: 无效或过期的令牌
+        404: 任务不存在或不属于当前用户
+    """
+    job = await _get_own_job(db, job_id, current_user)
+    
+    async def events():
+        last, idle = None, 0.0
+        current = job
+        while True:
+            data = jsonable_encoder(schemas.JobOut.from_orm(current))
+            if data != last:
+                last, idle = data, 0.0
+                yield _sse("job", data)
+                if current.status in jobs.FINISHED_STATUSES:
+                    return
+            elif idle >= SSE_KEEPALIVE:
+                idle = 0.0
+                yield ": keep-alive\n\n"
+            # 结束读事务，下一次查询能看到其他连接提交的新状态
+            await db.rollback()
+            await jobs.wait_for_change(job_id, jobs.POLL_INTERVAL)
+            idle += jobs.POLL_INTERVAL
+            current = await jobs.get_job(db, job_id)
+            if current is None:
+                return
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@app.post("/attempts", response_model=schemas.AttemptOut, status_code=201)
+async def record_attempt(
+    attempt_in: schemas.AttemptCreate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user=Depends(get_current_user),
+):
+    """记录答题结果
+    
+    保存一次答题，并在同一事务中增量更新该题知识点对应主题的掌握度（贝叶斯知识追踪，见mastery模块）。
+    
+    请求体：
+        {
+            \"problem_id\": 1,
+            \"correct\": true,
+            \"score\": 90
+        }
+        
+    响应：
+        {
+            \"id\": 1,
+            \"problem_id\": 1,
+            \"correct\": true,
+            \"score\": 90.0,
+            \"submitted_at\": \"...\",
+            \"mastery\": {\"导数\": 0.62}
+        }
+        
+    说明：
+        - 没有correct时，score达到及格线（60）视为答对；两者都没有时不更新掌握度
+        - mastery只包含本题涉及的主题，完整的掌握度见 GET /profile
+        - 同时更新该题的复习计划（下次复习时间），到期的题目见 GET /reviews/due
+        
+    状态码：
+        201: 记录成功
+        401: 无效或过期的令牌
+        403: 无权访问此题目（其他用户的题目）
+        404: 题目不存在
+    """
+    p = await crud_async.get_problem(db, attempt_in.problem_id)
+    if not p:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="题目不存在"
+        )
+    # 只能对系统题目和自己的题目记录答题
+    if p.owner_id and p.owner_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="无权访问此题目"
+        )
+    attempt, updated = await crud_async.record_attempt(db, current_user.id, p, attempt_in)
+    return schemas.AttemptOut(
+        id=attempt.id,
+        problem_id=attempt.problem_id,
+        correct=attempt.correct,
+        score=attempt.score,
+        submitted_at=attempt.submitted_at,
+        mastery=updated,
+    )
 
 
 @app.get("/profile", response_model=schemas.LearningProfile)
-def profile(db: Session = Depends(get_db), current_user=Depends(get_current_user)):
+async def profile(
+    range_: str = Query("90d", alias="range"),
+    granularity: str = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user=Depends(get_current_user),
+):
     """获取学习档案
     
-    返回用户的学习进度，包括各主题的掌握度。
+    返回用户的学习进度，包括各主题的掌握度和最近一段时间的学习趋势。
+    
+    查询参数：
+        range: 学习趋势的时间范围（默认\"90d\"，即最近90天）
+        granularity: 趋势的粒度（可选）：day / week / month
+            不提供时按时间范围选择：不超过31天按日，不超过183天按周，否则按月
     
     响应：
         {
@@ -559,29 +1414,310 @@ def profile(db: Session = Depends(get_db), current_user=Depends(get_current_user
                 \"代数\": 0.75,
                 \"几何\": 0.60
             },
-            \"trend\": []
+            \"granularity\": \"week\",
+            \"trend\": [
+                {
+                    \"period_start\": \"2024-05-06\",
+                    \"attempts\": 12,
+                    \"correct\": 9,
+                    \"accuracy\": 0.75,
+                    \"mastery\": {\"代数\": 0.71, \"几何\": 0.60}
+                }
+            ]
         }
         
     说明：
-        - mastery: 各主题掌握度（0.0-1.0表示0-100%）
-        - trend: 学习趋势（历史记录）
+        - mastery: 各主题掌握度（0.0-1.0表示0-100%），每次 POST /attempts 后增量更新
+        - trend: 学习趋势，每个时间桶的做题量、正确率和桶末的掌握度；
+          读取预先汇总的桶（见rollups模块），不扫描答题历史
+        - 日桶保留92天、周桶保留731天，超出保留期的范围需使用更粗的粒度
         
     应用场景：
         显示用户学习进度、推荐学习材料、生成学习报告
         
     状态码：
         200: 成功
+        400: 时间范围或粒度无效
         401: 无效或过期的令牌
     """
-    data = crud.get_learning_profile(db, current_user.id)
+    days = range_[:-1]
+    if not (range_.endswith("d") and days.isdigit() and int(days) > 0):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="时间范围格式应为天数，如90d")
+    days = int(days)
+    if granularity is not None and granularity not in rollups.GRANULARITIES:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="不支持的粒度")
+    granularity = granularity or rollups.default_granularity(days)
+    retention = rollups.RETENTION_DAYS[granularity] or rollups.MAX_RANGE_DAYS
+    if days > retention:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"按{granularity}统计的时间范围不能超过{retention}天",
+        )
+    data = await crud_async.get_learning_profile(db, current_user.id, days, granularity)
     return data
 
 
+@app.get("/recommendations", response_model=List[schemas.Recommendation])
+async def recommendations(
+    limit: int = recommend.DEFAULT_LIMIT,
+    subject: str = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user=Depends(get_current_user),
+):
+    """推荐题目
+    
+    针对当前用户掌握度最低的几个主题，推荐难度略高于当前水平的题目（见recommend模块）。
+    
+    查询参数：
+        limit: 推荐条数（默认10，最大50）
+        subject: 只推荐该学科的题目（可选）
+    
+    响应：
+        [
+            {
+                \"id\": 12,
+                \"subject\": \"数学\",
+                \"course\": \"高等数学\",
+                \"problem_type\": \"解答\",
+                \"knowledge_tags\": [\"导数\"],
+                \"difficulty\": 3,
+                \"topic\": \"导数\",
+                \"mastery\": 0.35,
+                \"popularity\": 128
+            }
+        ]
+        
+    说明：
+        - 掌握度0-1线性对应难度1-5，推荐高于当前水平的两个难度，同难度内热度（答题次数）高的优先
+        - 各薄弱主题轮流推荐，最弱的主题优先；已经做对的题目不再推荐
+        - 只推荐系统题目和自己上传的题目；没有难度或知识点标签的题目不参与推荐
+        - 还没有掌握度记录（没有答过带知识点标签的题目）时返回空列表
+        - 候选从预计算的推荐索引中按索引范围读取，不扫描题目表
+        - 结果按用户缓存，记录答题后失效；新上传的题目最迟在缓存TTL（默认5分钟）后出现
+        
+    状态码：
+        200: 成功
+        400: limit超出范围
+        401: 无效或过期的令牌
+    """
+    if not 1 <= limit <= recommend.MAX_LIMIT:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"limit须在1到{recommend.MAX_LIMIT}之间"
+        )
+    key = recommend.cache_key(current_user.id, limit, subject)
+    result = recommend.lookup(key)
+    if result is None:
+        result = await crud_async.get_recommendations(db, current_user.id, limit, subject)
+        recommend.remember(key, result)
+    return result
+
+
+@app.get("/mistakes", response_model=schemas.MistakeList)
+async def list_mistakes(
+    subject: str = None,
+    knowledge_tag: List[str] = Query(None),
+    tag_match: str = tags.TAG_MATCH_ALL,
+    difficulty_min: int = None,
+    difficulty_max: int = None,
+    since: datetime = None,
+    until: datetime = None,
+    mastered: bool = None,
+    limit: int = pagination.DEFAULT_PAGE_SIZE,
+    cursor: str = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user=Depends(get_current_user),
+):
+    """查询错题本
+    
+    返回当前用户答错过的题目，以及符合筛选条件的错题按学科、难度、知识点和掌握状态的计数。
+    结果按最近一次答错的时间从新到旧排序，使用游标分页。
+    
+    查询参数：
+        subject: 按学科筛选（可选）
+        knowledge_tag: 按知识点筛选（可选，可重复），如 ?knowledge_tag=导数
+        tag_match: 多个知识点的组合方式（默认\"all\"）
+            all: 包含全部知识点，any: 包含任一知识点
+        difficulty_min / difficulty_max: 难度范围（可选，含两端）
+        since / until: 最近一次答错的时间范围（可选，ISO 8601，UTC，含since不含until）
+        mastered: 按掌握标记筛选（可选），如 ?mastered=false 只看未掌握的错题
+        limit: 每页条数（默认50，最大200）
+        cursor: 上一页响应头X-Next-Cursor中的游标（可选，不提供表示第一页）
+        
+    响应：
+        {
+            \"items\": [
+                {
+                    \"problem_id\": 12,
+                    \"subject\": \"数学\",
+                    \"difficulty\": 3,
+                    \"knowledge_tags\": [\"导数\"],
+                    \"attempts\": 3,
+                    \"wrong\": 2,
+                    \"last_correct\": true,
+                    \"first_wrong_at\": \"...\",
+                    \"last_wrong_at\": \"...\",
+                    \"last_attempt_at\": \"...\",
+                    \"mastered\": false,
+                    \"mastered_at\": null
+                }
+            ],
+            \"total\": 12,
+            \"facets\": {
+                \"subject\": {\"数学\": 12},
+                \"difficulty\": {\"3\": 7, \"4\": 5},
+                \"knowledge_tag\": {\"导数\": 8, \"积分\": 4},
+                \"mastered\": {\"false\": 10, \"true\": 2}
+            }
+        }
+        还有下一页时，响应头X-Next-Cursor包含下一页游标
+        
+    说明：
+        - POST /attempts 答错（没有correct时按score判断）的题目进入错题本；
+          重做（再次 POST /attempts）答对时更新last_correct，再次答错时清除掌握标记
+        - 错题本是答题时维护的冗余表（见mistakes模块），筛选和分面统计只读取该用户的错题行，不扫描答题记录
+        - total和facets统计符合全部筛选条件的错题（不受分页影响）
+        
+    状态码：
+        200: 查询成功
+        400: tag_match无效或游标无效
+        401: 无效或过期的令牌
+    """
+    if tag_match not in tags.TAG_MATCH_MODES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"tag_match必须是: {', '.join(tags.TAG_MATCH_MODES)}"
+        )
+    try:
+        rows, next_cursor, facets = await crud_async.list_mistakes(
+            db,
+            current_user.id,
+            subject=subject,
+            knowledge_tags=knowledge_tag,
+            tag_match=tag_match,
+            difficulty_min=difficulty_min,
+            difficulty_max=difficulty_max,
+            since=since,
+            until=until,
+            mastered=mastered,
+            limit=limit,
+            cursor=cursor,
+        )
+    except pagination.InvalidCursor:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="无效的分页游标")
+    
+    content = schemas.MistakeList(items=[schemas.MistakeOut.from_orm(row) for row in rows], **facets)
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return JSONResponse(jsonable_encoder(content), headers=headers)
+
+
+@app.patch("/mistakes/{problem_id}", response_model=schemas.MistakeOut)
+async def update_mistake(
+    problem_id: int,
+    mistake_in: schemas.MistakeUpdate,
+    db: AsyncSession = Depends(get_async_db),
+    current_user=Depends(get_current_user),
+):
+    """标记错题是否已掌握
+    
+    路径参数：
+        problem_id: 题目ID
+        
+    请求体：
+        {
+            \"mastered\": true
+        }
+        
+    响应：
+        更新后的错题（字段同 GET /mistakes 的items）
+        
+    说明：
+        - 标记为掌握后仍保留在错题本中，可用 ?mastered=false 只看未掌握的错题
+        - 之后再次答错该题会自动清除掌握标记
+        
+    状态码：
+        200: 更新成功
+        401: 无效或过期的令牌
+        404: 错题本中没有该题
+    """
+    row = await crud_async.set_mistake_mastered(db, current_user.id, problem_id, mistake_in.mastered)
+    if row is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="错题本中没有该题"
+        )
+    return schemas.MistakeOut.from_orm(row)
+
+
+@app.get("/reviews/due", response_model=List[schemas.ReviewDue])
+async def due_reviews(
+    limit: int = reviews.DEFAULT_LIMIT,
+    db: AsyncSession = Depends(get_async_db),
+    current_user=Depends(get_current_user),
+):
+    """查询到期需要复习的题目
+    
+    按间隔重复（SM-2）为做过的每道题安排下次复习时间，返回当前已经到期的题目（见reviews模块）。
+    
+    查询参数：
+        limit: 返回条数（默认20，最大100）
+        
+    响应：
+        [
+            {
+                \"problem_id\": 12,
+                \"subject\": \"数学\",
+                \"course\": \"高等数学\",
+                \"problem_type\": \"解答\",
+                \"knowledge_tags\": [\"导数\"],
+                \"difficulty\": 3,
+                \"due_at\": \"...\",
+                \"interval_days\": 6,
+                \"ease\": 2.5,
+                \"repetitions\": 2,
+                \"lapses\": 1,
+                \"reviews\": 3,
+                \"last_quality\": 4,
+                \"last_reviewed_at\": \"...\"
+            }
+        ]
+        
+    说明：
+        - 每次 POST /attempts 都会更新该题的复习计划：答对时间隔依次为1天、6天，之后按难易系数增长；
+          答错时间隔回到1天（错题第二天再次出现在复习队列中）
+        - 只有score没有correct时按分数分档评分，60分以上视为复习成功
+        - 结果按到期时间从早到晚排序（最久未复习的优先）；复习（提交答题）后该题移到之后的时间，
+          再次请求即得到下一批到期题目
+        - 读取答题时维护的复习状态表，是 (user_id, due_at) 索引上的有界范围读取，不扫描答题记录
+        
+    状态码：
+        200: 成功
+        400: limit超出范围
+        401: 无效或过期的令牌
+    """
+    if not 1 <= limit <= reviews.MAX_LIMIT:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"limit须在1到{reviews.MAX_LIMIT}之间"
+        )
+    return await crud_async.get_due_reviews(db, current_user.id, limit)
+
+
 @app.get("/admin/users", response_model=List[schemas.UserOut])
-def admin_list_users(db: Session = Depends(get_db), current_user=Depends(get_current_user)):
+async def admin_list_users(
+    limit: int = 100,
+    cursor: str = None,
+    response: Response = None,
+    db: AsyncSession = Depends(get_async_db),
+    current_user=Depends(get_current_user),
+):
     """（管理员）列出所有用户
     
-    仅管理员可访问，返回系统中的所有用户列表。
+    仅管理员可访问，按注册时间从旧到新分页返回系统中的用户列表。
+    
+    查询参数：
+        limit: 每页条数（默认100，最大200）
+        cursor: 上一页响应头X-Next-Cursor中的游标（可选，不提供表示第一页）
     
     响应：
         [
@@ -594,11 +1730,14 @@ def admin_list_users(db: Session = Depends(get_db), current_user=Depends(get_cur
             ...
         ]
         
+    还有下一页时，响应头X-Next-Cursor包含下一页游标。
+        
     权限检查：
         current_user.is_admin 必须为 True
         
     状态码：
         200: 成功
+        400: 游标无效
         401: 无效或过期的令牌  
         403: 权限不足（非管理员）
     """
@@ -606,11 +1745,17 @@ def admin_list_users(db: Session = Depends(get_db), current_user=Depends(get_cur
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Requires admin")
     
-    return crud.list_users(db)
+    try:
+        users, next_cursor = await crud_async.list_users(db, limit=limit, cursor=cursor)
+    except pagination.InvalidCursor:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="无效的分页游标")
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return users
 
 
 @app.post("/admin/users/{user_id}/ban", response_model=schemas.UserOut)
-def admin_ban_user(user_id: int, db: Session = Depends(get_db), current_user=Depends(get_current_user)):
+async def admin_ban_user(user_id: int, db: AsyncSession = Depends(get_async_db), current_user=Depends(get_current_user)):
     """（管理员）禁用用户
     
     管理员可禁用指定用户，被禁用的用户无法登录。
@@ -644,8 +1789,28 @@ def admin_ban_user(user_id: int, db: Session = Depends(get_db), current_user=Dep
         raise HTTPException(status_code=403, detail="Requires admin")
     
     # 执行禁用操作
-    user = crud.set_user_active(db, user_id, active=False)
+    user = await crud_async.set_user_active(db, user_id, active=False)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     
     return user
+
+
+@app.get("/metrics")
+async def read_metrics():
+    """运行指标
+    
+    以JSON形式导出进程内的运行指标（见metrics模块），如：
+        {
+            \"password_hash_queue_depth\": 3,
+            \"password_hash_queue_depth_max\": 120,
+            \"password_hash_rejected_total\": 0
+        }
+        
+    说明：
+        - 指标只反映当前进程，多进程部署时需分别采集
+        
+    状态码：
+        200: 成功
+    """
+    return metrics.snapshot()
@@ -0,0 +1,181 @@
+"""主题掌握度模块（贝叶斯知识追踪，BKT）
+
+每个用户在每个主题（题目的知识点标签）上的掌握度是"已掌握该主题"的概率，
+每次答题后按贝叶斯知识追踪增量更新：
+1. 按答题结果求后验：答对可能是掌握了（1 - P_SLIP），也可能是猜对（P_GUESS）；
+   答错可能是失误（P_SLIP），也可能是没掌握（1 - P_GUESS）
+2. 加上本次练习中学会的概率：p = 后验 + (1 - 后验) * P_TRANSIT
+
+更新只依赖该主题当前的掌握度，因此记录一次答题只需读写该题知识点对应的几行
+（与标签数成正比，见crud_async.record_attempt），不需要读取答题历史；
+replay()按时间顺序重放答题历史，用于批量回填或调整参数后重建掌握度和学习趋势汇总（见rollups模块）。
+"""
+
+import argparse
+import datetime
+from typing import Iterable, List, Optional
+
+from sqlalchemy import delete, insert, select
+
+import models
+import rollups
+import tags
+
+# BKT参数：初始掌握概率、每次练习学会的概率、掌握后答错（失误）的概率、未掌握时答对（猜对）的概率
+P_INIT = 0.2
+P_TRANSIT = 0.1
+P_SLIP = 0.1
+P_GUESS = 0.2
+
+# 只有分数没有对错时，分数达到该值视为答对
+PASS_SCORE = 60.0
+
+# 回填时每条INSERT语句写入的行数
+ROWS_PER_STATEMENT = 500
+
+# 主题名的最大长度（TopicMastery.topic列），与知识点标签名的截断长度相同
+MAX_TOPIC_LENGTH = tags.MAX_TAG_LENGTH
+
+
+def outcome(correct: Optional[bool], score: Optional[float]) -> Optional[bool]:
+    """答题结果：优先使用correct，否则按分数判断；都没有时返回None（不计入掌握度）"""
+    if correct is not None:
+        return bool(correct)
+    if score is not None:
+        return score >= PASS_SCORE
+    return None
+
+
+def update(p_known: float, correct: bool) -> float:
+    """按一次答题结果更新掌握概率"""
+    if correct:
+        evidence = p_known * (1 - P_SLIP)
+        posterior = evidence / (evidence + (1 - p_known) * P_GUESS)
+    else:
+        evidence = p_known * P_SLIP
+        posterior = evidence / (evidence + (1 - p_known) * (1 - P_GUESS))
+    return posterior + (1 - posterior) * P_TRANSIT
+
+
+def topics_of(knowledge_tags) -> List[str]:
+    """题目涉及的主题：去重并排序后的知识点标签（排序保证加锁顺序一致）"""
+    return sorted({name.strip()[:MAX_TOPIC_LENGTH] for name in tags.parse_tag_list(knowledge_tags)
+                   if isinstance(name, str) and name.strip()})
+
+
+def apply(row: models.TopicMastery, correct: bool, at: datetime.datetime) -> None:
+    """把一次答题结果计入掌握度行"""
+    row.mastery = update(row.mastery if row.mastery is not None else P_INIT, correct)
+    row.attempts = (row.attempts or 0) + 1
+    row.correct = (row.correct or 0) + int(correct)
+    row.updated_at = at
+
+
+def ensure_rows_stmt(dialect_name: str, user_id: int, topics: Iterable[str]):
+    """为尚无掌握度记录的主题创建初始行（已存在的行不变，并发创建不会违反唯一约束）"""
+    return tags.insert_ignore(dialect_name, models.TopicMastery.__table__).values([
+        {"user_id": user_id, "topic": topic, "mastery": P_INIT, "attempts": 0, "correct": 0}
+        for topic in topics
+    ])
+
+
+def lock_rows_stmt(user_id: int, topics: Iterable[str]):
+    """按主题顺序查询并锁定掌握度行（SELECT ... FOR UPDATE），同一用户的并发答题依次更新"""
+    return (
+        select(models.TopicMastery)
+        .where(models.TopicMastery.user_id == user_id, models.TopicMastery.topic.in_(list(topics)))
+        .order_by(models.TopicMastery.topic)
+        .with_for_update()
+    )
+
+
+def replay(conn, user_ids: Optional[List[int]] = None) -> int:
+    """按时间顺序重放答题历史，重建掌握度和学习趋势汇总（不提交事务）
+
+    删除这些用户（user_ids为None时为全部用户）已有的掌握度行和趋势桶，
+    再按 (user_id, submitted_at, id) 的顺序流式读取答题记录，逐个用户在内存中累计后批量写入。
+    内存中只保留一个用户的主题状态和一批待写入的行。
+
+    参数：
+        conn: 数据库连接（Connection）
+        user_ids: 要重建的用户ID列表，None表示全部用户
+
+    返回：
+        写入的掌握度行数
+    """
+    attempts, problems = models.Attempt.__table__, models.Problem.__table__
+    table, rollup_table = models.TopicMastery.__table__, models.MasteryRollup.__table__
+
+    stmt = (
+        select(attempts.c.user_id, attempts.c.correct, attempts.c.score, attempts.c.submitted_at,
+               problems.c.knowledge_tags)
+        .join(problems, problems.c.id == attempts.c.problem_id)
+        .order_by(attempts.c.user_id, attempts.c.submitted_at, attempts.c.id)
+    )
+    if user_ids is None:
+        conn.execute(delete(table))
+        conn.execute(delete(rollup_table))
+    else:
+        stmt = stmt.where(attempts.c.user_id.in_(user_ids))
+        conn.execute(delete(table).where(table.c.user_id.in_(user_ids)))
+        conn.execute(delete(rollup_table).where(rollup_table.c.user_id.in_(user_ids)))
+
+    pending, pending_rollups = [], []
+    written = 0
+
+    def write():
+        nonlocal written
+        if pending:
+            conn.execute(insert(table), pending)
+            written += len(pending)
+            pending.clear()
+        if pending_rollups:
+            conn.execute(insert(rollup_table), pending_rollups)
+            pending_rollups.clear()
+
+    current_user, states = None, {}
+    accumulator = rollups.Accumulator(models.utcnow().date())
+    for user_id, correct, score, submitted_at, knowledge_tags in conn.execute(
+        stmt.execution_options(stream_results=True, yield_per=ROWS_PER_STATEMENT)
+    ):
+        if user_id != current_user:
+            pending.extend(states.values())
+            pending_rollups.extend(accumulator.drain())
+            current_user, states = user_id, {}
+            if len(pending) + len(pending_rollups) >= ROWS_PER_STATEMENT:
+                write()
+        result = outcome(correct, score)
+        if result is None:
+            continue
+        topics = topics_of(knowledge_tags)
+        for topic in topics:
+            state = states.get(topic)
+            if state is None:
+                state = states[topic] = {
+                    "user_id": user_id, "topic": topic, "mastery": P_INIT, "attempts": 0, "correct": 0,
+                }
+            state["mastery"] = update(state["mastery"], result)
+            state["attempts"] += 1
+            state["correct"] += int(result)
+            state["updated_at"] = submitted_at
+        accumulator.add(user_id, submitted_at, result, {topic: states[topic]["mastery"] for topic in topics})
+    pending.extend(states.values())
+    pending_rollups.extend(accumulator.drain())
+    write()
+    return written
+
+
+def _main() -> None:
+    """命令行入口：从答题历史重建掌握度和学习趋势汇总"""
+    import database
+
+    parser = argparse.ArgumentParser(description="从答题历史重建主题掌握度和学习趋势汇总")
+    parser.add_argument("--user-id", type=int, action="append", help="只重建指定用户（可重复）")
+    args = parser.parse_args()
+    with database.engine.begin() as conn:
+        written = replay(conn, args.user_id)
+    print(f"写入{written}行掌握度")
+
+
+if __name__ == "__main__":
+    _main()
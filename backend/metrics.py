@@ -0,0 +1,95 @@
+"""运行指标模块
+
+进程内的轻量计数器和仪表，用于观察队列深度、缓存命中率等运行状态。
+所有指标注册在全局registry中，通过 GET /metrics 以JSON形式导出。
+
+- Counter：只增不减的累计计数（如请求数、命中数）
+- Gauge：可增可减的瞬时值（如队列中等待的任务数）
+"""
+
+import threading
+from typing import Dict
+
+
+class Counter:
+    """累计计数器"""
+
+    def __init__(self, name: str, description: str = ""):
+        self.name = name
+        self.description = description
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1) -> None:
+        """增加计数"""
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+
+class Gauge:
+    """瞬时值仪表，同时记录历史最大值"""
+
+    def __init__(self, name: str, description: str = ""):
+        self.name = name
+        self.description = description
+        self._value = 0
+        self.max_value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1) -> None:
+        """增加当前值"""
+        with self._lock:
+            self._value += amount
+            self.max_value = max(self.max_value, self._value)
+
+    def dec(self, amount: float = 1) -> None:
+        """减少当前值"""
+        with self._lock:
+            self._value -= amount
+
+    def set(self, value: float) -> None:
+        """设置当前值"""
+        with self._lock:
+            self._value = value
+            self.max_value = max(self.max_value, value)
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+
+# 全局指标注册表：指标名 -> 指标对象
+registry: Dict[str, object] = {}
+_registry_lock = threading.Lock()
+
+
+def counter(name: str, description: str = "") -> Counter:
+    """获取（不存在时创建）指定名称的计数器"""
+    with _registry_lock:
+        if name not in registry:
+            registry[name] = Counter(name, description)
+        return registry[name]
+
+
+def gauge(name: str, description: str = "") -> Gauge:
+    """获取（不存在时创建）指定名称的仪表"""
+    with _registry_lock:
+        if name not in registry:
+            registry[name] = Gauge(name, description)
+        return registry[name]
+
+
+def snapshot() -> Dict[str, float]:
+    """导出所有指标的当前值（仪表额外导出 <name>_max 历史最大值）"""
+    with _registry_lock:
+        metrics = list(registry.values())
+    result = {}
+    for m in metrics:
+        result[m.name] = m.value
+        if isinstance(m, Gauge):
+            result[f"{m.name}_max"] = m.max_value
+    return result
@@ -0,0 +1,274 @@
+"""数据库迁移模块
+
+Base.metadata.create_all只会创建缺失的表，不会修改已存在的表。
+该模块在create_all之后由init_db调用，负责：
+- 为已存在的表补齐模型中新增的列
+- 为已存在的表补齐模型中新增的索引
+- 按顺序执行尚未执行过的数据迁移，并记录到schema_migrations表
+"""
+
+import base64
+import mimetypes
+
+from sqlalchemy import inspect, text
+
+from database import Base
+
+
+def _add_missing_columns(conn):
+    """为已存在的表补齐模型中新增的列（新增列一律按可空列添加）"""
+    inspector = inspect(conn)
+    existing_tables = set(inspector.get_table_names())
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing_columns = {c["name"] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing_columns:
+                continue
+            column_type = column.type.compile(dialect=conn.dialect)
+            conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+
+
+def _create_missing_indexes(conn):
+    """为已存在的表补齐模型中新增的索引"""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=conn, checkfirst=True)
+
+
+# ==================== 数据迁移 ====================
+
+def _0001_move_file_content_to_blobs(conn):
+    """把problems.file_content中的Base64文件内容迁移到Blob存储
+
+    旧版本把上传文件Base64编码后直接存入file_content列。
+    迁移后文件保存在Blob存储中，行内只保留摘要、大小和MIME类型，
+    file_content列被清空。
+    """
+    import blobstore
+
+    columns = {c["name"] for c in inspect(conn).get_columns("problems")}
+    if "file_content" not in columns:
+        return
+
+    store = blobstore.get_blob_store()
+    rows = conn.execute(text(
+        "SELECT id, raw, file_content FROM problems WHERE file_content IS NOT NULL"
+    )).fetchall()
+    for problem_id, raw, file_content in rows:
+        try:
+            data = base64.b64decode(file_content)
+        except (ValueError, TypeError):
+            continue
+        # 旧数据的raw形如"FILE:problem.png"，据此推断MIME类型
+        filename = raw[5:] if raw and raw.startswith("FILE:") else (raw or "")
+        mime_type = mimetypes.guess_type(filename)[0]
+        info = store.put(data, mime_type=mime_type)
+        conn.execute(
+            text(
+                "UPDATE problems SET file_sha256 = :sha256, file_size = :size, "
+                "mime_type = :mime_type, file_content = NULL WHERE id = :id"
+            ),
+            {"sha256": info.sha256, "size": info.size, "mime_type": info.mime_type, "id": problem_id},
+        )
+
+
+# 回填标签关联时每批处理的题目数
+BACKFILL_BATCH_SIZE = 1000
+
+# 单条多行INSERT / IN查询包含的最大行数（避免超过SQLite单条语句的参数个数上限）
+MAX_ROWS_PER_STATEMENT = 400
+
+
+def _chunks(items, size: int = MAX_ROWS_PER_STATEMENT):
+    """把列表按size切分"""
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _0002_backfill_problem_tags(conn):
+    """把problems中已有的knowledge_tags / tags回填到tags和problem_tags表
+
+    新题目的标签关联由crud_async在创建和更新时维护，该迁移只处理已有数据。
+    按题目ID分批读取，每批先创建缺失的标签，再插入关联（已存在的关联被忽略）。
+    """
+    import tags
+
+    dialect = conn.dialect.name
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            text(
+                "SELECT id, knowledge_tags, tags FROM problems "
+                "WHERE id > :last_id ORDER BY id LIMIT :limit"
+            ),
+            {"last_id": last_id, "limit": BACKFILL_BATCH_SIZE},
+        ).fetchall()
+        if not rows:
+            return
+        last_id = rows[-1][0]
+
+        problem_keys = {
+            problem_id: tags.tag_keys(tags.parse_tag_list(knowledge_tags), tags.parse_tag_list(user_tags))
+            for problem_id, knowledge_tags, user_tags in rows
+        }
+        all_keys = set().union(*problem_keys.values())
+        if not all_keys:
+            continue
+        tag_ids = {}
+        for keys in _chunks(all_keys):
+            conn.execute(tags.insert_tags_stmt(dialect, keys))
+            tag_ids.update(
+                ((row.kind, row.name), row.id) for row in conn.execute(tags.select_tag_ids_stmt(keys))
+            )
+        pairs = [
+            (problem_id, tag_ids[key])
+            for problem_id, keys in problem_keys.items()
+            for key in keys
+        ]
+        for chunk in _chunks(pairs):
+            conn.execute(tags.insert_problem_tags_stmt(dialect, chunk))
+
+
+def _0003_problem_search_index(conn):
+    """创建题目全文索引及其同步触发器，并为已有题目建立索引（见search模块）"""
+    import search
+
+    if search.install(conn):
+        search.rebuild(conn)
+
+
+def _0004_assign_problem_clusters(conn):
+    """为已有题目计算去重指纹并归入题目簇（新题目在crud_async.create_problem中归簇）
+
+    按题目ID从小到大处理，较早上传的题目成为簇的代表题目。
+    """
+    import dedup
+
+    dialect = conn.dialect.name
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            text(
+                "SELECT id, raw, file_sha256 FROM problems "
+                "WHERE id > :last_id AND cluster_id IS NULL ORDER BY id LIMIT :limit"
+            ),
+            {"last_id": last_id, "limit": BACKFILL_BATCH_SIZE},
+        ).fetchall()
+        if not rows:
+            return
+        last_id = rows[-1][0]
+        for problem_id, raw, file_sha256 in rows:
+            fp = dedup.fingerprint(raw, file_sha256)
+            if fp is None:
+                continue
+            match = dedup.assign_cluster(conn, dialect, problem_id, fp)
+            conn.execute(
+                text("UPDATE problems SET content_hash = :hash, cluster_id = :cluster_id WHERE id = :id"),
+                {"hash": fp.content_hash, "cluster_id": match.cluster_id, "id": problem_id},
+            )
+
+
+def _0005_backfill_topic_mastery(conn):
+    """按答题历史重建掌握度（已由0006_backfill_mastery_rollups一并完成）
+
+    学习趋势汇总中的掌握度快照需要重放答题历史时逐次记录，0006重放时同时重建掌握度，
+    这里不再单独重放一次（保留迁移名称，已执行过的数据库不受影响）。
+    """
+
+
+def _0006_backfill_mastery_rollups(conn):
+    """按答题历史重建掌握度和学习趋势汇总（之前的版本不写入趋势桶，新答题在crud_async.record_attempt中累加）"""
+    import mastery
+
+    mastery.replay(conn)
+
+
+def _0007_build_recommendation_index(conn):
+    """按已有题目、标签关联和答题次数建立推荐索引（新题目和答题由crud_async维护）"""
+    import recommend
+
+    for stmt in recommend.rebuild_stmts():
+        conn.execute(stmt)
+
+
+def _0008_backfill_mistakes(conn):
+    """按答题历史建立错题本（新答题在crud_async.record_attempt中维护）"""
+    import mistakes
+
+    mistakes.backfill(conn)
+
+
+def _0009_build_review_schedule(conn):
+    """按答题历史建立复习计划（新答题在crud_async.record_attempt中更新）"""
+    import reviews
+
+    reviews.rebuild(conn)
+
+
+def _0010_timezone_aware_timestamps(conn):
+    """把PostgreSQL上不带时区的时间列改为TIMESTAMP WITH TIME ZONE
+
+    之前的版本用datetime.utcnow()写入不带时区的timestamp列，保存的都是UTC时间，
+    转换时按UTC解释。SQLite的存储格式不变（models.UTCDateTime读出时补上UTC时区），无需迁移。
+    """
+    if conn.dialect.name != "postgresql":
+        return
+    import models
+
+    inspector = inspect(conn)
+    existing_tables = set(inspector.get_table_names())
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing_types = {c["name"]: c["type"] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            existing = existing_types.get(column.name)
+            if not isinstance(column.type, models.UTCDateTime) or existing is None:
+                continue
+            if getattr(existing, "timezone", False):
+                continue
+            conn.execute(text(
+                f"ALTER TABLE {table.name} ALTER COLUMN {column.name} "
+                f"TYPE TIMESTAMP WITH TIME ZONE USING {column.name} AT TIME ZONE 'UTC'"
+            ))
+
+
+# 数据迁移列表：(迁移名称, 迁移函数)，按顺序执行，每个迁移只执行一次
+MIGRATIONS = [
+    ("0001_move_file_content_to_blobs", _0001_move_file_content_to_blobs),
+    ("0002_backfill_problem_tags", _0002_backfill_problem_tags),
+    ("0003_problem_search_index", _0003_problem_search_index),
+    ("0004_assign_problem_clusters", _0004_assign_problem_clusters),
+    ("0005_backfill_topic_mastery", _0005_backfill_topic_mastery),
+    ("0006_backfill_mastery_rollups", _0006_backfill_mastery_rollups),
+    ("0007_build_recommendation_index", _0007_build_recommendation_index),
+    ("0008_backfill_mistakes", _0008_backfill_mistakes),
+    ("0009_build_review_schedule", _0009_build_review_schedule),
+    ("0010_timezone_aware_timestamps", _0010_timezone_aware_timestamps),
+]
+
+
+def run_migrations(engine):
+    """执行所有结构补齐和尚未执行的数据迁移
+
+    参数：
+        engine: SQLAlchemy数据库引擎
+    """
+    with engine.begin() as conn:
+        _add_missing_columns(conn)
+        _create_missing_indexes(conn)
+        conn.execute(text(
+            "CREATE TABLE IF NOT EXISTS schema_migrations (name VARCHAR(128) PRIMARY KEY)"
+        ))
+        applied = {row[0] for row in conn.execute(text("SELECT name FROM schema_migrations"))}
+
+    for name, migrate in MIGRATIONS:
+        if name in applied:
+            continue
+        # 每个迁移在独立事务中执行，失败时不会记录为已执行
+        with engine.begin() as conn:
+            migrate(conn)
+            conn.execute(text("INSERT INTO schema_migrations (name) VALUES (:name)"), {"name": name})
@@ -0,0 +1,324 @@
+"""错题本模块
+
+错题本按学科、知识点、难度、时间和掌握状态筛选用户答错过的题目。
+如果每次从答题记录计算，需要扫描用户的全部答题、按题目分组取最近状态，再连接题目表筛选。
+该模块维护冗余的 mistakes / mistake_tags 表（见models.Mistake、models.MistakeTag）：
+- 每次答题时（crud_async.record_attempt，与掌握度在同一事务中）：
+  答错时创建或更新错题行（ON CONFLICT DO UPDATE），并把题目的知识点关联复制到 mistake_tags；
+  答对时只更新已有错题行的最近状态（重做答对）
+- 再次答错会清除掌握标记；掌握标记由用户手动设置（PATCH /mistakes/{problem_id}）
+- 题目的学科、难度或知识点变化时同步所有用户的错题行（sync_problem_stmts）
+筛选条件都限定在该用户的行上（(user_id, ...) 前缀的索引），
+列表按 (last_wrong_at, problem_id) 从新到旧键集分页；分面统计是对同一筛选结果的一条聚合语句。
+
+该模块只构造SQL语句和处理查询结果，由crud_async和migrations共用。
+"""
+
+import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import String, and_, case, cast, delete, func, insert, literal, select, union_all
+
+import mastery
+import models
+import tags
+
+# 分面名称
+FACET_SUBJECT = "subject"
+FACET_DIFFICULTY = "difficulty"
+FACET_KNOWLEDGE_TAG = "knowledge_tag"
+FACET_MASTERED = "mastered"
+FACETS = (FACET_SUBJECT, FACET_DIFFICULTY, FACET_KNOWLEDGE_TAG, FACET_MASTERED)
+
+# 回填时每条INSERT语句写入的行数
+ROWS_PER_STATEMENT = 500
+
+
+# ==================== 答题时维护 ====================
+
+def _upsert_wrong_stmt(dialect_name: str, user_id: int, problem: models.Problem, at: datetime.datetime):
+    """答错：创建错题行，已存在时累加次数、更新最近答错时间并清除掌握标记"""
+    table = models.Mistake.__table__
+    values = {
+        "user_id": user_id, "problem_id": problem.id, "subject": problem.subject, "difficulty": problem.difficulty,
+        "attempts": 1, "wrong": 1, "last_correct": False,
+        "first_wrong_at": at, "last_wrong_at": at, "last_attempt_at": at, "mastered": False, "mastered_at": None,
+    }
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        # 其他数据库没有通用的写法，退化为普通INSERT（错题行已存在时报错）
+        return insert(table).values(values)
+    stmt = dialect_insert(table).values(values)
+    return stmt.on_conflict_do_update(
+        index_elements=["user_id", "problem_id"],
+        set_={
+            "subject": stmt.excluded.subject,
+            "difficulty": stmt.excluded.difficulty,
+            "attempts": table.c.attempts + 1,
+            "wrong": table.c.wrong + 1,
+            "last_correct": False,
+            "last_wrong_at": stmt.excluded.last_wrong_at,
+            "last_attempt_at": stmt.excluded.last_attempt_at,
+            "mastered": False,
+            "mastered_at": None,
+        },
+    )
+
+
+def _copy_tags_select(problem_id: int, user_id: Optional[int] = None):
+    """从题目的知识点关联得到 (user_id, tag_id, problem_id) 行
+
+    user_id为None时为该题所有的错题行（题目更新时使用）。
+    """
+    problem_tags, tag_table = models.ProblemTag.__table__, models.Tag.__table__
+    if user_id is not None:
+        user_column = literal(user_id)
+        stmt = select(user_column, problem_tags.c.tag_id, problem_tags.c.problem_id)
+    else:
+        table = models.Mistake.__table__
+        stmt = (
+            select(table.c.user_id, problem_tags.c.tag_id, problem_tags.c.problem_id)
+            .join(problem_tags, problem_tags.c.problem_id == table.c.problem_id)
+        )
+    return (
+        stmt.join(tag_table, tag_table.c.id == problem_tags.c.tag_id)
+        .where(problem_tags.c.problem_id == problem_id, tag_table.c.kind == models.TAG_KIND_KNOWLEDGE)
+    )
+
+
+def record_stmts(dialect_name: str, user_id: int, problem: models.Problem, correct: Optional[bool],
+                 at: datetime.datetime):
+    """一次答题需要执行的错题本语句（correct为mastery.outcome的结果，None时不计入）
+
+    返回：
+        需要按顺序执行的语句列表
+    """
+    table = models.Mistake.__table__
+    if correct is None:
+        return []
+    if correct:
+        # 重做答对：只更新已有的错题行，没有答错过的题目不进入错题本
+        return [
+            table.update()
+            .where(table.c.user_id == user_id, table.c.problem_id == problem.id)
+            .values(attempts=table.c.attempts + 1, last_correct=True, last_attempt_at=at)
+        ]
+    return [
+        _upsert_wrong_stmt(dialect_name, user_id, problem, at),
+        tags.insert_ignore(dialect_name, models.MistakeTag.__table__).from_select(
+            ["user_id", "tag_id", "problem_id"], _copy_tags_select(problem.id, user_id)
+        ),
+    ]
+
+
+def sync_problem_stmts(problem: models.Problem):
+    """题目的学科、难度或知识点变化后，同步所有用户的错题行和知识点关联
+
+    在题目的标签关联（problem_tags）更新之后执行。
+
+    返回：
+        需要按顺序执行的语句列表
+    """
+    table, mistake_tags = models.Mistake.__table__, models.MistakeTag.__table__
+    return [
+        table.update().where(table.c.problem_id == problem.id)
+        .values(subject=problem.subject, difficulty=problem.difficulty),
+        delete(mistake_tags).where(mistake_tags.c.problem_id == problem.id),
+        insert(mistake_tags).from_select(["user_id", "tag_id", "problem_id"], _copy_tags_select(problem.id)),
+    ]
+
+
+def set_mastered(row: models.Mistake, mastered: bool, at: datetime.datetime) -> None:
+    """设置错题的掌握标记"""
+    row.mastered = mastered
+    row.mastered_at = at if mastered else None
+
+
+# ==================== 查询 ====================
+
+def filter_conditions(
+    user_id: int,
+    subject: Optional[str] = None,
+    tag_ids: Optional[List[int]] = None,
+    tag_match: str = tags.TAG_MATCH_ALL,
+    difficulty_min: Optional[int] = None,
+    difficulty_max: Optional[int] = None,
+    since: Optional[datetime.datetime] = None,
+    until: Optional[datetime.datetime] = None,
+    mastered: Optional[bool] = None,
+) -> list:
+    """错题筛选条件（作用于models.Mistake），时间范围按最近一次答错的时间
+
+    知识点条件是 mistake_tags 上 (user_id, tag_id) 范围的 IN 子查询，只涉及该用户的错题。
+    """
+    table, mistake_tags = models.Mistake.__table__, models.MistakeTag.__table__
+    conditions = [table.c.user_id == user_id]
+    if mastered is not None:
+        conditions.append(table.c.mastered == mastered)
+    if subject:
+        conditions.append(table.c.subject == subject)
+    if difficulty_min is not None:
+        conditions.append(table.c.difficulty >= difficulty_min)
+    if difficulty_max is not None:
+        conditions.append(table.c.difficulty <= difficulty_max)
+    if since is not None:
+        conditions.append(table.c.last_wrong_at >= since)
+    if until is not None:
+        conditions.append(table.c.last_wrong_at < until)
+    if tag_ids:
+        def subquery(*where):
+            return select(mistake_tags.c.problem_id).where(mistake_tags.c.user_id == user_id, *where)
+
+        if tag_match == tags.TAG_MATCH_ANY:
+            conditions.append(table.c.problem_id.in_(subquery(mistake_tags.c.tag_id.in_(tag_ids))))
+        else:
+            conditions.extend(
+                table.c.problem_id.in_(subquery(mistake_tags.c.tag_id == tag_id)) for tag_id in tag_ids
+            )
+    return conditions
+
+
+def list_stmt(conditions: list):
+    """错题列表（连接题目表取摘要字段），由pagination按 (last_wrong_at, problem_id) 分页"""
+    table, problems = models.Mistake.__table__, models.Problem.__table__
+    return (
+        select(
+            table.c.problem_id, table.c.subject, table.c.difficulty, problems.c.course, problems.c.problem_type,
+            problems.c.knowledge_tags, table.c.attempts, table.c.wrong, table.c.last_correct,
+            table.c.first_wrong_at, table.c.last_wrong_at, table.c.last_attempt_at,
+            table.c.mastered, table.c.mastered_at,
+        )
+        .join(problems, problems.c.id == table.c.problem_id)
+        .where(*conditions)
+    )
+
+
+def get_stmt(user_id: int, problem_id: int):
+    """一道错题（字段同list_stmt）"""
+    table = models.Mistake.__table__
+    return list_stmt([table.c.user_id == user_id, table.c.problem_id == problem_id])
+
+
+def facets_stmt(conditions: list):
+    """筛选结果的分面统计：一条语句对同一筛选结果（CTE）按各分面分组计数
+
+    结果行为 (分面名称, 取值, 题数)，另有一行 ("total", None, 总题数)。
+    """
+    table, mistake_tags, tag_table = models.Mistake.__table__, models.MistakeTag.__table__, models.Tag.__table__
+    filtered = (
+        select(table.c.user_id, table.c.problem_id, table.c.subject, table.c.difficulty, table.c.mastered)
+        .where(*conditions)
+        .cte("filtered")
+    )
+
+    def facet(name, value, *joins):
+        source = filtered
+        for target, on in joins:
+            source = source.join(target, on)
+        value = cast(value, String(128))
+        return select(literal(name), value, func.count()).select_from(source).group_by(value)
+
+    return union_all(
+        select(literal("total"), cast(literal(None), String(128)), func.count()).select_from(filtered),
+        facet(FACET_SUBJECT, filtered.c.subject),
+        facet(FACET_DIFFICULTY, filtered.c.difficulty),
+        facet(FACET_MASTERED, case((filtered.c.mastered, 1), else_=0)),
+        facet(
+            FACET_KNOWLEDGE_TAG, tag_table.c.name,
+            (mistake_tags, and_(mistake_tags.c.user_id == filtered.c.user_id,
+                                mistake_tags.c.problem_id == filtered.c.problem_id)),
+            (tag_table, tag_table.c.id == mistake_tags.c.tag_id),
+        ),
+    )
+
+
+def build_facets(rows) -> dict:
+    """把facets_stmt的结果整理为 {"total": 题数, "facets": {分面: {取值: 题数}}}
+
+    - 学科、难度为空的题目只计入总数
+    - difficulty的取值为难度数字的字符串，mastered的取值为"true" / "false"
+    - 每个分面按题数从多到少排列
+    """
+    total = 0
+    facets: Dict[str, Dict[str, int]] = {name: {} for name in FACETS}
+    for name, value, count in rows:
+        if name == "total":
+            total = count
+        elif value is not None:
+            if name == FACET_MASTERED:
+                value = "true" if value == "1" else "false"
+            facets[name][value] = count
+    return {
+        "total": total,
+        "facets": {name: dict(sorted(values.items(), key=lambda kv: (-kv[1], kv[0]))) for name, values in facets.items()},
+    }
+
+
+# ==================== 回填 ====================
+
+def backfill(conn) -> int:
+    """按答题历史重建错题本（不提交事务）
+
+    按 (user_id, problem_id, submitted_at, id) 的顺序流式读取答题记录，
+    与答题时的维护规则相同：第一次答错后开始计数，最近一次答题决定last_correct，掌握标记为空。
+
+    返回：
+        写入的错题行数
+    """
+    table, mistake_tags = models.Mistake.__table__, models.MistakeTag.__table__
+    attempts, problems = models.Attempt.__table__, models.Problem.__table__
+    conn.execute(delete(mistake_tags))
+    conn.execute(delete(table))
+
+    stmt = (
+        select(attempts.c.user_id, attempts.c.problem_id, attempts.c.correct, attempts.c.score,
+               attempts.c.submitted_at, problems.c.subject, problems.c.difficulty)
+        .join(problems, problems.c.id == attempts.c.problem_id)
+        .order_by(attempts.c.user_id, attempts.c.problem_id, attempts.c.submitted_at, attempts.c.id)
+    )
+    pending: List[dict] = []
+    written = 0
+    row = None
+    for user_id, problem_id, correct, score, submitted_at, subject, difficulty in conn.execute(
+        stmt.execution_options(stream_results=True, yield_per=ROWS_PER_STATEMENT)
+    ):
+        result = mastery.outcome(correct, score)
+        if result is None:
+            continue
+        if row is None or (row["user_id"], row["problem_id"]) != (user_id, problem_id):
+            if result:
+                # 还没有答错过：不进入错题本
+                continue
+            row = {
+                "user_id": user_id, "problem_id": problem_id, "subject": subject, "difficulty": difficulty,
+                "attempts": 0, "wrong": 0, "first_wrong_at": submitted_at,
+                "mastered": False, "mastered_at": None,
+            }
+            pending.append(row)
+        row["attempts"] += 1
+        row["last_correct"] = result
+        row["last_attempt_at"] = submitted_at
+        if not result:
+            row["wrong"] += 1
+            row["last_wrong_at"] = submitted_at
+        if len(pending) > ROWS_PER_STATEMENT:
+            # 最后一行可能还在累加，留到下一批
+            conn.execute(insert(table), pending[:-1])
+            written += len(pending) - 1
+            del pending[:-1]
+    if pending:
+        conn.execute(insert(table), pending)
+        written += len(pending)
+
+    problem_tags, tag_table = models.ProblemTag.__table__, models.Tag.__table__
+    conn.execute(insert(mistake_tags).from_select(
+        ["user_id", "tag_id", "problem_id"],
+        select(table.c.user_id, problem_tags.c.tag_id, table.c.problem_id)
+        .join(problem_tags, problem_tags.c.problem_id == table.c.problem_id)
+        .join(tag_table, tag_table.c.id == problem_tags.c.tag_id)
+        .where(tag_table.c.kind == models.TAG_KIND_KNOWLEDGE),
+    ))
+    return written
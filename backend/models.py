@@ -4,11 +4,47 @@
 所有模型都继承自Base，在初始化数据库时会创建对应的表。
 """
 
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text, Float
+from sqlalchemy import Column, Integer, BigInteger, String, Boolean, Date, DateTime, ForeignKey, Text, Float, Index, JSON, LargeBinary, UniqueConstraint
+from sqlalchemy.types import TypeDecorator
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 from database import Base
 import datetime
 
+# 可移植的JSON列类型：PostgreSQL上使用JSONB（可建GIN索引），SQLite上以JSON文本存储
+# none_as_null=True: Python的None存为SQL NULL而不是JSON的null
+JSONType = JSON(none_as_null=True).with_variant(JSONB(none_as_null=True), "postgresql")
+
+
+def utcnow() -> datetime.datetime:
+    """当前UTC时间（带时区）：所有时间列的默认值和应用中的"现在"都使用它"""
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+class UTCDateTime(TypeDecorator):
+    """带时区的UTC时间列
+    
+    PostgreSQL上为 TIMESTAMP WITH TIME ZONE；SQLite没有时区类型，按UTC的本地时间文本存储。
+    写入时带时区的值转换为UTC（不带时区的值视为UTC），读出的值总是带UTC时区，
+    两种数据库上应用拿到的都是可以直接比较和相减的aware datetime。
+    """
+    impl = DateTime(timezone=True)
+    cache_ok = True
+    
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        if value.tzinfo is None:
+            return value.replace(tzinfo=datetime.timezone.utc)
+        return value.astimezone(datetime.timezone.utc)
+    
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        if value.tzinfo is None:
+            return value.replace(tzinfo=datetime.timezone.utc)
+        return value.astimezone(datetime.timezone.utc)
+
 
 class User(Base):
     """用户模型
@@ -49,7 +85,12 @@ class User(Base):
     is_admin = Column(Boolean, default=False)
     
     # 账户创建时间：自动记录为当前UTC时间
-    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    created_at = Column(UTCDateTime, default=utcnow)
+    
+    # 复合索引：支持管理员用户列表按(created_at, id)键集分页
+    __table_args__ = (
+        Index("ix_users_created_at_id", "created_at", "id"),
+    )
 
 
 class Problem(Base):
@@ -62,16 +103,20 @@ class Problem(Base):
     - owner_id: 题目上传者的用户ID（外键）
     - source_type: 题目来源类型（如\"text\"、\"image\"等）
     - raw: 原始题目内容（通常是用户输入的文本或上传文件名）
-    - file_content: Base64编码的文件内容（当上传图片/PDF等时存储）
+    - file_sha256: 上传文件内容的SHA-256摘要（文件本身保存在Blob存储中）
+    - file_size: 上传文件的字节数
+    - mime_type: 上传文件的MIME类型
     - parsed: 解析后的题目内容（经过AI处理）
     - subject: 学科（如\"数学\"、\"物理\"等）
     - course: 课程名称
     - problem_type: 题型（如\"选择\"、\"填空\"、\"解答\"等）
-    - knowledge_tags: 知识点标签（JSON格式，如\"[\\\"函数\\\", \\\"微积分\\\"]\"）
+    - knowledge_tags: 知识点标签（JSON数组，如[\"函数\", \"微积分\"]）
     - difficulty: 难度估计（1-5，1=最简单）
     - is_bookmarked: 是否收藏
-    - tags: 用户自定义标签（JSON格式）
+    - tags: 用户自定义标签（JSON数组）
     - notes: 用户备注
+    - content_hash: 规范化题目文本（或上传文件内容）的SHA-256，用于去重
+    - cluster_id: 所属题目簇ID（内容相同或高度相似的题目属于同一个簇，见dedup模块）
     - created_at: 题目上传时间
     - updated_at: 题目最后更新时间
     
@@ -92,8 +137,15 @@ class Problem(Base):
     # 原始题目内容：保存用户输入或上传的原始数据
     raw = Column(Text, nullable=True)
     
-    # 文件内容：Base64编码的文件内容，仅当source_type为image/pdf等时才有值
-    file_content = Column(Text, nullable=True)
+    # 文件摘要：上传文件内容的SHA-256，作为Blob存储的键
+    # 文件本体不进数据库，相同文件只存储一份；仅当上传了图片/PDF等时才有值
+    file_sha256 = Column(String(64), nullable=True, index=True)
+    
+    # 文件大小：字节数
+    file_size = Column(Integer, nullable=True)
+    
+    # 文件MIME类型：如\"image/png\"、\"application/pdf\"
+    mime_type = Column(String(128), nullable=True)
     
     # 解析后的题目内容：AI处理后的结构化题目
     parsed = Column(Text, nullable=True)
@@ -107,8 +159,8 @@ class Problem(Base):
     # 题型：如\"选择\"、\"填空\"、\"解答\"、\"证明\"等
     problem_type = Column(String(64), nullable=True)
     
-    # 知识点标签：JSON格式字符串，如\"[\\\"函数\\\", \\\"微积分\\\"]\"
-    knowledge_tags = Column(Text, nullable=True)
+    # 知识点标签：JSON数组，如[\"函数\", \"微积分\"]
+    knowledge_tags = Column(JSONType, nullable=True)
     
     # 难度估计：1-5表示简单到困难，可选
     difficulty = Column(Integer, nullable=True)
@@ -116,20 +168,188 @@ class Problem(Base):
     # 是否收藏：用于\"我的题库\"筛选
     is_bookmarked = Column(Boolean, default=False)
     
-    # 用户自定义标签：JSON格式字符串
-    tags = Column(Text, nullable=True)
+    # 用户自定义标签：JSON数组
+    tags = Column(JSONType, nullable=True)
     
     # 用户备注：记录用户对这道题的笔记
     notes = Column(Text, nullable=True)
     
+    # 去重指纹：规范化文本（或文件内容）的SHA-256，上传时计算
+    content_hash = Column(String(64), nullable=True)
+    
+    # 所属题目簇：同一簇的题目共享解析和求解结果
+    cluster_id = Column(Integer, ForeignKey("problem_clusters.id"), nullable=True, index=True)
+    
     # 题目创建时间：自动记录为当前UTC时间
-    created_at = Column(DateTime, default=datetime.datetime.utcnow)
+    created_at = Column(UTCDateTime, default=utcnow)
     
     # 题目最后更新时间：自动更新
-    updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
+    updated_at = Column(UTCDateTime, default=utcnow, onupdate=utcnow)
     
     # 与User建立关系：一个用户可以有多个题目
     owner = relationship("User")
+    
+    # 复合索引：支持"我的题目"按(created_at, id)键集分页，每页是一次索引范围扫描
+    __table_args__ = (
+        Index("ix_problems_owner_created_at_id", "owner_id", "created_at", "id"),
+    )
+
+
+class ProblemCluster(Base):
+    """题目簇模型
+    
+    内容相同（精确重复）或高度相似（近似重复）的题目归入同一个簇，
+    簇的代表题目是第一道上传的题目。归簇逻辑见dedup模块。
+    
+    字段说明：
+    - id: 主键，自增整数
+    - canonical_problem_id: 代表题目ID（创建该簇的题目）
+    - content_hash: 代表题目的去重指纹（规范化文本或文件内容的SHA-256）
+    - minhash: 代表题目的MinHash签名（NUM_PERM个32位整数，上传文件的题目为空）
+    - member_count: 簇中的题目数
+    - created_at: 创建时间
+    """
+    __tablename__ = "problem_clusters"
+    
+    # 主键字段
+    id = Column(Integer, primary_key=True)
+    
+    # 代表题目ID：不设外键，避免与problems.cluster_id形成循环依赖
+    canonical_problem_id = Column(Integer, nullable=True)
+    
+    # 代表题目的去重指纹
+    content_hash = Column(String(64), nullable=False)
+    
+    # 代表题目的MinHash签名，用于确认近似重复
+    minhash = Column(LargeBinary, nullable=True)
+    
+    # 簇中的题目数
+    member_count = Column(Integer, nullable=False, default=1)
+    
+    # 创建时间
+    created_at = Column(UTCDateTime, default=utcnow)
+
+
+class ProblemSignature(Base):
+    """题目签名模型
+    
+    去重查找用的签名键：精确指纹键（每种规范化文本一个）和簇代表题目的LSH段键。
+    按签名键的主键点查得到候选簇，查找开销与题目总数无关。
+    SQLite中是WITHOUT ROWID表，签名键索引就是表本身。
+    
+    字段说明：
+    - signature: 64位签名键（联合主键）
+    - cluster_id: 题目簇ID（外键，联合主键）
+    """
+    __tablename__ = "problem_signatures"
+    
+    # 签名键：精确指纹或LSH段的64位哈希
+    signature = Column(BigInteger, primary_key=True, autoincrement=False)
+    
+    # 题目簇ID：不同的簇可能有相同的段键
+    cluster_id = Column(Integer, ForeignKey("problem_clusters.id", ondelete="CASCADE"), primary_key=True)
+    
+    __table_args__ = {"sqlite_with_rowid": False}
+
+
+# 标签类型：知识点标签（Problem.knowledge_tags）与用户自定义标签（Problem.tags）
+TAG_KIND_KNOWLEDGE = "knowledge"
+TAG_KIND_USER = "user"
+
+
+class Tag(Base):
+    """标签模型
+    
+    知识点标签和用户自定义标签的规范化存储，每个(kind, name)只有一行。
+    题目与标签的对应关系记录在ProblemTag中，用于按标签筛选题目时走索引连接，
+    而不是逐行解析Problem.knowledge_tags / Problem.tags中的JSON。
+    
+    字段说明：
+    - id: 主键，自增整数
+    - kind: 标签类型（\"knowledge\"知识点标签、\"user\"用户自定义标签）
+    - name: 标签名称（如\"导数\"、\"易错\"）
+    """
+    __tablename__ = "tags"
+    
+    # 主键字段
+    id = Column(Integer, primary_key=True)
+    
+    # 标签类型：知识点标签与用户标签同名时是两个不同的标签
+    kind = Column(String(16), nullable=False)
+    
+    # 标签名称
+    name = Column(String(128), nullable=False)
+    
+    # 唯一约束：按(kind, name)查找标签ID
+    __table_args__ = (
+        UniqueConstraint("kind", "name", name="uq_tags_kind_name"),
+    )
+
+
+class ProblemTag(Base):
+    """题目-标签关联模型
+    
+    与Problem.knowledge_tags / Problem.tags保持同步（由crud_async在创建和更新题目时维护），
+    JSON列仍用于返回题目详情，关联表用于按标签筛选。
+    
+    字段说明：
+    - problem_id: 题目ID（外键，联合主键）
+    - tag_id: 标签ID（外键，联合主键）
+    """
+    __tablename__ = "problem_tags"
+    
+    # 题目ID：联合主键(problem_id, tag_id)同时用于查询某道题的所有标签
+    problem_id = Column(Integer, ForeignKey("problems.id", ondelete="CASCADE"), primary_key=True)
+    
+    # 标签ID
+    tag_id = Column(Integer, ForeignKey("tags.id", ondelete="CASCADE"), primary_key=True)
+    
+    # 复合索引：按标签查找题目（筛选时从标签出发的索引范围扫描）
+    __table_args__ = (
+        Index("ix_problem_tags_tag_problem", "tag_id", "problem_id"),
+    )
+
+
+class RecommendationEntry(Base):
+    """推荐索引模型
+    
+    题目推荐用的预计算索引（见recommend模块），每道有难度的题目的每个知识点标签一行。
+    按 (知识点, 可见范围, 难度) 定位后按热度从高到低读取，
+    选取候选题目时只读取索引中的少量行，不扫描题目表。
+    由crud_async在创建和更新题目、记录答题时维护。
+    
+    字段说明：
+    - problem_id: 题目ID（外键，联合主键）
+    - tag_id: 知识点标签ID（外键，联合主键）
+    - owner_key: 题目所有者的用户ID，系统题目（owner_id为空）为0
+    - subject: 学科
+    - difficulty: 难度（1-5）
+    - popularity: 热度（该题的答题次数）
+    """
+    __tablename__ = "recommendation_index"
+    
+    # 题目ID：联合主键(problem_id, tag_id)同时用于更新某道题的热度
+    problem_id = Column(Integer, ForeignKey("problems.id", ondelete="CASCADE"), primary_key=True)
+    
+    # 知识点标签ID
+    tag_id = Column(Integer, ForeignKey("tags.id", ondelete="CASCADE"), primary_key=True)
+    
+    # 可见范围：系统题目为0，否则为所有者的用户ID（用户只能看到系统题目和自己的题目）
+    owner_key = Column(Integer, nullable=False)
+    
+    # 学科：冗余自题目，用于按学科筛选推荐
+    subject = Column(String(64), nullable=True)
+    
+    # 难度：冗余自题目
+    difficulty = Column(Integer, nullable=False)
+    
+    # 热度：答题次数，每次答题时加一
+    popularity = Column(Integer, nullable=False, default=0)
+    
+    # 复合索引：每个 (知识点, 可见范围, 难度) 是一段按热度排序的索引范围
+    __table_args__ = (
+        Index("ix_recommendation_index_lookup", "tag_id", "owner_key", "difficulty", "popularity", "problem_id"),
+    )
 
 
 class Attempt(Base):
@@ -167,13 +387,20 @@ class Attempt(Base):
     score = Column(Float, nullable=True)
     
     # 答题提交时间：自动记录为当前UTC时间
-    submitted_at = Column(DateTime, default=datetime.datetime.utcnow)
+    submitted_at = Column(UTCDateTime, default=utcnow)
     
     # 与User建立关系：一个用户可以有多次答题记录
     user = relationship("User")
     
     # 与Problem建立关系：一道题可以被多个用户答过
     problem = relationship("Problem")
+    
+    # 按用户和时间顺序读取答题历史（重放掌握度、统计学习趋势）；
+    # 按用户和题目查找答题记录（推荐时排除已做对的题目）
+    __table_args__ = (
+        Index("ix_attempts_user_submitted_at", "user_id", "submitted_at", "id"),
+        Index("ix_attempts_user_problem", "user_id", "problem_id"),
+    )
 
 
 class TopicMastery(Base):
@@ -186,7 +413,12 @@ class TopicMastery(Base):
     - id: 主键，自增整数
     - user_id: 用户ID（外键）
     - topic: 学习主题名称（如\"代数\"、\"几何\"等）
-    - mastery: 掌握度分数（0.0-1.0，表示0%-100%）
+    - mastery: 掌握度分数（0.0-1.0，表示0%-100%），即掌握该主题的概率（见mastery模块）
+    - attempts: 计入掌握度的答题次数
+    - correct: 其中答对的次数
+    - updated_at: 最近一次更新时间
+    
+    每个用户的每个主题只有一行（user_id, topic联合唯一），每次答题只更新所涉及主题的行。
     
     关系：
     - user: 关联到User模型，表示学生
@@ -204,8 +436,412 @@ class TopicMastery(Base):
     topic = Column(String(128), index=True)
     
     # 掌握度分数：范围0.0-1.0，0表示完全不懂，1表示完全掌握
-    # 可通过用户答题情况动态计算更新
+    # 每次答题后由mastery模块按贝叶斯知识追踪增量更新
     mastery = Column(Float, default=0.0)
     
+    # 答题次数与答对次数
+    attempts = Column(Integer, default=0)
+    correct = Column(Integer, default=0)
+    
+    # 最近一次更新时间
+    updated_at = Column(UTCDateTime, nullable=True)
+    
     # 与User建立关系：一个用户可以对应多个主题的掌握度记录
     user = relationship("User")
+    
+    # 同一用户的同一主题只有一行，答题时按 (user_id, topic) 定位并加锁
+    __table_args__ = (
+        Index("ux_topic_mastery_user_topic", "user_id", "topic", unique=True),
+    )
+
+
+class MasteryRollup(Base):
+    """学习趋势汇总模型
+    
+    按用户、粒度、时间桶和主题预先汇总答题情况，GET /profile 的学习趋势只读取查询范围内的桶（见rollups模块）。
+    
+    字段说明：
+    - id: 主键，自增整数
+    - user_id: 用户ID（外键）
+    - granularity: 粒度（\"day\"、\"week\"、\"month\"）
+    - bucket_start: 桶的起始日期（周桶为周一，月桶为1日，UTC）
+    - topic: 主题名称，空字符串表示全部主题（每次答题计一次）
+    - attempts: 桶内计入掌握度的答题次数
+    - correct: 其中答对的次数
+    - mastery: 桶内最后一次答题后的掌握度快照（全部主题行为空）
+    """
+    __tablename__ = "mastery_rollups"
+    
+    # 主键字段
+    id = Column(Integer, primary_key=True, index=True)
+    
+    # 用户ID（外键）
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    
+    # 粒度与桶的起始日期
+    granularity = Column(String(8), nullable=False)
+    bucket_start = Column(Date, nullable=False)
+    
+    # 主题名称（与TopicMastery.topic一致），空字符串表示全部主题
+    topic = Column(String(128), nullable=False)
+    
+    # 答题次数与答对次数
+    attempts = Column(Integer, default=0)
+    correct = Column(Integer, default=0)
+    
+    # 掌握度快照
+    mastery = Column(Float, nullable=True)
+    
+    # 每次答题按该唯一约束累加到已有的桶（ON CONFLICT DO UPDATE），查询按 (user_id, granularity, bucket_start) 范围扫描
+    __table_args__ = (
+        UniqueConstraint("user_id", "granularity", "bucket_start", "topic", name="uq_mastery_rollups_bucket"),
+    )
+
+
+class Mistake(Base):
+    """错题本模型
+    
+    每个用户答错过的每道题一行，答题时维护（见mistakes模块），
+    冗余保存题目的学科、难度和最近一次答题的状态，错题本的筛选和分面统计只读取该用户的行，不扫描答题记录。
+    
+    字段说明：
+    - user_id: 用户ID（外键，联合主键）
+    - problem_id: 题目ID（外键，联合主键）
+    - subject: 学科（冗余自题目）
+    - difficulty: 难度（冗余自题目）
+    - attempts: 第一次答错以来计入结果的答题次数（含第一次答错）
+    - wrong: 其中答错的次数
+    - last_correct: 最近一次答题是否答对（重做答对后为True）
+    - first_wrong_at / last_wrong_at: 第一次 / 最近一次答错的时间
+    - last_attempt_at: 最近一次答题时间
+    - mastered: 是否已标记为掌握（再次答错时清除）
+    - mastered_at: 标记为掌握的时间
+    """
+    __tablename__ = "mistakes"
+    
+    # 用户ID与题目ID：联合主键，答题时按主键定位
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    problem_id = Column(Integer, ForeignKey("problems.id", ondelete="CASCADE"), primary_key=True)
+    
+    # 题目分面：题目更新时同步
+    subject = Column(String(64), nullable=True)
+    difficulty = Column(Integer, nullable=True)
+    
+    # 答题统计
+    attempts = Column(Integer, nullable=False, default=1)
+    wrong = Column(Integer, nullable=False, default=1)
+    last_correct = Column(Boolean, nullable=False, default=False)
+    
+    # 时间
+    first_wrong_at = Column(UTCDateTime, nullable=False)
+    last_wrong_at = Column(UTCDateTime, nullable=False)
+    last_attempt_at = Column(UTCDateTime, nullable=False)
+    
+    # 掌握标记
+    mastered = Column(Boolean, nullable=False, default=False)
+    mastered_at = Column(UTCDateTime, nullable=True)
+    
+    # 复合索引：错题列表按 (last_wrong_at, problem_id) 从新到旧分页，
+    # 常用的筛选条件（掌握状态、学科）各有一个以它们为前缀的索引，时间范围是同一索引上的范围扫描；
+    # 按problem_id查找用于题目更新时同步分面
+    __table_args__ = (
+        Index("ix_mistakes_user_wrong_at", "user_id", "last_wrong_at", "problem_id"),
+        Index("ix_mistakes_user_mastered_wrong_at", "user_id", "mastered", "last_wrong_at", "problem_id"),
+        Index("ix_mistakes_user_subject_wrong_at", "user_id", "subject", "last_wrong_at", "problem_id"),
+        Index("ix_mistakes_problem", "problem_id"),
+    )
+
+
+class MistakeTag(Base):
+    """错题-知识点关联模型
+    
+    错题本中每道题的知识点标签（题目problem_tags中的知识点标签按用户冗余一份），
+    按知识点筛选错题和统计知识点分面时只读取该用户的行。
+    
+    字段说明：
+    - user_id: 用户ID（联合主键）
+    - tag_id: 知识点标签ID（外键，联合主键）
+    - problem_id: 题目ID（外键，联合主键）
+    """
+    __tablename__ = "mistake_tags"
+    
+    # 联合主键 (user_id, tag_id, problem_id)：按 (用户, 知识点) 范围扫描得到错题
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    tag_id = Column(Integer, ForeignKey("tags.id", ondelete="CASCADE"), primary_key=True)
+    problem_id = Column(Integer, ForeignKey("problems.id", ondelete="CASCADE"), primary_key=True)
+    
+    # 按题目查找：题目的知识点变化时重建关联；按 (题目, 用户) 查找一道错题的知识点（统计知识点分面）
+    __table_args__ = (
+        Index("ix_mistake_tags_problem_user", "problem_id", "user_id"),
+    )
+
+
+class ReviewState(Base):
+    """复习计划模型（间隔重复，SM-2）
+
+    每个用户做过的每道题一行，记录该题的复习间隔、难易系数和下次复习时间，
+    每次答题时增量更新（见reviews模块）。"现在该复习哪些题"是 (user_id, due_at) 索引上的有界范围读取。
+
+    字段说明：
+    - user_id: 用户ID（外键，联合主键）
+    - problem_id: 题目ID（外键，联合主键）
+    - repetitions: 连续答对（复习成功）的次数，答错时清零
+    - interval_days: 当前复习间隔（天）
+    - ease: 难易系数（SM-2的EF，越大间隔增长越快，最小1.3）
+    - lapses: 答错（遗忘）的次数
+    - reviews: 计入复习的答题次数
+    - last_quality: 最近一次答题的评分（0-5）
+    - last_reviewed_at: 最近一次答题时间
+    - due_at: 下次复习时间（最近一次答题时间 + 复习间隔）
+    """
+    __tablename__ = "review_states"
+
+    # 用户ID与题目ID：联合主键，答题时按主键定位
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    problem_id = Column(Integer, ForeignKey("problems.id", ondelete="CASCADE"), primary_key=True)
+
+    # SM-2状态
+    repetitions = Column(Integer, nullable=False, default=0)
+    interval_days = Column(Integer, nullable=False, default=0)
+    ease = Column(Float, nullable=False, default=2.5)
+
+    # 答题统计
+    lapses = Column(Integer, nullable=False, default=0)
+    reviews = Column(Integer, nullable=False, default=0)
+    last_quality = Column(Integer, nullable=True)
+
+    # 时间
+    last_reviewed_at = Column(UTCDateTime, nullable=True)
+    due_at = Column(UTCDateTime, nullable=False)
+
+    # 复合索引：到期队列按 (due_at, problem_id) 从早到晚读取该用户 due_at <= 当前时间 的前若干行
+    __table_args__ = (
+        Index("ix_review_states_user_due", "user_id", "due_at", "problem_id"),
+    )
+
+
+class UploadSession(Base):
+    """分片上传会话模型
+    
+    记录一次可断点续传的大文件上传（多页PDF、多张照片等）。
+    客户端创建会话后逐个上传编号分片，全部上传后提交会话，
+    服务端按编号顺序拼接分片写入Blob存储并创建题目。
+    
+    字段说明：
+    - id: 会话ID（随机生成的十六进制字符串）
+    - owner_id: 上传用户ID（外键）
+    - filename: 原始文件名
+    - mime_type: 文件MIME类型
+    - problem_meta: 创建题目时使用的元数据（JSON格式）
+    - status: 会话状态（\"open\"上传中、\"completed\"已完成）
+    - problem_id: 提交成功后创建的题目ID
+    - created_at: 会话创建时间
+    - expires_at: 会话过期时间，过期后会话和已上传分片会被回收
+    
+    关系：
+    - owner: 关联到User模型
+    - parts: 已上传的分片列表（按分片编号排序）
+    """
+    __tablename__ = "upload_sessions"
+    
+    # 主键字段：随机会话ID
+    id = Column(String(64), primary_key=True)
+    
+    # 上传用户ID
+    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    
+    # 原始文件名
+    filename = Column(String(256), nullable=True)
+    
+    # 文件MIME类型
+    mime_type = Column(String(128), nullable=True)
+    
+    # 题目元数据：JSON对象，提交时用于创建题目
+    problem_meta = Column(JSONType, nullable=True)
+    
+    # 会话状态：\"open\"表示上传中，\"completed\"表示已提交
+    status = Column(String(16), default="open")
+    
+    # 提交后创建的题目ID（重复提交时直接返回该题目）
+    problem_id = Column(Integer, ForeignKey("problems.id"), nullable=True)
+    
+    # 会话创建时间
+    created_at = Column(UTCDateTime, default=utcnow)
+    
+    # 会话过期时间：需要索引以支持过期会话回收
+    expires_at = Column(UTCDateTime, nullable=False, index=True)
+    
+    # 与User建立关系
+    owner = relationship("User")
+    
+    # 已上传的分片：删除会话时一并删除
+    parts = relationship(
+        "UploadPart",
+        cascade="all, delete-orphan",
+        order_by="UploadPart.part_number",
+    )
+
+
+class UploadPart(Base):
+    """上传分片模型
+    
+    记录分片上传会话中已成功接收并校验的分片。
+    分片内容暂存在磁盘上，会话提交后删除。
+    
+    字段说明：
+    - session_id: 所属会话ID（外键，联合主键）
+    - part_number: 分片编号，从1开始（联合主键）
+    - size: 分片字节数
+    - sha256: 分片内容的SHA-256摘要
+    - uploaded_at: 分片上传时间
+    """
+    __tablename__ = "upload_parts"
+    
+    # 所属会话ID
+    session_id = Column(String(64), ForeignKey("upload_sessions.id"), primary_key=True)
+    
+    # 分片编号：从1开始，重复上传同一编号会覆盖旧分片
+    part_number = Column(Integer, primary_key=True)
+    
+    # 分片字节数
+    size = Column(Integer, nullable=False)
+    
+    # 分片内容的SHA-256摘要
+    sha256 = Column(String(64), nullable=False)
+    
+    # 分片上传时间
+    uploaded_at = Column(UTCDateTime, default=utcnow)
+
+
+class SolveResultEntry(Base):
+    """求解结果缓存模型
+    
+    按 (规范化题目哈希, 求解模式, 求解器版本) 保存求解结果，
+    相同题目再次求解时直接返回，不重新调用求解引擎。读写逻辑见solve_cache模块。
+    
+    字段说明：
+    - id: 主键，自增整数
+    - content_hash: 题目规范化文本的SHA-256（见dedup.content_hash）
+    - mode: 求解模式（structured、direct）
+    - solver_version: 产生该结果的求解器版本，升级求解器后旧版本的结果不再命中
+    - result: 求解结果（thoughts、steps、answer，JSON格式）
+    - created_at: 求解时间
+    - expires_at: 过期时间，过期的结果不再命中并会被清理
+    """
+    __tablename__ = "solve_results"
+    __table_args__ = (
+        UniqueConstraint("content_hash", "mode", "solver_version", name="uq_solve_results_key"),
+    )
+    
+    # 主键字段
+    id = Column(Integer, primary_key=True)
+    
+    # 题目规范化文本的SHA-256
+    content_hash = Column(String(64), nullable=False)
+    
+    # 求解模式
+    mode = Column(String(32), nullable=False)
+    
+    # 求解器版本
+    solver_version = Column(String(64), nullable=False)
+    
+    # 求解结果
+    result = Column(JSONType, nullable=False)
+    
+    # 求解时间
+    created_at = Column(UTCDateTime, default=utcnow)
+    
+    # 过期时间：清理过期结果时按该索引查询
+    expires_at = Column(UTCDateTime, nullable=False, index=True)
+
+
+class Job(Base):
+    """异步任务模型
+    
+    求解等耗时操作作为任务写入jobs表，由工作进程（见jobs模块）按优先级领取执行，
+    客户端通过GET /jobs/{id}轮询或订阅SSE获取结果。
+    
+    字段说明：
+    - id: 主键，自增整数
+    - kind: 任务类型（如\"solve\"）
+    - owner_id: 提交任务的用户ID（外键）
+    - status: 任务状态（\"queued\"排队中、\"waiting\"等待相同的任务、\"running\"执行中、\"succeeded\"成功、\"failed\"失败）
+    - priority: 优先级，数值大的先执行
+    - payload: 任务参数（JSON格式）
+    - result: 任务结果（JSON格式，成功后写入）
+    - error: 最近一次失败的原因
+    - attempts: 已执行次数
+    - max_attempts: 最多执行次数，失败后未达到该次数时重新排队
+    - run_after: 最早执行时间（重试时按退避时间推迟）
+    - lease_expires_at: 执行中任务的租约到期时间，工作进程异常退出后任务在租约到期时重新排队
+    - worker_id: 正在执行任务的工作者标识
+    - leader_job_id: 合并到的进行中的相同任务（status为waiting时），该任务完成时本任务随之完成
+    - created_at: 提交时间
+    - started_at: 最近一次开始执行的时间
+    - finished_at: 完成（成功或最终失败）时间
+    """
+    __tablename__ = "jobs"
+    __table_args__ = (
+        # 领取任务：WHERE status='queued' ORDER BY priority DESC, id
+        Index("ix_jobs_claim", "status", "priority", "id"),
+    )
+    
+    # 主键字段
+    id = Column(Integer, primary_key=True)
+    
+    # 任务类型
+    kind = Column(String(32), nullable=False)
+    
+    # 提交任务的用户ID
+    owner_id = Column(Integer, ForeignKey("users.id"), nullable=True, index=True)
+    
+    # 任务状态
+    status = Column(String(16), nullable=False, default="queued")
+    
+    # 优先级
+    priority = Column(Integer, nullable=False, default=0)
+    
+    # 任务参数与结果
+    payload = Column(JSONType, nullable=True)
+    result = Column(JSONType, nullable=True)
+    error = Column(Text, nullable=True)
+    
+    # 执行次数
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=1)
+    
+    # 调度与租约
+    run_after = Column(UTCDateTime, nullable=False, default=utcnow)
+    lease_expires_at = Column(UTCDateTime, nullable=True)
+    worker_id = Column(String(64), nullable=True)
+    
+    # 合并到的相同任务：该任务完成时按此索引找到等待的任务
+    leader_job_id = Column(Integer, nullable=True, index=True)
+    
+    # 时间戳
+    created_at = Column(UTCDateTime, default=utcnow)
+    started_at = Column(UTCDateTime, nullable=True)
+    finished_at = Column(UTCDateTime, nullable=True)
+
+
+class JobFlight(Base):
+    """进行中任务的锁表（单飞）
+    
+    相同输入的任务（如求解同一道题）同时只执行一个：第一个任务写入key对应的行成为执行者，
+    其他进程、其他API进程中提交的相同任务发现该行后只等待它完成。逻辑见jobs模块。
+    
+    字段说明：
+    - key: 任务输入的标识（如 \"solve:<题目哈希>:<模式>:<求解器版本>\"）
+    - job_id: 执行该输入的任务ID
+    - expires_at: 锁的过期时间，执行任务异常丢失时过期的锁可以被新任务接管
+    """
+    __tablename__ = "job_flights"
+    
+    # 任务输入的标识
+    key = Column(String(160), primary_key=True)
+    
+    # 执行该输入的任务ID
+    job_id = Column(Integer, nullable=False, index=True)
+    
+    # 锁的过期时间
+    expires_at = Column(UTCDateTime, nullable=False)
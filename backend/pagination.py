@@ -0,0 +1,112 @@
+"""键集（游标）分页模块
+
+按 (created_at, id) 排序分页：下一页的条件是"排在上一页最后一行之后"，
+配合 (…, created_at, id) 复合索引，每一页都是一次有界的索引范围扫描，
+翻到第一万页和第一页一样快（OFFSET 分页需要先扫描并丢弃前面所有行）。
+
+游标对客户端是不透明的字符串：上一页最后一行的 (created_at, id) 的base64url编码。
+"""
+
+import base64
+import datetime
+import json
+
+from sqlalchemy import tuple_
+
+# 每页默认条数与最大条数
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class InvalidCursor(ValueError):
+    """游标格式无效（被篡改或来自不兼容的版本）"""
+
+
+def encode_cursor(created_at: datetime.datetime, row_id: int) -> str:
+    """把排序键编码为不透明的游标字符串"""
+    payload = json.dumps([created_at.isoformat(), row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    """把游标字符串解码为 (created_at, id)
+
+    异常：
+        InvalidCursor: 游标格式无效
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return datetime.datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, TypeError, UnicodeError):
+        raise InvalidCursor(cursor)
+
+
+def apply_keyset(query, created_column, id_column, cursor: str = None, limit: int = DEFAULT_PAGE_SIZE, descending: bool = False):
+    """为查询加上键集分页的筛选、排序和LIMIT（多取一行用于判断是否还有下一页）
+
+    query既可以是Session.query()返回的Query，也可以是select()语句（供异步会话使用）。
+
+    返回：
+        (处理后的查询, 实际每页条数)
+
+    异常：
+        InvalidCursor: 游标格式无效
+    """
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    key = tuple_(created_column, id_column)
+    if cursor:
+        last = tuple_(*decode_cursor(cursor))
+        query = query.filter(key < last if descending else key > last)
+    if descending:
+        query = query.order_by(created_column.desc(), id_column.desc())
+    else:
+        query = query.order_by(created_column.asc(), id_column.asc())
+    return query.limit(limit + 1), limit
+
+
+def split_page(rows, created_column, id_column, limit: int):
+    """把apply_keyset查询得到的行切分为 (本页对象列表, 下一页游标)"""
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last_row = rows[-1]
+        next_cursor = encode_cursor(
+            getattr(last_row, created_column.key), getattr(last_row, id_column.key)
+        )
+    return rows, next_cursor
+
+
+def paginate(query, created_column, id_column, cursor: str = None, limit: int = DEFAULT_PAGE_SIZE, descending: bool = False):
+    """对查询应用键集分页
+
+    参数：
+        query: SQLAlchemy查询对象（已应用筛选条件）
+        created_column: 排序用的时间列，如models.Problem.created_at
+        id_column: 排序用的主键列，如models.Problem.id
+        cursor: 上一页返回的游标（None表示第一页）
+        limit: 每页条数（会被限制在1到MAX_PAGE_SIZE之间）
+        descending: True按从新到旧排序，False按从旧到新排序
+
+    返回：
+        (本页对象列表, 下一页游标)，没有下一页时游标为None
+
+    异常：
+        InvalidCursor: 游标格式无效
+    """
+    query, limit = apply_keyset(query, created_column, id_column, cursor, limit, descending)
+    return split_page(query.all(), created_column, id_column, limit)
+
+
+async def paginate_async(session, stmt, created_column, id_column, cursor: str = None, limit: int = DEFAULT_PAGE_SIZE, descending: bool = False, scalars: bool = True):
+    """paginate的异步版本：在AsyncSession上执行select()语句，参数和返回值同paginate
+
+    scalars为True时返回每行的第一列（select(Model)得到ORM对象）；
+    为False时返回结果行本身，用于直接选择列的查询（结果行需包含排序用的列）。
+    """
+    stmt, limit = apply_keyset(stmt, created_column, id_column, cursor, limit, descending)
+    if scalars:
+        rows = (await session.scalars(stmt)).all()
+    else:
+        rows = (await session.execute(stmt)).all()
+    return split_page(rows, created_column, id_column, limit)
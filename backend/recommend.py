@@ -0,0 +1,296 @@
+"""自适应题目推荐模块
+
+GET /recommendations 为用户推荐"略高于当前水平"的题目：
+1. 取该用户掌握度最低的几个主题（TopicMastery，只取有对应知识点标签的主题）
+2. 按主题掌握度确定目标难度段：掌握度线性映射到1-5的当前水平，目标是高于当前水平的BAND_WIDTH个难度
+3. 从预计算的推荐索引（recommendation_index，见models.RecommendationEntry）中，
+   对每个 (主题, 可见范围, 难度) 按热度从高到低读取少量候选，排除用户已经做对的题目，
+   各主题轮流取题（最弱的主题优先）
+
+索引由crud_async维护：创建和更新题目时重建该题的索引行（replace_entries_stmts），
+每次答题时该题的热度加一（bump_popularity_stmt）；已有数据由数据迁移回填（rebuild_stmts）。
+每次选取候选都是若干次有界的索引范围扫描，与题目总数无关。
+
+推荐结果按用户缓存在进程内（recommendation_cache），记录答题（掌握度变化）时失效；
+题目变化和其他进程中的答题最迟在TTL到期后生效。
+
+该模块只构造SQL语句和处理查询结果，由crud_async和migrations共用。
+"""
+
+import itertools
+import os
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import and_, delete, func, insert, literal, or_, select, union_all
+
+import cache
+import mastery
+import metrics
+import models
+
+# 难度范围
+MIN_DIFFICULTY = 1
+MAX_DIFFICULTY = 5
+
+# 目标难度段包含的难度数（从当前水平之上的第一个难度开始）
+BAND_WIDTH = 2
+
+# 参与推荐的最弱主题数
+WEAK_TOPICS = 3
+
+# 每页推荐条数的默认值与上限
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+
+# 每个 (主题, 可见范围, 难度) 读取的候选数 = limit * CANDIDATE_FACTOR（留出被排除的已做对的题目）
+CANDIDATE_FACTOR = 2
+
+# 系统题目（owner_id为空）在索引中的owner_key
+SHARED_OWNER = 0
+
+# 推荐结果缓存容量与TTL（秒），可通过环境变量调整
+CACHE_SIZE = int(os.environ.get("STUDY_HELPER_RECOMMENDATION_CACHE_SIZE", 10000))
+CACHE_TTL = float(os.environ.get("STUDY_HELPER_RECOMMENDATION_CACHE_TTL", 300))
+
+recommendation_cache = cache.TTLCache(maxsize=CACHE_SIZE, ttl=CACHE_TTL)
+
+hits_total = metrics.counter("recommendation_cache_hits_total", "命中进程内缓存的推荐请求数")
+misses_total = metrics.counter("recommendation_cache_misses_total", "未命中缓存、查询推荐索引的推荐请求数")
+
+# 每个用户的缓存代数：失效时换成新的代数，旧代数的条目不再被读取（随LRU / TTL淘汰）
+_generations: Dict[int, int] = {}
+_generation_counter = itertools.count(1)
+
+
+class WeakTopic(NamedTuple):
+    """参与推荐的主题"""
+    topic: str
+    mastery: float
+    tag_id: int
+
+
+# ==================== 缓存 ====================
+
+def cache_key(user_id: int, limit: int, subject: Optional[str]) -> tuple:
+    """推荐结果的缓存键（包含该用户当前的缓存代数）
+
+    在查询数据库之前计算：查询期间缓存被失效时，结果写入旧代数的键，不会被之后的请求读到。
+    """
+    return user_id, _generations.get(user_id, 0), limit, subject
+
+
+def lookup(key: tuple):
+    """读取缓存的推荐结果，未命中时返回None"""
+    result = recommendation_cache.get(key)
+    (misses_total if result is None else hits_total).inc()
+    return result
+
+
+def remember(key: tuple, result: List[dict]) -> None:
+    """缓存推荐结果"""
+    recommendation_cache.set(key, result)
+
+
+def invalidate(user_id: int) -> None:
+    """使用户的推荐结果失效（掌握度变化时调用）"""
+    _generations[user_id] = next(_generation_counter)
+
+
+# ==================== 目标难度 ====================
+
+def target_band(p_known: float) -> Tuple[int, int]:
+    """按掌握度确定目标难度段 (最低难度, 最高难度)
+
+    掌握度0对应难度1、掌握度1对应难度5，目标是高于该水平的BAND_WIDTH个难度，
+    已经处于最高水平时只推荐最高难度。
+    """
+    level = MIN_DIFFICULTY + p_known * (MAX_DIFFICULTY - MIN_DIFFICULTY)
+    low = min(int(level) + 1, MAX_DIFFICULTY)
+    return low, min(low + BAND_WIDTH - 1, MAX_DIFFICULTY)
+
+
+# ==================== 索引维护 ====================
+
+def owner_key(owner_id: Optional[int]) -> int:
+    """题目所有者在索引中的owner_key"""
+    return owner_id or SHARED_OWNER
+
+
+def popularity_stmt(problem_id: int):
+    """题目当前的热度（索引中没有该题时为None）"""
+    table = models.RecommendationEntry.__table__
+    return select(func.max(table.c.popularity)).where(table.c.problem_id == problem_id)
+
+
+def replace_entries_stmts(problem: models.Problem, popularity: Optional[int] = None):
+    """重建一道题的索引行：先删除旧行，有难度时再按题目的知识点标签关联插入新行
+
+    在题目的标签关联（problem_tags）更新之后执行，popularity为重建前的热度。
+
+    返回：
+        需要按顺序执行的语句列表
+    """
+    table = models.RecommendationEntry.__table__
+    stmts = [delete(table).where(table.c.problem_id == problem.id)]
+    if problem.difficulty is not None:
+        problem_tags, tags = models.ProblemTag.__table__, models.Tag.__table__
+        rows = (
+            select(
+                problem_tags.c.problem_id,
+                problem_tags.c.tag_id,
+                literal(owner_key(problem.owner_id)),
+                literal(problem.subject, models.RecommendationEntry.subject.type),
+                literal(problem.difficulty),
+                literal(popularity or 0),
+            )
+            .join(tags, tags.c.id == problem_tags.c.tag_id)
+            .where(problem_tags.c.problem_id == problem.id, tags.c.kind == models.TAG_KIND_KNOWLEDGE)
+        )
+        stmts.append(insert(table).from_select(
+            ["problem_id", "tag_id", "owner_key", "subject", "difficulty", "popularity"], rows
+        ))
+    return stmts
+
+
+def bump_popularity_stmt(problem_id: int):
+    """答题后该题的热度加一"""
+    table = models.RecommendationEntry.__table__
+    return table.update().where(table.c.problem_id == problem_id).values(popularity=table.c.popularity + 1)
+
+
+def rebuild_stmts():
+    """按已有题目、标签关联和答题记录重建整个索引（数据迁移使用）"""
+    table = models.RecommendationEntry.__table__
+    problems, problem_tags, tags = models.Problem.__table__, models.ProblemTag.__table__, models.Tag.__table__
+    attempts = models.Attempt.__table__
+    counts = (
+        select(attempts.c.problem_id, func.count().label("n"))
+        .group_by(attempts.c.problem_id)
+        .subquery()
+    )
+    rows = (
+        select(
+            problems.c.id,
+            problem_tags.c.tag_id,
+            func.coalesce(problems.c.owner_id, SHARED_OWNER),
+            problems.c.subject,
+            problems.c.difficulty,
+            func.coalesce(counts.c.n, 0),
+        )
+        .join(problem_tags, problem_tags.c.problem_id == problems.c.id)
+        .join(tags, tags.c.id == problem_tags.c.tag_id)
+        .outerjoin(counts, counts.c.problem_id == problems.c.id)
+        .where(problems.c.difficulty.isnot(None), tags.c.kind == models.TAG_KIND_KNOWLEDGE)
+    )
+    return [
+        delete(table),
+        insert(table).from_select(["problem_id", "tag_id", "owner_key", "subject", "difficulty", "popularity"], rows),
+    ]
+
+
+# ==================== 查询 ====================
+
+def weak_topics_stmt(user_id: int, count: int = WEAK_TOPICS):
+    """用户掌握度最低的count个主题（只包括有对应知识点标签的主题），结果行为 (topic, mastery, tag_id)"""
+    topic_mastery, tags = models.TopicMastery.__table__, models.Tag.__table__
+    return (
+        select(topic_mastery.c.topic, topic_mastery.c.mastery, tags.c.id)
+        .join(tags, and_(tags.c.kind == models.TAG_KIND_KNOWLEDGE, tags.c.name == topic_mastery.c.topic))
+        .where(topic_mastery.c.user_id == user_id)
+        .order_by(topic_mastery.c.mastery, topic_mastery.c.topic)
+        .limit(count)
+    )
+
+
+def candidates_stmt(user_id: int, topics: Iterable[WeakTopic], per_branch: int, subject: Optional[str] = None):
+    """每个 (主题, 可见范围, 难度) 按热度读取前per_branch个候选，合并为一条UNION ALL语句
+
+    每个分支是 ix_recommendation_index_lookup 上的一段有界范围扫描（subject只在范围内过滤）。
+    结果行为 (problem_id, tag_id, difficulty, popularity)。
+    """
+    table = models.RecommendationEntry.__table__
+    branches = []
+    for topic in topics:
+        low, high = target_band(topic.mastery)
+        for owner in (SHARED_OWNER, user_id):
+            for difficulty in range(low, high + 1):
+                branch = (
+                    select(table.c.problem_id, table.c.tag_id, table.c.difficulty, table.c.popularity)
+                    .where(table.c.tag_id == topic.tag_id, table.c.owner_key == owner,
+                           table.c.difficulty == difficulty)
+                    .order_by(table.c.popularity.desc(), table.c.problem_id.desc())
+                    .limit(per_branch)
+                )
+                if subject:
+                    branch = branch.where(table.c.subject == subject)
+                branches.append(select(branch.subquery()))
+    return union_all(*branches)
+
+
+def solved_stmt(user_id: int, problem_ids: Iterable[int]):
+    """problem_ids中用户已经做对过的题目（判定方式同mastery.outcome）"""
+    attempts = models.Attempt.__table__
+    return (
+        select(attempts.c.problem_id)
+        .where(
+            attempts.c.user_id == user_id,
+            attempts.c.problem_id.in_(list(problem_ids)),
+            or_(
+                attempts.c.correct.is_(True),
+                and_(attempts.c.correct.is_(None), attempts.c.score >= mastery.PASS_SCORE),
+            ),
+        )
+        .distinct()
+    )
+
+
+def pick(topics: List[WeakTopic], candidates: Iterable, solved: Iterable[int], limit: int) -> List[dict]:
+    """从候选中选出推荐
+
+    每个主题的候选按热度从高到低（同热度时难度低的优先）排列，
+    各主题轮流取一道（最弱的主题优先），跳过已做对和已选过的题目。
+
+    返回：
+        [{problem_id, topic, mastery, popularity}]
+    """
+    by_tag: Dict[int, list] = {topic.tag_id: [] for topic in topics}
+    for row in candidates:
+        by_tag[row.tag_id].append(row)
+    queues = [
+        (topic, iter(sorted(by_tag[topic.tag_id], key=lambda r: (-r.popularity, r.difficulty, -r.problem_id))))
+        for topic in topics
+    ]
+    excluded = set(solved)
+    picked: List[dict] = []
+    while queues and len(picked) < limit:
+        remaining = []
+        for topic, queue in queues:
+            for row in queue:
+                if row.problem_id not in excluded:
+                    excluded.add(row.problem_id)
+                    picked.append({
+                        "problem_id": row.problem_id, "topic": topic.topic,
+                        "mastery": topic.mastery, "popularity": row.popularity,
+                    })
+                    remaining.append((topic, queue))
+                    break
+            if len(picked) >= limit:
+                break
+        queues = remaining
+    return picked
+
+
+# 推荐结果中的题目字段
+PROBLEM_FIELDS = ("id", "subject", "course", "problem_type", "knowledge_tags", "difficulty")
+
+
+def problem_columns():
+    """查询推荐题目时需要加载的列（用于load_only）"""
+    return [getattr(models.Problem, field) for field in PROBLEM_FIELDS if field != "id"]
+
+
+def to_dict(problem: models.Problem, item: dict) -> dict:
+    """把题目和pick()选出的推荐项合并为响应字典"""
+    result = {field: getattr(problem, field) for field in PROBLEM_FIELDS}
+    result.update(topic=item["topic"], mastery=item["mastery"], popularity=item["popularity"])
+    return result
@@ -0,0 +1,297 @@
+"""掌握度批量重算（离线命令）
+
+调整掌握度模型的参数（mastery.P_INIT等）后，需要按答题历史重新计算所有用户的TopicMastery。
+逐行在Python中调用mastery.update对上百万用户太慢，该命令按用户分批：
+1. 取下一批用户（按user_id递增），按 (user_id, 主题, submitted_at, id) 顺序读出这些用户计入掌握度的答题，
+   主题来自标签关联表（problem_tags中的知识点标签），转换为按列存放的NumPy数组
+2. 每个 (用户, 主题) 的答题是一个序列，同一批中的所有序列同时计算：
+   第k步对所有长度超过k的序列一起执行一次向量化的BKT更新，循环次数是批内最长序列的长度
+3. 先删除本批用户区间（上一批最后一个用户之后，到本批最后一个用户）已有的掌握度行，
+   再以 ON CONFLICT DO UPDATE 批量写入（与并发答题新建的行冲突时覆盖），删除和写入在同一个事务中提交
+
+每批提交后把最后一个用户ID写入检查点文件，中断后再次运行从检查点之后的用户继续；全部完成后删除检查点。
+每批都是先删除再写入，检查点之前的批次重复执行也不影响结果；
+计入掌握度的答题已全部删除的 (用户, 主题) 行和没有答题记录的用户的行也会被删除，结果与mastery.replay一致。
+只重算TopicMastery；学习趋势中的历史掌握度快照保留当时的值（需要一并重建时使用 python mastery.py）。
+
+用法（在backend目录下执行）：
+    python recompute.py --users-per-chunk 1000 --checkpoint recompute.checkpoint.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import time
+from typing import Callable, NamedTuple, Optional
+
+from sqlalchemy import case, delete, insert, select
+
+import mastery
+import models
+
+try:
+    import numpy as np
+except ImportError:  # numpy只是该离线命令的依赖，服务本身不需要
+    np = None
+
+logger = logging.getLogger(__name__)
+
+# 每批处理的用户数
+USERS_PER_CHUNK = 1000
+
+# 写入掌握度时每条语句的行数
+ROWS_PER_STATEMENT = 1000
+
+
+class Chunk(NamedTuple):
+    """一批答题（每次答题按所涉及的主题展开为多行，按 (user_id, topic_id, 时间) 排序，每个字段是一列）"""
+    user_ids: "np.ndarray"
+    topic_ids: "np.ndarray"
+    correct: "np.ndarray"
+    submitted_at: tuple
+
+
+def bkt_update(p: "np.ndarray", correct: "np.ndarray") -> "np.ndarray":
+    """mastery.update的向量化版本（运算顺序相同，结果与逐个调用一致）"""
+    evidence = p * np.where(correct, 1 - mastery.P_SLIP, mastery.P_SLIP)
+    posterior = evidence / (evidence + (1 - p) * np.where(correct, mastery.P_GUESS, 1 - mastery.P_GUESS))
+    return posterior + (1 - posterior) * mastery.P_TRANSIT
+
+
+def step_layout(starts: "np.ndarray", n: int):
+    """把首尾相接的多个序列重排为按步数分段，以便逐步同时处理所有序列
+
+    序列按长度从长到短排列，第k步仍在进行的序列正好是前counts[k]个。
+
+    参数：
+        starts: 每个序列的起始下标（递增）
+        n: 所有序列的总长度
+
+    返回：
+        (order, steps, counts)：order[i]为排在第i位的序列；
+        values[steps]按 (步数, 序列排名) 排列，第k步是连续的counts[k]个值，顺序与按order排列的状态一致
+    """
+    m = len(starts)
+    lengths = np.diff(np.append(starts, n))
+    order = np.argsort(-lengths, kind="stable")
+    rank = np.empty(m, dtype=np.int64)
+    rank[order] = np.arange(m)
+    position = np.arange(n) - np.repeat(starts, lengths)
+    steps = np.lexsort((np.repeat(rank, lengths), position))
+    return order, steps, np.bincount(position)
+
+
+def run_sequences(correct: "np.ndarray", starts: "np.ndarray") -> "np.ndarray":
+    """同时对多个答题序列执行BKT更新，返回每个序列最终的掌握度
+
+    参数：
+        correct: 所有序列的答题结果首尾相接（布尔数组）
+        starts: 每个序列在correct中的起始下标（递增）
+    """
+    m = len(starts)
+    order, steps, counts = step_layout(starts, len(correct))
+    steps = correct[steps]
+    state = np.full(m, mastery.P_INIT)
+    offset = 0
+    for count in counts:
+        state[:count] = bkt_update(state[:count], steps[offset:offset + count])
+        offset += count
+    result = np.empty(m)
+    result[order] = state
+    return result
+
+
+def compute_chunk(chunk: Chunk):
+    """计算一批答题的掌握度，返回 (序列起始下标, 掌握度, 答题数, 答对数)"""
+    n = len(chunk.correct)
+    boundary = np.ones(n, dtype=bool)
+    boundary[1:] = (chunk.user_ids[1:] != chunk.user_ids[:-1]) | (chunk.topic_ids[1:] != chunk.topic_ids[:-1])
+    starts = np.flatnonzero(boundary)
+    attempts = np.diff(np.append(starts, n))
+    correct = np.add.reduceat(chunk.correct.astype(np.int64), starts)
+    return starts, run_sequences(chunk.correct, starts), attempts, correct
+
+
+def _next_users_stmt(after_user_id: int, users: int):
+    """下一批有答题记录的用户ID"""
+    attempts = models.Attempt.__table__
+    return (
+        select(attempts.c.user_id)
+        .where(attempts.c.user_id > after_user_id)
+        .group_by(attempts.c.user_id)
+        .order_by(attempts.c.user_id)
+        .limit(users)
+    )
+
+
+def _chunk_stmt(first_user_id: int, last_user_id: int):
+    """一批用户计入掌握度的答题，主题为题目的知识点标签"""
+    attempts, problem_tags, tags = models.Attempt.__table__, models.ProblemTag.__table__, models.Tag.__table__
+    outcome = case(
+        (attempts.c.correct.isnot(None), attempts.c.correct),
+        else_=attempts.c.score >= mastery.PASS_SCORE,
+    )
+    return (
+        select(attempts.c.user_id, problem_tags.c.tag_id, outcome, attempts.c.submitted_at)
+        .join(problem_tags, problem_tags.c.problem_id == attempts.c.problem_id)
+        .join(tags, tags.c.id == problem_tags.c.tag_id)
+        .where(
+            attempts.c.user_id.between(first_user_id, last_user_id),
+            tags.c.kind == models.TAG_KIND_KNOWLEDGE,
+            attempts.c.correct.isnot(None) | attempts.c.score.isnot(None),
+        )
+        .order_by(attempts.c.user_id, problem_tags.c.tag_id, attempts.c.submitted_at, attempts.c.id)
+    )
+
+
+def _upsert_stmt(dialect_name: str):
+    """覆盖写入掌握度（按 (user_id, topic) 唯一约束）"""
+    table = models.TopicMastery.__table__
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        return insert(table)
+    stmt = dialect_insert(table)
+    return stmt.on_conflict_do_update(
+        index_elements=["user_id", "topic"],
+        set_={name: stmt.excluded[name] for name in ("mastery", "attempts", "correct", "updated_at")},
+    )
+
+
+def _topic_names(conn) -> dict:
+    """知识点标签ID到名称的映射"""
+    tags = models.Tag.__table__
+    return dict(conn.execute(select(tags.c.id, tags.c.name).where(tags.c.kind == models.TAG_KIND_KNOWLEDGE)).all())
+
+
+def _read_checkpoint(path: Optional[str]) -> dict:
+    if path and os.path.exists(path):
+        with open(path) as f:
+            return json.load(f)
+    return {"last_user_id": 0, "attempts": 0, "rows": 0}
+
+
+def _write_checkpoint(path: Optional[str], checkpoint: dict) -> None:
+    # 先写临时文件再替换，中断时检查点文件总是完整的
+    if path:
+        with open(path + ".tmp", "w") as f:
+            json.dump(checkpoint, f)
+        os.replace(path + ".tmp", path)
+
+
+def run(
+    engine,
+    users_per_chunk: int = USERS_PER_CHUNK,
+    checkpoint_path: Optional[str] = None,
+    compute: Callable = compute_chunk,
+) -> dict:
+    """重算全部用户的掌握度，从检查点（如果存在）之后的用户继续
+
+    参数：
+        engine: 同步数据库引擎
+        users_per_chunk: 每批处理的用户数
+        checkpoint_path: 检查点文件路径，None表示不记录检查点
+        compute: 计算一批答题的函数（见compute_chunk）
+
+    返回：
+        统计字典：last_user_id、attempts / rows（包括中断前的运行在内处理的答题·主题行数 / 写入的掌握度行数）、
+        processed / written（本次运行处理的答题·主题行数 / 写入的掌握度行数）、
+        compute（其中计算掌握度的秒数）、elapsed（本次运行秒数）
+    """
+    if np is None:
+        raise RuntimeError("批量重算需要安装numpy")
+    checkpoint = _read_checkpoint(checkpoint_path)
+    if checkpoint["last_user_id"]:
+        logger.info("从检查点继续：user_id > %d", checkpoint["last_user_id"])
+    upsert = _upsert_stmt(engine.dialect.name)
+    started = time.perf_counter()
+    processed = written = 0
+    compute_seconds = 0.0
+
+    with engine.connect() as conn:
+        topic_names = _topic_names(conn)
+    mastery_table = models.TopicMastery.__table__
+    while True:
+        with engine.begin() as conn:
+            user_ids = conn.execute(_next_users_stmt(checkpoint["last_user_id"], users_per_chunk)).scalars().all()
+            # 本批负责的用户区间也包括区间内没有答题记录的用户；最后一批之后的用户都没有答题记录
+            stale = mastery_table.c.user_id > checkpoint["last_user_id"]
+            if user_ids:
+                stale &= mastery_table.c.user_id <= user_ids[-1]
+            conn.execute(delete(mastery_table).where(stale))
+            if not user_ids:
+                break
+            rows = conn.execute(_chunk_stmt(user_ids[0], user_ids[-1])).all()
+            params = []
+            if rows:
+                user_column, topic_column, correct_column, submitted_at = zip(*rows)
+                chunk = Chunk(
+                    np.array(user_column), np.array(topic_column), np.array(correct_column, dtype=bool), submitted_at
+                )
+                t = time.perf_counter()
+                starts, values, attempts, correct_counts = compute(chunk)
+                compute_seconds += time.perf_counter() - t
+                topic_ids = chunk.topic_ids[starts].tolist()
+                if not topic_names.keys() >= set(topic_ids):
+                    # 运行期间新建的知识点标签
+                    topic_names = _topic_names(conn)
+                ends = (np.append(starts[1:], len(rows)) - 1).tolist()
+                params = [
+                    {
+                        "user_id": user_id,
+                        "topic": topic_names[topic_id],
+                        "mastery": value,
+                        "attempts": count,
+                        "correct": right,
+                        "updated_at": submitted_at[end],
+                    }
+                    for user_id, topic_id, value, count, right, end in zip(
+                        chunk.user_ids[starts].tolist(), topic_ids, values.tolist(), attempts.tolist(),
+                        correct_counts.tolist(), ends,
+                    )
+                ]
+            for i in range(0, len(params), ROWS_PER_STATEMENT):
+                conn.execute(upsert, params[i:i + ROWS_PER_STATEMENT])
+        processed += len(rows)
+        written += len(params)
+        checkpoint = {
+            "last_user_id": user_ids[-1],
+            "attempts": checkpoint["attempts"] + len(rows),
+            "rows": checkpoint["rows"] + len(params),
+        }
+        _write_checkpoint(checkpoint_path, checkpoint)
+        elapsed = time.perf_counter() - started
+        logger.info(
+            "user_id ≤ %d：本次 %d 行答题·主题、%d 行掌握度，%.0f 答题·主题行/秒，%.0f 掌握度行/秒",
+            checkpoint["last_user_id"], processed, written, processed / elapsed, written / elapsed,
+        )
+
+    if checkpoint_path and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    return {
+        **checkpoint, "processed": processed, "written": written,
+        "compute": compute_seconds, "elapsed": time.perf_counter() - started,
+    }
+
+
+def _main() -> None:
+    """命令行入口"""
+    import database
+
+    parser = argparse.ArgumentParser(description="按答题历史批量重算主题掌握度（NumPy向量化）")
+    parser.add_argument("--users-per-chunk", type=int, default=USERS_PER_CHUNK)
+    parser.add_argument("--checkpoint", default="recompute.checkpoint.json", help="检查点文件，存在时从中断处继续")
+    args = parser.parse_args()
+    stats = run(database.engine, args.users_per_chunk, args.checkpoint)
+    print(
+        f"完成：共 {stats['attempts']} 行答题·主题、{stats['rows']} 行掌握度；本次运行 {stats['elapsed']:.1f}s，"
+        f"{stats['processed'] / stats['elapsed']:.0f} 答题·主题行/秒，{stats['written'] / stats['elapsed']:.0f} 掌握度行/秒"
+    )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    _main()
@@ -0,0 +1,312 @@
+"""复习计划模块（间隔重复，SM-2）
+
+用户做过的每道题都按SM-2算法安排下次复习的时间：
+1. 每次答题给出0-5的评分（quality）：有对错时答对4分、答错1分，只有分数时按每20分1档（60分为3分，及格）
+2. 评分达到3分（复习成功）时连续成功次数加一，间隔依次为1天、6天，之后每次乘以难易系数（EF）；
+   低于3分时连续成功次数清零，间隔回到1天，并记为一次遗忘
+3. 难易系数按评分调整：EF += 0.1 - (5 - q) * (0.08 + (5 - q) * 0.02)，最小1.3
+4. 下次复习时间 = 本次答题时间 + 间隔
+
+每道题的复习状态保存在 review_states 表（见models.ReviewState），每次答题时在crud_async.record_attempt中
+增量更新（只读写该题的一行，与掌握度在同一事务中）。到期队列（GET /reviews/due）是
+(user_id, due_at) 索引上 due_at <= 当前时间 的有界范围读取，与用户做过的题目数无关。
+
+rebuild()按答题历史重建复习状态（数据迁移和调整参数后使用）：每个 (用户, 题目) 的答题是一个序列，
+安装了numpy时同一批中的所有序列同时计算（与recompute模块相同的按步数分段方式），否则逐个答题计算。
+
+该模块只构造SQL语句和处理查询结果，由crud_async（答题时维护和到期查询）和migrations（重建）共用。
+"""
+
+import argparse
+import datetime
+from typing import List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import delete, insert, select
+
+import models
+import recompute
+import tags
+
+np = recompute.np
+
+# 评分（0-5）：答对 / 答错时的评分，达到PASS_QUALITY视为复习成功
+MAX_QUALITY = 5
+CORRECT_QUALITY = 4
+WRONG_QUALITY = 1
+PASS_QUALITY = 3
+
+# 只有分数时每档的分数（60分对应PASS_QUALITY，与mastery.PASS_SCORE一致）
+SCORE_PER_QUALITY = 20.0
+
+# 难易系数的初始值和最小值
+INITIAL_EASE = 2.5
+MIN_EASE = 1.3
+
+# 第一次、第二次复习成功后的间隔（天）
+FIRST_INTERVAL = 1
+SECOND_INTERVAL = 6
+
+# 到期队列每次返回条数的默认值与上限
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+# 重建时每批计算的答题数（批次在 (用户, 题目) 序列之间切分）和每条INSERT语句写入的行数
+ROWS_PER_CHUNK = 100000
+ROWS_PER_STATEMENT = 1000
+
+
+# ==================== 调度算法 ====================
+
+def quality(correct: Optional[bool], score: Optional[float]) -> Optional[int]:
+    """答题评分（0-5）：优先使用correct，否则按分数分档；都没有时返回None（不计入复习）"""
+    if correct is not None:
+        return CORRECT_QUALITY if correct else WRONG_QUALITY
+    if score is not None:
+        return min(MAX_QUALITY, max(0, int(score // SCORE_PER_QUALITY)))
+    return None
+
+
+def schedule(repetitions: int, interval_days: int, ease: float, q: int) -> Tuple[int, int, float]:
+    """按一次答题评分计算新的 (连续成功次数, 间隔天数, 难易系数)"""
+    if q >= PASS_QUALITY:
+        if repetitions == 0:
+            interval_days = FIRST_INTERVAL
+        elif repetitions == 1:
+            interval_days = SECOND_INTERVAL
+        else:
+            interval_days = round(interval_days * ease)
+        repetitions += 1
+    else:
+        repetitions, interval_days = 0, FIRST_INTERVAL
+    ease = max(MIN_EASE, ease + 0.1 - (MAX_QUALITY - q) * (0.08 + (MAX_QUALITY - q) * 0.02))
+    return repetitions, interval_days, ease
+
+
+def apply(row: models.ReviewState, q: int, at: datetime.datetime) -> None:
+    """把一次答题评分计入复习状态行"""
+    row.repetitions, row.interval_days, row.ease = schedule(
+        row.repetitions or 0, row.interval_days or 0, row.ease if row.ease is not None else INITIAL_EASE, q
+    )
+    row.lapses = (row.lapses or 0) + int(q < PASS_QUALITY)
+    row.reviews = (row.reviews or 0) + 1
+    row.last_quality = q
+    row.last_reviewed_at = at
+    row.due_at = at + datetime.timedelta(days=row.interval_days)
+
+
+# ==================== 答题时维护 ====================
+
+def ensure_row_stmt(dialect_name: str, user_id: int, problem_id: int, at: datetime.datetime):
+    """为第一次做的题目创建初始复习状态行（已存在的行不变，并发创建不会违反唯一约束）"""
+    return tags.insert_ignore(dialect_name, models.ReviewState.__table__).values(
+        user_id=user_id, problem_id=problem_id, repetitions=0, interval_days=0, ease=INITIAL_EASE,
+        lapses=0, reviews=0, due_at=at,
+    )
+
+
+def lock_row_stmt(user_id: int, problem_id: int):
+    """查询并锁定复习状态行（SELECT ... FOR UPDATE），同一用户对同一题的并发答题依次更新"""
+    return (
+        select(models.ReviewState)
+        .where(models.ReviewState.user_id == user_id, models.ReviewState.problem_id == problem_id)
+        .with_for_update()
+    )
+
+
+# ==================== 查询 ====================
+
+def due_stmt(user_id: int, now: datetime.datetime, limit: int = DEFAULT_LIMIT):
+    """到期的复习题目：due_at <= now，按到期时间从早到晚（最久未复习的优先）取前limit个
+
+    是 ix_review_states_user_due 上的一段有界范围扫描，再按主键连接题目表取摘要字段。
+    """
+    table, problems = models.ReviewState.__table__, models.Problem.__table__
+    return (
+        select(
+            table.c.problem_id, problems.c.subject, problems.c.course, problems.c.problem_type,
+            problems.c.knowledge_tags, problems.c.difficulty, table.c.due_at, table.c.interval_days,
+            table.c.ease, table.c.repetitions, table.c.lapses, table.c.reviews, table.c.last_quality,
+            table.c.last_reviewed_at,
+        )
+        .join(problems, problems.c.id == table.c.problem_id)
+        .where(table.c.user_id == user_id, table.c.due_at <= now)
+        .order_by(table.c.due_at, table.c.problem_id)
+        .limit(limit)
+    )
+
+
+# ==================== 重建 ====================
+
+class Chunk(NamedTuple):
+    """一批答题（按 (user_id, problem_id, 时间) 排序，每个字段是一列）"""
+    user_ids: list
+    problem_ids: list
+    correct: list
+    scores: list
+    submitted_at: list
+
+
+def sm2_update(repetitions: "np.ndarray", interval_days: "np.ndarray", ease: "np.ndarray", q: "np.ndarray"):
+    """schedule的向量化版本（运算顺序相同，结果与逐个调用一致）"""
+    passed = q >= PASS_QUALITY
+    grown = np.where(
+        repetitions == 0, FIRST_INTERVAL,
+        np.where(repetitions == 1, SECOND_INTERVAL, np.round(interval_days * ease)),
+    )
+    interval_days = np.where(passed, grown, FIRST_INTERVAL)
+    repetitions = np.where(passed, repetitions + 1, 0)
+    ease = np.maximum(MIN_EASE, ease + 0.1 - (MAX_QUALITY - q) * (0.08 + (MAX_QUALITY - q) * 0.02))
+    return repetitions, interval_days, ease
+
+
+def replay_sequences(q: "np.ndarray", starts: "np.ndarray"):
+    """同时对多个答题序列执行SM-2更新
+
+    参数：
+        q: 所有序列的评分首尾相接（整数数组）
+        starts: 每个序列在q中的起始下标（递增）
+
+    返回：
+        每个序列最终的 (连续成功次数, 间隔天数, 难易系数, 遗忘次数)
+    """
+    m = len(starts)
+    order, steps, counts = recompute.step_layout(starts, len(q))
+    steps = q[steps]
+    repetitions = np.zeros(m, dtype=np.int64)
+    interval_days = np.zeros(m)
+    ease = np.full(m, INITIAL_EASE)
+    offset = 0
+    for count in counts:
+        repetitions[:count], interval_days[:count], ease[:count] = sm2_update(
+            repetitions[:count], interval_days[:count], ease[:count], steps[offset:offset + count]
+        )
+        offset += count
+    lapses = np.add.reduceat((q < PASS_QUALITY).astype(np.int64), starts)
+    result = []
+    for state in (repetitions, interval_days.astype(np.int64), ease):
+        column = np.empty_like(state)
+        column[order] = state
+        result.append(column)
+    return (*result, lapses)
+
+
+def _sequence_starts(chunk: Chunk) -> List[int]:
+    """每个 (用户, 题目) 序列在批中的起始下标"""
+    return [
+        i for i in range(len(chunk.user_ids))
+        if i == 0 or chunk.user_ids[i] != chunk.user_ids[i - 1] or chunk.problem_ids[i] != chunk.problem_ids[i - 1]
+    ]
+
+
+def compute_chunk(chunk: Chunk):
+    """用NumPy计算一批答题的复习状态，返回 (序列起始下标, 评分, 连续成功次数, 间隔天数, 难易系数, 遗忘次数)"""
+    n = len(chunk.user_ids)
+    user_ids, problem_ids = np.array(chunk.user_ids), np.array(chunk.problem_ids)
+    boundary = np.ones(n, dtype=bool)
+    boundary[1:] = (user_ids[1:] != user_ids[:-1]) | (problem_ids[1:] != problem_ids[:-1])
+    starts = np.flatnonzero(boundary)
+    # correct为空（None转换为nan）时按分数分档，查询已排除两者都为空的答题
+    correct = np.array(chunk.correct, dtype=float)
+    scores = np.array(chunk.scores, dtype=float)
+    q = np.where(
+        np.isnan(correct),
+        np.clip(np.floor_divide(np.nan_to_num(scores), SCORE_PER_QUALITY), 0, MAX_QUALITY),
+        np.where(correct == 1, CORRECT_QUALITY, WRONG_QUALITY),
+    ).astype(np.int64)
+    return (starts.tolist(), q.tolist(), *(column.tolist() for column in replay_sequences(q, starts)))
+
+
+def compute_chunk_python(chunk: Chunk):
+    """compute_chunk的逐个答题版本（没有numpy时使用，结果相同）"""
+    starts = _sequence_starts(chunk)
+    q = [quality(correct, score) for correct, score in zip(chunk.correct, chunk.scores)]
+    columns = ([], [], [], [])
+    for start, end in zip(starts, starts[1:] + [len(q)]):
+        repetitions, interval_days, ease, lapses = 0, 0, INITIAL_EASE, 0
+        for value in q[start:end]:
+            repetitions, interval_days, ease = schedule(repetitions, interval_days, ease, value)
+            lapses += int(value < PASS_QUALITY)
+        for column, value in zip(columns, (repetitions, interval_days, ease, lapses)):
+            column.append(value)
+    return (starts, q, *columns)
+
+
+def rebuild(conn, user_ids: Optional[List[int]] = None, vectorized: bool = True) -> int:
+    """按答题历史重建复习状态（不提交事务）
+
+    删除这些用户（user_ids为None时为全部用户）已有的复习状态，再按 (user_id, problem_id, submitted_at, id)
+    的顺序流式读取计入复习的答题，每累计约ROWS_PER_CHUNK次答题（在序列之间切分）计算一批并写入。
+
+    参数：
+        conn: 数据库连接（Connection）
+        user_ids: 要重建的用户ID列表，None表示全部用户
+        vectorized: 是否使用NumPy计算（没有安装numpy时总是逐个答题计算）
+
+    返回：
+        写入的复习状态行数
+    """
+    table, attempts = models.ReviewState.__table__, models.Attempt.__table__
+    compute = compute_chunk if vectorized and np is not None else compute_chunk_python
+    stmt = (
+        select(attempts.c.user_id, attempts.c.problem_id, attempts.c.correct, attempts.c.score,
+               attempts.c.submitted_at)
+        .where(attempts.c.correct.isnot(None) | attempts.c.score.isnot(None))
+        .order_by(attempts.c.user_id, attempts.c.problem_id, attempts.c.submitted_at, attempts.c.id)
+    )
+    if user_ids is None:
+        conn.execute(delete(table))
+    else:
+        stmt = stmt.where(attempts.c.user_id.in_(user_ids))
+        conn.execute(delete(table).where(table.c.user_id.in_(user_ids)))
+
+    written = 0
+
+    def write(chunk: Chunk):
+        nonlocal written
+        starts, q, *states = compute(chunk)
+        ends = starts[1:] + [len(q)]
+        rows = [
+            {
+                "user_id": chunk.user_ids[start], "problem_id": chunk.problem_ids[start],
+                "repetitions": repetitions, "interval_days": interval_days, "ease": ease,
+                "lapses": lapses, "reviews": end - start, "last_quality": q[end - 1],
+                "last_reviewed_at": chunk.submitted_at[end - 1],
+                "due_at": chunk.submitted_at[end - 1] + datetime.timedelta(days=interval_days),
+            }
+            for start, end, repetitions, interval_days, ease, lapses in zip(starts, ends, *states)
+        ]
+        for i in range(0, len(rows), ROWS_PER_STATEMENT):
+            conn.execute(insert(table), rows[i:i + ROWS_PER_STATEMENT])
+        written += len(rows)
+
+    chunk = Chunk([], [], [], [], [])
+    for user_id, problem_id, correct, score, submitted_at in conn.execute(
+        stmt.execution_options(stream_results=True, yield_per=ROWS_PER_STATEMENT)
+    ):
+        if len(chunk.user_ids) >= ROWS_PER_CHUNK and (
+            user_id != chunk.user_ids[-1] or problem_id != chunk.problem_ids[-1]
+        ):
+            write(chunk)
+            chunk = Chunk([], [], [], [], [])
+        for column, value in zip(chunk, (user_id, problem_id, correct, score, submitted_at)):
+            column.append(value)
+    if chunk.user_ids:
+        write(chunk)
+    return written
+
+
+def _main() -> None:
+    """命令行入口：从答题历史重建复习计划"""
+    import database
+
+    parser = argparse.ArgumentParser(description="从答题历史重建间隔重复复习计划")
+    parser.add_argument("--user-id", type=int, action="append", help="只重建指定用户（可重复）")
+    parser.add_argument("--no-numpy", action="store_true", help="逐个答题计算（不使用NumPy）")
+    args = parser.parse_args()
+    with database.engine.begin() as conn:
+        written = rebuild(conn, args.user_id, vectorized=not args.no_numpy)
+    print(f"写入{written}行复习状态")
+
+
+if __name__ == "__main__":
+    _main()
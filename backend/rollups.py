@@ -0,0 +1,174 @@
+"""学习趋势汇总模块
+
+GET /profile 的学习趋势（按日/周/月的做题量、正确率和各主题掌握度曲线）如果每次从答题记录计算，
+需要扫描用户的全部答题历史。该模块维护预先汇总的 mastery_rollups 表（models.MasteryRollup）：
+- 每次答题时（crud_async.record_attempt，与掌握度在同一事务中）对所涉及的每个主题和"全部主题"行，
+  把答题数、答对数累加到该答题所在的日、周（周一开始）、月桶中，并记录掌握度快照（桶内最后一次答题后的值）
+- 较细的桶只保留最近一段时间（RETENTION_DAYS：日桶92天、周桶731天），
+  更早的数据只以较粗的桶保留（月桶永久保留），过期的行在该用户下次答题时清理
+查询某个时间范围的趋势只读取该范围内对应粒度的桶，行数与桶数成正比，与答题历史长度无关。
+日期按UTC划分。
+"""
+
+import datetime
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import and_, delete, insert, or_, select
+
+import models
+
+# 粒度
+GRANULARITY_DAY = "day"
+GRANULARITY_WEEK = "week"
+GRANULARITY_MONTH = "month"
+GRANULARITIES = (GRANULARITY_DAY, GRANULARITY_WEEK, GRANULARITY_MONTH)
+
+# "全部主题"行的topic：每次答题计一次，用于统计做题量和正确率
+TOPIC_ALL = ""
+
+# 各粒度的桶保留的天数（None表示永久保留），查询范围不能超过对应粒度的保留期
+RETENTION_DAYS = {GRANULARITY_DAY: 92, GRANULARITY_WEEK: 731, GRANULARITY_MONTH: None}
+
+# 查询范围的上限（天）
+MAX_RANGE_DAYS = 3660
+
+
+def bucket_start(day: datetime.date, granularity: str) -> datetime.date:
+    """日期所在桶的起始日期"""
+    if granularity == GRANULARITY_WEEK:
+        return day - datetime.timedelta(days=day.weekday())
+    if granularity == GRANULARITY_MONTH:
+        return day.replace(day=1)
+    return day
+
+
+def default_granularity(days: int) -> str:
+    """按查询范围选择粒度，使桶数保持在几十个以内"""
+    if days <= 31:
+        return GRANULARITY_DAY
+    if days <= 183:
+        return GRANULARITY_WEEK
+    return GRANULARITY_MONTH
+
+
+def rows_for_attempt(user_id: int, at: datetime.datetime, correct: bool, mastery: Dict[str, float]) -> List[dict]:
+    """一次答题要累加到各粒度桶中的行（mastery为更新后的 {主题: 掌握度}）"""
+    day = at.date()
+    rows = []
+    for granularity in GRANULARITIES:
+        start = bucket_start(day, granularity)
+        rows.append({
+            "user_id": user_id, "granularity": granularity, "bucket_start": start, "topic": TOPIC_ALL,
+            "attempts": 1, "correct": int(correct), "mastery": None,
+        })
+        for topic, value in mastery.items():
+            rows.append({
+                "user_id": user_id, "granularity": granularity, "bucket_start": start, "topic": topic,
+                "attempts": 1, "correct": int(correct), "mastery": value,
+            })
+    return rows
+
+
+def upsert_stmt(dialect_name: str, rows: List[dict]):
+    """把行累加到已有的桶中（答题数、答对数相加，掌握度快照取新值），桶不存在时创建"""
+    table = models.MasteryRollup.__table__
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        # 其他数据库没有通用的写法，退化为普通INSERT（桶已存在时报错）
+        return insert(table).values(rows)
+    stmt = dialect_insert(table).values(rows)
+    return stmt.on_conflict_do_update(
+        index_elements=["user_id", "granularity", "bucket_start", "topic"],
+        set_={
+            "attempts": table.c.attempts + stmt.excluded.attempts,
+            "correct": table.c.correct + stmt.excluded.correct,
+            "mastery": stmt.excluded.mastery,
+        },
+    )
+
+
+def cutoffs(today: datetime.date) -> Dict[str, datetime.date]:
+    """各粒度仍保留的最早桶起始日期（永久保留的粒度不在其中）"""
+    return {
+        granularity: bucket_start(today - datetime.timedelta(days=days), granularity)
+        for granularity, days in RETENTION_DAYS.items() if days is not None
+    }
+
+
+def prune_stmt(user_id: int, today: datetime.date):
+    """删除该用户超过保留期的日桶和周桶"""
+    table = models.MasteryRollup.__table__
+    return delete(table).where(
+        table.c.user_id == user_id,
+        or_(*(
+            and_(table.c.granularity == granularity, table.c.bucket_start < cutoff)
+            for granularity, cutoff in cutoffs(today).items()
+        )),
+    )
+
+
+def range_start(today: datetime.date, days: int, granularity: str) -> datetime.date:
+    """最近days天（含今天）所覆盖的第一个桶的起始日期"""
+    return bucket_start(today - datetime.timedelta(days=days - 1), granularity)
+
+
+def select_stmt(user_id: int, granularity: str, start: datetime.date):
+    """查询某个粒度从start开始的全部桶"""
+    table = models.MasteryRollup.__table__
+    return (
+        select(table.c.bucket_start, table.c.topic, table.c.attempts, table.c.correct, table.c.mastery)
+        .where(table.c.user_id == user_id, table.c.granularity == granularity, table.c.bucket_start >= start)
+        .order_by(table.c.bucket_start, table.c.topic)
+    )
+
+
+def build_trend(rows: Iterable) -> List[dict]:
+    """把桶行组装为按时间排序的趋势点
+
+    每个点包含：period_start、attempts、correct、accuracy（答对比例，没有答题时为None）
+    和mastery（{主题: 掌握度}，该桶没有练习的主题沿用之前的桶中的值）
+    """
+    points: List[dict] = []
+    current: Dict[str, float] = {}
+    for row in rows:
+        if not points or points[-1]["period_start"] != row.bucket_start:
+            points.append({"period_start": row.bucket_start, "attempts": 0, "correct": 0, "accuracy": None,
+                           "mastery": dict(current)})
+        point = points[-1]
+        if row.topic == TOPIC_ALL:
+            point["attempts"], point["correct"] = row.attempts, row.correct
+            point["accuracy"] = row.correct / row.attempts if row.attempts else None
+        elif row.mastery is not None:
+            current[row.topic] = point["mastery"][row.topic] = row.mastery
+    return points
+
+
+class Accumulator:
+    """在内存中累加一个用户的桶（mastery.replay重放答题历史时使用）"""
+
+    def __init__(self, today: datetime.date):
+        self.cutoffs = cutoffs(today)
+        self.buckets: Dict[tuple, dict] = {}
+
+    def add(self, user_id: int, at: datetime.datetime, correct: bool, mastery: Dict[str, float]) -> None:
+        for row in rows_for_attempt(user_id, at, correct, mastery):
+            cutoff: Optional[datetime.date] = self.cutoffs.get(row["granularity"])
+            if cutoff is not None and row["bucket_start"] < cutoff:
+                continue
+            key = (row["granularity"], row["bucket_start"], row["topic"])
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                self.buckets[key] = row
+            else:
+                bucket["attempts"] += 1
+                bucket["correct"] += row["correct"]
+                bucket["mastery"] = row["mastery"]
+
+    def drain(self) -> List[dict]:
+        """取出累加的行并清空"""
+        rows = list(self.buckets.values())
+        self.buckets = {}
+        return rows
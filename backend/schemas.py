@@ -10,6 +10,16 @@ import datetime
 import json
 
 
+def parse_json_list(v):
+    """将数据库中的JSON字符串标签解析为列表（无法解析时返回None）"""
+    if isinstance(v, str):
+        try:
+            return json.loads(v)
+        except (json.JSONDecodeError, TypeError):
+            return None
+    return v
+
+
 class UserCreate(BaseModel):
     """用户注册请求模型
     
@@ -73,8 +83,6 @@ class ProblemCreate(BaseModel):
       可选值：\"text\"（文本）、\"image\"（图片）、\"latex\"（LaTeX）
     - raw: 原始题目内容（必填）
       可以是文本、文件名或其他原始数据
-    - file_content: Base64编码的文件内容（可选）
-      当上传图片、PDF等文件时使用
     - subject: 学科（可选）
       如\"数学\"、\"物理\"、\"化学\"等
     - course: 课程名称（可选）
@@ -90,7 +98,6 @@ class ProblemCreate(BaseModel):
     """
     source_type: str = "text"
     raw: str
-    file_content: Optional[str] = None
     subject: Optional[str] = None
     course: Optional[str] = None
     problem_type: Optional[str] = None
@@ -134,7 +141,9 @@ class ProblemOut(BaseModel):
     - id: 题目ID
     - owner_id: 所有者用户ID
     - source_type: 题目来源类型
-    - file_content: Base64编码的文件内容
+    - file_sha256: 上传文件的SHA-256摘要（通过GET /problems/{id}/file下载文件）
+    - file_size: 上传文件字节数
+    - mime_type: 上传文件MIME类型
     - subject: 学科
     - course: 课程
     - problem_type: 题型
@@ -143,6 +152,7 @@ class ProblemOut(BaseModel):
     - is_bookmarked: 是否收藏
     - tags: 用户标签列表
     - notes: 用户备注
+    - cluster_id: 所属题目簇ID（内容相同或高度相似的题目属于同一个簇）
     - created_at: 创建时间
     - updated_at: 更新时间
     
@@ -152,7 +162,9 @@ class ProblemOut(BaseModel):
     id: int
     owner_id: Optional[int] = None
     source_type: str
-    file_content: Optional[str] = None
+    file_sha256: Optional[str] = None
+    file_size: Optional[int] = None
+    mime_type: Optional[str] = None
     subject: Optional[str] = None
     course: Optional[str] = None
     problem_type: Optional[str] = None
@@ -161,6 +173,7 @@ class ProblemOut(BaseModel):
     is_bookmarked: bool = False
     tags: Optional[List[str]] = None
     notes: Optional[str] = None
+    cluster_id: Optional[int] = None
     created_at: datetime.datetime
     updated_at: datetime.datetime
 
@@ -171,22 +184,186 @@ class ProblemOut(BaseModel):
     @validator('knowledge_tags', pre=True, always=True)
     def parse_knowledge_tags(cls, v):
         """将JSON字符串解析为列表"""
-        if isinstance(v, str):
-            try:
-                return json.loads(v)
-            except (json.JSONDecodeError, TypeError):
-                return None
-        return v
+        return parse_json_list(v)
     
     @validator('tags', pre=True, always=True)
     def parse_tags(cls, v):
         """将JSON字符串解析为列表"""
-        if isinstance(v, str):
-            try:
-                return json.loads(v)
-            except (json.JSONDecodeError, TypeError):
-                return None
-        return v
+        return parse_json_list(v)
+
+
+class ProblemSummary(BaseModel):
+    """题目列表项响应模型
+    
+    用于GET /problems，只包含列表展示需要的轻量字段。
+    raw、parsed、notes等大文本字段默认不返回（也不会从数据库读取），
+    需要时通过fields参数显式请求。
+    
+    字段：
+    - id: 题目ID
+    - owner_id/source_type/subject/course/problem_type: 题目基本信息
+    - knowledge_tags/tags: 标签列表
+    - difficulty/is_bookmarked: 难度与收藏状态
+    - file_sha256/file_size/mime_type: 附件信息（不含文件内容）
+    - raw/parsed/notes: 大文本字段，仅在fields中请求时返回
+    - created_at/updated_at: 创建与更新时间
+    """
+    id: int
+    owner_id: Optional[int] = None
+    source_type: Optional[str] = None
+    subject: Optional[str] = None
+    course: Optional[str] = None
+    problem_type: Optional[str] = None
+    knowledge_tags: Optional[List[str]] = None
+    difficulty: Optional[int] = None
+    is_bookmarked: Optional[bool] = None
+    tags: Optional[List[str]] = None
+    file_sha256: Optional[str] = None
+    file_size: Optional[int] = None
+    mime_type: Optional[str] = None
+    raw: Optional[str] = None
+    parsed: Optional[str] = None
+    notes: Optional[str] = None
+    created_at: Optional[datetime.datetime] = None
+    updated_at: Optional[datetime.datetime] = None
+
+    @validator('knowledge_tags', pre=True)
+    def parse_knowledge_tags(cls, v):
+        """将JSON字符串解析为列表"""
+        return parse_json_list(v)
+    
+    @validator('tags', pre=True)
+    def parse_tags(cls, v):
+        """将JSON字符串解析为列表"""
+        return parse_json_list(v)
+
+
+# 题目列表默认返回的字段（不含raw、parsed、notes等大文本字段）
+PROBLEM_SUMMARY_FIELDS = (
+    "id", "owner_id", "source_type", "subject", "course", "problem_type",
+    "knowledge_tags", "difficulty", "is_bookmarked", "tags",
+    "file_sha256", "file_size", "mime_type", "created_at", "updated_at",
+)
+
+# 题目列表可通过fields参数请求的全部字段
+PROBLEM_LIST_FIELDS = PROBLEM_SUMMARY_FIELDS + ("raw", "parsed", "notes")
+
+
+class ProblemSearchHit(BaseModel):
+    """全文检索结果项响应模型
+    
+    用于GET /problems/search，按相关度从高到低排列。
+    
+    字段：
+    - id: 题目ID
+    - subject/course/problem_type/knowledge_tags/difficulty: 题目基本信息
+    - created_at: 创建时间
+    - score: 相关度（越大越相关，只用于同一次查询的结果之间比较）
+    - field: 片段所在的列（\"raw\"、\"parsed\"或\"notes\"）
+    - snippet: 包含查询词的原文片段（纯文本，未做HTML转义）
+    - highlights: 查询词在snippet中的位置 [[开始, 结束], ...]，按字符计，结束位置不含
+    """
+    id: int
+    subject: Optional[str] = None
+    course: Optional[str] = None
+    problem_type: Optional[str] = None
+    knowledge_tags: Optional[List[str]] = None
+    difficulty: Optional[int] = None
+    created_at: Optional[datetime.datetime] = None
+    score: float
+    field: str
+    snippet: str
+    highlights: List[List[int]] = []
+
+
+class UploadSessionCreate(BaseModel):
+    """创建分片上传会话请求模型
+    
+    用于大文件（多页PDF、多张照片等）的断点续传上传。
+    题目元数据在创建会话时提交，会话提交时用于创建题目。
+    
+    字段：
+    - filename: 原始文件名（必填）
+    - mime_type: 文件MIME类型（可选，默认按文件名推断）
+    - source_type: 题目来源类型（默认\"pdf\"）
+    - subject/course/problem_type/knowledge_tags/difficulty/tags/notes:
+      与ProblemCreate含义相同的题目元数据（均可选）
+    """
+    filename: str
+    mime_type: Optional[str] = None
+    source_type: str = "pdf"
+    subject: Optional[str] = None
+    course: Optional[str] = None
+    problem_type: Optional[str] = None
+    knowledge_tags: Optional[List[str]] = None
+    difficulty: Optional[int] = None
+    tags: Optional[List[str]] = None
+    notes: Optional[str] = None
+
+
+class UploadPartOut(BaseModel):
+    """已上传分片响应模型
+    
+    字段：
+    - part_number: 分片编号（从1开始）
+    - size: 分片字节数
+    - sha256: 分片内容的SHA-256摘要
+    """
+    part_number: int
+    size: int
+    sha256: str
+
+    class Config:
+        # 允许从SQLAlchemy ORM对象直接创建Pydantic模型
+        from_attributes = True
+
+
+class UploadSessionOut(BaseModel):
+    """分片上传会话响应模型
+    
+    客户端断线重连后通过该模型获知已上传的分片，只需补传缺失部分。
+    
+    字段：
+    - id: 会话ID
+    - filename: 原始文件名
+    - mime_type: 文件MIME类型
+    - status: 会话状态（\"open\"上传中、\"completed\"已完成）
+    - parts: 已上传的分片列表
+    - received_bytes: 已接收的总字节数
+    - max_part_size: 单个分片最大字节数
+    - expires_at: 会话过期时间
+    - problem_id: 提交后创建的题目ID
+    """
+    id: str
+    filename: Optional[str] = None
+    mime_type: Optional[str] = None
+    status: str
+    parts: List[UploadPartOut] = []
+    received_bytes: int = 0
+    max_part_size: int
+    expires_at: datetime.datetime
+    problem_id: Optional[int] = None
+
+
+class UploadPartRef(BaseModel):
+    """提交会话时客户端声明的分片
+    
+    字段：
+    - part_number: 分片编号
+    - sha256: 客户端计算的分片SHA-256摘要
+    """
+    part_number: int
+    sha256: str
+
+
+class UploadComplete(BaseModel):
+    """提交分片上传会话请求模型
+    
+    字段：
+    - parts: 客户端认为已上传的分片列表（可选）
+      提供时服务端会逐一核对编号和SHA-256，不一致则拒绝提交
+    """
+    parts: Optional[List[UploadPartRef]] = None
 
 
 class ParsedProblem(BaseModel):
@@ -214,13 +391,16 @@ class SolveRequest(BaseModel):
       如果提供，则使用该题目进行求解
     - raw: 原始题目文本（可选）
       如果problem_id为空，则使用此字段
-    - mode: 求解模式（默认\"structured\"）
+    - mode: 求解模式（默认\"structured\"），决定使用的求解后端（见solver.MODE_BACKENDS）
       \"structured\": 结构化求解
       \"direct\": 直接给出答案
+    - priority: 任务优先级通道（默认\"normal\"）
+      \"high\"、\"normal\"、\"low\"，高优先级的任务先执行
     """
     problem_id: Optional[int] = None
     raw: Optional[str] = None
     mode: Optional[str] = "structured"
+    priority: Optional[str] = "normal"
 
 
 class SolveResult(BaseModel):
@@ -235,10 +415,106 @@ class SolveResult(BaseModel):
       列举求解的各个步骤
     - answer: 最终答案（可选）
       题目的最终答案或结论
+    - cached: 结果是否来自求解结果缓存
+    - cache_source: 命中来源（\"memory\"进程内缓存、\"store\"持久层），未命中时为空
+    - solver_version: 产生该结果的求解器版本
+    - solved_at: 结果的求解时间（命中缓存时早于本次请求）
     """
     thoughts: Optional[str] = None
     steps: Optional[List[str]] = None
     answer: Optional[str] = None
+    cached: bool = False
+    cache_source: Optional[str] = None
+    solver_version: Optional[str] = None
+    solved_at: Optional[datetime.datetime] = None
+
+
+class JobOut(BaseModel):
+    """异步任务响应模型
+    
+    POST /solve 返回新提交的任务，客户端通过 GET /jobs/{id} 轮询
+    或订阅 GET /jobs/{id}/events（SSE）获取结果。
+    
+    字段：
+    - id: 任务ID
+    - kind: 任务类型（\"solve\"）
+    - status: 任务状态（\"queued\"排队中、\"waiting\"等待进行中的相同任务、\"running\"执行中、
+      \"succeeded\"成功、\"failed\"失败）
+    - priority: 优先级（数值大的先执行）
+    - attempts: 已执行次数
+    - max_attempts: 最多执行次数
+    - result: 任务结果，求解任务为SolveResult的字段（成功后才有）
+    - error: 最近一次失败的原因
+    - created_at: 提交时间
+    - started_at: 最近一次开始执行的时间
+    - finished_at: 完成时间
+    """
+    id: int
+    kind: str
+    status: str
+    priority: int
+    attempts: int = 0
+    max_attempts: int = 1
+    result: Optional[SolveResult] = None
+    error: Optional[str] = None
+    created_at: Optional[datetime.datetime] = None
+    started_at: Optional[datetime.datetime] = None
+    finished_at: Optional[datetime.datetime] = None
+
+    class Config:
+        # 允许从SQLAlchemy ORM对象直接创建Pydantic模型
+        from_attributes = True
+
+
+class AttemptCreate(BaseModel):
+    """答题记录请求模型
+    
+    字段：
+    - problem_id: 题目ID
+    - correct: 是否答对（可选）
+    - score: 得分（可选，0-100）
+      没有correct时，得分达到及格线视为答对；两者都没有时只记录答题，不更新掌握度
+    """
+    problem_id: int
+    correct: Optional[bool] = None
+    score: Optional[float] = None
+
+
+class AttemptOut(BaseModel):
+    """答题记录响应模型
+    
+    字段：
+    - id: 答题记录ID
+    - problem_id: 题目ID
+    - correct: 是否答对
+    - score: 得分
+    - submitted_at: 提交时间
+    - mastery: 本次答题更新后的主题掌握度（只包含该题涉及的主题）
+      键：主题名称，值：掌握度（0.0-1.0）
+    """
+    id: int
+    problem_id: int
+    correct: Optional[bool] = None
+    score: Optional[float] = None
+    submitted_at: datetime.datetime
+    mastery: Dict[str, float] = {}
+
+
+class TrendPoint(BaseModel):
+    """学习趋势中的一个时间桶
+    
+    字段：
+    - period_start: 桶的起始日期（日桶为当天，周桶为周一，月桶为1日，UTC）
+    - attempts: 桶内的答题次数
+    - correct: 其中答对的次数
+    - accuracy: 正确率（0.0-1.0），没有答题时为空
+    - mastery: 桶末各主题的掌握度（该桶没有练习的主题沿用之前的值）
+    """
+    period_start: datetime.date
+    attempts: int = 0
+    correct: int = 0
+    accuracy: Optional[float] = None
+    mastery: Dict[str, float] = {}
 
 
 class LearningProfile(BaseModel):
@@ -251,10 +527,136 @@ class LearningProfile(BaseModel):
     - mastery: 主题掌握度字典
       键：主题名称（如\"代数\"）
       值：掌握度分数（0.0-1.0）
+    - granularity: 学习趋势的粒度（\"day\"、\"week\"、\"month\"）
     - trend: 学习趋势（可选）
-      列表形式的历史掌握度记录
+      按时间排序的桶列表（做题量、正确率、掌握度）
       用于绘制学习曲线
     """
     user_id: int
     mastery: Dict[str, float]
-    trend: Optional[List[Dict[str, float]]] = None
+    granularity: Optional[str] = None
+    trend: Optional[List[TrendPoint]] = None
+
+
+class Recommendation(BaseModel):
+    """推荐题目响应模型
+    
+    用于GET /recommendations，包含题目摘要和推荐依据。
+    
+    字段：
+    - id/subject/course/problem_type/knowledge_tags/difficulty: 题目基本信息
+    - topic: 推荐针对的主题（用户掌握度较低的知识点）
+    - mastery: 该主题当前的掌握度（0.0-1.0）
+    - popularity: 题目热度（答题次数）
+    """
+    id: int
+    subject: Optional[str] = None
+    course: Optional[str] = None
+    problem_type: Optional[str] = None
+    knowledge_tags: Optional[List[str]] = None
+    difficulty: Optional[int] = None
+    topic: str
+    mastery: float
+    popularity: int = 0
+
+
+class MistakeOut(BaseModel):
+    """错题响应模型
+    
+    字段：
+    - problem_id: 题目ID
+    - subject/difficulty/course/problem_type/knowledge_tags: 题目摘要
+    - attempts: 第一次答错以来的答题次数（含第一次答错）
+    - wrong: 其中答错的次数
+    - last_correct: 最近一次答题是否答对（重做答对后为true）
+    - first_wrong_at / last_wrong_at: 第一次 / 最近一次答错的时间
+    - last_attempt_at: 最近一次答题时间
+    - mastered: 是否已标记为掌握
+    - mastered_at: 标记为掌握的时间
+    """
+    problem_id: int
+    subject: Optional[str] = None
+    difficulty: Optional[int] = None
+    course: Optional[str] = None
+    problem_type: Optional[str] = None
+    knowledge_tags: Optional[List[str]] = None
+    attempts: int
+    wrong: int
+    last_correct: bool
+    first_wrong_at: datetime.datetime
+    last_wrong_at: datetime.datetime
+    last_attempt_at: datetime.datetime
+    mastered: bool
+    mastered_at: Optional[datetime.datetime] = None
+
+    class Config:
+        from_attributes = True
+
+    @validator('knowledge_tags', pre=True)
+    def parse_knowledge_tags(cls, v):
+        """将JSON字符串解析为列表"""
+        return parse_json_list(v)
+
+
+class MistakeList(BaseModel):
+    """错题本列表响应模型
+    
+    字段：
+    - items: 本页错题（按最近一次答错的时间从新到旧）
+    - total: 符合筛选条件的错题总数
+    - facets: 符合筛选条件的错题按分面的计数
+      {\"subject\": {\"数学\": 12}, \"difficulty\": {\"3\": 5}, \"knowledge_tag\": {\"导数\": 4}, \"mastered\": {\"false\": 10, \"true\": 2}}
+    """
+    items: List[MistakeOut]
+    total: int
+    facets: Dict[str, Dict[str, int]]
+
+
+class MistakeUpdate(BaseModel):
+    """错题掌握标记请求模型
+    
+    字段：
+    - mastered: 是否已掌握
+    """
+    mastered: bool
+
+
+class ReviewDue(BaseModel):
+    """到期复习题目响应模型
+    
+    用于GET /reviews/due，包含题目摘要和该题的复习状态（SM-2）。
+    
+    字段：
+    - problem_id: 题目ID
+    - subject/course/problem_type/knowledge_tags/difficulty: 题目摘要
+    - due_at: 应复习的时间
+    - interval_days: 当前复习间隔（天）
+    - ease: 难易系数（越大间隔增长越快）
+    - repetitions: 连续复习成功的次数
+    - lapses: 答错（遗忘）的次数
+    - reviews: 计入复习的答题次数
+    - last_quality: 最近一次答题的评分（0-5）
+    - last_reviewed_at: 最近一次答题时间
+    """
+    problem_id: int
+    subject: Optional[str] = None
+    course: Optional[str] = None
+    problem_type: Optional[str] = None
+    knowledge_tags: Optional[List[str]] = None
+    difficulty: Optional[int] = None
+    due_at: datetime.datetime
+    interval_days: int
+    ease: float
+    repetitions: int
+    lapses: int
+    reviews: int
+    last_quality: Optional[int] = None
+    last_reviewed_at: Optional[datetime.datetime] = None
+
+    class Config:
+        from_attributes = True
+
+    @validator('knowledge_tags', pre=True)
+    def parse_knowledge_tags(cls, v):
+        """将JSON字符串解析为列表"""
+        return parse_json_list(v)
@@ -0,0 +1,350 @@
+"""题目内容全文检索
+
+对 problems 的 raw / parsed / notes 三列建立全文索引，供 GET /problems/search 使用：
+- SQLite: FTS5虚拟表 problems_fts（contentless，只保存索引），rowid即题目ID
+- PostgreSQL: problem_search表保存每道题的tsvector，使用GIN索引
+两种数据库的索引都由 problems 表上的触发器维护，任何写入路径（ORM、原生SQL、迁移）都会同步。
+
+中文分词：SQLite的unicode61分词器和PostgreSQL的默认解析器都把连续的汉字当作一个词，
+无法按词检索。写入索引前先用 search_tokens 把连续汉字切成重叠的二元组（"求导数" -> "求导 导数"），
+查询词用同样的方式切分后按短语匹配，相当于在原文中查找连续子串；非中文部分保持原样交给分词器。
+SQLite中 search_tokens 以应用自定义函数的形式注册到每个连接（见database模块），
+PostgreSQL中由等价的PL/pgSQL函数实现。
+
+注意：注册自定义函数之前的连接（如sqlite3命令行）无法写入problems表，触发器会报 no such function。
+
+该模块不在模块级导入models，供database在连接建立时注册函数。
+"""
+
+import re
+
+from sqlalchemy import DateTime, Float, Integer, JSON, String, text
+
+# 注册到SQLite连接 / 在PostgreSQL中创建的分词函数名
+SEARCH_TOKENS_FUNCTION = "study_helper_search_tokens"
+
+# 建立全文索引的列
+INDEXED_COLUMNS = ("raw", "parsed", "notes")
+
+# 一次查询最多使用的查询词个数
+MAX_QUERY_TERMS = 16
+
+# 每次检索最多返回的条数与最大偏移量（相关度排序需要先取出全部命中行，深翻页没有意义）
+MAX_LIMIT = 100
+MAX_OFFSET = 1000
+
+# 片段默认长度（字符数）
+SNIPPET_LENGTH = 60
+
+# 汉字（CJK统一表意文字、扩展A区、兼容表意文字）
+_CJK_RUN = re.compile("[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+")
+_CJK_CHAR = re.compile("^[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]$")
+_WORD = re.compile(r"\w")
+
+
+def _bigrams(match) -> str:
+    run = match.group(0)
+    if len(run) == 1:
+        return f" {run} "
+    return " " + " ".join(run[i:i + 2] for i in range(len(run) - 1)) + " "
+
+
+def search_tokens(value):
+    """把文本转换为建立索引用的分词文本：连续汉字切成重叠的二元组，其余字符保持不变
+
+    例如 "求f(x)的导数" -> " 求 f(x) 的导 导数 "（只有一个字的汉字串保留单字）
+    """
+    if not value:
+        return ""
+    return _CJK_RUN.sub(_bigrams, value)
+
+
+def register_sqlite_functions(dbapi_connection):
+    """在SQLite连接上注册分词函数（触发器中调用）"""
+    dbapi_connection.create_function(SEARCH_TOKENS_FUNCTION, 1, search_tokens, deterministic=True)
+
+
+# ==================== 索引结构 ====================
+
+# 全文索引中保存题目所有者的列：按用户检索时先与该用户的倒排列表求交集，
+# 而不是取出所有用户的命中行后再按problems.owner_id过滤
+OWNER_TOKEN_PREFIX = "owner"
+
+
+def _sqlite_column_values(prefix: str) -> str:
+    values = [f"{SEARCH_TOKENS_FUNCTION}({prefix}.{c})" for c in INDEXED_COLUMNS]
+    values.append(f"'{OWNER_TOKEN_PREFIX}' || {prefix}.owner_id")
+    return ", ".join(values)
+
+
+_SQLITE_COLUMNS = ", ".join(INDEXED_COLUMNS + ("owner",))
+_UPDATE_COLUMNS = ", ".join(INDEXED_COLUMNS + ("owner_id",))
+
+SQLITE_DDL = [
+    # contentless表只保存索引；删除时需要提供与写入时相同的分词结果
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS problems_fts USING fts5({_SQLITE_COLUMNS}, content='')",
+    f"""CREATE TRIGGER IF NOT EXISTS problems_fts_ai AFTER INSERT ON problems BEGIN
+        INSERT INTO problems_fts (rowid, {_SQLITE_COLUMNS}) VALUES (new.id, {_sqlite_column_values("new")});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS problems_fts_ad AFTER DELETE ON problems BEGIN
+        INSERT INTO problems_fts (problems_fts, rowid, {_SQLITE_COLUMNS}) VALUES ('delete', old.id, {_sqlite_column_values("old")});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS problems_fts_au AFTER UPDATE OF {_UPDATE_COLUMNS} ON problems BEGIN
+        INSERT INTO problems_fts (problems_fts, rowid, {_SQLITE_COLUMNS}) VALUES ('delete', old.id, {_sqlite_column_values("old")});
+        INSERT INTO problems_fts (rowid, {_SQLITE_COLUMNS}) VALUES (new.id, {_sqlite_column_values("new")});
+    END""",
+]
+
+SQLITE_DROP = [
+    "DROP TRIGGER IF EXISTS problems_fts_ai",
+    "DROP TRIGGER IF EXISTS problems_fts_ad",
+    "DROP TRIGGER IF EXISTS problems_fts_au",
+    "DROP TABLE IF EXISTS problems_fts",
+]
+
+# 与search_tokens等价的PL/pgSQL实现
+_POSTGRES_SEARCH_TOKENS = f"""
+CREATE OR REPLACE FUNCTION {SEARCH_TOKENS_FUNCTION}(src text) RETURNS text
+LANGUAGE plpgsql IMMUTABLE AS $$
+DECLARE
+    result text := '';
+    prev text;
+    run_length integer := 0;
+    ch text;
+BEGIN
+    IF src IS NULL THEN
+        RETURN '';
+    END IF;
+    FOR ch IN SELECT regexp_split_to_table(src, '') LOOP
+        IF ch ~ '[\\u3400-\\u4dbf\\u4e00-\\u9fff\\uf900-\\ufaff]' THEN
+            IF run_length > 0 THEN
+                result := result || ' ' || prev || ch;
+            END IF;
+            run_length := run_length + 1;
+            prev := ch;
+        ELSE
+            IF run_length = 1 THEN
+                result := result || ' ' || prev;
+            END IF;
+            IF run_length > 0 THEN
+                result := result || ' ';
+            END IF;
+            run_length := 0;
+            result := result || ch;
+        END IF;
+    END LOOP;
+    IF run_length = 1 THEN
+        result := result || ' ' || prev;
+    END IF;
+    RETURN result;
+END
+$$"""
+
+def _postgres_document(prefix: str) -> str:
+    """题目的tsvector：正文权重A，所有者标记权重D（查询时用 :D 限定，不会与正文中的同名单词混淆）"""
+    body = " || ' ' || ".join(f"{SEARCH_TOKENS_FUNCTION}({prefix}.{c})" for c in INDEXED_COLUMNS)
+    return (
+        f"setweight(to_tsvector('simple', {body}), 'A') || "
+        f"setweight(to_tsvector('simple', '{OWNER_TOKEN_PREFIX}' || {prefix}.owner_id), 'D')"
+    )
+
+
+POSTGRES_DDL = [
+    _POSTGRES_SEARCH_TOKENS,
+    "CREATE TABLE IF NOT EXISTS problem_search (problem_id integer PRIMARY KEY, document tsvector NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS ix_problem_search_document ON problem_search USING gin (document)",
+    f"""CREATE OR REPLACE FUNCTION problem_search_sync() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        DELETE FROM problem_search WHERE problem_id = OLD.id;
+        RETURN OLD;
+    END IF;
+    INSERT INTO problem_search (problem_id, document)
+    VALUES (NEW.id, {_postgres_document('NEW')})
+    ON CONFLICT (problem_id) DO UPDATE SET document = EXCLUDED.document;
+    RETURN NEW;
+END
+$$""",
+    "DROP TRIGGER IF EXISTS problem_search_sync ON problems",
+    f"""CREATE TRIGGER problem_search_sync
+AFTER INSERT OR DELETE OR UPDATE OF {_UPDATE_COLUMNS} ON problems
+FOR EACH ROW EXECUTE FUNCTION problem_search_sync()""",
+]
+
+POSTGRES_DROP = [
+    "DROP TRIGGER IF EXISTS problem_search_sync ON problems",
+    "DROP FUNCTION IF EXISTS problem_search_sync()",
+    "DROP TABLE IF EXISTS problem_search",
+    f"DROP FUNCTION IF EXISTS {SEARCH_TOKENS_FUNCTION}(text)",
+]
+
+
+def install(conn):
+    """创建全文索引表、分词函数（PostgreSQL）和同步触发器（可重复执行）
+
+    参数：
+        conn: SQLAlchemy连接（在事务中）
+
+    返回：
+        是否支持该数据库（SQLite、PostgreSQL以外的数据库不创建索引）
+    """
+    dialect = conn.dialect.name
+    if dialect == "sqlite":
+        statements = SQLITE_DDL
+    elif dialect == "postgresql":
+        statements = POSTGRES_DDL
+    else:
+        return False
+    for statement in statements:
+        conn.execute(text(statement))
+    return True
+
+
+def uninstall(conn):
+    """删除全文索引表、触发器和函数"""
+    statements = {"sqlite": SQLITE_DROP, "postgresql": POSTGRES_DROP}.get(conn.dialect.name, [])
+    for statement in statements:
+        conn.execute(text(statement))
+
+
+def rebuild(conn):
+    """按problems表中的现有数据重建全文索引（用于迁移回填）"""
+    dialect = conn.dialect.name
+    if dialect == "sqlite":
+        conn.execute(text("INSERT INTO problems_fts (problems_fts) VALUES ('delete-all')"))
+        conn.execute(text(
+            f"INSERT INTO problems_fts (rowid, {_SQLITE_COLUMNS}) "
+            f"SELECT p.id, {_sqlite_column_values('p')} FROM problems AS p"
+        ))
+    elif dialect == "postgresql":
+        conn.execute(text("DELETE FROM problem_search"))
+        conn.execute(text(
+            f"INSERT INTO problem_search (problem_id, document) "
+            f"SELECT p.id, {_postgres_document('p')} FROM problems AS p"
+        ))
+
+
+# ==================== 查询 ====================
+
+def query_terms(query: str):
+    """把用户输入的查询拆分为查询词（按空白分隔，忽略不含文字的词，最多MAX_QUERY_TERMS个）"""
+    terms = [t for t in (query or "").split() if _WORD.search(t)]
+    return terms[:MAX_QUERY_TERMS]
+
+
+def _fts5_phrase(term: str) -> str:
+    tokens = search_tokens(term).split()
+    phrase = '"' + " ".join(tokens).replace('"', '""') + '"'
+    # 单个汉字在索引中只作为二元组的一部分出现，用前缀匹配
+    return phrase + "*" if _CJK_CHAR.match(term) else phrase
+
+
+# 搜索结果的列及类型（原生SQL需要显式声明类型，才能得到datetime和列表）
+_RESULT_COLUMNS = {
+    "id": Integer,
+    "subject": String,
+    "course": String,
+    "problem_type": String,
+    "knowledge_tags": JSON,
+    "difficulty": Integer,
+    "created_at": DateTime,
+    "raw": String,
+    "parsed": String,
+    "notes": String,
+}
+
+
+def search_stmt(dialect_name: str, owner_id: int, terms, limit: int, offset: int = 0):
+    """构造全文检索语句：所有查询词都须命中（AND），按相关度从高到低排序
+
+    结果行包含 _RESULT_COLUMNS 中的列和相关度score（越大越相关）。
+
+    异常：
+        ValueError: 不支持的数据库
+    """
+    columns = ", ".join(f"p.{c}" for c in _RESULT_COLUMNS)
+    params = {"owner_id": owner_id, "limit": limit, "offset": offset}
+    if dialect_name == "sqlite":
+        phrases = " ".join(_fts5_phrase(t) for t in terms)
+        params["query"] = f'owner : "{OWNER_TOKEN_PREFIX}{int(owner_id)}" AND ({phrases})'
+        # 所有者列的权重为0，不参与相关度计算
+        rank = "bm25(problems_fts, 1.0, 1.0, 1.0, 0.0)"
+        sql = (
+            f"SELECT {columns}, -{rank} AS score "
+            "FROM problems_fts JOIN problems AS p ON p.id = problems_fts.rowid "
+            "WHERE problems_fts MATCH :query AND p.owner_id = :owner_id "
+            f"ORDER BY {rank}, p.id DESC LIMIT :limit OFFSET :offset"
+        )
+    elif dialect_name == "postgresql":
+        # text()中的冒号须转义，否则':D'会被当作绑定参数
+        parts = [f"to_tsquery('simple', '{OWNER_TOKEN_PREFIX}' || :owner_id || '\\:D')"]
+        for i, term in enumerate(terms):
+            if _CJK_CHAR.match(term):
+                parts.append(f"to_tsquery('simple', :t{i} || ':*')")
+                params[f"t{i}"] = term
+            else:
+                parts.append(f"phraseto_tsquery('simple', :t{i})")
+                params[f"t{i}"] = search_tokens(term)
+        tsquery = " && ".join(parts)
+        sql = (
+            f"SELECT {columns}, ts_rank(s.document, q.query) AS score "
+            f"FROM problem_search AS s JOIN problems AS p ON p.id = s.problem_id, "
+            f"(SELECT {tsquery} AS query) AS q "
+            "WHERE s.document @@ q.query AND p.owner_id = :owner_id "
+            "ORDER BY score DESC, p.id DESC LIMIT :limit OFFSET :offset"
+        )
+    else:
+        raise ValueError(f"Full-text search is not supported on {dialect_name}")
+    # created_at与模型的列类型相同，读出带UTC时区的时间（models在调用时导入，见模块说明）
+    import models
+
+    result_columns = dict(_RESULT_COLUMNS, created_at=models.UTCDateTime)
+    return text(sql).bindparams(**params).columns(score=Float, **result_columns)
+
+
+def make_snippet(row, terms, length: int = SNIPPET_LENGTH):
+    """从命中的题目中截取包含查询词的片段
+
+    依次在raw、parsed、notes中查找第一个出现的查询词（不区分大小写），
+    截取其前后共约length个字符。
+
+    返回：
+        (片段所在的列名, 片段文本, 查询词在片段中的位置列表[[开始, 结束], ...])
+    """
+    lowered_terms = [t.lower() for t in terms]
+    for field in INDEXED_COLUMNS:
+        value = getattr(row, field) or ""
+        lowered = value.lower()
+        positions = [(lowered.find(t), t) for t in lowered_terms]
+        positions = [(pos, t) for pos, t in positions if pos >= 0]
+        if not positions:
+            continue
+        first = min(pos for pos, _ in positions)
+        start = max(0, min(first - length // 3, len(value) - length))
+        snippet = value[start:start + length]
+        return field, snippet, _highlights(snippet.lower(), lowered_terms)
+    # 分词匹配但原文中没有连续出现查询词（如查询"e^x"命中"e x"），返回开头部分
+    for field in INDEXED_COLUMNS:
+        value = getattr(row, field)
+        if value:
+            return field, value[:length], []
+    return "raw", "", []
+
+
+def _highlights(lowered_snippet: str, lowered_terms):
+    """查询词在片段中出现的位置，重叠的区间合并"""
+    spans = []
+    for term in lowered_terms:
+        pos = lowered_snippet.find(term)
+        while pos >= 0:
+            spans.append([pos, pos + len(term)])
+            pos = lowered_snippet.find(term, pos + len(term))
+    spans.sort()
+    merged = []
+    for span in spans:
+        if merged and span[0] <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], span[1])
+        else:
+            merged.append(span)
+    return merged
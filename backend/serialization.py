@@ -0,0 +1,99 @@
+"""题目列表的快速序列化
+
+GET /problems 每页最多返回数百道题目，逐行构造ORM对象、再逐个经过Pydantic模型验证，
+最后由FastAPI的jsonable_encoder转换一遍再编码，在大页面上是主要的CPU开销。
+该模块提供绕过这些步骤的序列化路径：
+- 列表查询直接选择列（见crud_async.list_problems），得到SQL结果行而不是ORM对象
+- problem_rows_to_dicts 直接从结果行构造响应字典，标签列的JSON文本经缓存解析为元组
+- JSONBytesResponse 使用orjson编码（未安装orjson时退回标准库json）
+
+输出与 schemas.ProblemSummary 配合 response_model_exclude_unset 的结果一致：
+只包含请求的字段，时间按ISO 8601格式输出。
+"""
+
+import datetime
+import functools
+import json
+
+from fastapi import Response
+
+try:
+    import orjson
+except ImportError:  # orjson是可选依赖
+    orjson = None
+
+# 以JSON保存的标签列
+TAG_FIELDS = ("knowledge_tags", "tags")
+
+# 缓存的不同标签JSON文本数（题目之间的标签组合高度重复）
+TAG_CACHE_SIZE = 4096
+
+
+@functools.lru_cache(maxsize=TAG_CACHE_SIZE)
+def _parse_tag_text(text: str):
+    """解析标签列的JSON文本，结果为不可变元组以便缓存共享；无法解析或不是数组时返回None"""
+    try:
+        value = json.loads(text)
+    except ValueError:
+        return None
+    if isinstance(value, str):
+        # 兼容旧数据：JSON列中保存的是JSON字符串（二次编码）
+        return _parse_tag_text(value)
+    return tuple(value) if isinstance(value, list) else None
+
+
+def parse_tag_value(value):
+    """把标签列的值转换为可直接编码的序列
+
+    列表查询读出的是JSON文本（见crud_async.list_problems），经缓存解析；
+    PostgreSQL驱动对JSONB列直接返回列表，原样返回。
+    """
+    if isinstance(value, str):
+        return _parse_tag_text(value)
+    return value
+
+
+def problem_rows_to_dicts(rows, fields):
+    """把列表查询的结果行转换为响应字典列表
+
+    参数：
+        rows: crud_async.list_problems返回的结果行，前几列依次对应fields
+            （之后可能还有分页用的列，会被忽略）
+        fields: 需要返回的字段名列表
+
+    返回：
+        每行一个字典，只包含fields中的字段
+    """
+    tag_fields = [f for f in fields if f in TAG_FIELDS]
+    items = []
+    for row in rows:
+        item = dict(zip(fields, row))
+        for f in tag_fields:
+            item[f] = parse_tag_value(item[f])
+        items.append(item)
+    return items
+
+
+def _default(value):
+    """标准库json无法直接编码的类型"""
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, tuple):
+        return list(value)
+    raise TypeError(f"无法序列化的类型: {type(value).__name__}")
+
+
+def dumps(content) -> bytes:
+    """把响应内容编码为JSON字节串（优先使用orjson）"""
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+class JSONBytesResponse(Response):
+    """用dumps编码内容的JSON响应，内容需已是dict/list等可直接编码的数据"""
+
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return dumps(content)
@@ -0,0 +1,177 @@
+"""求解结果缓存模块
+
+求解引擎是最主要的成本和延迟来源，而大量请求求解的是相同的题目。
+求解结果按 (题目规范化文本的SHA-256, 求解模式, 求解器版本) 缓存：
+- 持久层：solve_results表（models.SolveResultEntry），多进程共享，重启后仍然有效
+- 进程内：持久层前面的LRU + TTL缓存（cache.TTLCache），命中时不查询数据库
+
+失效方式：
+- 版本失效：求解器版本（solver.solver_version）是键的一部分，升级求解器后旧结果不再命中
+- TTL失效：结果写入STORE_TTL后过期，过期的行在写入新结果时顺带清理；
+  进程内条目的有效期不超过对应持久层条目的剩余有效期
+
+题目文本按dedup.normalize_text规范化后再哈希，只有空白、标点、全半角或大小写不同的题目共享结果。
+"""
+
+import datetime
+import os
+from typing import NamedTuple, Optional
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+import cache
+import dedup
+import metrics
+import models
+import solver
+
+# 进程内缓存容量与TTL（秒）
+MEMORY_CACHE_SIZE = int(os.environ.get("STUDY_HELPER_SOLVE_CACHE_SIZE", 10000))
+MEMORY_CACHE_TTL = float(os.environ.get("STUDY_HELPER_SOLVE_CACHE_TTL", 600))
+
+# 持久层结果的有效期：默认30天
+STORE_TTL = datetime.timedelta(days=int(os.environ.get("STUDY_HELPER_SOLVE_STORE_TTL_DAYS", 30)))
+
+# 命中来源
+SOURCE_MEMORY = "memory"
+SOURCE_STORE = "store"
+
+memory_cache = cache.TTLCache(maxsize=MEMORY_CACHE_SIZE, ttl=MEMORY_CACHE_TTL)
+
+hits_total = {
+    SOURCE_MEMORY: metrics.counter("solve_cache_memory_hits_total", "进程内缓存命中的求解请求数"),
+    SOURCE_STORE: metrics.counter("solve_cache_store_hits_total", "持久层命中的求解请求数"),
+}
+misses_total = metrics.counter("solve_cache_misses_total", "未命中缓存、调用求解引擎的求解请求数")
+hit_ratio = metrics.gauge("solve_cache_hit_ratio", "求解结果缓存的累计命中率")
+
+
+class SolveKey(NamedTuple):
+    """求解结果缓存键"""
+    content_hash: str
+    mode: str
+    solver_version: str
+
+
+class CachedSolve(NamedTuple):
+    """缓存中的求解结果
+
+    - result: thoughts、steps、answer字典
+    - solved_at: 求解时间
+    - expires_at: 持久层过期时间
+    - source: 命中来源（memory / store），刚求解写入时为None
+    """
+    result: dict
+    solved_at: datetime.datetime
+    expires_at: datetime.datetime
+    source: Optional[str] = None
+
+
+def solve_key(raw: Optional[str], mode: str) -> Optional[SolveKey]:
+    """计算题目文本的缓存键，规范化后为空的题目不缓存（返回None）"""
+    content_hash = dedup.content_hash(raw)
+    if content_hash is None:
+        return None
+    return SolveKey(content_hash, mode, solver.solver_version(mode))
+
+
+def flight_key(key: SolveKey) -> str:
+    """求解任务的单飞标识（见jobs.enqueue）"""
+    return f"solve:{key.content_hash}:{key.mode}:{key.solver_version}"
+
+
+def _record(source: Optional[str]) -> None:
+    """记录一次查找的结果并更新命中率"""
+    if source is None:
+        misses_total.inc()
+    else:
+        hits_total[source].inc()
+    hits = sum(c.value for c in hits_total.values())
+    hit_ratio.set(hits / (hits + misses_total.value))
+
+
+def _remember(key: SolveKey, entry: CachedSolve, now: datetime.datetime) -> None:
+    """写入进程内缓存，有效期不超过持久层条目的剩余有效期"""
+    remaining = (entry.expires_at - now).total_seconds()
+    memory_cache.set(key, entry._replace(source=None), ttl=min(MEMORY_CACHE_TTL, remaining))
+
+
+def _upsert_stmt(dialect_name: str, values: dict):
+    """写入结果，键已存在（如已过期的旧结果，或并发求解同一道题）时覆盖"""
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        return insert(models.SolveResultEntry).values(**values)
+    stmt = dialect_insert(models.SolveResultEntry).values(**values)
+    return stmt.on_conflict_do_update(
+        index_elements=["content_hash", "mode", "solver_version"],
+        set_={"result": stmt.excluded.result, "created_at": stmt.excluded.created_at, "expires_at": stmt.excluded.expires_at},
+    )
+
+
+async def lookup(db: AsyncSession, key: SolveKey, record: bool = True) -> Optional[CachedSolve]:
+    """依次查找进程内缓存和持久层，未命中时返回None
+
+    record为True时计入命中/未命中指标（同一个请求的重复查找传False）
+    """
+    entry = memory_cache.get(key)
+    if entry is not None:
+        if record:
+            _record(SOURCE_MEMORY)
+        return entry._replace(source=SOURCE_MEMORY)
+
+    now = models.utcnow()
+    row = (await db.execute(
+        select(
+            models.SolveResultEntry.result,
+            models.SolveResultEntry.created_at,
+            models.SolveResultEntry.expires_at,
+        ).where(
+            models.SolveResultEntry.content_hash == key.content_hash,
+            models.SolveResultEntry.mode == key.mode,
+            models.SolveResultEntry.solver_version == key.solver_version,
+            models.SolveResultEntry.expires_at > now,
+        )
+    )).first()
+    if row is None:
+        if record:
+            _record(None)
+        return None
+    entry = CachedSolve(row.result, row.created_at, row.expires_at, SOURCE_STORE)
+    _remember(key, entry, now)
+    if record:
+        _record(SOURCE_STORE)
+    return entry
+
+
+async def store(db: AsyncSession, key: SolveKey, result: dict) -> CachedSolve:
+    """保存求解结果（提交事务），并清理已过期的结果"""
+    now = models.utcnow()
+    entry = CachedSolve(result, now, now + STORE_TTL)
+    await db.execute(_upsert_stmt(db.get_bind().dialect.name, {
+        "content_hash": key.content_hash,
+        "mode": key.mode,
+        "solver_version": key.solver_version,
+        "result": result,
+        "created_at": entry.solved_at,
+        "expires_at": entry.expires_at,
+    }))
+    # 按expires_at索引清理过期结果（包括旧求解器版本的结果），开销很小
+    await db.execute(delete(models.SolveResultEntry).where(models.SolveResultEntry.expires_at <= now))
+    await db.commit()
+    _remember(key, entry, now)
+    return entry
+
+
+def to_response(entry: CachedSolve, solver_version: str) -> dict:
+    """构造SolveResult字段的字典（可直接保存为JSON：时间转为ISO格式字符串）"""
+    return {
+        **entry.result,
+        "cached": entry.source is not None,
+        "cache_source": entry.source,
+        "solver_version": solver_version,
+        "solved_at": entry.solved_at.isoformat(),
+    }
@@ -0,0 +1,269 @@
+"""题目求解模块
+
+封装求解引擎的调用，返回思路、步骤和答案。
+求解后端按 思路 → 步骤 → 答案 的顺序逐段、逐个token产生输出（stream），
+流式求解接口（POST /solve/stream）边生成边推送；solve()求解一道题并一次性返回。
+
+求解后端实现SolverBackend接口，在BACKENDS中注册，按求解模式选择（backend_for）：
+- placeholder：占位实现，一次性返回模拟数据，未来将集成AI求解引擎
+- fake：按token延迟模拟本地模型生成（每次调用固定开销FAKE_CALL_OVERHEAD秒，每个token FAKE_TOKEN_DELAY秒），
+  用于测量首token延迟、总延迟和批处理吞吐
+默认所有模式使用STUDY_HELPER_SOLVER_BACKEND，可用STUDY_HELPER_SOLVER_BACKENDS按模式指定，
+如 "structured=fake,direct=placeholder"。
+
+batched为True的后端（本地模型）由微批处理层（batching.MicroBatcher）调用：
+并发的solve()最多收集BATCH_MAX_SIZE个、等待BATCH_WINDOW秒后作为一批交给solve_batch。
+流式求解逐个请求推送增量，不经过批处理。
+
+求解器版本（solver_version）标识后端、模型和提示词的版本，求解结果缓存以它为键的一部分，
+更换求解模型或调整提示词后应修改版本，旧版本的缓存结果随之失效。
+"""
+
+import os
+import re
+import threading
+import time
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Protocol, Sequence, Tuple
+
+import batching
+import metrics
+
+# 求解模式
+MODES = ("structured", "direct")
+
+# 默认的求解后端名（见BACKENDS）
+BACKEND_NAME = os.environ.get("STUDY_HELPER_SOLVER_BACKEND", "placeholder")
+
+# 按模式指定的求解后端，格式为 "模式=后端,模式=后端"，未指定的模式使用BACKEND_NAME
+MODE_BACKENDS = {mode: BACKEND_NAME for mode in MODES}
+MODE_BACKENDS.update(
+    item.strip().split("=", 1) for item in os.environ.get("STUDY_HELPER_SOLVER_BACKENDS", "").split(",") if item.strip()
+)
+
+# 求解器版本，设置后覆盖各后端的默认版本（"后端名-后端版本"）
+SOLVER_VERSION = os.environ.get("STUDY_HELPER_SOLVER_VERSION")
+
+# 微批处理：每批最多的求解数，以及第一个求解到达后等待后续求解的时间（秒）
+BATCH_MAX_SIZE = int(os.environ.get("STUDY_HELPER_SOLVER_BATCH_SIZE", 8))
+BATCH_WINDOW = float(os.environ.get("STUDY_HELPER_SOLVER_BATCH_WINDOW_MS", 0)) / 1000
+
+# 输出的三个部分，按该顺序生成
+SECTION_THOUGHTS = "thoughts"
+SECTION_STEPS = "steps"
+SECTION_ANSWER = "answer"
+
+# fake后端每个token的生成耗时，以及每次调用（一批）的固定开销（秒）
+FAKE_TOKEN_DELAY = float(os.environ.get("STUDY_HELPER_FAKE_TOKEN_DELAY", 0.02))
+FAKE_CALL_OVERHEAD = float(os.environ.get("STUDY_HELPER_FAKE_CALL_OVERHEAD", 0))
+
+# 切分token：连续的字母数字为一个token，其他字符（汉字、符号）各为一个token
+_TOKEN_RE = re.compile(r"[A-Za-z0-9]+|\s+|.", re.S)
+
+batches_total = metrics.counter("solver_batches_total", "求解后端执行的批数")
+batch_items_total = metrics.counter("solver_batch_items_total", "经批处理求解的题目数（除以批数为平均批大小）")
+
+
+class SolveDelta(NamedTuple):
+    """求解输出的一个增量
+
+    - section: 所属部分（thoughts / steps / answer）
+    - index: steps中的步骤序号（从0开始），其他部分为None
+    - text: 新生成的文本，追加到该部分（或该步骤）已有的文本之后
+    """
+    section: str
+    index: Optional[int]
+    text: str
+
+
+def collect(deltas: Iterable[SolveDelta]) -> Dict:
+    """把增量序列拼接为完整的求解结果（thoughts、steps、answer字典）"""
+    thoughts, steps, answer = [], [], []
+    for delta in deltas:
+        if delta.section == SECTION_THOUGHTS:
+            thoughts.append(delta.text)
+        elif delta.section == SECTION_STEPS:
+            while len(steps) <= delta.index:
+                steps.append([])
+            steps[delta.index].append(delta.text)
+        else:
+            answer.append(delta.text)
+    return {"thoughts": "".join(thoughts), "steps": ["".join(s) for s in steps], "answer": "".join(answer)}
+
+
+def split_result(result: Dict) -> Iterator[SolveDelta]:
+    """把完整结果按部分拆成增量（每个部分或步骤一个增量），用于一次性输出的后端和缓存命中的结果"""
+    if result.get("thoughts"):
+        yield SolveDelta(SECTION_THOUGHTS, None, result["thoughts"])
+    for i, step in enumerate(result.get("steps") or []):
+        yield SolveDelta(SECTION_STEPS, i, step)
+    if result.get("answer"):
+        yield SolveDelta(SECTION_ANSWER, None, result["answer"])
+
+
+class SolverBackend(Protocol):
+    """求解后端接口
+
+    - name: 注册名
+    - version: 后端自身的版本（模型、提示词），与name组成默认的求解器版本
+    - batched: 为True时solve()经微批处理层调用solve_batch（适合本地模型），否则每次求解直接调用
+    """
+    name: str
+    version: str
+    batched: bool
+
+    def stream(self, raw: Optional[str], mode: str) -> Iterator[SolveDelta]:
+        """求解一道题，按顺序产生增量（同步生成器，可能阻塞）"""
+        ...
+
+    def solve_batch(self, items: Sequence[Tuple[Optional[str], str]]) -> List[Dict]:
+        """求解一批 (题目文本, 模式)，按相同顺序返回完整结果"""
+        ...
+
+
+class BaseBackend:
+    """求解后端的默认实现：solve_batch逐个收集stream的输出"""
+    name = ""
+    version = "1"
+    batched = False
+
+    def stream(self, raw: Optional[str], mode: str) -> Iterator[SolveDelta]:
+        raise NotImplementedError
+
+    def solve_batch(self, items: Sequence[Tuple[Optional[str], str]]) -> List[Dict]:
+        return [collect(self.stream(raw, mode)) for raw, mode in items]
+
+
+BACKENDS: Dict[str, type] = {}
+
+
+def register_backend(name: str):
+    """注册求解后端类（装饰器），类需可无参数构造"""
+    def register(cls):
+        cls.name = name
+        BACKENDS[name] = cls
+        return cls
+    return register
+
+
+@register_backend("placeholder")
+class PlaceholderBackend(BaseBackend):
+    """占位求解后端：一次性返回模拟数据"""
+
+    def stream(self, raw: Optional[str], mode: str = "structured") -> Iterator[SolveDelta]:
+        # TODO: 集成真实的AI求解模型
+        return split_result({
+            "thoughts": "先把题目读清楚，然后分步求解。",
+            "steps": ["分析已知条件", "列出解题思路", "计算并得到结果"],
+            "answer": "42（占位答案）",
+        })
+
+
+@register_backend("fake")
+class FakeBackend(BaseBackend):
+    """模拟本地模型逐token生成的求解后端（确定性输出）
+
+    每次调用先等待call_overhead秒（固定开销），之后每个token等待token_delay秒；
+    一批求解只付一次固定开销，各题目的token并行生成，耗时取决于最长的输出。
+    """
+    batched = True
+
+    def __init__(self, token_delay: float = FAKE_TOKEN_DELAY, call_overhead: float = FAKE_CALL_OVERHEAD):
+        self.token_delay = token_delay
+        self.call_overhead = call_overhead
+
+    def _result(self, raw: Optional[str], mode: str) -> Dict:
+        problem = (raw or "").strip()
+        return {
+            "thoughts": f"先读题：{problem[:30]}。找出已知条件和所求的量，再选择合适的方法分步求解。",
+            "steps": [
+                "整理题目中的已知条件和所求的量",
+                "根据条件列出关系式",
+                "化简并求解关系式",
+                "检验结果是否满足题意",
+            ] if mode == "structured" else [],
+            "answer": f"答案（模拟）：{len(problem)}",
+        }
+
+    def stream(self, raw: Optional[str], mode: str = "structured") -> Iterator[SolveDelta]:
+        time.sleep(self.call_overhead)
+        for delta in split_result(self._result(raw, mode)):
+            for token in _TOKEN_RE.findall(delta.text):
+                time.sleep(self.token_delay)
+                yield delta._replace(text=token)
+
+    def solve_batch(self, items: Sequence[Tuple[Optional[str], str]]) -> List[Dict]:
+        results = [self._result(raw, mode) for raw, mode in items]
+        tokens = max(sum(len(_TOKEN_RE.findall(d.text)) for d in split_result(r)) for r in results)
+        time.sleep(self.call_overhead + tokens * self.token_delay)
+        return results
+
+
+# 后端实例与批处理层，每个后端一个（多个模式使用同一后端时共享）
+_instances: Dict[str, SolverBackend] = {}
+_batchers: Dict[str, batching.MicroBatcher] = {}
+_instances_lock = threading.Lock()
+
+
+def backend_for(mode: str) -> SolverBackend:
+    """求解模式对应的后端实例"""
+    name = MODE_BACKENDS[mode]
+    backend = _instances.get(name)
+    if backend is None:
+        with _instances_lock:
+            backend = _instances.get(name)
+            if backend is None:
+                backend = _instances[name] = BACKENDS[name]()
+    return backend
+
+
+def solver_version(mode: str) -> str:
+    """求解模式对应的求解器版本（求解结果缓存键的一部分）"""
+    if SOLVER_VERSION:
+        return SOLVER_VERSION
+    backend = backend_for(mode)
+    return f"{backend.name}-{backend.version}"
+
+
+def _run_batch(backend: SolverBackend, items: List[Tuple[Optional[str], str]]) -> List[Dict]:
+    batches_total.inc()
+    batch_items_total.inc(len(items))
+    return backend.solve_batch(items)
+
+
+def _batcher(backend: SolverBackend) -> batching.MicroBatcher:
+    batcher = _batchers.get(backend.name)
+    if batcher is None:
+        with _instances_lock:
+            batcher = _batchers.get(backend.name)
+            if batcher is None:
+                batcher = _batchers[backend.name] = batching.MicroBatcher(
+                    lambda items: _run_batch(backend, items),
+                    max_size=BATCH_MAX_SIZE, window=BATCH_WINDOW, name=f"solver-{backend.name}",
+                )
+    return batcher
+
+
+def stream(raw: Optional[str], mode: str = "structured") -> Iterator[SolveDelta]:
+    """流式求解：按 思路 → 步骤 → 答案 的顺序产生增量（同步生成器，可能阻塞）"""
+    return backend_for(mode).stream(raw, mode)
+
+
+def solve(raw: Optional[str], mode: str = "structured") -> Dict:
+    """求解题目（阻塞，batched后端的求解与其他线程中的并发求解合并成批）
+
+    参数：
+        raw: 题目文本
+        mode: 求解模式（structured / direct）
+
+    返回：
+        包含thoughts、steps、answer的字典
+    """
+    backend = backend_for(mode)
+    if backend.batched:
+        return _batcher(backend).call((raw, mode))
+    return backend.solve_batch([(raw, mode)])[0]
+
+
+for _mode, _name in MODE_BACKENDS.items():
+    if _mode not in MODES or _name not in BACKENDS:
+        raise ValueError(f"STUDY_HELPER_SOLVER_BACKENDS配置无效: {_mode}={_name}")
@@ -0,0 +1,119 @@
+"""题目标签的规范化存储与筛选
+
+Problem.knowledge_tags / Problem.tags 以JSON数组保存在题目行中，用于返回题目详情；
+同样的标签同时规范化到 tags / problem_tags 表（见models.Tag、models.ProblemTag），
+按标签筛选题目时走 problem_tags 的索引，而不是逐行解析JSON。
+
+该模块只构造SQL语句，由crud_async和migrations共用：
+- tag_keys: 从两个标签列表得到 (kind, name) 集合
+- insert_tags_stmt / select_tag_ids_stmt: 创建缺失的标签、按 (kind, name) 查询标签ID
+- replace_problem_tags_stmts: 重建某道题的标签关联
+- filter_clause: 按标签ID筛选题目（AND / OR）
+"""
+
+import json
+
+from sqlalchemy import and_, delete, insert, select, tuple_
+
+import models
+
+# 标签筛选的匹配方式：all 要求包含全部标签（AND），any 包含任一标签即可（OR）
+TAG_MATCH_ALL = "all"
+TAG_MATCH_ANY = "any"
+TAG_MATCH_MODES = (TAG_MATCH_ALL, TAG_MATCH_ANY)
+
+# 标签名的最大长度（models.Tag.name列），更长的标签截断后保存
+MAX_TAG_LENGTH = 128
+
+
+def parse_tag_list(value):
+    """把标签列的值解析为列表
+
+    JSON列读出的是列表；迁移中用原生SQL读取时SQLite返回JSON文本，
+    无法解析或不是数组时返回空列表。
+    """
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            return []
+    return value if isinstance(value, list) else []
+
+
+def tag_keys(knowledge_tags=None, tags=None):
+    """把知识点标签和用户标签列表转换为 (kind, name) 集合
+
+    去除首尾空白并截断到MAX_TAG_LENGTH（与mastery.topics_of相同，知识点标签和掌握度主题一一对应），忽略空标签。
+    """
+    keys = set()
+    for kind, names in ((models.TAG_KIND_KNOWLEDGE, knowledge_tags), (models.TAG_KIND_USER, tags)):
+        for name in names or []:
+            if isinstance(name, str) and name.strip():
+                keys.add((kind, name.strip()[:MAX_TAG_LENGTH]))
+    return keys
+
+
+def insert_ignore(dialect_name: str, table):
+    """构造忽略唯一约束冲突的INSERT（SQLite与PostgreSQL都支持 ON CONFLICT DO NOTHING）
+
+    其他模块写入带唯一约束的关联表时同样使用（如dedup的签名表）。
+    """
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect_name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        # 其他数据库没有通用的写法，退化为普通INSERT（冲突时报错）
+        return insert(table)
+    return dialect_insert(table).on_conflict_do_nothing()
+
+
+def insert_tags_stmt(dialect_name: str, keys):
+    """创建keys中尚不存在的标签（并发创建同名标签时不会违反唯一约束）"""
+    return insert_ignore(dialect_name, models.Tag.__table__).values(
+        [{"kind": kind, "name": name} for kind, name in sorted(keys)]
+    )
+
+
+def select_tag_ids_stmt(keys):
+    """按 (kind, name) 查询标签，结果行为 (id, kind, name)"""
+    return select(models.Tag.id, models.Tag.kind, models.Tag.name).where(
+        tuple_(models.Tag.kind, models.Tag.name).in_(sorted(keys))
+    )
+
+
+def replace_problem_tags_stmts(dialect_name: str, problem_id: int, tag_ids):
+    """重建一道题的标签关联：先删除旧关联，再插入新关联
+
+    返回：
+        需要按顺序执行的语句列表
+    """
+    stmts = [delete(models.ProblemTag).where(models.ProblemTag.problem_id == problem_id)]
+    if tag_ids:
+        stmts.append(insert_problem_tags_stmt(dialect_name, [(problem_id, tag_id) for tag_id in tag_ids]))
+    return stmts
+
+
+def insert_problem_tags_stmt(dialect_name: str, pairs):
+    """插入 (problem_id, tag_id) 关联，已存在的关联被忽略"""
+    return insert_ignore(dialect_name, models.ProblemTag.__table__).values(
+        [{"problem_id": problem_id, "tag_id": tag_id} for problem_id, tag_id in pairs]
+    )
+
+
+def filter_clause(tag_ids, match: str = TAG_MATCH_ALL):
+    """按标签ID筛选题目的条件（作用于models.Problem.id）
+
+    - all: 每个标签一个 IN 子查询，题目必须出现在所有子查询中
+    - any: 一个 tag_id IN (...) 的子查询
+
+    子查询都按 (tag_id, problem_id) 索引查找，不需要扫描题目行。
+    """
+    if match == TAG_MATCH_ANY:
+        subquery = select(models.ProblemTag.problem_id).where(models.ProblemTag.tag_id.in_(tag_ids))
+        return models.Problem.id.in_(subquery)
+    conditions = [
+        models.Problem.id.in_(select(models.ProblemTag.problem_id).where(models.ProblemTag.tag_id == tag_id))
+        for tag_id in tag_ids
+    ]
+    return and_(*conditions)
@@ -0,0 +1,980 @@
+"""API和数据库操作测试
+
+使用conftest.py中的db/client fixtures，每个测试分别在SQLite和PostgreSQL上运行
+（没有可用的PostgreSQL时跳过PostgreSQL参数），覆盖各方言分支：
+upsert（掌握度、学习趋势、错题本、复习计划）、insert_ignore（标签）、
+全文检索（FTS5 / tsvector）和任务领取（FOR UPDATE SKIP LOCKED）。
+"""
+
+import asyncio
+import datetime
+import hashlib
+import json
+import math
+import os
+import random
+
+import httpx
+import numpy as np
+import pytest
+from sqlalchemy import delete, inspect, select, text
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+import blobstore
+import database
+import dedup
+import jobs
+import mastery
+import migrations
+import models
+import recompute
+import reviews
+import solver
+import tags
+import uploads
+from main import app, get_async_db
+
+
+def register_and_login(client, username: str, password: str = "secret123") -> dict:
+    """注册并登录用户，返回带访问令牌的请求头"""
+    r = client.post("/register", json={"username": username, "password": password, "nickname": username})
+    assert r.status_code == 200, r.text
+    r = client.post("/login", data={"username": username, "password": password})
+    assert r.status_code == 200, r.text
+    return {"Authorization": f"Bearer {r.json()['access_token']}"}
+
+
+def upload(client, headers: dict, raw: str, **fields) -> dict:
+    """上传文本题目，knowledge_tags/tags以列表传入"""
+    data = {"raw": raw, "source_type": "text"}
+    for name in ("knowledge_tags", "tags"):
+        if name in fields:
+            fields[name] = json.dumps(fields[name], ensure_ascii=False)
+    data.update({k: str(v) for k, v in fields.items()})
+    r = client.post("/problems/upload", data=data, headers=headers)
+    assert r.status_code == 200, r.text
+    return r.json()
+
+
+def post_streamed(path: str, headers: dict, chunks: list) -> tuple:
+    """以ASGI方式直接调用应用，请求体按chunks逐块发送（分块传输，不带Content-Length）
+
+    返回：
+        (响应状态码, 应用实际读取的块数)
+    """
+    async def drive():
+        consumed = 0
+        messages = []
+
+        async def receive():
+            nonlocal consumed
+            if consumed == len(chunks):
+                return {"type": "http.disconnect"}
+            consumed += 1
+            return {"type": "http.request", "body": chunks[consumed - 1], "more_body": consumed < len(chunks)}
+
+        async def send(message):
+            messages.append(message)
+
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST",
+            "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"",
+            "headers": [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers.items()],
+            "client": ("testclient", 50000), "server": ("testserver", 80),
+        }
+        await app(scope, receive, send)
+        start = next(m for m in messages if m["type"] == "http.response.start")
+        return start["status"], consumed
+
+    return asyncio.run(drive())
+
+
+def multipart_file_chunks(boundary: str, name: str, filename: str, chunk: bytes, count: int) -> list:
+    """构造只含一个文件部分的multipart请求体，文件内容为count个chunk"""
+    head = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"{name}\"; filename=\"{filename}\"\r\n"
+            f"Content-Type: application/octet-stream\r\n\r\n").encode()
+    return [head] + [chunk] * count + [f"\r\n--{boundary}--\r\n".encode()]
+
+
+def run_jobs(db, workers: int = 1, timeout: float = 30) -> None:
+    """启动工作者池执行任务，直到没有排队、执行中或等待中的任务"""
+    session_factory = db.info["async_session_factory"]
+    unfinished = (jobs.STATUS_QUEUED, jobs.STATUS_RUNNING, jobs.STATUS_WAITING)
+
+    async def drive():
+        pool = jobs.WorkerPool(session_factory, workers)
+        pool.start()
+        try:
+            async def drained():
+                while True:
+                    async with session_factory() as session:
+                        pending = (await session.execute(
+                            select(models.Job.id).where(models.Job.status.in_(unfinished)).limit(1)
+                        )).first()
+                    if pending is None:
+                        return
+                    await asyncio.sleep(0.05)
+            await asyncio.wait_for(drained(), timeout)
+        finally:
+            await pool.stop()
+
+    asyncio.run(drive())
+
+
+class TestAuth:
+    """用户注册和登录"""
+
+    def test_register_and_login(self, client):
+        headers = register_and_login(client, "alice")
+        r = client.get("/users/me", headers=headers)
+        assert r.status_code == 200
+        assert r.json()["username"] == "alice"
+
+    def test_register_duplicate_username(self, client):
+        register_and_login(client, "alice")
+        r = client.post("/register", json={"username": "alice", "password": "another1"})
+        assert r.status_code == 400
+
+    def test_login_wrong_password(self, client):
+        register_and_login(client, "alice")
+        r = client.post("/login", data={"username": "alice", "password": "wrong"})
+        assert r.status_code == 400
+
+    def test_requires_token(self, client):
+        assert client.get("/users/me").status_code == 401
+
+
+class TestProblemEndpoints:
+    """题目上传、查询和更新的往返"""
+
+    def test_upload_get_update_round_trip(self, client):
+        headers = register_and_login(client, "alice")
+        created = upload(client, headers, "求函数f(x)=x^2的导数", subject="数学", course="高等数学",
+                         difficulty=2, knowledge_tags=["导数"], tags=["易错"], notes="基础题")
+        assert created["owner_id"] is not None
+        assert created["knowledge_tags"] == ["导数"]
+        assert created["tags"] == ["易错"]
+
+        r = client.get(f"/problems/{created['id']}", headers=headers)
+        assert r.status_code == 200
+        fetched = r.json()
+        for name in ("subject", "course", "difficulty", "knowledge_tags", "tags", "notes"):
+            assert fetched[name] == created[name]
+
+        r = client.patch(f"/problems/{created['id']}", headers=headers, json={
+            "difficulty": 4, "is_bookmarked": True, "knowledge_tags": ["导数", "极限"], "tags": ["难题"],
+        })
+        assert r.status_code == 200, r.text
+        r = client.get(f"/problems/{created['id']}", headers=headers)
+        updated = r.json()
+        assert updated["difficulty"] == 4
+        assert updated["is_bookmarked"] is True
+        assert updated["knowledge_tags"] == ["导数", "极限"]
+        assert updated["tags"] == ["难题"]
+        assert updated["subject"] == "数学"
+
+    def test_other_users_problem(self, client):
+        owner = register_and_login(client, "alice")
+        other = register_and_login(client, "bob")
+        problem = upload(client, owner, "求极限lim(x->0) sin x / x")
+        assert client.patch(f"/problems/{problem['id']}", headers=other, json={"notes": "x"}).status_code == 403
+        r = client.post("/attempts", headers=other, json={"problem_id": problem["id"], "correct": True})
+        assert r.status_code == 403
+        assert client.get("/problems/999999", headers=owner).status_code == 404
+
+
+class TestUploadStreaming:
+    """题目上传：边接收边解析请求体，文件流式写入Blob存储，超限请求在接收完之前被拒绝"""
+
+    BOUNDARY = "study-helper-test-boundary"
+
+    def test_file_upload_streams_into_blob_store(self, client, blob_store):
+        headers = register_and_login(client, "alice")
+        data = bytes(range(256)) * 5000
+        r = client.post("/problems/upload", headers=headers, files={"file": ("scan.png", data, "image/png")},
+                        data={"subject": "数学", "knowledge_tags": json.dumps(["导数"])})
+        assert r.status_code == 200, r.text
+        problem = r.json()
+        assert problem["file_sha256"] == hashlib.sha256(data).hexdigest()
+        assert problem["file_size"] == len(data)
+        assert problem["mime_type"] == "image/png"
+        assert problem["subject"] == "数学"
+        assert problem["knowledge_tags"] == ["导数"]
+
+        r = client.get(f"/problems/{problem['id']}/file", headers=headers)
+        assert r.status_code == 200
+        assert r.content == data
+        # 写入线程的临时文件已提交或删除
+        assert os.listdir(blob_store.tmp_dir) == []
+
+    def test_invalid_form_fields(self, client, blob_store):
+        headers = register_and_login(client, "alice")
+        assert client.post("/problems/upload", headers=headers, data={"subject": "数学"}).status_code == 400
+        r = client.post("/problems/upload", headers=headers, data={"raw": "题目", "difficulty": "难"})
+        assert r.status_code == 422
+        r = client.post("/problems/upload", headers={**headers, "Content-Type": "text/plain"}, content=b"raw")
+        assert r.status_code == 400
+
+    def test_declared_length_rejected_without_reading_body(self, client, blob_store):
+        headers = register_and_login(client, "alice")
+        headers.update({
+            "Content-Type": f"multipart/form-data; boundary={self.BOUNDARY}",
+            "Content-Length": str(blobstore.MAX_UPLOAD_SIZE * 2),
+        })
+        chunks = multipart_file_chunks(self.BOUNDARY, "file", "big.pdf", b"x" * 1024 * 1024, 40)
+        status_code, consumed = post_streamed("/problems/upload", headers, chunks)
+        assert status_code == 413
+        assert consumed == 0
+
+    def test_file_over_limit_rejected_while_streaming(self, client, blob_store, monkeypatch):
+        monkeypatch.setattr(blobstore, "MAX_UPLOAD_SIZE", 1024 * 1024)
+        headers = register_and_login(client, "alice")
+        headers["Content-Type"] = f"multipart/form-data; boundary={self.BOUNDARY}"
+        chunks = multipart_file_chunks(self.BOUNDARY, "file", "big.pdf", b"x" * 256 * 1024, 40)
+        status_code, consumed = post_streamed("/problems/upload", headers, chunks)
+        assert status_code == 413
+        # 超过1MB后停止接收：除写入队列缓冲的块外，后面的块都没有被读取
+        assert consumed < len(chunks) // 2
+        assert os.listdir(blob_store.tmp_dir) == []
+
+    def test_body_over_limit_rejected_by_middleware(self, client, blob_store):
+        headers = register_and_login(client, "alice")
+        headers["Content-Type"] = f"multipart/form-data; boundary={self.BOUNDARY}"
+        # 非file字段的文件部分会被丢弃，不受文件大小限制，由中间件限制整个请求体
+        chunk = b"x" * 1024 * 1024
+        count = blobstore.MAX_UPLOAD_SIZE // len(chunk) + 10
+        chunks = multipart_file_chunks(self.BOUNDARY, "attachment", "big.pdf", chunk, count)
+        status_code, consumed = post_streamed("/problems/upload", headers, chunks)
+        assert status_code == 413
+        assert consumed < len(chunks) - 5
+
+
+def put_part(client, headers: dict, session_id: str, part_number: int, data: bytes, sha256: str = None):
+    """上传一个分片，默认附带正确的SHA-256"""
+    return client.put(
+        f"/uploads/{session_id}/parts/{part_number}", content=data,
+        headers={**headers, "X-Part-SHA256": sha256 or hashlib.sha256(data).hexdigest()},
+    )
+
+
+class TestUploadSessions:
+    """分片上传会话：创建、上传分片、提交、放弃，校验和不匹配与过期回收"""
+
+    def test_create_upload_complete(self, client, blob_store, upload_dir):
+        headers = register_and_login(client, "alice")
+        r = client.post("/uploads", headers=headers, json={
+            "filename": "期中试卷.pdf", "subject": "数学", "knowledge_tags": ["导数"],
+        })
+        assert r.status_code == 200, r.text
+        session = r.json()
+        assert session["mime_type"] == "application/pdf"
+        assert session["status"] == "open"
+
+        parts = [os.urandom(3000), os.urandom(3000), os.urandom(100)]
+        # 乱序上传并重传第2片：同编号的新分片覆盖旧分片
+        for number in (3, 2, 1):
+            assert put_part(client, headers, session["id"], number, parts[number - 1]).status_code == 200
+        r = put_part(client, headers, session["id"], 2, parts[1])
+        assert r.json() == {"part_number": 2, "size": 3000, "sha256": hashlib.sha256(parts[1]).hexdigest()}
+
+        r = client.get(f"/uploads/{session['id']}", headers=headers)
+        assert [p["part_number"] for p in r.json()["parts"]] == [1, 2, 3]
+        assert r.json()["received_bytes"] == 6100
+
+        declared = [{"part_number": i + 1, "sha256": hashlib.sha256(p).hexdigest()} for i, p in enumerate(parts)]
+        r = client.post(f"/uploads/{session['id']}/complete", headers=headers, json={"parts": declared})
+        assert r.status_code == 200, r.text
+        problem = r.json()
+        content = b"".join(parts)
+        assert problem["file_sha256"] == hashlib.sha256(content).hexdigest()
+        assert problem["file_size"] == len(content)
+        assert problem["subject"] == "数学"
+        assert problem["knowledge_tags"] == ["导数"]
+        assert client.get(f"/problems/{problem['id']}/file", headers=headers).content == content
+        assert not os.path.exists(uploads.session_dir(session["id"]))
+
+        # 重复提交幂等返回同一题目；已提交的会话不再接受分片
+        r = client.post(f"/uploads/{session['id']}/complete", headers=headers)
+        assert r.json()["id"] == problem["id"]
+        assert put_part(client, headers, session["id"], 4, b"x").status_code == 409
+
+    def test_incomplete_parts_rejected(self, client, blob_store, upload_dir):
+        headers = register_and_login(client, "alice")
+        session = client.post("/uploads", headers=headers, json={"filename": "scan.png"}).json()
+        put_part(client, headers, session["id"], 1, b"first")
+        put_part(client, headers, session["id"], 3, b"third")
+        r = client.post(f"/uploads/{session['id']}/complete", headers=headers)
+        assert r.status_code == 400
+        put_part(client, headers, session["id"], 2, b"second")
+        r = client.post(f"/uploads/{session['id']}/complete", headers=headers, json={"parts": [
+            {"part_number": 1, "sha256": hashlib.sha256(b"first").hexdigest()},
+        ]})
+        assert r.status_code == 400
+
+    def test_checksum_mismatch(self, client, blob_store, upload_dir):
+        headers = register_and_login(client, "alice")
+        session = client.post("/uploads", headers=headers, json={"filename": "scan.png"}).json()
+        assert put_part(client, headers, session["id"], 1, b"original").status_code == 200
+
+        r = put_part(client, headers, session["id"], 1, b"corrupted", sha256=hashlib.sha256(b"original").hexdigest())
+        assert r.status_code == 400
+        # 校验失败的分片不覆盖已有分片，也不留下临时文件
+        assert os.listdir(uploads.session_dir(session["id"])) == ["1.part"]
+        with open(uploads.part_path(session["id"], 1), "rb") as f:
+            assert f.read() == b"original"
+        r = client.get(f"/uploads/{session['id']}", headers=headers)
+        assert r.json()["parts"][0]["sha256"] == hashlib.sha256(b"original").hexdigest()
+
+        r = client.put(f"/uploads/{session['id']}/parts/2", headers=headers, content=b"no checksum")
+        assert r.status_code == 400
+
+    def test_abort_removes_session_and_parts(self, client, blob_store, upload_dir):
+        headers = register_and_login(client, "alice")
+        other = register_and_login(client, "bob")
+        session = client.post("/uploads", headers=headers, json={"filename": "scan.png"}).json()
+        put_part(client, headers, session["id"], 1, b"data")
+        assert client.delete(f"/uploads/{session['id']}", headers=other).status_code == 404
+        assert client.delete(f"/uploads/{session['id']}", headers=headers).status_code == 204
+        assert not os.path.exists(uploads.session_dir(session["id"]))
+        assert client.get(f"/uploads/{session['id']}", headers=headers).status_code == 404
+
+    def test_expired_sessions_collected(self, client, db, blob_store, upload_dir):
+        headers = register_and_login(client, "alice")
+        expired = client.post("/uploads", headers=headers, json={"filename": "old.png"}).json()
+        put_part(client, headers, expired["id"], 1, b"stale")
+        db.get(models.UploadSession, expired["id"]).expires_at = models.utcnow() - datetime.timedelta(minutes=1)
+        db.commit()
+        assert client.get(f"/uploads/{expired['id']}", headers=headers).status_code == 404
+
+        # 创建新会话时回收过期会话的记录和暂存分片
+        current = client.post("/uploads", headers=headers, json={"filename": "new.png"}).json()
+        db.expire_all()
+        assert db.get(models.UploadSession, expired["id"]) is None
+        assert db.query(models.UploadPart).filter_by(session_id=expired["id"]).count() == 0
+        assert not os.path.exists(uploads.session_dir(expired["id"]))
+        assert client.get(f"/uploads/{current['id']}", headers=headers).status_code == 200
+
+
+class TestDedup:
+    """题目去重：精确重复、近似重复（相似度阈值0.8）和上传文件的精确去重"""
+
+    TEXT = "已知函数f(x)=x^3-3x^2+2x+1，求f(x)在区间[0,3]上的最大值和最小值，并说明取得最值时x的取值。请写出完整的求解过程。"
+
+    def test_exact_duplicate_reuses_parsed(self, client, db):
+        alice = register_and_login(client, "alice")
+        bob = register_and_login(client, "bob")
+        first = upload(client, alice, self.TEXT)
+        db.get(models.Problem, first["id"]).parsed = "最大值7，最小值1"
+        db.commit()
+
+        # 空白、标点和全半角不同的同一道题
+        variant = "  " + self.TEXT.replace("，", ",").replace("f(x)", "Ｆ( x )") + "\n"
+        second = upload(client, bob, variant)
+        assert second["cluster_id"] == first["cluster_id"]
+        db.expire_all()
+        cluster = db.get(models.ProblemCluster, first["cluster_id"])
+        assert cluster.member_count == 2
+        assert cluster.canonical_problem_id == first["id"]
+        assert db.get(models.Problem, second["id"]).parsed == "最大值7，最小值1"
+        assert db.get(models.Problem, second["id"]).content_hash == dedup.content_hash(self.TEXT)
+
+        other = upload(client, bob, "求不定积分∫x·e^x dx")
+        assert other["cluster_id"] != first["cluster_id"]
+        assert db.query(models.ProblemCluster).count() == 2
+
+    def test_near_duplicate_joins_cluster(self, client, db):
+        headers = register_and_login(client, "alice")
+        first = upload(client, headers, self.TEXT)
+        db.get(models.Problem, first["id"]).parsed = "最大值7，最小值1"
+        db.commit()
+
+        near = self.TEXT + "（10分）"
+        assert dedup.similarity(dedup.fingerprint(self.TEXT).minhash, dedup.fingerprint(near).minhash) >= 0.8
+        second = upload(client, headers, near)
+        assert second["cluster_id"] == first["cluster_id"]
+        db.expire_all()
+        # 近似重复不复用解析结果，但记录了自身的精确指纹：再次上传同样的文本直接精确命中
+        assert db.get(models.Problem, second["id"]).parsed is None
+        third = upload(client, headers, near)
+        assert third["cluster_id"] == first["cluster_id"]
+        assert db.get(models.ProblemCluster, first["cluster_id"]).member_count == 3
+        assert db.get(models.Problem, third["id"]).parsed is None
+
+    def test_near_duplicate_threshold(self, client, db):
+        headers = register_and_login(client, "alice")
+        cluster_id = upload(client, headers, self.TEXT)["cluster_id"]
+        base = dedup.fingerprint(self.TEXT)
+
+        def probe(shared: int):
+            # 与代表题目的LSH段键相同（成为候选）、MinHash签名有shared个值相同的指纹
+            signature = base.minhash[:shared] + tuple(v ^ 1 for v in base.minhash[shared:])
+            fp = dedup.Fingerprint("0" * 64, 0, signature, base.band_keys)
+            return dedup.find_cluster(db, fp)
+
+        # 32个值中至少26个相同（0.8125）才达到阈值0.8
+        threshold = math.ceil(dedup.NEAR_DUPLICATE_THRESHOLD * dedup.NUM_PERM)
+        match = probe(threshold)
+        assert match == dedup.ClusterMatch(cluster_id, dedup.MATCH_NEAR, threshold / dedup.NUM_PERM)
+        assert probe(threshold - 1) is None
+        assert probe(dedup.NUM_PERM).similarity == 1.0
+
+    def test_file_fingerprint(self, client, db, blob_store):
+        headers = register_and_login(client, "alice")
+        data = os.urandom(4096)
+
+        def upload_file(name: str, content: bytes) -> dict:
+            r = client.post("/problems/upload", headers=headers, files={"file": (name, content, "image/png")})
+            assert r.status_code == 200, r.text
+            return r.json()
+
+        first = upload_file("scan.png", data)
+        second = upload_file("再次扫描.png", data)
+        assert second["cluster_id"] == first["cluster_id"]
+        db.expire_all()
+        cluster = db.get(models.ProblemCluster, first["cluster_id"])
+        assert (cluster.member_count, cluster.content_hash) == (2, hashlib.sha256(data).hexdigest())
+        # 上传文件的题目只做精确去重
+        assert cluster.minhash is None
+        assert dedup.fingerprint("FILE:scan.png", hashlib.sha256(data).hexdigest()).minhash is None
+
+        third = upload_file("scan.png", data[:-1] + bytes([data[-1] ^ 1]))
+        assert third["cluster_id"] != first["cluster_id"]
+
+
+class TestProblemList:
+    """题目列表：游标分页和标签筛选"""
+
+    def test_keyset_pagination(self, client):
+        headers = register_and_login(client, "alice")
+        ids = [upload(client, headers, f"第{i}题：计算{i}+{i}")["id"] for i in range(7)]
+        # 其他用户的题目不出现在列表中
+        upload(client, register_and_login(client, "bob"), "别人的题目")
+
+        seen, cursor, pages = [], None, 0
+        while True:
+            params = {"limit": 3}
+            if cursor:
+                params["cursor"] = cursor
+            r = client.get("/problems", params=params, headers=headers)
+            assert r.status_code == 200
+            page = [item["id"] for item in r.json()]
+            assert len(page) <= 3
+            seen.extend(page)
+            pages += 1
+            cursor = r.headers.get("X-Next-Cursor")
+            if not cursor:
+                break
+        assert pages == 3
+        assert seen == sorted(ids, reverse=True)
+
+    def test_invalid_cursor(self, client):
+        headers = register_and_login(client, "alice")
+        r = client.get("/problems", params={"cursor": "not-a-cursor"}, headers=headers)
+        assert r.status_code == 400
+
+    def test_tag_filter_all_and_any(self, client):
+        headers = register_and_login(client, "alice")
+        both = upload(client, headers, "题目甲", tags=["易错", "难题"])["id"]
+        only_hard = upload(client, headers, "题目乙", tags=["难题"])["id"]
+        only_easy_mistake = upload(client, headers, "题目丙", tags=["易错"], knowledge_tags=["导数"])["id"]
+        upload(client, headers, "题目丁")
+
+        def listed(**params):
+            r = client.get("/problems", params=params, headers=headers)
+            assert r.status_code == 200, r.text
+            return sorted(item["id"] for item in r.json())
+
+        assert listed(tag=["易错", "难题"]) == [both]
+        assert listed(tag=["易错", "难题"], tag_match="all") == [both]
+        assert listed(tag=["易错", "难题"], tag_match="any") == sorted([both, only_hard, only_easy_mistake])
+        assert listed(tag=["难题"], knowledge_tag=["导数"], tag_match="any") == sorted(
+            [both, only_hard, only_easy_mistake]
+        )
+        assert listed(tag=["易错"], knowledge_tag=["导数"]) == [only_easy_mistake]
+        assert listed(tag=["不存在"]) == []
+
+        # 更新标签后按新的标签筛选（标签关联表整体替换）
+        r = client.patch(f"/problems/{only_hard}", headers=headers, json={"tags": ["易错", "难题"]})
+        assert r.status_code == 200
+        assert listed(tag=["易错", "难题"]) == sorted([both, only_hard])
+
+        r = client.get("/problems", params={"tag": "难题", "tag_match": "some"}, headers=headers)
+        assert r.status_code == 400
+
+    def test_tags_shared_between_problems(self, client, db):
+        headers = register_and_login(client, "alice")
+        upload(client, headers, "题目甲", tags=["易错"], knowledge_tags=["导数"])
+        upload(client, headers, "题目乙", tags=["易错"], knowledge_tags=["导数"])
+        # 已存在的标签不重复写入（insert_ignore）
+        assert db.query(models.Tag).count() == 2
+
+    def test_long_tags_truncated_like_topics(self, client, db):
+        headers = register_and_login(client, "alice")
+        long_topic, long_tag = "微" * 200, "难" * 200
+        problem = upload(client, headers, "题目甲", knowledge_tags=[long_topic], tags=[long_tag])
+        names = sorted(tag.name for tag in db.query(models.Tag))
+        assert names == sorted([long_topic[:tags.MAX_TAG_LENGTH], long_tag[:tags.MAX_TAG_LENGTH]])
+
+        # 筛选时按同样的规则截断
+        r = client.get("/problems", params={"knowledge_tag": long_topic, "tag": long_tag}, headers=headers)
+        assert [item["id"] for item in r.json()] == [problem["id"]]
+
+        # 掌握度主题与知识点标签一致
+        r = client.post("/attempts", headers=headers, json={"problem_id": problem["id"], "correct": True})
+        assert list(r.json()["mastery"]) == [long_topic[:mastery.MAX_TOPIC_LENGTH]]
+        assert mastery.topics_of([long_topic]) == [name for name in names if name.startswith("微")]
+
+
+class TestSearch:
+    """全文检索（SQLite FTS5 / PostgreSQL tsvector）"""
+
+    def test_search_raw_and_notes(self, client):
+        headers = register_and_login(client, "alice")
+        integral = upload(client, headers, "求定积分∫e^x dx，积分区间为[0, 1]")
+        other = upload(client, headers, "解方程x^2-1=0")
+        upload(client, register_and_login(client, "bob"), "求定积分∫x dx")
+
+        r = client.get("/problems/search", params={"q": "定积分"}, headers=headers)
+        assert r.status_code == 200
+        hits = r.json()
+        assert [hit["id"] for hit in hits] == [integral["id"]]
+        assert hits[0]["field"] == "raw"
+        assert "定积分" in hits[0]["snippet"]
+
+        # 更新笔记后可以检索到
+        r = client.patch(f"/problems/{other['id']}", headers=headers, json={"notes": "因式分解"})
+        assert r.status_code == 200
+        r = client.get("/problems/search", params={"q": "因式分解"}, headers=headers)
+        assert [hit["id"] for hit in r.json()] == [other["id"]]
+
+        r = client.get("/problems/search", params={"q": "微分方程"}, headers=headers)
+        assert r.json() == []
+
+
+class TestAttempts:
+    """答题记录：掌握度、学习趋势、错题本和复习计划的upsert"""
+
+    def test_attempts_update_mastery_mistakes_and_reviews(self, client, db):
+        headers = register_and_login(client, "alice")
+        problem = upload(client, headers, "求f(x)=ln x的导数", subject="数学", difficulty=3, knowledge_tags=["导数"])
+
+        r = client.post("/attempts", headers=headers, json={"problem_id": problem["id"], "correct": False})
+        assert r.status_code == 201, r.text
+        after_wrong = r.json()["mastery"]["导数"]
+        r = client.post("/attempts", headers=headers, json={"problem_id": problem["id"], "score": 90})
+        assert r.status_code == 201
+        assert r.json()["mastery"]["导数"] > after_wrong
+
+        r = client.get("/profile", headers=headers)
+        assert r.status_code == 200
+        profile = r.json()
+        assert set(profile["mastery"]) == {"导数"}
+        assert sum(point["attempts"] for point in profile["trend"]) == 2
+        assert sum(point["correct"] for point in profile["trend"]) == 1
+
+        r = client.get("/mistakes", headers=headers)
+        assert r.status_code == 200
+        mistakes = r.json()
+        assert mistakes["total"] == 1
+        item = mistakes["items"][0]
+        assert (item["problem_id"], item["attempts"], item["wrong"], item["last_correct"]) == (problem["id"], 2, 1, True)
+
+        r = client.patch(f"/mistakes/{problem['id']}", headers=headers, json={"mastered": True})
+        assert r.status_code == 200, r.text
+        assert r.json()["mastered"] is True
+        assert client.get("/mistakes", params={"mastered": False}, headers=headers).json()["total"] == 0
+
+        state = db.query(models.ReviewState).one()
+        assert (state.problem_id, state.reviews, state.lapses) == (problem["id"], 2, 1)
+        assert db.query(models.TopicMastery).count() == 1
+
+
+class TestJobs:
+    """任务队列：并发领取时每个任务只执行一次"""
+
+    def test_each_job_claimed_once(self, client, db, monkeypatch):
+        register_and_login(client, "alice")
+        calls = {}
+
+        async def record(session, payload):
+            calls[payload["n"]] = calls.get(payload["n"], 0) + 1
+            await asyncio.sleep(0.01)
+            return {"n": payload["n"]}
+
+        monkeypatch.setitem(jobs.handlers, "test", record)
+
+        async def submit():
+            async with db.info["async_session_factory"]() as session:
+                for n in range(20):
+                    await jobs.enqueue(session, "test", {"n": n}, priority="high" if n % 2 else "normal")
+
+        asyncio.run(submit())
+        run_jobs(db, workers=4)
+
+        assert calls == {n: 1 for n in range(20)}
+        finished = db.query(models.Job).all()
+        assert len(finished) == 20
+        for job in finished:
+            assert job.status == jobs.STATUS_SUCCEEDED
+            assert job.attempts == 1
+            assert job.result == {"n": job.payload["n"]}
+
+    def test_waiters_removed_when_last_leaves(self):
+        async def scenario():
+            # 超时返回的等待不留下条目
+            await jobs.wait_for_change(1, 0.01)
+            assert 1 not in jobs._watchers
+
+            # 两个等待者共用一个事件：先超时的离开后条目保留，通知唤醒另一个
+            short = asyncio.ensure_future(jobs.wait_for_change(2, 0.01))
+            long = asyncio.ensure_future(jobs.wait_for_change(2, 10))
+            await short
+            assert jobs._watchers[2][1] == 1
+            jobs._notify(2)
+            await asyncio.wait_for(long, 1)
+            assert jobs._watchers == {}
+
+        asyncio.run(scenario())
+
+
+class TestSolveSingleFlight:
+    """同一道题的并发求解请求合并为一次求解器调用"""
+
+    def test_concurrent_solves_call_solver_once(self, client, db, monkeypatch):
+        headers = register_and_login(client, "alice")
+        problem = upload(client, headers, "求f(x)=x^3-3x的极值")
+        calls = []
+        real_solve = solver.solve
+
+        def counting_solve(raw, mode="structured"):
+            calls.append((raw, mode))
+            return real_solve(raw, mode)
+
+        monkeypatch.setattr(solver, "solve", counting_solve)
+
+        async def submit_all():
+            # 同一事件循环中的请求共用与生产配置相同的连接池（fixture的NullPool每个会话一个连接，
+            # 100个并发请求会超过PostgreSQL默认的连接数上限）
+            url = db.get_bind().url.render_as_string(hide_password=False)
+            engine = database.create_async_db_engine(url)
+            sessions = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+
+            async def pooled_db():
+                async with sessions() as session:
+                    yield session
+
+            fixture_db = app.dependency_overrides[get_async_db]
+            app.dependency_overrides[get_async_db] = pooled_db
+            try:
+                transport = httpx.ASGITransport(app=app)
+                async with httpx.AsyncClient(transport=transport, base_url="http://test", headers=headers) as ac:
+                    responses = await asyncio.gather(*[
+                        ac.post("/solve", json={"problem_id": problem["id"]}) for _ in range(100)
+                    ])
+            finally:
+                app.dependency_overrides[get_async_db] = fixture_db
+                await engine.dispose()
+            return responses
+
+        responses = asyncio.run(submit_all())
+        assert [r.status_code for r in responses] == [202] * 100, [r.text for r in responses if r.status_code != 202]
+        statuses = [r.json()["status"] for r in responses]
+        assert statuses.count(jobs.STATUS_QUEUED) == 1
+        assert statuses.count(jobs.STATUS_WAITING) == 99
+
+        run_jobs(db, workers=4)
+
+        assert len(calls) == 1
+        results = []
+        for r in responses:
+            job = client.get(f"/jobs/{r.json()['id']}", headers=headers).json()
+            assert job["status"] == jobs.STATUS_SUCCEEDED
+            results.append(job["result"])
+        assert all(result == results[0] for result in results)
+        assert results[0]["answer"] is not None
+
+
+def mastery_rows(conn) -> dict:
+    """读取全部掌握度行：(user_id, 主题) -> (掌握度, 答题数, 答对数, 更新时间)"""
+    table = models.TopicMastery.__table__
+    rows = conn.execute(select(table.c.user_id, table.c.topic, table.c.mastery, table.c.attempts,
+                               table.c.correct, table.c.updated_at)).all()
+    return {(row[0], row[1]): tuple(row[2:]) for row in rows}
+
+
+class TestRecompute:
+    """NumPy批量重算与逐条重放（mastery.replay / mastery.update）的结果一致"""
+
+    def test_run_sequences_matches_update(self):
+        rng = random.Random(0)
+        sequences = [[rng.random() < 0.6 for _ in range(rng.randint(1, 30))] for _ in range(50)]
+        expected = []
+        for sequence in sequences:
+            p = mastery.P_INIT
+            for correct in sequence:
+                p = mastery.update(p, correct)
+            expected.append(p)
+        starts = np.cumsum([0] + [len(sequence) for sequence in sequences[:-1]])
+        correct = np.array([c for sequence in sequences for c in sequence])
+        assert recompute.run_sequences(correct, starts).tolist() == pytest.approx(expected)
+
+    def test_run_matches_replay_after_resume(self, client, db, tmp_path):
+        rng = random.Random(1)
+        users = {}
+        for username in ("alice", "bob", "carol"):
+            headers = register_and_login(client, username)
+            problems = [
+                upload(client, headers, f"{username}的第{i}题", knowledge_tags=topics)["id"]
+                for i, topics in enumerate((["导数", "极限"], ["极限"], ["积分"], ["导数", "积分"]))
+            ]
+            for _ in range(20):
+                attempt = {"problem_id": rng.choice(problems)}
+                if rng.random() < 0.8:
+                    attempt["correct"] = rng.random() < 0.6
+                else:
+                    attempt["score"] = rng.randint(0, 100)
+                r = client.post("/attempts", headers=headers, json=attempt)
+                assert r.status_code == 201, r.text
+            users[username] = problems
+        user_ids = dict(zip(users, sorted(db.scalars(select(models.User.id)).all())))
+
+        # 删除答题后留下的掌握度行：alice的"积分"主题、carol的全部主题
+        attempts = models.Attempt.__table__
+        db.execute(delete(attempts).where(attempts.c.user_id == user_ids["alice"],
+                                          attempts.c.problem_id.in_(users["alice"][2:])))
+        db.execute(delete(attempts).where(attempts.c.user_id == user_ids["carol"]))
+        db.commit()
+        before = mastery_rows(db.connection())
+        assert (user_ids["alice"], "积分") in before
+        assert any(user_id == user_ids["carol"] for user_id, _ in before)
+        db.rollback()
+
+        engine = db.get_bind()
+        checkpoint_path = str(tmp_path / "recompute.checkpoint.json")
+        calls = []
+
+        def interrupted(chunk):
+            calls.append(chunk)
+            if len(calls) == 2:
+                raise RuntimeError("模拟中断")
+            return recompute.compute_chunk(chunk)
+
+        with pytest.raises(RuntimeError):
+            recompute.run(engine, users_per_chunk=1, checkpoint_path=checkpoint_path, compute=interrupted)
+        with open(checkpoint_path) as f:
+            assert json.load(f)["last_user_id"] == user_ids["alice"]
+        recompute.run(engine, users_per_chunk=1, checkpoint_path=checkpoint_path)
+        assert not os.path.exists(checkpoint_path)
+
+        with engine.connect() as conn:
+            recomputed = mastery_rows(conn)
+            mastery.replay(conn)
+            replayed = mastery_rows(conn)
+            conn.rollback()
+        assert (user_ids["alice"], "积分") not in recomputed
+        assert not any(user_id == user_ids["carol"] for user_id, _ in recomputed)
+        assert recomputed.keys() == replayed.keys()
+        for key, (value, count, right, updated_at) in recomputed.items():
+            assert value == pytest.approx(replayed[key][0])
+            assert (count, right, updated_at) == replayed[key][1:]
+
+
+class TestReviews:
+    """SM-2复习计划：间隔序列、遗忘、到期队列排序，以及NumPy重建与逐个计算一致"""
+
+    def test_interval_sequence(self):
+        # 评分4时难易系数不变：间隔依次为1天、6天，之后乘以难易系数
+        state = (0, 0, reviews.INITIAL_EASE)
+        intervals = []
+        for _ in range(4):
+            state = reviews.schedule(*state, reviews.CORRECT_QUALITY)
+            intervals.append(state[1])
+        assert intervals == [1, 6, 15, 38]
+        assert state == (4, 38, pytest.approx(reviews.INITIAL_EASE))
+
+        # 评分5时难易系数每次加0.1，第3次起的间隔按更新前的系数增长
+        state = (0, 0, reviews.INITIAL_EASE)
+        for expected_interval, expected_ease in ((1, 2.6), (6, 2.7), (16, 2.8)):
+            state = reviews.schedule(*state, reviews.MAX_QUALITY)
+            assert state[1:] == (expected_interval, pytest.approx(expected_ease))
+
+        # 向量化版本逐步结果相同
+        repetitions, interval_days, ease = np.zeros(1, dtype=np.int64), np.zeros(1), np.full(1, reviews.INITIAL_EASE)
+        vectorized = []
+        for _ in range(4):
+            repetitions, interval_days, ease = reviews.sm2_update(
+                repetitions, interval_days, ease, np.array([reviews.CORRECT_QUALITY])
+            )
+            vectorized.append(int(interval_days[0]))
+        assert vectorized == intervals
+
+    def test_lapse_resets_interval(self):
+        state = (0, 0, reviews.INITIAL_EASE)
+        for _ in range(3):
+            state = reviews.schedule(*state, reviews.CORRECT_QUALITY)
+        repetitions, interval_days, ease = reviews.schedule(*state, reviews.WRONG_QUALITY)
+        assert (repetitions, interval_days) == (0, reviews.FIRST_INTERVAL)
+        assert ease == pytest.approx(reviews.INITIAL_EASE - 0.54)
+        # 遗忘后重新从1天、6天开始
+        state = reviews.schedule(repetitions, interval_days, ease, reviews.CORRECT_QUALITY)
+        assert state[:2] == (1, reviews.FIRST_INTERVAL)
+        assert reviews.schedule(*state, reviews.CORRECT_QUALITY)[:2] == (2, reviews.SECOND_INTERVAL)
+        # 难易系数不低于下限
+        for _ in range(5):
+            state = reviews.schedule(*state, reviews.WRONG_QUALITY)
+        assert state[2] == reviews.MIN_EASE
+
+    def test_attempts_record_lapses(self, client, db):
+        headers = register_and_login(client, "alice")
+        problem = upload(client, headers, "题目甲")["id"]
+        for correct in (True, True, False):
+            r = client.post("/attempts", headers=headers, json={"problem_id": problem, "correct": correct})
+            assert r.status_code == 201, r.text
+        state = db.query(models.ReviewState).filter_by(problem_id=problem).one()
+        assert (state.repetitions, state.interval_days, state.lapses, state.reviews) == (0, 1, 1, 3)
+        assert state.last_quality == reviews.WRONG_QUALITY
+        assert state.due_at - state.last_reviewed_at == datetime.timedelta(days=1)
+
+    def test_due_queue_order(self, client, db):
+        headers = register_and_login(client, "alice")
+        problems = [upload(client, headers, f"第{i}题")["id"] for i in range(5)]
+        for problem in problems:
+            client.post("/attempts", headers=headers, json={"problem_id": problem, "correct": True})
+        now = models.utcnow()
+        # 第0题尚未到期；其余按到期时间从早到晚为 3, 1, 4, 2（第1题与第4题同时到期，按题目ID）
+        due_at = {
+            problems[0]: now + datetime.timedelta(days=1),
+            problems[1]: now - datetime.timedelta(days=2),
+            problems[2]: now - datetime.timedelta(hours=1),
+            problems[3]: now - datetime.timedelta(days=5),
+            problems[4]: now - datetime.timedelta(days=2),
+        }
+        for state in db.query(models.ReviewState):
+            state.due_at = due_at[state.problem_id]
+        db.commit()
+
+        r = client.get("/reviews/due", headers=headers)
+        assert r.status_code == 200, r.text
+        assert [row["problem_id"] for row in r.json()] == [problems[i] for i in (3, 1, 4, 2)]
+        r = client.get("/reviews/due", params={"limit": 2}, headers=headers)
+        assert [row["problem_id"] for row in r.json()] == [problems[3], problems[1]]
+        assert client.get("/reviews/due", params={"limit": reviews.MAX_LIMIT + 1}, headers=headers).status_code == 400
+
+    def test_compute_chunk_matches_python(self):
+        rng = random.Random(2)
+        rows = []
+        for user_id in range(1, 4):
+            for problem_id in range(1, 6):
+                for i in range(rng.randint(1, 12)):
+                    if rng.random() < 0.7:
+                        rows.append((user_id, problem_id, rng.random() < 0.6, None, i))
+                    else:
+                        rows.append((user_id, problem_id, None, rng.uniform(0, 100), i))
+        chunk = reviews.Chunk(*(list(column) for column in zip(*rows)))
+        vectorized, python = reviews.compute_chunk(chunk), reviews.compute_chunk_python(chunk)
+        # 序列起始、评分、连续成功次数、间隔天数、遗忘次数完全相同，难易系数在浮点误差内相同
+        for index in (0, 1, 2, 3, 5):
+            assert vectorized[index] == python[index]
+        assert vectorized[4] == pytest.approx(python[4])
+
+    def test_rebuild_vectorized_matches_python(self, client, db):
+        rng = random.Random(3)
+        for username in ("alice", "bob"):
+            headers = register_and_login(client, username)
+            problems = [upload(client, headers, f"{username}的第{i}题")["id"] for i in range(4)]
+            for _ in range(25):
+                attempt = {"problem_id": rng.choice(problems)}
+                if rng.random() < 0.7:
+                    attempt["correct"] = rng.random() < 0.6
+                else:
+                    attempt["score"] = rng.randint(0, 100)
+                assert client.post("/attempts", headers=headers, json=attempt).status_code == 201
+
+        table = models.ReviewState.__table__
+        columns = (table.c.user_id, table.c.problem_id, table.c.repetitions, table.c.interval_days, table.c.ease,
+                   table.c.lapses, table.c.reviews, table.c.last_quality, table.c.last_reviewed_at, table.c.due_at)
+
+        def states(conn):
+            return {row[:2]: row[2:] for row in conn.execute(select(*columns)).all()}
+
+        with db.get_bind().connect() as conn:
+            incremental = states(conn)
+            reviews.rebuild(conn, vectorized=True)
+            vectorized = states(conn)
+            reviews.rebuild(conn, vectorized=False)
+            python = states(conn)
+            conn.rollback()
+        assert vectorized.keys() == python.keys() == incremental.keys()
+        for key, row in vectorized.items():
+            for expected in (python[key], incremental[key]):
+                assert row[:2] == expected[:2]
+                assert row[2] == pytest.approx(expected[2])
+                assert row[3:] == expected[3:]
+
+
+class TestMigrations:
+    """启动迁移在已有数据上执行，以及时间列统一为带时区的UTC时间"""
+
+    def test_migrations_run_on_existing_data(self, client, db):
+        headers = register_and_login(client, "alice")
+        problems = [upload(client, headers, f"求第{i}个函数的导数", knowledge_tags=["导数"])["id"] for i in range(3)]
+        for i, problem_id in enumerate(problems * 2):
+            r = client.post("/attempts", headers=headers, json={"problem_id": problem_id, "correct": i % 3 != 0})
+            assert r.status_code == 201, r.text
+        engine = db.get_bind()
+        with engine.connect() as conn:
+            before = mastery_rows(conn)
+
+        try:
+            migrations.run_migrations(engine)
+            with engine.connect() as conn:
+                applied = {row[0] for row in conn.execute(text("SELECT name FROM schema_migrations"))}
+                after = mastery_rows(conn)
+            # 已记录的迁移不再重复执行
+            migrations.run_migrations(engine)
+        finally:
+            # schema_migrations不在模型元数据中，fixture清理时不会删除
+            with engine.begin() as conn:
+                conn.execute(text("DROP TABLE IF EXISTS schema_migrations"))
+
+        assert applied == {name for name, _ in migrations.MIGRATIONS}
+        assert after.keys() == before.keys()
+        for key, (value, count, right, updated_at) in after.items():
+            assert value == pytest.approx(before[key][0])
+            assert (count, right, updated_at) == before[key][1:]
+        r = client.get("/problems/search", params={"q": "导数"}, headers=headers)
+        assert sorted(hit["id"] for hit in r.json()) == problems
+
+    def test_timestamps_are_utc_aware(self, client, db):
+        headers = register_and_login(client, "alice")
+        problem = upload(client, headers, "求f(x)=x^2的导数")
+        assert datetime.datetime.fromisoformat(problem["created_at"]).utcoffset() == datetime.timedelta(0)
+        hits = client.get("/problems/search", params={"q": "导数"}, headers=headers).json()
+        assert datetime.datetime.fromisoformat(hits[0]["created_at"]) == datetime.datetime.fromisoformat(
+            problem["created_at"])
+
+        # 其他时区的值按同一时刻换算为UTC后保存
+        beijing = datetime.timezone(datetime.timedelta(hours=8))
+        row = db.get(models.Problem, problem["id"])
+        row.updated_at = datetime.datetime(2026, 1, 1, 8, 0, tzinfo=beijing)
+        db.commit()
+        db.expire_all()
+        updated_at = db.get(models.Problem, problem["id"]).updated_at
+        assert updated_at == datetime.datetime(2026, 1, 1, 0, 0, tzinfo=datetime.timezone.utc)
+        assert updated_at.utcoffset() == datetime.timedelta(0)
+
+    def test_naive_postgres_columns_converted(self, db):
+        engine = db.get_bind()
+        if engine.dialect.name != "postgresql":
+            pytest.skip("只有PostgreSQL上的时间列需要转换")
+        created_at = datetime.datetime(2026, 1, 1, 12, 30, tzinfo=datetime.timezone.utc)
+        with engine.connect() as conn:
+            # 模拟旧版本的表：不带时区的列中保存UTC时间
+            conn.execute(text("ALTER TABLE jobs ALTER COLUMN created_at TYPE TIMESTAMP WITHOUT TIME ZONE"))
+            conn.execute(text("INSERT INTO jobs (kind, status, priority, attempts, max_attempts, run_after, created_at) "
+                              "VALUES ('solve', 'queued', 0, 0, 1, now(), '2026-01-01 12:30:00')"))
+            migrations._0010_timezone_aware_timestamps(conn)
+            column = {c["name"]: c["type"] for c in inspect(conn).get_columns("jobs")}["created_at"]
+            assert column.timezone
+            assert conn.scalar(select(models.Job.__table__.c.created_at)) == created_at
+            conn.rollback()
@@ -0,0 +1,165 @@
+"""分片上传暂存模块
+
+为可断点续传的分片上传提供磁盘暂存：
+- 分片按编号保存在 UPLOAD_DIR/<session_id>/<part_number>.part
+- 写入分片时边接收边计算SHA-256，与客户端提供的校验和比对
+- 提交会话时按编号顺序流式拼接分片，交给Blob存储
+- 回收过期会话的数据库记录和暂存文件
+
+会话和分片的数据库记录由crud_async模块维护。
+"""
+
+import datetime
+import hashlib
+import os
+import shutil
+import tempfile
+from typing import AsyncIterator, Iterable, Iterator
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+
+import blobstore
+import crud_async
+import models
+
+# 获取当前文件所在的目录路径
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 分片暂存根目录
+UPLOAD_DIR = os.environ.get("STUDY_HELPER_UPLOAD_DIR", os.path.join(BASE_DIR, "uploads"))
+
+# 单个分片最大字节数：默认8MB
+MAX_PART_SIZE = int(os.environ.get("STUDY_HELPER_MAX_PART_BYTES", 8 * 1024 * 1024))
+
+# 分片上传文件的最大总字节数：默认200MB
+MAX_TOTAL_SIZE = int(os.environ.get("STUDY_HELPER_MAX_MULTIPART_BYTES", 200 * 1024 * 1024))
+
+# 单个会话最多分片数
+MAX_PARTS = 10000
+
+# 会话有效期：默认24小时，过期后会话和分片被回收
+SESSION_TTL = datetime.timedelta(hours=int(os.environ.get("STUDY_HELPER_UPLOAD_TTL_HOURS", 24)))
+
+
+class PartChecksumMismatch(Exception):
+    """分片内容的SHA-256与客户端提供的校验和不一致"""
+
+    def __init__(self, expected: str, actual: str):
+        super().__init__(f"分片校验和不匹配: 期望 {expected}，实际 {actual}")
+        self.expected = expected
+        self.actual = actual
+
+
+def session_dir(session_id: str) -> str:
+    """返回会话的分片暂存目录"""
+    return os.path.join(UPLOAD_DIR, session_id)
+
+
+def part_path(session_id: str, part_number: int) -> str:
+    """返回分片的暂存文件路径"""
+    return os.path.join(session_dir(session_id), f"{part_number}.part")
+
+
+async def write_part(
+    session_id: str,
+    part_number: int,
+    chunks: AsyncIterator[bytes],
+    expected_sha256: str,
+    max_size: int = MAX_PART_SIZE,
+):
+    """接收并保存一个分片
+
+    边接收边计算SHA-256并写入临时文件，校验通过后原子替换同编号的旧分片，
+    因此客户端可以安全地重试任意分片。文件IO在线程池中执行，不阻塞事件循环。
+
+    参数：
+        session_id: 会话ID
+        part_number: 分片编号
+        chunks: 请求体的异步分块迭代器
+        expected_sha256: 客户端提供的分片SHA-256（十六进制）
+        max_size: 分片最大字节数
+
+    返回：
+        (分片字节数, 分片SHA-256)
+
+    异常：
+        blobstore.BlobTooLarge: 分片超过max_size
+        PartChecksumMismatch: 校验和不一致
+    """
+    fd, tmp_path = await run_in_threadpool(_create_temp_part, session_id)
+    hasher = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as f:
+            # 攒够一块再交给线程池写入，阻塞的磁盘IO不在事件循环中执行
+            buffer = bytearray()
+            async for chunk in chunks:
+                size += len(chunk)
+                if size > max_size:
+                    raise blobstore.BlobTooLarge(max_size)
+                hasher.update(chunk)
+                buffer += chunk
+                if len(buffer) >= blobstore.CHUNK_SIZE:
+                    data, buffer = bytes(buffer), bytearray()
+                    await run_in_threadpool(f.write, data)
+            if buffer:
+                await run_in_threadpool(f.write, bytes(buffer))
+            await run_in_threadpool(f.flush)
+        sha256 = hasher.hexdigest()
+        if sha256 != expected_sha256.lower():
+            raise PartChecksumMismatch(expected_sha256, sha256)
+        await run_in_threadpool(os.replace, tmp_path, part_path(session_id, part_number))
+    finally:
+        await run_in_threadpool(_discard, tmp_path)
+    return size, sha256
+
+
+def _create_temp_part(session_id: str):
+    """在会话目录中创建接收分片用的临时文件，返回 (文件描述符, 路径)"""
+    directory = session_dir(session_id)
+    os.makedirs(directory, exist_ok=True)
+    return tempfile.mkstemp(dir=directory, suffix=".tmp")
+
+
+def _discard(path: str) -> None:
+    """删除未被替换为正式分片的临时文件"""
+    if os.path.exists(path):
+        os.unlink(path)
+
+
+def iter_assembled(session_id: str, part_numbers: Iterable[int]) -> Iterator[bytes]:
+    """按给定顺序流式读取分片内容，拼接成完整文件
+
+    返回的迭代器可直接作为blobstore.BlobStore.put_stream的数据源。
+    """
+    for part_number in part_numbers:
+        with open(part_path(session_id, part_number), "rb") as f:
+            while True:
+                chunk = f.read(blobstore.CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+
+
+def remove_session_files(session_id: str) -> None:
+    """删除会话的所有暂存分片"""
+    shutil.rmtree(session_dir(session_id), ignore_errors=True)
+
+
+async def collect_expired_sessions(db: AsyncSession, now: datetime.datetime = None) -> int:
+    """回收过期的上传会话
+
+    删除过期会话的数据库记录和暂存分片。
+
+    参数：
+        db: 异步数据库会话
+        now: 当前时间（默认为当前UTC时间）
+
+    返回：
+        回收的会话数量
+    """
+    session_ids = await crud_async.delete_expired_upload_sessions(db, now or models.utcnow())
+    for session_id in session_ids:
+        await run_in_threadpool(remove_session_files, session_id)
+    return len(session_ids)